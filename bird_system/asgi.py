@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bird_system.settings')
 
 application = get_asgi_application()
+
+# 设置了 BIRD_MAINTENANCE_WINDOW 时启动定时数据库维护线程
+from monitor.retention import start_scheduler  # noqa: E402
+
+start_scheduler()
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'monitor.middleware.RequestMetricsMiddleware',  # 放在最前，统计包含其他中间件在内的完整耗时
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,13 +74,43 @@ WSGI_APPLICATION = 'bird_system.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# SQLite 生产配置: WAL 模式下读写互不阻塞；写事务使用 BEGIN IMMEDIATE 尽早拿写锁，
+# 配合 busy timeout 排队而不是直接报 "database is locked"。
+# https://www.sqlite.org/wal.html
+# https://www.sqlite.org/pragma.html
+
+SQLITE_INIT_PRAGMAS = [
+    'PRAGMA auto_vacuum=INCREMENTAL',  # 只对新建的数据库生效，已有数据库见 manage.py maintain_db --full-vacuum
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',  # WAL 下 NORMAL 不会损坏数据库，只在掉电时可能丢失最后的事务
+    'PRAGMA mmap_size=268435456',  # 256MB 内存映射读
+    'PRAGMA cache_size=-65536',  # 每个连接 64MB 页缓存
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA wal_autocheckpoint=2000',
+]
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite',
+        'CONN_MAX_AGE': 600,  # 复用连接，避免每个请求重新打开数据库并执行 PRAGMA
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': '; '.join(SQLITE_INIT_PRAGMAS),
+        },
     }
 }
 
+# 导入和批量写入通过进程内单写线程串行执行，按批提交事务 (见 monitor/writer.py)
+BIRD_SINGLE_WRITER = True
+BIRD_WRITER_MAX_BATCH = 50  # 每个事务最多合并的写任务数
+BIRD_IMPORT_ASYNC = True  # 上传后在后台线程导入，页面通过实时日志查看进度
+BIRD_IMPORT_CHUNK_SIZE = 500  # 导入时每批写入的行数
+BIRD_IMPORT_WORKERS = None  # 批量导入 (多文件/ZIP) 的解析进程数，None 表示 CPU 核数
+BIRD_EXCEL_ENGINE = 'auto'  # Excel 读取引擎: auto (优先 calamine)、calamine、openpyxl (只读流式)、pandas (原 pd.read_excel)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -120,4 +151,95 @@ STATIC_URL = 'static/'
 # Additional locations of static files
 STATICFILES_DIRS = [
     BASE_DIR / 'monitor' / 'static',
-]
\ No newline at end of file
+]
+
+# 鸟群热点检测参数
+# https://en.wikipedia.org/wiki/DBSCAN
+
+BIRD_HOTSPOT_EPS_KM = 1.0  # 邻域半径(公里)
+BIRD_HOTSPOT_MIN_SAMPLES = 3  # 核心点最少邻近记录数
+BIRD_HOTSPOT_WINDOW_MINUTES = 360  # 滑动时间窗口
+BIRD_HOTSPOT_AIRPORT_RADIUS_KM = 30.0  # 关联最近机场的搜索半径
+
+
+# 历史记录列式归档 (Parquet, 需要 pyarrow)
+
+BIRD_ARCHIVE_DIR = BASE_DIR / 'archive'
+BIRD_HOT_WINDOW_DAYS = 90  # 实时库保留的热数据天数，更早的完整月份可以归档
+
+
+
+# 机场鸟击防范保护区 (monitor/zones.py，修改后执行: manage.py build_airport_zones --retag)
+
+BIRD_AIRPORT_ZONES_KM = {  # 各类型机场的同心圆保护区半径 (公里)，由内到外依次为 1、2、3 级
+    'large_airport': (3, 8, 13),
+    'medium_airport': (3, 8, 13),
+    'small_airport': (3, 8),
+    'heliport': (3,),
+    'seaplane_base': (3, 8),
+}
+BIRD_ZONE_GRID_DEG = 0.1  # 保护区网格索引的网格大小 (度)
+
+# 数据保留与数据库维护 (monitor/retention.py，手动执行: manage.py maintain_db)
+
+BIRD_RETENTION_LOG_DAYS = 30  # 导入日志处理详情的保留天数，超过后只保留摘要，None 表示不处理
+BIRD_RETENTION_LOG_MODE = 'compress'  # compress: 完整详情压缩保存；trim: 直接丢弃摘要以外的内容
+BIRD_RETENTION_ARCHIVE_RECORDS = False  # 维护时把热数据窗口以外的月份归档到 Parquet 并从实时库删除
+BIRD_MAINTENANCE_WINDOW = None  # Web 进程内每天自动维护的时间窗口 (本地时间)，如 ('02:00', '04:00')
+BIRD_MAINTENANCE_VACUUM_PAGES = 2000  # 增量 VACUUM 每个写事务释放的页数
+
+
+# 重复鸟情检测 (monitor/dedup.py，修改容差后执行: manage.py rebuild_dedup_fingerprints)
+
+BIRD_DEDUP_POLICY = 'flag'  # 导入和录入时重复记录的处理: flag 标记、merge 合并到已有记录、skip 跳过，None 表示不检查
+BIRD_DEDUP_MINUTES = 30  # 同一鸟种记录时间相差不超过该值 (分钟) 且
+BIRD_DEDUP_KM = 1.0  # 距离不超过该值 (公里，没有坐标时要求发现位置相同) 视为重复
+
+
+# 鸟群轨迹 (monitor/tracks.py，修改参数后执行: manage.py build_tracks)
+
+BIRD_TRACK_MAX_SPEED_KMH = 80.0  # 鸟群最大飞行速度，两次目击的距离超过 速度 x 时间间隔 时不连接
+BIRD_TRACK_MAX_GAP_MINUTES = 60  # 同一轨迹两次目击的最大时间间隔
+BIRD_TRACK_POSITION_KM = 0.5  # 目击位置误差 (公里)，连接时加在允许的距离上
+BIRD_TRACK_HORIZON_MINUTES = 30  # 按当前航向和速度外推多长时间，计算与机场的最近接近距离
+BIRD_TRACK_MIN_POINTS = 3  # 地图和 API 默认只显示目击次数不少于该值的轨迹
+
+
+# 鸟情记录变更日志 (monitor/changes.py，地图按序号增量同步: /api/bird-records/changes/?since=)
+
+BIRD_CHANGE_LOG_DAYS = 7  # 变更日志保留天数，数据库维护时删除更早的变更，None 表示不清理
+BIRD_CHANGES_PAGE_SIZE = 1000  # 每次同步最多返回的变更条数
+
+
+# 地图启动数据包 (monitor/bootstrap.py，/api/map-bootstrap/)
+
+BIRD_MAP_BOOTSTRAP_TIER = 'china'  # 默认的机场分层: china (中国机场)、major (大中型机场)
+BIRD_MAP_BOOTSTRAP_DAYS = 30  # 包含最近多少天的鸟情记录
+BIRD_MAP_BOOTSTRAP_MAX_RECORDS = 50000  # 最多包含的记录数 (取最新的)
+BIRD_MAP_BOOTSTRAP_MAX_AIRPORTS = 5000  # 最多包含的机场数
+BIRD_MAP_BOOTSTRAP_MAX_LAG = 5000  # 数据包落后的记录变更超过该数量后重新生成，之前由客户端增量同步补齐
+BIRD_MAP_BOOTSTRAP_CACHE_SECONDS = 300  # 数据包的缓存时间
+
+
+# 请求性能指标 (/metrics, Prometheus 文本格式) 与慢请求日志
+
+BIRD_SLOW_REQUEST_MS = None  # 慢请求阈值(毫秒)，设置后把超时请求的主要 SQL 写入 monitor.slow_requests 日志
+BIRD_SLOW_REQUEST_TOP_SQL = 5  # 慢请求日志中列出的 SQL 语句数
+BIRD_METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']  # 允许抓取 /metrics 的地址，None 表示不限制
+
+
+# 鸟种、机场查询缓存 (monitor/lookups.py)
+
+BIRD_LOOKUP_CHECK_SECONDS = 1.0  # 检查其他进程修改 (共享缓存中的版本号) 的最短间隔
+
+
+# 管理后台大表列表页
+
+BIRD_ADMIN_COUNT_LIMIT = 10000  # 有筛选条件时最多统计的行数，超过后按该值分页
+BIRD_ADMIN_FILTER_CACHE_SECONDS = 300  # 筛选栏选项 (国家代码、鸟种) 的缓存时间
+
+
+# 读取接口的异步实现 (ASGI 部署时生效，WSGI 下自动使用同步版本)
+# 注意：ASGI 下数据库连接按请求上下文创建，CONN_MAX_AGE 不会跨请求复用连接
+
+BIRD_ASYNC_API = True
@@ -1,28 +1,153 @@
+from django.conf import settings
 from django.contrib import admin
-from .models import BirdSpecies, BirdRecord, Airport, ImportLog
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+from . import search
+from .models import BirdSpecies, BirdRecord, Airport, AirportZone, ImportLog, Hotspot, FlockTrack, AlertRule, Alert
+
+
+# ---- 大表列表页 ----
+# 百万级记录和全量机场目录下，默认列表页的精确 COUNT(*)、筛选栏的 DISTINCT 扫描、
+# 逐行外键查询和 LIKE '%关键字%' 搜索都是全表操作，以下工具把它们换成索引可以命中的查询。
+
+class EstimatedCountPaginator(Paginator):
+    """不执行精确 COUNT(*) 的分页器
+
+    未筛选时用 MAX(id) 估算总数 (主键索引，删除较少时接近实际行数)；
+    有筛选或搜索条件时最多数到 BIRD_ADMIN_COUNT_LIMIT 条。
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list.order_by()
+        if not queryset.query.where:
+            return queryset.aggregate(estimate=Max('pk'))['estimate'] or 0
+        return queryset[:settings.BIRD_ADMIN_COUNT_LIMIT].count()
+
+
+def _cached_choices(key, compute):
+    choices = cache.get(key)
+    if choices is None:
+        choices = list(compute())
+        cache.set(key, choices, settings.BIRD_ADMIN_FILTER_CACHE_SECONDS)
+    return choices
+
+
+class CachedAllValuesFieldListFilter(admin.AllValuesFieldListFilter):
+    """筛选栏的取值列表 (SELECT DISTINCT) 缓存 BIRD_ADMIN_FILTER_CACHE_SECONDS 秒"""
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        key = f'admin-filter:{model._meta.label_lower}:{field_path}'
+        self.lookup_choices = _cached_choices(key, lambda: self.lookup_choices)
+
+
+class CachedRelatedFieldListFilter(admin.RelatedFieldListFilter):
+    """外键筛选栏的选项列表缓存 BIRD_ADMIN_FILTER_CACHE_SECONDS 秒"""
+
+    def field_choices(self, field, request, model_admin):
+        key = f'admin-filter:{field.model._meta.label_lower}:{field.name}'
+        return _cached_choices(key, lambda: super(CachedRelatedFieldListFilter, self).field_choices(
+            field, request, model_admin))
+
+
+class IndexedSearchMixin:
+    """只使用索引可以命中的搜索条件
+
+    code_search_fields 按大写精确匹配 (机场代码等)，exact_search_fields 精确匹配，
+    prefix_search_fields 按前缀范围查询 (区分大小写)，fulltext_search 开启时同时按鸟情记录的全文索引匹配
+    (monitor/search.py)；不做 LIKE '%关键字%' 全表扫描。
+    """
+    code_search_fields = ()
+    exact_search_fields = ()
+    prefix_search_fields = ()
+    fulltext_search = False
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        condition = Q()
+        for field in self.code_search_fields:
+            condition |= Q(**{field: term.upper()})
+        for field in self.exact_search_fields:
+            condition |= Q(**{field: term})
+        for field in self.prefix_search_fields:
+            condition |= Q(**{f'{field}__gte': term, f'{field}__lt': term + '\U0010ffff'})
+        if self.fulltext_search:
+            # 只读取索引当前内容，后台保存和导入完成后才同步索引
+            ids = search.matching_ids(term)
+            if ids is not None:
+                condition |= Q(pk__in=ids)
+        return queryset.filter(condition), False
+
+
+class SearchIndexSyncMixin:
+    """保存或删除后同步鸟情记录的全文索引 (事务提交后交给单写线程)"""
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        search.sync_after_commit()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        search.sync_after_commit()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        search.sync_after_commit()
+
 
 @admin.register(BirdSpecies)
-class BirdSpeciesAdmin(admin.ModelAdmin):
+class BirdSpeciesAdmin(SearchIndexSyncMixin, admin.ModelAdmin):
     list_display = ('name', 'danger_level')
     search_fields = ('name',)
 
 @admin.register(BirdRecord)
-class BirdRecordAdmin(admin.ModelAdmin):
+class BirdRecordAdmin(SearchIndexSyncMixin, IndexedSearchMixin, admin.ModelAdmin):
     list_display = ('species', 'quantity', 'location', 'risk_level', 'record_time')
-    list_filter = ('risk_level', 'species', 'record_time')
+    list_filter = ('risk_level', 'zone_level', ('duplicate_of', admin.EmptyFieldListFilter),
+                   ('species', CachedRelatedFieldListFilter), 'record_time')
+    list_select_related = ('species',)
+    autocomplete_fields = ('species',)
     search_fields = ('location', 'species__name')
-    readonly_fields = ('latitude', 'longitude')
+    exact_search_fields = ('species__name',)
+    prefix_search_fields = ('location',)
+    fulltext_search = True
+    search_help_text = '按鸟种名称精确匹配、发现位置前缀，或在位置、入侵原因、备注中全文搜索 (中文至少两个字)'
+    readonly_fields = ('latitude', 'longitude', 'zone_airport', 'zone_level', 'duplicate_of')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+class AirportZoneInline(admin.TabularInline):
+    """保护区由机场坐标和类型自动生成，只读显示"""
+    model = AirportZone
+    fields = ('level', 'radius_km', 'min_latitude', 'max_latitude', 'min_longitude', 'max_longitude')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 @admin.register(Airport)
-class AirportAdmin(admin.ModelAdmin):
+class AirportAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ('name', 'ident', 'airport_type', 'iso_country', 'municipality')
-    list_filter = ('airport_type', 'iso_country')
+    list_filter = ('airport_type', ('iso_country', CachedAllValuesFieldListFilter))
     search_fields = ('name', 'ident', 'municipality')
+    code_search_fields = ('ident', 'icao_code', 'iata_code')
+    prefix_search_fields = ('name', 'municipality')
+    search_help_text = '按机场代码 (标识符/ICAO/IATA) 精确匹配，或按名称、城市前缀搜索'
     readonly_fields = ('latitude', 'longitude')
+    inlines = (AirportZoneInline,)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 @admin.register(ImportLog)
 class ImportLogAdmin(admin.ModelAdmin):
-    list_display = ('created_at', 'log_type', 'file_name', 'status', 'success_count', 'error_count')
+    list_display = ('created_at', 'log_type', 'file_name', 'status', 'success_count', 'error_count', 'rows_per_second', 'duration_seconds')
     list_filter = ('log_type', 'status', 'created_at')
     search_fields = ('file_name',)
     readonly_fields = ('details', 'error_messages', 'completed_at')
@@ -36,3 +161,49 @@ class ImportLogAdmin(admin.ModelAdmin):
         # 不允许修改日志，只能查看
         return False
 
+@admin.register(Hotspot)
+class HotspotAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'dominant_species', 'total_quantity', 'nearest_airport', 'airport_distance_km', 'last_seen')
+    list_select_related = ('dominant_species', 'nearest_airport')
+    raw_id_fields = ('dominant_species', 'nearest_airport')
+    readonly_fields = ('member_ids', 'updated_at')
+
+    def has_add_permission(self, request):
+        # 热点由检测器自动生成
+        return False
+
+@admin.register(FlockTrack)
+class FlockTrackAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'species', 'max_quantity', 'speed_kmh', 'approach_airport', 'approach_distance_km',
+                    'approach_level', 'last_seen')
+    list_filter = ('approach_level',)
+    list_select_related = ('species', 'approach_airport')
+    raw_id_fields = ('species', 'approach_airport')
+    readonly_fields = ('record_ids', 'path', 'updated_at')
+
+    def has_add_permission(self, request):
+        # 轨迹由连接器自动生成
+        return False
+
+@admin.register(AlertRule)
+class AlertRuleAdmin(admin.ModelAdmin):
+    list_display = ('name', 'rule_type', 'level', 'threshold', 'species', 'airport', 'radius_km', 'window_minutes', 'enabled')
+    list_filter = ('rule_type', 'level', 'enabled')
+    list_editable = ('enabled',)
+    list_select_related = ('species', 'airport')
+    raw_id_fields = ('species', 'airport')
+    search_fields = ('name',)
+
+@admin.register(Alert)
+class AlertAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'level', 'message', 'rule', 'airport', 'acknowledged')
+    list_filter = ('level', 'acknowledged')
+    list_select_related = ('rule', 'airport')
+    raw_id_fields = ('record', 'airport')
+    readonly_fields = ('rule', 'level', 'message', 'created_at')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        # 预警由规则引擎自动生成
+        return False
@@ -0,0 +1,264 @@
+"""实时预警引擎
+
+记录写入或导入时按规则评估：数量阈值、鸟种危险等级、以及"机场 X 周边 R 公里内
+T 分钟内出现 N 次"。密集度规则使用内存中的滑动窗口计数 (按机场/鸟种/半径/窗口分组)，
+不在每次写入时查询记录表。每条规则触发后在冷却时间内不再重复触发。触发的预警会保存到
+数据库，并推送给 SSE 连接。
+"""
+import asyncio
+import bisect
+import logging
+import threading
+from collections import deque
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .geo import bbox_around, haversine_km
+from .models import Alert, AlertRule, BirdRecord
+
+logger = logging.getLogger(__name__)
+
+
+class AlertBroadcaster:
+    """进程内预警推送 - 每个 SSE 连接持有一个 asyncio 队列
+
+    publish() 可以在任意线程中调用 (例如同步视图中的导入)，通过
+    call_soon_threadsafe 把消息投递到订阅者所在的事件循环。
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add((loop, queue))
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers = {item for item in self._subscribers if item[1] is not queue}
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, payload):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, payload)
+            except RuntimeError:
+                # 事件循环已关闭，连接已断开
+                self.unsubscribe(queue)
+
+    @staticmethod
+    def _offer(queue, payload):
+        # 客户端消费太慢时丢弃最旧的消息，保证推送不阻塞
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(payload)
+
+
+class AlertEngine:
+    """规则评估引擎 (进程内单例，规则变更时通过信号失效)"""
+
+    def __init__(self, broadcaster):
+        self.broadcaster = broadcaster
+        self._lock = threading.Lock()
+        self._rules = None
+        # (机场ID, 鸟种ID, 半径, 窗口分钟数) -> 按记录时间排序的 deque[(记录时间, 记录ID)]
+        self._windows = {}
+        # 规则ID -> 上次触发时间
+        self._last_fired = {}
+
+    def invalidate(self):
+        """规则变化后清空缓存，下一次评估时重新加载"""
+        with self._lock:
+            self._rules = None
+            self._windows = {}
+
+    def evaluate(self, records, now=None):
+        """评估一批刚写入的记录，返回触发的 Alert 列表
+
+        records 为已保存的 BirdRecord 实例 (species 已加载)。
+        """
+        records = [record for record in records if record.pk]
+        if not records:
+            return []
+        now = now or timezone.now()
+        for record in records:
+            # 导入时解析出的时间可能不带时区
+            if timezone.is_naive(record.record_time):
+                record.record_time = timezone.make_aware(record.record_time)
+
+        with self._lock:
+            rules = self._get_rules(now)
+            if not rules:
+                return []
+            fired = []
+            # 按记录时间顺序推进滑动窗口
+            for record in sorted(records, key=lambda r: r.record_time):
+                for rule in rules:
+                    alert = self._check(rule, record, now)
+                    if alert is not None:
+                        fired.append(alert)
+
+        if not fired:
+            return []
+        alerts = Alert.objects.bulk_create(fired)
+        payloads = [serialize_alert(alert) for alert in alerts]
+
+        def publish():
+            for payload in payloads:
+                self.broadcaster.publish(payload)
+
+        # 写入事务提交后再推送：推送不占用写事务，事务回滚时也不会推送不存在的预警
+        transaction.on_commit(publish)
+        return alerts
+
+    def _get_rules(self, now):
+        if self._rules is None:
+            self._rules = list(AlertRule.objects.filter(enabled=True).select_related('species', 'airport'))
+            self._windows = {}
+            for rule in self._rules:
+                if rule.rule_type == 'density' and rule.airport_id:
+                    self._prime_window(rule, now)
+        return self._rules
+
+    def _window_key(self, rule):
+        return rule.airport_id, rule.species_id, rule.radius_km, rule.window_minutes
+
+    def _prime_window(self, rule, now):
+        """首次加载密集度规则时，从数据库补齐当前窗口内已有的记录"""
+        key = self._window_key(rule)
+        if key in self._windows:
+            return
+        span = timedelta(minutes=rule.window_minutes)
+        airport = rule.airport
+        min_lat, max_lat, min_lon, max_lon = bbox_around(airport.latitude, airport.longitude, rule.radius_km)
+        queryset = BirdRecord.objects.filter(
+            record_time__gte=now - span,
+            latitude__gte=min_lat, latitude__lte=max_lat,
+            longitude__gte=min_lon, longitude__lte=max_lon,
+        )
+        if rule.species_id:
+            queryset = queryset.filter(species_id=rule.species_id)
+        events = deque(
+            (record_time, record_id)
+            for record_id, lat, lon, record_time in queryset.order_by('record_time').values_list(
+                'id', 'latitude', 'longitude', 'record_time')
+            if haversine_km(airport.latitude, airport.longitude, lat, lon) <= rule.radius_km
+        )
+        self._windows[key] = {'span': span, 'events': events, 'seen': {record_id for _, record_id in events}}
+
+    def _near_airport(self, rule, record):
+        if record.latitude is None or record.longitude is None:
+            return False
+        airport = rule.airport
+        # 先用经纬度差粗筛，再计算球面距离
+        if abs(record.latitude - airport.latitude) > rule.radius_km / 110.0:
+            return False
+        return haversine_km(airport.latitude, airport.longitude, record.latitude, record.longitude) <= rule.radius_km
+
+    def _check(self, rule, record, now):
+        if rule.species_id and record.species_id != rule.species_id:
+            return None
+        if rule.airport_id and not self._near_airport(rule, record):
+            return None
+
+        species_name = record.species.name
+        if rule.rule_type == 'quantity':
+            if record.quantity < rule.threshold:
+                return None
+            message = f'{species_name} 数量 {record.quantity} 只，达到阈值 {rule.threshold} ({record.location})'
+        elif rule.rule_type == 'danger':
+            danger_level = record.species.danger_level
+            if danger_level < rule.threshold:
+                return None
+            message = f'高危鸟种 {species_name} (危险等级 {danger_level}) 出现在 {record.location}'
+        elif rule.rule_type == 'density':
+            if not rule.airport_id:
+                return None
+            count = self._push_window(rule, record, now)
+            if count < rule.threshold:
+                return None
+            species_label = rule.species.name if rule.species_id else '鸟情'
+            message = (f'{rule.airport.name} 周边 {rule.radius_km:g} 公里内 {rule.window_minutes} 分钟内'
+                       f'出现 {count} 次{species_label}记录')
+        else:
+            return None
+
+        # 冷却时间内同一规则不重复触发
+        if self._cooling_down(rule, now):
+            return None
+        self._last_fired[rule.id] = now
+        return Alert(
+            rule=rule,
+            level=rule.level,
+            message=message[:500],
+            record=record,
+            airport=rule.airport,
+        )
+
+    def _push_window(self, rule, record, now):
+        """把记录加入滑动窗口，返回窗口内的记录数
+
+        窗口按记录时间排序，过期的记录从左端弹出，窗口长度即为计数，不重新遍历。
+        """
+        key = self._window_key(rule)
+        if key not in self._windows:
+            self._prime_window(rule, now)
+        window = self._windows[key]
+        events = window['events']
+        span = window['span']
+        # 早于当前窗口的历史数据 (例如补录) 不参与密集度统计
+        if record.record_time >= now - span and record.pk not in window['seen']:
+            event = (record.record_time, record.pk)
+            if not events or event >= events[-1]:
+                events.append(event)
+            else:
+                # 同一批记录按时间排序后评估，乱序只出现在不同批次之间
+                bisect.insort(events, event)
+            window['seen'].add(record.pk)
+        latest = max(now, events[-1][0]) if events else now
+        while events and events[0][0] < latest - span:
+            _, expired_id = events.popleft()
+            window['seen'].discard(expired_id)
+        return len(events)
+
+    def _cooling_down(self, rule, now):
+        last = self._last_fired.get(rule.id)
+        return last is not None and now - last < timedelta(minutes=rule.cooldown_minutes)
+
+
+def serialize_alert(alert):
+    """预警的 JSON 表示 (用于 API 和 SSE 推送)"""
+    return {
+        'id': alert.id,
+        'level': alert.level,
+        'message': alert.message,
+        'rule': alert.rule.name,
+        'record_id': alert.record_id,
+        'airport': alert.airport.ident if alert.airport else None,
+        'created_at': timezone.localtime(alert.created_at).strftime('%Y-%m-%d %H:%M:%S') if alert.created_at else None,
+    }
+
+
+broadcaster = AlertBroadcaster()
+engine = AlertEngine(broadcaster)
+
+
+def evaluate_records(records):
+    """写入记录后评估预警规则；失败只记录日志，不影响记录写入"""
+    try:
+        return engine.evaluate(records)
+    except Exception:
+        logger.exception('预警规则评估失败')
+        return []
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class MonitorConfig(AppConfig):
     name = 'monitor'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,473 @@
+"""历史鸟情记录列式归档
+
+把已结束月份的记录写入按 year/month (可选 species_id) 分区的 Parquet 数据集，
+并提供基于 pyarrow.dataset 的分析查询 (分区裁剪 + 谓词下推)。热数据窗口以外的
+统计从归档读取，实时库可以只保留近期记录。
+
+归档目录中的 _manifest.json 记录每个月已归档的最大记录ID和归档截止时间，
+重复运行只会追加新的记录，不会重复写入。
+
+归档之后实时库中的变化:
+- 补录到已归档月份的新记录: ID 大于所有已归档的记录 (自增主键不复用)，统计时按 ID 从实时库读取；
+- 已归档记录的修改和删除: 清单记录已同步到的变更日志序号 (change_seq)，之后修改或删除过的已归档记录
+  在统计时从归档中排除、改读实时库；下一次归档 (或数据库维护清理变更日志之前) 重写这些记录所在的月份。
+  归档后从实时库删除记录产生的变更不算作修改，其序号区间记录在清单的 pruned_changes 中。
+"""
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import changes
+from .models import BirdRecord, RecordChange
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = '_manifest.json'
+WRITE_CHUNK_SIZE = 50000
+DELETE_BATCH_SIZE = 900  # SQLite 单条语句的参数数量上限以内
+
+# 归档列: (查询字段, 归档列名)
+ARCHIVE_FIELDS = [
+    ('id', 'id'),
+    ('species_id', 'species_id'),
+    ('species__name', 'species_name'),
+    ('quantity', 'quantity'),
+    ('location', 'location'),
+    ('latitude', 'latitude'),
+    ('longitude', 'longitude'),
+    ('intrusion_reason', 'intrusion_reason'),
+    ('record_time', 'record_time'),
+    ('risk_level', 'risk_level'),
+    ('notes', 'notes'),
+]
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ValueError("历史归档需要安装pyarrow: pip install pyarrow")
+
+
+def archive_dir():
+    return Path(getattr(settings, 'BIRD_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'archive'))
+
+
+def hot_window_days():
+    return getattr(settings, 'BIRD_HOT_WINDOW_DAYS', 90)
+
+
+def default_cutoff(now=None):
+    """默认归档截止时间：热数据窗口开始所在月份的第一天 (只归档已结束的完整月份)"""
+    now = timezone.localtime(now or timezone.now())
+    boundary = now - timedelta(days=hot_window_days())
+    return boundary.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def load_manifest():
+    path = archive_dir() / MANIFEST_NAME
+    if not path.exists():
+        return {'months': {}, 'cutoff': None, 'partition_species': False, 'change_seq': None, 'pruned_changes': []}
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    # 早期的清单没有变更日志同步点，下一次归档时从当时的序号开始
+    manifest.setdefault('change_seq', None)
+    manifest.setdefault('pruned_changes', [])
+    return manifest
+
+
+def _save_manifest(manifest):
+    directory = archive_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    temp_path = directory / (MANIFEST_NAME + '.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    temp_path.replace(directory / MANIFEST_NAME)
+
+
+def archive_cutoff():
+    """已归档数据的截止时间 (之前的统计从归档读取)，尚未归档时返回 None"""
+    cutoff = load_manifest().get('cutoff')
+    return datetime.fromisoformat(cutoff) if cutoff else None
+
+
+def analytics_cutoff():
+    """分析查询的冷热分界：早于该时间的统计读归档，之后的读实时库
+
+    没有归档或未安装 pyarrow 时返回 None，所有统计都走实时库。
+    """
+    try:
+        _require_pyarrow()
+    except ValueError:
+        return None
+    return archive_cutoff()
+
+
+def archived_max_id(manifest):
+    """已归档记录的最大ID，之后写入的记录 (包括补录到已归档月份的) 都不在归档中"""
+    return max((entry['max_id'] for entry in manifest['months'].values()), default=0)
+
+
+def changed_record_ids(manifest, upto=None):
+    """清单同步点之后修改或删除过的已归档记录ID (归档中的版本已经过期)"""
+    max_id = archived_max_id(manifest)
+    if manifest.get('change_seq') is None or not max_id:
+        return []
+    queryset = RecordChange.objects.filter(id__gt=manifest['change_seq'], record_id__lte=max_id)
+    if upto is not None:
+        queryset = queryset.filter(id__lte=upto)
+    for first, last in manifest.get('pruned_changes', []):
+        queryset = queryset.exclude(id__gt=first, id__lte=last)
+    return sorted(set(queryset.values_list('record_id', flat=True)))
+
+
+def analytics_split():
+    """分析查询的冷热划分，返回 (截止时间, 实时库筛选条件, 需要从归档中排除的记录ID)
+
+    实时库统计截止时间之后的记录、归档之后写入的记录 (补录) 和归档后修改过的记录，
+    归档统计截止时间之前除修改或删除过的记录以外的部分。没有归档时返回 (None, None, [])。
+    """
+    cutoff = analytics_cutoff()
+    if cutoff is None:
+        return None, None, []
+    manifest = load_manifest()
+    stale_ids = changed_record_ids(manifest)
+    live_filter = Q(record_time__gte=cutoff) | Q(id__gt=archived_max_id(manifest))
+    if stale_ids:
+        live_filter |= Q(id__in=stale_ids)
+    return cutoff, live_filter, stale_ids
+
+
+def _month_starts(first, cutoff):
+    """从 first 所在月份到 cutoff (不含) 的每个月第一天"""
+    current = timezone.localtime(first).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while current < cutoff:
+        yield current
+        current = (current + timedelta(days=32)).replace(day=1)
+        current = timezone.make_aware(current.replace(tzinfo=None))
+
+
+def _arrow_schema(partition_species):
+    import pyarrow as pa
+
+    fields = [
+        pa.field('id', pa.int64()),
+        pa.field('species_id', pa.int64()),
+        pa.field('species_name', pa.string()),
+        pa.field('quantity', pa.int64()),
+        pa.field('location', pa.string()),
+        pa.field('latitude', pa.float64()),
+        pa.field('longitude', pa.float64()),
+        pa.field('intrusion_reason', pa.string()),
+        pa.field('record_time', pa.timestamp('us', tz='UTC')),
+        pa.field('risk_level', pa.string()),
+        pa.field('notes', pa.string()),
+        pa.field('year', pa.int16()),
+        pa.field('month', pa.int8()),
+    ]
+    return pa.schema(fields)
+
+
+def _partition_schema(partition_species):
+    import pyarrow as pa
+
+    fields = [pa.field('year', pa.int16()), pa.field('month', pa.int8())]
+    if partition_species:
+        fields.append(pa.field('species_id', pa.int64()))
+    return pa.schema(fields)
+
+
+def archive_records(cutoff=None, partition_species=False, prune=False, stdout=None):
+    """把 cutoff 之前的记录追加写入归档，返回统计信息
+
+    先把上次归档之后已归档记录的修改和删除同步到归档 (apply_changes)。
+    prune=True 时在归档文件和清单写入成功后，从实时库删除已归档的记录。
+    """
+    _require_pyarrow()
+    import pyarrow.dataset as ds
+
+    cutoff = cutoff or default_cutoff()
+    manifest = load_manifest()
+    if manifest['months'] and manifest.get('partition_species', False) != partition_species:
+        raise ValueError('归档分区方式与已有归档不一致，请使用相同的 --partition-species 设置')
+    manifest['partition_species'] = partition_species
+    stats = {'rows': 0, 'months': 0, 'pruned': 0, 'chunks': 0}
+    stats['changed'] = _apply_changes(manifest, stdout)
+
+    first = BirdRecord.objects.filter(record_time__lt=cutoff).order_by('record_time').values_list(
+        'record_time', flat=True).first()
+    if first is None:
+        _save_manifest(manifest)
+        if prune:
+            stats['pruned'] = prune_archived(manifest)
+        return stats
+
+    schema = _arrow_schema(partition_species)
+    partitioning = ds.partitioning(_partition_schema(partition_species), flavor='hive')
+    lookups = [lookup for lookup, _ in ARCHIVE_FIELDS]
+    run_token = uuid.uuid4().hex[:8]
+
+    for month_start in _month_starts(first, cutoff):
+        month_end = min((month_start + timedelta(days=32)).replace(day=1), cutoff)
+        key = month_start.strftime('%Y-%m')
+        entry = manifest['months'].get(key, {'max_id': 0, 'rows': 0})
+        queryset = BirdRecord.objects.filter(
+            record_time__gte=month_start,
+            record_time__lt=month_end,
+            id__gt=entry['max_id'],
+        ).order_by('id').values_list(*lookups)
+
+        month_rows, max_id, chunk_index = 0, entry['max_id'], 0
+        batch = []
+        for row in queryset.iterator(chunk_size=5000):
+            batch.append(row)
+            if len(batch) >= WRITE_CHUNK_SIZE:
+                _write_chunk(batch, month_start, schema, partitioning, f'{key}-{run_token}-{chunk_index}')
+                chunk_index += 1
+                month_rows += len(batch)
+                max_id = batch[-1][0]
+                batch = []
+        if batch:
+            _write_chunk(batch, month_start, schema, partitioning, f'{key}-{run_token}-{chunk_index}')
+            chunk_index += 1
+            month_rows += len(batch)
+            max_id = batch[-1][0]
+
+        if month_rows:
+            # end 记录该月已归档到的时间上限 (截止时间可能落在月中)
+            manifest['months'][key] = {
+                'max_id': max_id,
+                'rows': entry['rows'] + month_rows,
+                'end': max(month_end.isoformat(), entry.get('end', '')),
+            }
+            stats['rows'] += month_rows
+            stats['months'] += 1
+            stats['chunks'] += chunk_index
+            if stdout:
+                stdout.write(f'{key}: 归档 {month_rows} 条记录')
+
+    previous_cutoff = archive_cutoff()
+    if previous_cutoff is None or cutoff > previous_cutoff:
+        manifest['cutoff'] = cutoff.isoformat()
+    _save_manifest(manifest)
+
+    if prune:
+        stats['pruned'] = prune_archived(manifest)
+    return stats
+
+
+def apply_changes(stdout=None):
+    """把清单同步点之后已归档记录的修改和删除写入归档，返回重写的记录数
+
+    数据库维护清理变更日志之前调用，避免未同步的修改随变更日志一起被删除。没有归档时返回 None。
+    """
+    manifest = load_manifest()
+    if not manifest['months']:
+        return None
+    _require_pyarrow()
+    changed = _apply_changes(manifest, stdout)
+    _save_manifest(manifest)
+    return changed
+
+
+def _apply_changes(manifest, stdout=None):
+    """重写包含过期记录的月份：去掉归档中的旧版本，追加截止时间之前的当前版本，推进同步点"""
+    import pyarrow.dataset as ds
+
+    seq = changes.latest_seq()
+    stale_ids = changed_record_ids(manifest, upto=seq)
+    if stale_ids:
+        schema = _arrow_schema(manifest['partition_species'])
+        partitioning = ds.partitioning(_partition_schema(manifest['partition_species']), flavor='hive')
+        token = uuid.uuid4().hex[:8]
+        dataset = open_dataset()
+        if dataset is not None:
+            located = dataset.to_table(columns=['year', 'month'], filter=ds.field('id').isin(stale_ids))
+            for year, month in sorted(set(zip(located.column('year').to_pylist(), located.column('month').to_pylist()))):
+                key = f'{year:04d}-{month:02d}'
+                removed = _rewrite_month(dataset, year, month, stale_ids, schema, partitioning, f'{key}-{token}-r')
+                manifest['months'][key]['rows'] -= removed
+
+        cutoff = archive_cutoff()
+        lookups = [lookup for lookup, _ in ARCHIVE_FIELDS]
+        current = BirdRecord.objects.filter(id__in=stale_ids, record_time__lt=cutoff).order_by('id').values_list(*lookups)
+        by_month = {}
+        for row in current:
+            month_start = timezone.localtime(row[8]).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            by_month.setdefault(month_start, []).append(row)
+        for month_start, rows in sorted(by_month.items()):
+            key = month_start.strftime('%Y-%m')
+            _write_chunk(rows, month_start, schema, partitioning, f'{key}-{token}-c')
+            month_end = min((month_start + timedelta(days=32)).replace(day=1), cutoff)
+            entry = manifest['months'].setdefault(key, {'max_id': 0, 'rows': 0, 'end': month_end.isoformat()})
+            entry['rows'] += len(rows)
+            entry['max_id'] = max(entry['max_id'], rows[-1][0])
+        if stdout:
+            stdout.write(f'同步归档后修改或删除的记录 {len(stale_ids)} 条')
+
+    manifest['change_seq'] = seq
+    manifest['pruned_changes'] = [span for span in manifest.get('pruned_changes', []) if span[1] > seq]
+    return len(stale_ids)
+
+
+def _rewrite_month(dataset, year, month, drop_ids, schema, partitioning, token):
+    """去掉某月归档中的指定记录：先写入新文件再删除旧文件，返回去掉的行数"""
+    import pyarrow.dataset as ds
+
+    month_filter = (ds.field('year') == year) & (ds.field('month') == month)
+    paths = [fragment.path for fragment in dataset.get_fragments(filter=month_filter)]
+    before = dataset.count_rows(filter=month_filter)
+    table = dataset.to_table(filter=month_filter & ~ds.field('id').isin(drop_ids))
+    if table.num_rows:
+        _write_table(table.select(schema.names).cast(schema), partitioning, token)
+    for path in paths:
+        Path(path).unlink()
+    return before - table.num_rows
+
+
+def prune_archived(manifest=None):
+    """从实时库删除清单中已归档的记录，返回删除条数"""
+    manifest = manifest or load_manifest()
+    pruned = 0
+    for key, entry in sorted(manifest['months'].items()):
+        month_start = timezone.make_aware(datetime.strptime(key, '%Y-%m'))
+        month_end = datetime.fromisoformat(entry['end'])
+        pruned += _prune_month(manifest, month_start, month_end, entry['max_id'])
+        _save_manifest(manifest)
+    return pruned
+
+
+def _write_chunk(rows, month_start, schema, partitioning, token):
+    import pyarrow as pa
+
+    columns = [list(column) for column in zip(*rows)]
+    columns.append([month_start.year] * len(rows))
+    columns.append([month_start.month] * len(rows))
+    table = pa.Table.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+        schema=schema,
+    )
+    _write_table(table, partitioning, token)
+
+
+def _write_table(table, partitioning, token):
+    import pyarrow.dataset as ds
+
+    ds.write_dataset(
+        table,
+        archive_dir(),
+        format='parquet',
+        partitioning=partitioning,
+        basename_template=f'part-{token}-{{i}}.parquet',
+        existing_data_behavior='overwrite_or_ignore',
+        max_rows_per_group=WRITE_CHUNK_SIZE,
+    )
+
+
+def _prune_month(manifest, month_start, month_end, max_id):
+    """删除某月已归档的记录，分批提交避免长时间持有写锁
+
+    同步点之后修改过的记录归档中的版本已经过期，保留到下一次同步。每批删除产生的变更序号区间
+    记入清单，统计时不把它们当作删除 (写事务开始时已持有写锁，区间内只有本批的变更)。
+    """
+    pruned = 0
+    queryset = BirdRecord.objects.filter(record_time__gte=month_start, record_time__lt=month_end, id__lte=max_id)
+    modified = RecordChange.objects.filter(id__gt=manifest['change_seq'] or 0).values('record_id')
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.exclude(id__in=modified).values_list('id', flat=True)[:DELETE_BATCH_SIZE])
+            if not ids:
+                break
+            first_seq = changes.latest_seq()
+            with changes.collect():
+                BirdRecord.objects.filter(id__in=ids).delete()
+            _note_pruned(manifest, first_seq, changes.latest_seq())
+        pruned += len(ids)
+    return pruned
+
+
+def _note_pruned(manifest, first_seq, last_seq):
+    spans = manifest.setdefault('pruned_changes', [])
+    if spans and spans[-1][1] == first_seq:
+        spans[-1][1] = last_seq
+    else:
+        spans.append([first_seq, last_seq])
+
+
+def open_dataset():
+    """打开归档数据集，没有归档时返回 None"""
+    _require_pyarrow()
+    import pyarrow.dataset as ds
+
+    directory = archive_dir()
+    if not directory.exists() or not any(directory.glob('year=*')):
+        return None
+    return ds.dataset(directory, format='parquet', partitioning='hive')
+
+
+def _filter_expression(start=None, end=None, species_ids=None, exclude_ids=None):
+    """构造过滤表达式：year/month 用于分区裁剪，record_time/species_id 下推到 Parquet 行组统计
+
+    exclude_ids 为归档后修改或删除过的记录 (见 analytics_split)，统计时改读实时库。
+    """
+    import pyarrow.dataset as ds
+
+    expression = None
+
+    def combine(current, condition):
+        return condition if current is None else current & condition
+
+    month_key = ds.field('year') * 100 + ds.field('month')
+    if start is not None:
+        start_local = timezone.localtime(start)
+        expression = combine(expression, month_key >= start_local.year * 100 + start_local.month)
+        expression = combine(expression, ds.field('record_time') >= start)
+    if end is not None:
+        end_local = timezone.localtime(end)
+        expression = combine(expression, month_key <= end_local.year * 100 + end_local.month)
+        expression = combine(expression, ds.field('record_time') < end)
+    if species_ids:
+        expression = combine(expression, ds.field('species_id').isin(list(species_ids)))
+    if exclude_ids:
+        expression = combine(expression, ~ds.field('id').isin(list(exclude_ids)))
+    return expression
+
+
+def query_archive(start=None, end=None, species_ids=None, columns=None, exclude_ids=None):
+    """读取归档记录，返回 pandas DataFrame (没有归档时返回空 DataFrame)"""
+    import pandas as pd
+
+    dataset = open_dataset()
+    if dataset is None:
+        return pd.DataFrame(columns=columns or [name for _, name in ARCHIVE_FIELDS])
+    table = dataset.to_table(columns=columns, filter=_filter_expression(start, end, species_ids, exclude_ids))
+    return table.to_pandas()
+
+
+def archived_species_totals(start=None, end=None, exclude_ids=None):
+    """归档中各鸟种的数量合计 {鸟种名称: 数量}"""
+    dataset = open_dataset()
+    if dataset is None:
+        return {}
+    table = dataset.to_table(columns=['species_name', 'quantity'],
+                             filter=_filter_expression(start, end, exclude_ids=exclude_ids))
+    if table.num_rows == 0:
+        return {}
+    grouped = table.group_by('species_name').aggregate([('quantity', 'sum')])
+    return dict(zip(grouped.column('species_name').to_pylist(), grouped.column('quantity_sum').to_pylist()))
+
+
+def archived_daily_counts(start=None, end=None, exclude_ids=None):
+    """归档中每天(本地时区)的记录条数 {date: count}"""
+    frame = query_archive(start, end, columns=['record_time'], exclude_ids=exclude_ids)
+    if frame.empty:
+        return {}
+    local_days = frame['record_time'].dt.tz_convert(settings.TIME_ZONE).dt.date
+    return local_days.value_counts().sort_index().to_dict()
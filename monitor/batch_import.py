@@ -0,0 +1,253 @@
+"""批量导入：一次上传多个文件或 ZIP 压缩包
+
+文件读取和逐行校验 (pandas，CPU 密集) 在进程池中并行执行；每个文件解析完成后，
+按完成顺序把校验后的行交给单写线程分批写入，同一时间仍然只有一个写事务。
+父日志汇总整批进度，每个文件一条子日志 (ImportLog.parent)。
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import zones
+from .hotspots import update_hotspots
+from .tracks import update_tracks
+from .import_worker import init_worker, parse_file
+from .models import ImportLog
+from .profiling import ImportProfiler
+from .writer import writer as db_writer
+
+# 批量导入支持的数据文件格式 (ZIP 中的其他文件会被跳过)
+BATCH_FILE_FORMATS = ('.csv', '.xls', '.xlsx')
+
+
+def is_archive(file_name):
+    return file_name.lower().endswith('.zip')
+
+
+def _member_name(member):
+    """ZIP 条目名称：未标记 UTF-8 的条目按 GBK 解码 (Windows 中文系统压缩的文件)"""
+    if member.flag_bits & 0x800:
+        return member.filename
+    try:
+        return member.filename.encode('cp437').decode('gbk')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return member.filename
+
+
+def expand_sources(sources, work_dir):
+    """展开 ZIP 压缩包
+
+    sources 为 [(文件名, 路径)]，返回 ([(显示名称, 路径)], [跳过的文件名])。
+    压缩包中的文件按序号写入 work_dir，不使用包内路径，避免写到临时目录之外。
+    """
+    files, skipped = [], []
+    for name, path in sources:
+        if not is_archive(name):
+            if name.lower().endswith(BATCH_FILE_FORMATS):
+                files.append((name, path))
+            else:
+                skipped.append(name)
+            continue
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.infolist():
+                member_name = _member_name(member)
+                base_name = os.path.basename(member_name)
+                if member.is_dir() or not base_name or member_name.startswith('__MACOSX/') or base_name.startswith('.'):
+                    continue
+                if not base_name.lower().endswith(BATCH_FILE_FORMATS):
+                    skipped.append(f'{name}/{member_name}')
+                    continue
+                target = os.path.join(work_dir, f'{len(files)}{os.path.splitext(base_name)[1].lower()}')
+                with archive.open(member) as src, open(target, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                files.append((f'{name}/{member_name}', target))
+    return files, skipped
+
+
+def _create_children(parent, files):
+    return [
+        ImportLog.objects.create(
+            parent=parent,
+            log_type=parent.log_type,
+            file_name=name[-255:],
+            file_size=os.path.getsize(path),
+            status='processing',
+            details=f'批量导入 #{parent.id}: 等待解析 {name}',
+        )
+        for name, path in files
+    ]
+
+
+def run_batch_import(parent_id, sources, import_type, background=False, sheet_name=None):
+    """并行解析多个文件并依次写入，返回汇总结果；background=True 时在后台线程中运行
+
+    sheet_name 为 Excel 文件读取的工作表名称 (所有文件相同)，为空时按表头自动选择。
+    """
+    from django.db import connection
+
+    parent = ImportLog.objects.get(id=parent_id)
+    profiler = ImportProfiler(chunk_size=settings.BIRD_IMPORT_CHUNK_SIZE)
+    work_dir = tempfile.mkdtemp(prefix='bird-batch-')
+    try:
+        files, skipped = expand_sources(sources, work_dir)
+        for name in skipped:
+            parent.details += f'\n跳过不支持的文件: {name}'
+        if not files:
+            parent.status = 'failed'
+            parent.error_messages = '没有可导入的数据文件 (支持 CSV、XLS、XLSX)'
+            parent.completed_at = timezone.now()
+            db_writer.run(parent.save)
+            return {'error': parent.error_messages}
+
+        children = db_writer.run(_create_children, parent, files)
+        workers = min(settings.BIRD_IMPORT_WORKERS or os.cpu_count() or 1, len(files))
+        parent.details += f'\n共 {len(files)} 个文件，使用 {workers} 个解析进程'
+        profiler.apply(parent, 0)
+        db_writer.run(parent.save)
+
+        return _import_files(parent, children, files, import_type, workers, profiler, sheet_name)
+
+    except Exception as e:
+        parent.status = 'failed'
+        parent.error_messages += f'\n批量导入失败: {e}'
+        parent.completed_at = timezone.now()
+        db_writer.run(parent.save)
+        return {'error': f'批量导入失败: {e}'}
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        for _, path in sources:
+            if os.path.exists(path):
+                os.remove(path)
+        if background:
+            # 后台线程结束时释放自己的数据库连接
+            connection.close()
+
+
+def _import_files(parent, children, files, import_type, workers, profiler, sheet_name=None):
+    success_count = error_count = failed_files = 0
+    errors = []
+    created_ids = []
+    duplicate_counts = {}
+
+    executor = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=init_worker)
+    with executor:
+        futures = {
+            executor.submit(parse_file, path, name, import_type, sheet_name): (index, name, child)
+            for index, ((name, path), child) in enumerate(zip(files, children), start=1)
+        }
+        # 等待解析结果的时间计入 parse，写入各阶段的耗时从子日志汇总
+        waited_from = time.perf_counter()
+        for future in as_completed(futures):
+            profiler.add('parse', time.perf_counter() - waited_from)
+            index, name, child = futures[future]
+            child_profiler = ImportProfiler(chunk_size=settings.BIRD_IMPORT_CHUNK_SIZE)
+            result = _import_parsed(future, child, import_type, child_profiler)
+
+            for stage, seconds in child_profiler.stages.items():
+                if stage not in ('read', 'validate'):
+                    profiler.add(stage, seconds)
+            profiler.batches.extend(child_profiler.batches)
+
+            parent.total_rows += child.total_rows
+            if 'error' in result:
+                failed_files += 1
+                parent.error_messages += f'\n{name}: {result["error"]}'
+                parent.details += f'\n[{index}/{len(files)}] {name}: ✗ {result["error"]}'
+            else:
+                success_count += result['success_count']
+                error_count += result['error_count']
+                created_ids.extend(result.get('created_ids', []))
+                for policy, count in result.get('duplicates', {}).items():
+                    duplicate_counts[policy] = duplicate_counts.get(policy, 0) + count
+                errors.extend(f'{name} {message}' for message in result['errors'][:20])
+                if result['error_count']:
+                    parent.error_messages += f'\n{name}: {result["error_count"]} 行失败，详见子日志 #{child.id}'
+                parent.details += (f'\n[{index}/{len(files)}] {name}: 成功 {result["success_count"]} 条, '
+                                   f'失败 {result["error_count"]} 条')
+            parent.success_count = success_count
+            parent.error_count = error_count
+            parent.duplicates_flagged = duplicate_counts.get('flag', 0)
+            parent.duplicates_merged = duplicate_counts.get('merge', 0)
+            parent.duplicates_skipped = duplicate_counts.get('skip', 0)
+            profiler.apply(parent, success_count + error_count)
+            db_writer.run(parent.save)
+            waited_from = time.perf_counter()
+
+    if created_ids and import_type == 'airport':
+        # 所有文件写完后统一生成新机场的保护区 (每批一个写任务)，再重新标记这些保护区范围内的记录
+        with profiler.stage('zones'):
+            for offset in range(0, len(created_ids), zones.ID_CHUNK_SIZE):
+                db_writer.run(zones.rebuild_zones, created_ids[offset:offset + zones.ID_CHUNK_SIZE])
+            retag = zones.retag_records(airport_ids=created_ids, writer=db_writer)
+        parent.details += f'\n保护区标记: 检查 {retag["records"]} 条记录, 更新 {retag["changed"]} 条'
+    elif created_ids:
+        # 所有文件写完后统一增量更新热点和轨迹
+        with profiler.stage('hotspots'):
+            hotspot_stats = db_writer.run(update_hotspots, created_ids)
+        if hotspot_stats:
+            parent.details += f'\n热点更新: 新建 {hotspot_stats["created"]} 个, 移除 {hotspot_stats["removed"]} 个'
+        with profiler.stage('tracks'):
+            track_stats = db_writer.run(update_tracks, created_ids)
+        if track_stats:
+            parent.details += f'\n轨迹连接: 新建 {track_stats["created"]} 条, 延伸 {track_stats["extended"]} 条'
+
+    if failed_files == len(files):
+        parent.status = 'failed'
+    elif failed_files or error_count:
+        parent.status = 'completed_with_errors'
+    else:
+        parent.status = 'completed'
+    parent.completed_at = timezone.now()
+    if any(duplicate_counts.values()):
+        parent.details += (f'\n重复记录: 标记 {parent.duplicates_flagged} 条, 合并 {parent.duplicates_merged} 条, '
+                           f'跳过 {parent.duplicates_skipped} 条')
+    parent.details += (f'\n\n批量导入完成: {len(files)} 个文件 (失败 {failed_files} 个), '
+                       f'成功 {success_count} 条, 失败 {error_count} 条')
+    profiler.apply(parent, success_count + error_count)
+    parent.details += f'\n总耗时 {parent.duration_seconds:.2f} 秒, {parent.rows_per_second or 0:.0f} 行/秒'
+    with profiler.stage('log'):
+        db_writer.run(parent.save)
+
+    if parent.status == 'failed':
+        return {'error': f'批量导入失败: {len(files)} 个文件均未能导入'}
+    unit = '个机场' if import_type == 'airport' else '条鸟情记录'
+    return {
+        'message': f'批量导入 {len(files)} 个文件，成功导入 {success_count} {unit}',
+        'success_count': success_count,
+        'error_count': error_count,
+        'errors': errors,
+        'created_ids': created_ids,
+    }
+
+
+def _import_parsed(future, child, import_type, profiler):
+    """把一个文件的解析结果交给写入流程 (与单文件导入相同)，结果写入子日志"""
+    from .views import _fail_import, import_airport_rows, import_bird_rows
+
+    try:
+        parsed = future.result()
+    except Exception as e:
+        return _fail_import(child, f'文件处理失败: {e}')
+
+    profiler.record_offloaded({
+        'read': parsed['read_seconds'],
+        'validate': parsed.get('validate_seconds', 0.0),
+    }, parsed.get('peak_memory_mb'))
+    child.total_rows = parsed['total_rows']
+    child.details += f'\n成功读取 {parsed["total_rows"]} 行数据'
+    child.details += f'\n列名: {", ".join(parsed["columns"])}'
+    if 'error' in parsed:
+        return _fail_import(child, parsed['error'])
+
+    if import_type == 'airport':
+        return import_airport_rows(parsed['rows'], child, profiler, update_zones=False)
+    return import_bird_rows(parsed['rows'], child, profiler, update_hotspot_index=False)
@@ -0,0 +1,133 @@
+"""地图启动数据包 (/api/map-bootstrap/)
+
+地图页面打开时一次请求取回：当前机场分层、最近 BIRD_MAP_BOOTSTRAP_DAYS 天的鸟情记录 (按列存放)、
+鸟种和风险等级字典以及汇总计数。数据包序列化并 gzip 压缩后放在 Django 缓存中，
+同一版本只生成一次，之后的请求直接返回压缩后的字节。
+
+版本由机场、鸟种查询缓存的版本号 (monitor/lookups.py) 和生成时的记录变更序号 (monitor/changes.py) 组成。
+记录变化不会立即让数据包失效：客户端加载后从数据包的序号开始增量同步，
+只有落后超过 BIRD_MAP_BOOTSTRAP_MAX_LAG 条变更或超过 BIRD_MAP_BOOTSTRAP_CACHE_SECONDS 秒后才重新生成。
+"""
+import gzip
+import json
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count
+from django.utils import timezone
+
+from . import changes, lookups
+from .models import Airport, BirdRecord, BirdSpecies, Hotspot
+
+# 机场分层，与地图页面的机场数据源对应
+AIRPORT_TIERS = {
+    'china': {'iso_country': 'CN'},
+    'major': {'airport_type__in': ('large_airport', 'medium_airport')},
+}
+AIRPORT_COLUMNS = (
+    'id', 'ident', 'name', 'airport_type', 'latitude', 'longitude', 'elevation_ft',
+    'iso_country', 'municipality', 'icao_code', 'iata_code',
+)
+RECORD_COLUMNS = ('id', 'species', 'quantity', 'location', 'latitude', 'longitude', 'risk', 'record_time')
+
+stats = {'hits': 0, 'builds': 0}
+_build_lock = threading.Lock()
+
+
+def _cache_key(tier, days):
+    return f'bird-map-bootstrap:{tier}:{days}:{lookups.airports.version()}:{lookups.species.version()}'
+
+
+def _fresh(cached):
+    return cached is not None and changes.latest_seq() - cached['seq'] <= settings.BIRD_MAP_BOOTSTRAP_MAX_LAG
+
+
+def get_bundle(tier=None, days=None):
+    """返回 (版本号, gzip 压缩的 JSON 字节)，tier 或 days 不合法时抛出 ValueError"""
+    tier = tier or settings.BIRD_MAP_BOOTSTRAP_TIER
+    if tier not in AIRPORT_TIERS:
+        raise ValueError(f'不支持的机场分层: {tier}，可选: {", ".join(AIRPORT_TIERS)}')
+    days = settings.BIRD_MAP_BOOTSTRAP_DAYS if days is None else days
+    if not 0 < days <= 3660:
+        raise ValueError('days 应在 1 到 3660 之间')
+
+    key = _cache_key(tier, days)
+    cached = cache.get(key)
+    if not _fresh(cached):
+        # 同一进程的并发请求只生成一次
+        with _build_lock:
+            cached = cache.get(key)
+            if not _fresh(cached):
+                bundle = build_bundle(tier, days)
+                content = json.dumps(bundle, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':'))
+                cached = {'version': bundle['version'], 'seq': bundle['seq'],
+                          'payload': gzip.compress(content.encode('utf-8'), 6)}
+                cache.set(key, cached, settings.BIRD_MAP_BOOTSTRAP_CACHE_SECONDS)
+                stats['builds'] += 1
+                return cached['version'], cached['payload']
+    stats['hits'] += 1
+    return cached['version'], cached['payload']
+
+
+def build_bundle(tier, days):
+    # 先取序号再读取记录，读取期间的变更由客户端增量同步时再应用一次
+    seq = changes.latest_seq()
+    airports_version, species_version = lookups.airports.version(), lookups.species.version()
+    since = timezone.now() - timedelta(days=days)
+
+    species = {'id': [], 'name': [], 'danger_level': []}
+    species_index = {}
+    for pk, name, danger_level in BirdSpecies.objects.order_by('id').values_list('id', 'name', 'danger_level'):
+        species_index[pk] = len(species['id'])
+        species['id'].append(pk)
+        species['name'].append(name)
+        species['danger_level'].append(danger_level)
+
+    risk_levels = [code for code, _ in BirdRecord.RISK_LEVEL_CHOICES]
+    risk_index = {code: position for position, code in enumerate(risk_levels)}
+
+    recent = BirdRecord.objects.filter(latitude__isnull=False, longitude__isnull=False, record_time__gte=since)
+    records = {column: [] for column in RECORD_COLUMNS}
+    rows = recent.order_by('-record_time').values_list(
+        'id', 'species_id', 'quantity', 'location', 'latitude', 'longitude', 'risk_level', 'record_time',
+    )[:settings.BIRD_MAP_BOOTSTRAP_MAX_RECORDS]
+    for pk, species_id, quantity, location, latitude, longitude, risk_level, record_time in rows:
+        records['id'].append(pk)
+        records['species'].append(species_index.get(species_id))
+        records['quantity'].append(quantity)
+        records['location'].append(location)
+        records['latitude'].append(latitude)
+        records['longitude'].append(longitude)
+        records['risk'].append(risk_index.get(risk_level))
+        records['record_time'].append(record_time.strftime('%Y-%m-%d %H:%M'))
+
+    airports = {column: [] for column in AIRPORT_COLUMNS}
+    tier_airports = Airport.objects.filter(**AIRPORT_TIERS[tier])
+    for row in tier_airports.order_by('id').values_list(*AIRPORT_COLUMNS)[:settings.BIRD_MAP_BOOTSTRAP_MAX_AIRPORTS]:
+        for column, value in zip(AIRPORT_COLUMNS, row):
+            airports[column].append(value)
+
+    risk_counts = dict(recent.order_by().values_list('risk_level').annotate(count=Count('id')))
+    return {
+        'version': f'{tier}.{days}.{airports_version}.{species_version}.{seq}',
+        'seq': seq,
+        'generated_at': timezone.now(),
+        'days': days,
+        'tier': tier,
+        'species': species,
+        'risk_levels': [{'code': code, 'label': label} for code, label in BirdRecord.RISK_LEVEL_CHOICES],
+        'records': records,
+        'airports': airports,
+        'summary': {
+            'records': BirdRecord.objects.count(),
+            'recent_records': sum(risk_counts.values()),
+            'recent_records_shown': len(records['id']),
+            'recent_by_risk': {code: risk_counts.get(code, 0) for code in risk_levels},
+            'airports': tier_airports.count(),
+            'hotspots': Hotspot.objects.count(),
+            'species': len(species['id']),
+        },
+    }
@@ -0,0 +1,101 @@
+"""鸟情记录变更日志与增量同步
+
+BirdRecord 的新增、修改和删除 (monitor.signals，批量写入时由调用方显式记录) 按顺序写入 RecordChange，
+序号即自增主键。SQLite 同一时刻只有一个写事务，序号的分配顺序与提交顺序一致，
+客户端记住最后一个序号，下次只取之后的变更 (/api/bird-records/changes/?since=序号)。
+
+批量导入时在 collect() 中执行，变更先缓存在本线程，结束时一次批量写入 (与记录在同一个事务中)。
+
+超过 BIRD_CHANGE_LOG_DAYS 天的变更在数据库维护时删除 (始终保留最新一条)；
+客户端的序号早于保留的最早变更时返回 reset，客户端重新加载全部记录。
+"""
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import RecordChange
+
+WRITE_BATCH_SIZE = 2000
+
+_local = threading.local()
+
+
+@contextmanager
+def collect():
+    """缓存块内记录的变更，正常结束时批量写入 (可以嵌套，由最外层写入)"""
+    if getattr(_local, 'buffer', None) is not None:
+        yield
+        return
+    _local.buffer = []
+    try:
+        yield
+        entries = _local.buffer
+    finally:
+        _local.buffer = None
+    _write(entries)
+
+
+def record(op, record_ids):
+    """记录一批记录的变更 (op: insert / update / delete)"""
+    entries = [(op, record_id) for record_id in record_ids]
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is not None:
+        buffer.extend(entries)
+    else:
+        _write(entries)
+
+
+def _write(entries):
+    if entries:
+        RecordChange.objects.bulk_create(
+            [RecordChange(op=op, record_id=record_id) for op, record_id in entries], batch_size=WRITE_BATCH_SIZE)
+
+
+def latest_seq():
+    return RecordChange.objects.aggregate(seq=Max('id'))['seq'] or 0
+
+
+def changes_since(since, limit=None):
+    """since 之后的变更，同一条记录只保留最后一次；since 为 None 时只返回当前序号
+
+    返回 {'seq': 本次同步到的序号, 'reset': 是否需要重新加载, 'upserts': [记录ID], 'deletes': [记录ID],
+    'has_more': 是否还有未返回的变更}；新增和修改合并为 upserts，由调用方读取记录当前的内容。
+    """
+    limit = limit or settings.BIRD_CHANGES_PAGE_SIZE
+    bounds = RecordChange.objects.aggregate(oldest=Min('id'), latest=Max('id'))
+    oldest, latest = bounds['oldest'], bounds['latest'] or 0
+    result = {'seq': latest, 'reset': False, 'upserts': [], 'deletes': [], 'has_more': False}
+    if since is None:
+        return result
+    if since > latest or (oldest is not None and since < oldest - 1):
+        # 序号之后的部分变更已被清理 (或数据库已重建)
+        result['reset'] = True
+        return result
+
+    entries = list(RecordChange.objects.filter(id__gt=since).order_by('id')
+                   .values_list('id', 'op', 'record_id')[:limit])
+    final = {}
+    for _, op, record_id in entries:
+        final.pop(record_id, None)
+        final[record_id] = op
+    result['seq'] = entries[-1][0] if entries else since
+    result['has_more'] = result['seq'] < latest
+    result['upserts'] = [record_id for record_id, op in final.items() if op != 'delete']
+    result['deletes'] = [record_id for record_id, op in final.items() if op == 'delete']
+    return result
+
+
+def compact_changes(days=None, now=None):
+    """删除超过保留天数的变更 (保留最新一条，用于判断客户端序号是否过期)，返回删除条数"""
+    days = settings.BIRD_CHANGE_LOG_DAYS if days is None else days
+    if days is None:
+        return 0
+    latest = latest_seq()
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    removed, _ = RecordChange.objects.filter(created_at__lt=cutoff, id__lt=latest).delete()
+    return removed
+
@@ -0,0 +1,237 @@
+"""重复鸟情检测
+
+同一群鸟常由雷达日志、巡查记录和人工录入分别上报。每条记录保存时计算指纹
+(BirdRecord.dedup_fingerprint，有索引)：鸟种 + 时间桶 (BIRD_DEDUP_MINUTES) + 网格 (边长不小于 BIRD_DEDUP_KM)，
+没有坐标时用规范化的发现位置代替网格。
+
+检查一批新记录时，生成每条记录相邻时间桶和相邻网格的指纹，一次查询取出这些指纹下的已有记录，
+再在内存中按时间差和距离确认是否重复 (批内先写入的记录也参与比较)。
+重复记录按 BIRD_DEDUP_POLICY 处理：flag 照常写入并标记 duplicate_of，merge 合并到已有记录 (数量取较大值、
+补全空白的入侵原因和备注)，skip 直接跳过。
+
+指纹依赖容差设置，修改 BIRD_DEDUP_MINUTES / BIRD_DEDUP_KM 后执行 `manage.py rebuild_dedup_fingerprints`。
+"""
+import math
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .geo import haversine_km, km_to_lat_deg, km_to_lon_deg
+
+POLICIES = ('flag', 'merge', 'skip')
+REFINGERPRINT_CHUNK_SIZE = 50000
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def _window_seconds():
+    return settings.BIRD_DEDUP_MINUTES * 60
+
+
+def _cell_deg():
+    return km_to_lat_deg(settings.BIRD_DEDUP_KM)
+
+
+def _lon_cell_deg(row, cell_deg):
+    # 按该行靠近极点一侧的纬度计算，整行的网格宽度都不小于容差距离
+    edge = max(abs(row * cell_deg), abs((row + 1) * cell_deg))
+    return km_to_lon_deg(settings.BIRD_DEDUP_KM, min(edge, 89.9))
+
+
+def normalize_location(location):
+    """发现位置的规范形式：小写并去掉空白和标点"""
+    return _NON_WORD.sub('', (location or '').lower())
+
+
+def _places(latitude, longitude, location, neighbours=False):
+    """记录所在网格 (neighbours=True 时为周围 3x3 网格) 或规范化位置的指纹片段"""
+    if latitude is not None and longitude is not None:
+        cell_deg = _cell_deg()
+        row = math.floor(latitude / cell_deg)
+        rows = (row - 1, row, row + 1) if neighbours else (row,)
+        places = []
+        for r in rows:
+            col = math.floor(longitude / _lon_cell_deg(r, cell_deg))
+            cols = (col - 1, col, col + 1) if neighbours else (col,)
+            places.extend(f'{r}:{c}' for c in cols)
+        return places
+    location = normalize_location(location)
+    return [f'@{location}'] if location else []
+
+
+def fingerprint(species_id, record_time, latitude, longitude, location):
+    """记录的指纹，没有时间、坐标和位置时返回 None"""
+    if species_id is None or record_time is None:
+        return None
+    places = _places(latitude, longitude, location)
+    if not places:
+        return None
+    bucket = int(record_time.timestamp() // _window_seconds())
+    return f'{species_id}:{bucket}:{places[0]}'
+
+
+def neighbour_fingerprints(species_id, record_time, latitude, longitude, location):
+    """可能与该记录重复的记录所在的全部指纹 (相邻时间桶 x 相邻网格)"""
+    bucket = int(record_time.timestamp() // _window_seconds())
+    places = _places(latitude, longitude, location, neighbours=True)
+    return [f'{species_id}:{b}:{place}' for b in (bucket - 1, bucket, bucket + 1) for place in places]
+
+
+def is_duplicate(a, b):
+    """两条记录 (字段字典) 是否在容差内重复"""
+    if abs((a['record_time'] - b['record_time']).total_seconds()) > _window_seconds():
+        return False
+    if a['latitude'] is not None and a['longitude'] is not None:
+        if b['latitude'] is None or b['longitude'] is None:
+            return False
+        return haversine_km(a['latitude'], a['longitude'], b['latitude'], b['longitude']) <= settings.BIRD_DEDUP_KM
+    return normalize_location(a['location']) == normalize_location(b['location'])
+
+
+CANDIDATE_FIELDS = ('id', 'species_id', 'quantity', 'location', 'latitude', 'longitude', 'record_time',
+                    'intrusion_reason', 'notes', 'dedup_fingerprint')
+
+
+def _existing_candidates(keys):
+    """指纹在 keys 中的已有记录 (不含已标记为重复的记录)，通过临时表一次查询"""
+    from .models import BirdRecord
+
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS bird_dedup_keys (fingerprint TEXT PRIMARY KEY)')
+        cursor.execute('DELETE FROM bird_dedup_keys')
+        cursor.executemany('INSERT INTO bird_dedup_keys (fingerprint) VALUES (%s)', [(key,) for key in keys])
+    return list(BirdRecord.objects.filter(
+        dedup_fingerprint__in=RawSQL('SELECT fingerprint FROM bird_dedup_keys', ()),
+        duplicate_of__isnull=True,
+    ).values(*CANDIDATE_FIELDS))
+
+
+def _merge(target, incoming):
+    """把重复记录合并到目标：同一群鸟取较大的数量，补全空白的文字字段；返回是否有变化"""
+    changed = False
+    if incoming['quantity'] > target['quantity']:
+        target['quantity'] = incoming['quantity']
+        changed = True
+    for field in ('intrusion_reason', 'notes'):
+        if not target.get(field) and incoming.get(field):
+            target[field] = incoming[field]
+            changed = True
+    return changed
+
+
+def resolve(items, policy=None):
+    """检查一批待写入的记录，items 为 (鸟种ID, 记录字段) 列表
+
+    返回每条记录的处理方式：None 正常写入，或 (flag / merge / skip, 目标)，
+    目标为 ('record', 已有记录ID) 或 ('row', 批内先写入的记录序号)。
+    没有记录时间的记录字段会补上当前时间；合并到批内记录时直接修改其记录字段，
+    合并到已有记录的修改在这里批量写入 (需要在写事务中调用)。
+    """
+    policy = settings.BIRD_DEDUP_POLICY if policy is None else policy
+    actions = [None] * len(items)
+    if not policy or not items:
+        return actions
+    if policy not in POLICIES:
+        raise ValueError(f'不支持的重复记录处理方式: {policy}，可选: {", ".join(POLICIES)}')
+
+    now = timezone.now()
+    incoming = []
+    keys = set()
+    for species_id, record_data in items:
+        record_data.setdefault('record_time', now)
+        fields = dict(record_data, species_id=species_id)
+        fields.setdefault('latitude', None)
+        fields.setdefault('longitude', None)
+        fields.setdefault('location', '')
+        place = (species_id, fields['record_time'], fields['latitude'], fields['longitude'], fields['location'])
+        key = fingerprint(*place)
+        neighbours = neighbour_fingerprints(*place) if key else []
+        incoming.append((fields, key, neighbours))
+        keys.update(neighbours)
+    if not keys:
+        return actions
+
+    # 指纹 -> 候选记录 [(目标, 字段)]，批内写入的记录随后加入
+    index = {}
+    for candidate in _existing_candidates(keys):
+        index.setdefault(candidate['dedup_fingerprint'], []).append((('record', candidate['id']), candidate))
+
+    merged = {}  # 已有记录ID -> 合并后的字段
+    for position, (fields, key, neighbours) in enumerate(incoming):
+        best = None
+        for neighbour in neighbours:
+            for target, candidate in index.get(neighbour, ()):
+                if candidate['species_id'] == fields['species_id'] and is_duplicate(fields, candidate):
+                    gap = abs((fields['record_time'] - candidate['record_time']).total_seconds())
+                    if best is None or gap < best[0]:
+                        best = (gap, target, candidate)
+        if best is None:
+            if key:
+                index.setdefault(key, []).append((('row', position), fields))
+            continue
+
+        _, target, candidate = best
+        actions[position] = (policy, target)
+        if policy == 'merge' and _merge(candidate, fields):
+            if target[0] == 'record':
+                merged[target[1]] = candidate
+            else:
+                record_data = items[target[1]][1]
+                for field in ('quantity', 'intrusion_reason', 'notes'):
+                    record_data[field] = candidate[field]
+
+    if merged:
+        _save_merged(merged)
+    return actions
+
+
+def _save_merged(merged):
+    from . import changes, lookups
+    from .models import BirdRecord
+
+    records = []
+    for record_id, fields in merged.items():
+        danger_level = lookups.species_danger_level(fields['species_id']) or 3
+        records.append(BirdRecord(
+            id=record_id, quantity=fields['quantity'], intrusion_reason=fields['intrusion_reason'],
+            notes=fields['notes'], risk_level=BirdRecord.compute_risk_level(danger_level, fields['quantity']),
+        ))
+    with transaction.atomic():
+        BirdRecord.objects.bulk_update(records, ['quantity', 'intrusion_reason', 'notes', 'risk_level'],
+                                       batch_size=500)
+        changes.record('update', list(merged))
+
+
+def rebuild_fingerprints(record_model=None, chunk_size=REFINGERPRINT_CHUNK_SIZE):
+    """按当前容差重新计算全部记录的指纹，返回 {'records': 检查条数, 'changed': 变化条数}
+
+    迁移中调用时传入历史模型。与 zones.retag_records 相同，每批写入临时表后用一条 UPDATE ... FROM 更新。
+    """
+    from .models import BirdRecord
+
+    record_model = record_model or BirdRecord
+    table = connection.ops.quote_name(record_model._meta.db_table)
+    stats = {'records': 0, 'changed': 0}
+    last_id = 0
+    while True:
+        rows = list(record_model.objects.filter(id__gt=last_id).order_by('id').values_list(
+            'id', 'species_id', 'record_time', 'latitude', 'longitude', 'location')[:chunk_size])
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        values = [(pk, fingerprint(*fields)) for pk, *fields in rows]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('CREATE TEMP TABLE IF NOT EXISTS bird_dedup_fingerprints '
+                           '(id INTEGER PRIMARY KEY, fingerprint TEXT)')
+            cursor.execute('DELETE FROM bird_dedup_fingerprints')
+            cursor.executemany('INSERT INTO bird_dedup_fingerprints (id, fingerprint) VALUES (%s, %s)', values)
+            cursor.execute(
+                f'UPDATE {table} SET dedup_fingerprint = t.fingerprint '
+                f'FROM bird_dedup_fingerprints AS t WHERE {table}.id = t.id '
+                f'AND {table}.dedup_fingerprint IS NOT t.fingerprint'
+            )
+            stats['changed'] += cursor.rowcount
+        stats['records'] += len(rows)
+    return stats
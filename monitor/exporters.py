@@ -0,0 +1,286 @@
+"""流式数据导出 - CSV / XLSX / GeoJSON / Parquet
+
+所有格式都通过 queryset.iterator() 分块读取，逐块生成输出，内存占用与总行数无关。
+导出列名与导入格式保持一致，导出的文件可以直接重新导入。
+"""
+import csv
+import io
+import json
+import tempfile
+
+from django.utils import timezone
+
+from .models import Airport, BirdRecord
+
+CHUNK_SIZE = 2000
+
+# (查询字段, 导出列名)
+RECORD_EXPORT_FIELDS = [
+    ('id', 'ID'),
+    ('species__name', '鸟种'),
+    ('quantity', '数量'),
+    ('location', '位置'),
+    ('latitude', '纬度'),
+    ('longitude', '经度'),
+    ('record_time', '记录时间'),
+    ('intrusion_reason', '入侵原因'),
+    ('risk_level', '风险等级'),
+    ('notes', '备注'),
+]
+
+# 与 airports.csv (OurAirports) 的列名一致
+AIRPORT_EXPORT_FIELDS = [
+    ('ident', 'ident'),
+    ('airport_type', 'type'),
+    ('name', 'name'),
+    ('latitude', 'latitude_deg'),
+    ('longitude', 'longitude_deg'),
+    ('elevation_ft', 'elevation_ft'),
+    ('continent', 'continent'),
+    ('iso_country', 'iso_country'),
+    ('iso_region', 'iso_region'),
+    ('municipality', 'municipality'),
+    ('scheduled_service', 'scheduled_service'),
+    ('icao_code', 'icao_code'),
+    ('iata_code', 'iata_code'),
+    ('gps_code', 'gps_code'),
+    ('local_code', 'local_code'),
+    ('home_link', 'home_link'),
+    ('wikipedia_link', 'wikipedia_link'),
+    ('keywords', 'keywords'),
+]
+
+EXPORT_DATASETS = {
+    'records': {
+        'model': BirdRecord,
+        'fields': RECORD_EXPORT_FIELDS,
+        'file_name': 'bird_records',
+        'order_by': 'id',
+    },
+    'airports': {
+        'model': Airport,
+        'fields': AIRPORT_EXPORT_FIELDS,
+        'file_name': 'airports',
+        'order_by': 'id',
+    },
+}
+
+# 格式 -> (Content-Type, 扩展名)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', '.csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', '.xlsx'),
+    'geojson': ('application/geo+json', '.geojson'),
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+}
+
+
+def base_queryset(dataset):
+    """导出用的基础查询集"""
+    config = EXPORT_DATASETS[dataset]
+    queryset = config['model'].objects.all()
+    if dataset == 'records':
+        queryset = queryset.select_related('species')
+    return queryset
+
+
+def export_file_name(dataset, fmt):
+    stamp = timezone.localtime().strftime('%Y%m%d_%H%M%S')
+    return f"{EXPORT_DATASETS[dataset]['file_name']}_{stamp}{EXPORT_FORMATS[fmt][1]}"
+
+
+def iter_export(dataset, fmt, queryset):
+    """按格式生成导出文件的字节块"""
+    if dataset not in EXPORT_DATASETS:
+        raise ValueError(f'不支持的导出数据集: {dataset}')
+    writers = {
+        'csv': _iter_csv,
+        'xlsx': _iter_xlsx,
+        'geojson': _iter_geojson,
+        'parquet': _iter_parquet,
+    }
+    if fmt not in writers:
+        raise ValueError(f'不支持的导出格式: {fmt}')
+    if fmt == 'parquet':
+        _require_pyarrow()
+    return writers[fmt](EXPORT_DATASETS[dataset], queryset)
+
+
+def _iter_batches(config, queryset):
+    """分块读取数据，每块为行元组列表"""
+    lookups = [lookup for lookup, _ in config['fields']]
+    rows = queryset.order_by(config['order_by']).values_list(*lookups).iterator(chunk_size=CHUNK_SIZE)
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= CHUNK_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _display_value(value):
+    """文本格式中的单元格值：时间转为本地时间字符串，空值转为空字符串"""
+    if value is None:
+        return ''
+    if hasattr(value, 'tzinfo'):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+def _iter_csv(config, queryset):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # 带 BOM，Excel 可以直接识别中文
+    buffer.write('\ufeff')
+    writer.writerow([header for _, header in config['fields']])
+    yield buffer.getvalue().encode('utf-8')
+    for batch in _iter_batches(config, queryset):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_display_value(value) for value in row] for row in batch)
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _iter_geojson(config, queryset):
+    lookups = [lookup for lookup, _ in config['fields']]
+    lat_index = lookups.index('latitude')
+    lon_index = lookups.index('longitude')
+    headers = [header for _, header in config['fields']]
+
+    yield b'{"type": "FeatureCollection", "features": ['
+    first = True
+    for batch in _iter_batches(config, queryset):
+        features = []
+        for row in batch:
+            if row[lat_index] is None or row[lon_index] is None:
+                continue
+            properties = {
+                header: _display_value(value)
+                for index, (header, value) in enumerate(zip(headers, row))
+                if index not in (lat_index, lon_index)
+            }
+            features.append(json.dumps({
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [row[lon_index], row[lat_index]]},
+                'properties': properties,
+            }, ensure_ascii=False))
+        if not features:
+            continue
+        chunk = ',\n'.join(features)
+        yield (chunk if first else ',\n' + chunk).encode('utf-8')
+        first = False
+    yield b']}\n'
+
+
+def _iter_xlsx(config, queryset):
+    """XLSX 是 zip 容器，必须写完才能得到目录表。使用只写模式写入临时文件
+    (内存占用固定)，完成后再分块发送文件内容。"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=config['file_name'])
+    sheet.append([header for _, header in config['fields']])
+    for batch in _iter_batches(config, queryset):
+        for row in batch:
+            sheet.append([_display_value(value) for value in row])
+
+    with tempfile.TemporaryFile(suffix='.xlsx') as temp_file:
+        workbook.save(temp_file)
+        temp_file.seek(0)
+        while True:
+            chunk = temp_file.read(1024 * 1024)
+            if not chunk:
+                break
+            yield chunk
+
+
+class _ChunkSink:
+    """只追加的输出缓冲：ParquetWriter 每写完一个行组就取出字节发送"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ValueError("导出Parquet需要安装pyarrow: pip install pyarrow")
+
+
+def arrow_schema(model, fields):
+    """根据模型字段类型生成 Arrow schema (跨块保持一致)"""
+    import pyarrow as pa
+
+    type_mapping = {
+        'AutoField': pa.int64(),
+        'BigAutoField': pa.int64(),
+        'IntegerField': pa.int64(),
+        'FloatField': pa.float64(),
+        'BooleanField': pa.bool_(),
+        'DateTimeField': pa.timestamp('us', tz='UTC'),
+    }
+    schema_fields = []
+    for lookup, header in fields:
+        field_model = model
+        parts = lookup.split('__')
+        for part in parts[:-1]:
+            field_model = field_model._meta.get_field(part).related_model
+        internal_type = field_model._meta.get_field(parts[-1]).get_internal_type()
+        schema_fields.append(pa.field(header, type_mapping.get(internal_type, pa.string())))
+    return pa.schema(schema_fields)
+
+
+def _iter_parquet(config, queryset):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema(config['model'], config['fields'])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    try:
+        # 每个数据块写成一个行组
+        for batch in _iter_batches(config, queryset):
+            columns = list(zip(*batch))
+            table = pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema,
+            )
+            writer.write_table(table)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
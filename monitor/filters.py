@@ -0,0 +1,82 @@
+"""查询参数筛选 - 记录列表、导出和 API 共用同一套筛选规则"""
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import lookups
+
+
+def _parse_bound(value, end_of_day=False):
+    """解析 YYYY-MM-DD 或 YYYY-MM-DD HH:MM[:SS]，返回带时区的时间"""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            return None
+        moment = datetime.combine(day, time.max if end_of_day else time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_bbox(value):
+    """解析 bbox=最小经度,最小纬度,最大经度,最大纬度，格式错误时返回 None"""
+    if not value:
+        return None
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in value.split(','))
+    except ValueError:
+        return None
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def filter_bird_records(queryset, params):
+    """按查询参数筛选鸟情记录
+
+    支持: species (ID或名称)、risk_level、start / end (日期或时间)、
+    bbox (最小经度,最小纬度,最大经度,最大纬度)
+    """
+    species = params.get('species', '').strip()
+    if species:
+        if species.isdigit():
+            queryset = queryset.filter(species_id=int(species))
+        else:
+            queryset = queryset.filter(species_id=lookups.species_id(species))
+
+    risk_level = params.get('risk_level', '')
+    if risk_level:
+        queryset = queryset.filter(risk_level=risk_level)
+
+    start = _parse_bound(params.get('start', ''))
+    if start:
+        queryset = queryset.filter(record_time__gte=start)
+
+    end = _parse_bound(params.get('end', ''), end_of_day=True)
+    if end:
+        queryset = queryset.filter(record_time__lte=end)
+
+    bbox = parse_bbox(params.get('bbox', ''))
+    if bbox:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        queryset = queryset.filter(
+            longitude__gte=min_lon, longitude__lte=max_lon,
+            latitude__gte=min_lat, latitude__lte=max_lat,
+        )
+
+    return queryset
+
+
+def filter_airports(queryset, params):
+    """按查询参数筛选机场: country (国家代码)、type (机场类型)"""
+    country = params.get('country', '')
+    if country:
+        queryset = queryset.filter(iso_country=country.upper())
+
+    airport_type = params.get('type', '')
+    if airport_type:
+        queryset = queryset.filter(airport_type=airport_type)
+
+    return queryset
@@ -0,0 +1,142 @@
+"""地理计算工具 - 球面距离、经纬度网格索引、最近机场查找"""
+import math
+from collections import defaultdict
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_LAT_DEGREE = 111.32
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """两点间球面距离(公里)"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bearing_deg(lat1, lon1, lat2, lon2):
+    """从第一个点指向第二个点的初始方位角 (度，正北为 0，顺时针)"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_lambda = math.radians(lon2 - lon1)
+    x = math.sin(d_lambda) * math.cos(phi2)
+    y = math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(d_lambda)
+    return math.degrees(math.atan2(x, y)) % 360
+
+
+def destination_point(lat, lon, bearing, distance_km):
+    """从 (lat, lon) 沿方位角 bearing 前进 distance_km 公里后的位置 (纬度, 经度)"""
+    phi1 = math.radians(lat)
+    theta = math.radians(bearing)
+    delta = distance_km / EARTH_RADIUS_KM
+    phi2 = math.asin(math.sin(phi1) * math.cos(delta) + math.cos(phi1) * math.sin(delta) * math.cos(theta))
+    lambda2 = math.radians(lon) + math.atan2(math.sin(theta) * math.sin(delta) * math.cos(phi1),
+                                             math.cos(delta) - math.sin(phi1) * math.sin(phi2))
+    return math.degrees(phi2), (math.degrees(lambda2) + 540) % 360 - 180
+
+
+def km_to_lat_deg(km):
+    """公里换算为纬度差"""
+    return km / KM_PER_LAT_DEGREE
+
+
+def km_to_lon_deg(km, latitude):
+    """公里换算为指定纬度处的经度差 (高纬度地区限制上限，避免除零)"""
+    cos_lat = max(math.cos(math.radians(latitude)), 0.01)
+    return min(km / (KM_PER_LAT_DEGREE * cos_lat), 360.0)
+
+
+def bbox_around(lat, lon, radius_km):
+    """返回以(lat, lon)为中心、半径radius_km的经纬度外接矩形 (min_lat, max_lat, min_lon, max_lon)"""
+    d_lat = km_to_lat_deg(radius_km)
+    d_lon = km_to_lon_deg(radius_km, lat)
+    return lat - d_lat, lat + d_lat, lon - d_lon, lon + d_lon
+
+
+class GridIndex:
+    """经纬度网格点索引
+
+    按固定的网格尺寸(度)把点分桶，邻域查询只检查目标周围的少量网格，
+    避免两两比较。适合在内存中维护近期记录或机场坐标。
+    """
+
+    def __init__(self, cell_deg):
+        self.cell_deg = cell_deg
+        self.cells = defaultdict(dict)
+        self.points = {}
+
+    def cell_of(self, lat, lon):
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg))
+
+    def insert(self, key, lat, lon, payload=None):
+        if key in self.points:
+            self.remove(key)
+        cell = self.cell_of(lat, lon)
+        self.cells[cell][key] = (lat, lon, payload)
+        self.points[key] = cell
+
+    def remove(self, key):
+        cell = self.points.pop(key, None)
+        if cell is None:
+            return
+        bucket = self.cells.get(cell)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self.cells[cell]
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, key):
+        return key in self.points
+
+    def get(self, key):
+        cell = self.points.get(key)
+        if cell is None:
+            return None
+        return self.cells[cell][key]
+
+    def candidates(self, lat, lon, radius_km):
+        """返回可能位于半径内的点 (key, lat, lon, payload)，未做精确距离过滤"""
+        row, col = self.cell_of(lat, lon)
+        row_span = int(math.ceil(km_to_lat_deg(radius_km) / self.cell_deg))
+        # 经度方向的网格跨度取决于查询点附近的最高纬度
+        edge_lat = min(abs(lat) + km_to_lat_deg(radius_km), 89.0)
+        col_span = int(math.ceil(km_to_lon_deg(radius_km, edge_lat) / self.cell_deg))
+        for r in range(row - row_span, row + row_span + 1):
+            for c in range(col - col_span, col + col_span + 1):
+                bucket = self.cells.get((r, c))
+                if not bucket:
+                    continue
+                for key, (p_lat, p_lon, payload) in bucket.items():
+                    yield key, p_lat, p_lon, payload
+
+    def neighbours(self, lat, lon, radius_km):
+        """返回半径内的点 [(key, 距离km, payload)]"""
+        result = []
+        for key, p_lat, p_lon, payload in self.candidates(lat, lon, radius_km):
+            distance = haversine_km(lat, lon, p_lat, p_lon)
+            if distance <= radius_km:
+                result.append((key, distance, payload))
+        return result
+
+
+def nearest_airport(lat, lon, max_km=50.0, exclude_types=('closed',)):
+    """查找距离坐标最近的机场，返回 (airport_id, 距离km)，范围内没有机场时返回 (None, None)"""
+    from .models import Airport
+
+    min_lat, max_lat, min_lon, max_lon = bbox_around(lat, lon, max_km)
+    airports = Airport.objects.filter(
+        latitude__gte=min_lat, latitude__lte=max_lat,
+        longitude__gte=min_lon, longitude__lte=max_lon,
+    ).exclude(airport_type__in=exclude_types).values_list('id', 'latitude', 'longitude')
+
+    best_id, best_distance = None, None
+    for airport_id, a_lat, a_lon in airports:
+        distance = haversine_km(lat, lon, a_lat, a_lon)
+        if distance <= max_km and (best_distance is None or distance < best_distance):
+            best_id, best_distance = airport_id, distance
+    return best_id, best_distance
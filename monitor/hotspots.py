@@ -0,0 +1,251 @@
+"""鸟群聚集热点检测
+
+对滑动时间窗口内的鸟情记录做 DBSCAN 式空间聚类。新记录到达时只对其附近的
+区域(以及与之相邻的已有热点)重新聚类，而不是对全部历史记录重新计算。
+"""
+import logging
+from collections import Counter, deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .geo import GridIndex, km_to_lat_deg, km_to_lon_deg, nearest_airport
+from .models import BirdRecord, Hotspot
+
+logger = logging.getLogger(__name__)
+
+# values_list 字段顺序: 记录ID、纬度、经度、数量、鸟种ID、记录时间
+RECORD_FIELDS = ('id', 'latitude', 'longitude', 'quantity', 'species_id', 'record_time')
+
+# 聚类区域向外扩展的最大次数，防止极端链式簇无限扩张
+MAX_REGION_GROWTH = 20
+
+
+class HotspotDetector:
+    """增量热点检测器"""
+
+    def __init__(self, eps_km=None, min_samples=None, window_minutes=None, airport_radius_km=None):
+        self.eps_km = eps_km or getattr(settings, 'BIRD_HOTSPOT_EPS_KM', 1.0)
+        self.min_samples = min_samples or getattr(settings, 'BIRD_HOTSPOT_MIN_SAMPLES', 3)
+        self.window = timedelta(minutes=window_minutes or getattr(settings, 'BIRD_HOTSPOT_WINDOW_MINUTES', 360))
+        self.airport_radius_km = airport_radius_km or getattr(settings, 'BIRD_HOTSPOT_AIRPORT_RADIUS_KM', 30.0)
+
+    def update(self, record_ids, now=None):
+        """新记录写入后调用：仅对新记录所在区域做局部重新聚类"""
+        now = now or timezone.now()
+        since = now - self.window
+        seeds = list(
+            BirdRecord.objects.filter(
+                id__in=list(record_ids),
+                record_time__gte=since,
+                latitude__isnull=False,
+                longitude__isnull=False,
+            ).values_list(*RECORD_FIELDS)
+        )
+        if not seeds:
+            return {'created': 0, 'removed': 0}
+
+        # 与新记录相邻的已有热点需要一起重算 (可能被合并)
+        bbox = self._bbox_of(seeds, self.eps_km * 2)
+        nearby = list(self._hotspots_in(bbox).only('id', 'member_ids'))
+        seed_ids = {row[0] for row in seeds}
+        for hotspot in nearby:
+            seed_ids.update(hotspot.member_ids)
+        return self._recluster(seed_ids, nearby, since)
+
+    def expire(self, now=None):
+        """移除窗口外的成员：对包含过期记录的热点重新聚类"""
+        now = now or timezone.now()
+        since = now - self.window
+        stale = list(Hotspot.objects.filter(first_seen__lt=since))
+        if not stale:
+            return {'created': 0, 'removed': 0}
+        seed_ids = set()
+        for hotspot in stale:
+            seed_ids.update(hotspot.member_ids)
+        return self._recluster(seed_ids, stale, since)
+
+    def rebuild(self, now=None):
+        """对整个时间窗口重新聚类 (初始化或参数调整后使用)"""
+        now = now or timezone.now()
+        since = now - self.window
+        points = self._load_points(since)
+        clusters = self._dbscan(points, list(points))
+        with transaction.atomic():
+            removed, _ = Hotspot.objects.all().delete()
+            created = self._save_clusters(clusters, points)
+        return {'created': created, 'removed': removed}
+
+    def _recluster(self, seed_ids, affected_hotspots, since):
+        seed_rows = list(
+            BirdRecord.objects.filter(
+                id__in=list(seed_ids),
+                record_time__gte=since,
+                latitude__isnull=False,
+                longitude__isnull=False,
+            ).values_list(*RECORD_FIELDS)
+        )
+        points, clusters = {}, []
+        if seed_rows:
+            points, clusters = self._cluster_region(seed_rows, since)
+
+        member_ids = set()
+        for cluster in clusters:
+            member_ids.update(cluster)
+        stale_ids = {hotspot.id for hotspot in affected_hotspots}
+        # 与新簇有重叠的其他热点也被新簇取代；重叠热点的成员与新簇相连，中心点只需在新簇范围附近查找
+        if member_ids:
+            bbox = self._bbox_of([points[pid] for pid in member_ids], self.eps_km)
+            for hotspot in self._hotspots_in(bbox).exclude(id__in=stale_ids).only('id', 'member_ids'):
+                if member_ids.intersection(hotspot.member_ids):
+                    stale_ids.add(hotspot.id)
+
+        with transaction.atomic():
+            removed, _ = Hotspot.objects.filter(id__in=stale_ids).delete()
+            created = self._save_clusters(clusters, points)
+        return {'created': created, 'removed': removed}
+
+    def _cluster_region(self, seed_rows, since):
+        """在种子周围加载窗口内记录并聚类；簇触及加载区域边缘时扩大区域重新计算"""
+        seed_ids = [row[0] for row in seed_rows]
+        bbox = self._bbox_of(seed_rows, self.eps_km * 2)
+        points, clusters = {}, []
+        for _ in range(MAX_REGION_GROWTH):
+            points = self._load_points(since, bbox)
+            clusters = self._dbscan(points, seed_ids)
+            members = [points[pid] for cluster in clusters for pid in cluster]
+            if not members:
+                break
+            needed = self._bbox_of(members, self.eps_km)
+            if self._bbox_contains(bbox, needed):
+                break
+            bbox = (
+                min(bbox[0], needed[0]), max(bbox[1], needed[1]),
+                min(bbox[2], needed[2]), max(bbox[3], needed[3]),
+            )
+            bbox = self._pad(bbox, self.eps_km)
+        return points, clusters
+
+    def _load_points(self, since, bbox=None):
+        queryset = BirdRecord.objects.filter(
+            record_time__gte=since,
+            latitude__isnull=False,
+            longitude__isnull=False,
+        )
+        if bbox is not None:
+            min_lat, max_lat, min_lon, max_lon = bbox
+            queryset = queryset.filter(
+                latitude__gte=min_lat, latitude__lte=max_lat,
+                longitude__gte=min_lon, longitude__lte=max_lon,
+            )
+        return {row[0]: row for row in queryset.values_list(*RECORD_FIELDS)}
+
+    def _dbscan(self, points, seed_ids):
+        """从种子点出发做 DBSCAN 扩展，只返回种子可达的簇 [set(记录ID)]"""
+        index = GridIndex(km_to_lat_deg(self.eps_km))
+        for pid, lat, lon, *_ in points.values():
+            index.insert(pid, lat, lon)
+
+        neighbour_cache = {}
+
+        def neighbours(pid):
+            if pid not in neighbour_cache:
+                _, lat, lon, *_ = points[pid]
+                neighbour_cache[pid] = [key for key, _, _ in index.neighbours(lat, lon, self.eps_km)]
+            return neighbour_cache[pid]
+
+        def is_core(pid):
+            return len(neighbours(pid)) >= self.min_samples
+
+        labelled = set()
+        clusters = []
+        for seed in seed_ids:
+            if seed not in points or seed in labelled:
+                continue
+            # 非核心种子可能是其他核心点的边界点，从相邻核心点开始扩展
+            starts = [seed] if is_core(seed) else [pid for pid in neighbours(seed) if is_core(pid)]
+            for start in starts:
+                if start in labelled:
+                    continue
+                cluster = {start}
+                queue = deque([start])
+                while queue:
+                    pid = queue.popleft()
+                    if not is_core(pid):
+                        continue
+                    for neighbour in neighbours(pid):
+                        if neighbour not in cluster and neighbour not in labelled:
+                            cluster.add(neighbour)
+                            queue.append(neighbour)
+                labelled.update(cluster)
+                clusters.append(cluster)
+        return clusters
+
+    def _save_clusters(self, clusters, points):
+        created = 0
+        for cluster in clusters:
+            rows = [points[pid] for pid in cluster]
+            weights = [max(row[3] or 0, 1) for row in rows]
+            total_weight = sum(weights)
+            centroid_lat = sum(row[1] * w for row, w in zip(rows, weights)) / total_weight
+            centroid_lon = sum(row[2] * w for row, w in zip(rows, weights)) / total_weight
+
+            species_totals = Counter()
+            for row in rows:
+                species_totals[row[4]] += row[3] or 0
+            dominant_species_id = species_totals.most_common(1)[0][0] if species_totals else None
+
+            airport_id, distance = nearest_airport(centroid_lat, centroid_lon, max_km=self.airport_radius_km)
+            Hotspot.objects.create(
+                centroid_latitude=centroid_lat,
+                centroid_longitude=centroid_lon,
+                member_count=len(rows),
+                total_quantity=sum(row[3] or 0 for row in rows),
+                dominant_species_id=dominant_species_id,
+                nearest_airport_id=airport_id,
+                airport_distance_km=distance,
+                member_ids=sorted(cluster),
+                first_seen=min(row[5] for row in rows),
+                last_seen=max(row[5] for row in rows),
+            )
+            created += 1
+        return created
+
+    @staticmethod
+    def _hotspots_in(bbox):
+        """中心点落在范围内的热点 (按中心点索引查询，不扫描全部热点)"""
+        min_lat, max_lat, min_lon, max_lon = bbox
+        return Hotspot.objects.filter(
+            centroid_latitude__gte=min_lat, centroid_latitude__lte=max_lat,
+            centroid_longitude__gte=min_lon, centroid_longitude__lte=max_lon,
+        )
+
+    def _bbox_of(self, rows, pad_km):
+        bbox = (
+            min(row[1] for row in rows), max(row[1] for row in rows),
+            min(row[2] for row in rows), max(row[2] for row in rows),
+        )
+        return self._pad(bbox, pad_km)
+
+    def _pad(self, bbox, pad_km):
+        min_lat, max_lat, min_lon, max_lon = bbox
+        d_lat = km_to_lat_deg(pad_km)
+        d_lon = km_to_lon_deg(pad_km, max(abs(min_lat), abs(max_lat)))
+        return min_lat - d_lat, max_lat + d_lat, min_lon - d_lon, max_lon + d_lon
+
+    @staticmethod
+    def _bbox_contains(outer, inner):
+        return outer[0] <= inner[0] and outer[1] >= inner[1] and outer[2] <= inner[2] and outer[3] >= inner[3]
+
+
+def update_hotspots(record_ids):
+    """写入新记录后更新热点；失败只记录日志，不影响记录写入"""
+    if not record_ids:
+        return None
+    try:
+        return HotspotDetector().update(record_ids)
+    except Exception:
+        logger.exception('热点更新失败')
+        return None
@@ -0,0 +1,42 @@
+"""批量导入的解析进程
+
+进程池以 spawn 方式启动子进程，子进程先反序列化任务函数 (导入本模块) 再执行 init_worker，
+因此本模块顶层不能导入模型等依赖 Django 初始化的模块。
+"""
+import os
+import time
+
+
+def init_worker():
+    """解析进程以 spawn 方式启动 (不继承父进程的线程和数据库连接)，需要重新初始化 Django"""
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bird_system.settings')
+    django.setup()
+
+
+def parse_file(path, file_name, import_type, sheet_name=None):
+    """读取文件并逐行校验，返回可以跨进程传递的结果 (不访问数据库)"""
+    from .profiling import current_rss_mb
+    from .views import iter_airport_rows, iter_bird_rows, missing_import_columns, read_import_file
+
+    started = time.perf_counter()
+    df = read_import_file(path, file_name.lower(), import_type, sheet_name)
+    read_seconds = time.perf_counter() - started
+    result = {
+        'total_rows': len(df),
+        'columns': [str(col) for col in df.columns],
+        'read_seconds': read_seconds,
+    }
+
+    missing_columns = missing_import_columns(df, import_type)
+    if missing_columns:
+        result['error'] = f'缺少必要的列: {", ".join(missing_columns)}'
+        return result
+
+    started = time.perf_counter()
+    validate = iter_airport_rows if import_type == 'airport' else iter_bird_rows
+    result['rows'] = list(validate(df))
+    result['validate_seconds'] = time.perf_counter() - started
+    result['peak_memory_mb'] = current_rss_mb()
+    return result
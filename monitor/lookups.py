@@ -0,0 +1,141 @@
+"""鸟种、机场查询缓存 (进程内)
+
+鸟种: 名称 -> ID、ID -> (名称, 危险等级)；机场: 标识符 / ICAO / IATA 代码 -> 机场 ID。
+两张表都很小且很少修改，首次使用时整表加载到进程内存 (机场只读取 4 个字段)。
+
+失效: BirdSpecies / Airport 保存或删除后 (monitor.signals) 在事务提交时清空本进程的映射，
+并递增 Django 缓存中的版本号；其他进程每隔 BIRD_LOOKUP_CHECK_SECONDS 秒比较一次版本号，
+发现变化后重新加载。多进程部署需要配置共享的 CACHES 后端 (如 Redis、数据库缓存)，
+默认的本地内存缓存只能保证单进程内一致。
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class LookupTable:
+    """一张表的映射缓存，loader 返回 {映射名: dict}"""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.version_key = f'bird-lookups:{name}:version'
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self._maps = None
+        self._version = None
+        self._checked_at = 0.0
+        self._generation = 0  # 本进程失效次数，防止加载期间发生的失效被旧数据覆盖
+        self._lock = threading.Lock()
+
+    def get(self, map_name, key):
+        value = self._current()[map_name].get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def current(self, map_name):
+        """整个映射 (不计入命中统计)"""
+        return self._current()[map_name]
+
+    def invalidate(self):
+        """清空本进程的映射，并递增共享版本号通知其他进程"""
+        with self._lock:
+            self._maps = None
+            self._generation += 1
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.set(self.version_key, 1, None)
+
+    def version(self):
+        """共享缓存中的版本号，表变化后递增"""
+        return cache.get(self.version_key, 0)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'reloads': self.reloads}
+
+    def _current(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._maps is not None and now - self._checked_at < settings.BIRD_LOOKUP_CHECK_SECONDS:
+                return self._maps
+            generation = self._generation
+        version = self.version()
+        with self._lock:
+            if self._maps is not None and version == self._version:
+                self._checked_at = now
+                return self._maps
+
+        maps = self.loader()
+        with self._lock:
+            self.reloads += 1
+            if generation == self._generation:
+                self._maps = maps
+                self._version = version
+                self._checked_at = now
+        return maps
+
+
+def _load_species():
+    from .models import BirdSpecies
+
+    by_name, by_id = {}, {}
+    for species_id, name, danger_level in BirdSpecies.objects.values_list('id', 'name', 'danger_level'):
+        by_name.setdefault(name, species_id)
+        by_id[species_id] = (name, danger_level)
+    return {'by_name': by_name, 'by_id': by_id}
+
+
+def _load_airports():
+    from .models import Airport
+
+    by_code = {}
+    rows = list(Airport.objects.values_list('id', 'ident', 'icao_code', 'iata_code'))
+    # 优先级: 标识符 > ICAO > IATA (不同机场的代码冲突时按此顺序取)
+    for column in (1, 2, 3):
+        for row in rows:
+            code = row[column]
+            if code:
+                by_code.setdefault(code.upper(), row[0])
+    return {'by_code': by_code}
+
+
+species = LookupTable('species', _load_species)
+airports = LookupTable('airports', _load_airports)
+
+
+def species_id(name):
+    """按名称查鸟种 ID，不存在时返回 None"""
+    return species.get('by_name', name)
+
+
+def species_danger_level(pk):
+    entry = species.get('by_id', pk)
+    return entry[1] if entry else None
+
+
+def species_reference(name):
+    """按名称返回鸟种对象 (由缓存字段构造，不查询数据库)，不存在时返回 None"""
+    from .models import BirdSpecies
+
+    pk = species_id(name)
+    entry = species._current()['by_id'].get(pk) if pk is not None else None
+    if entry is None:
+        return None
+    return BirdSpecies.from_db('default', ['id', 'name', 'danger_level'], [pk, entry[0], entry[1]])
+
+
+def airport_id(code):
+    """按机场标识符、ICAO 或 IATA 代码查机场 ID (不区分大小写)，不存在时返回 None"""
+    code = (code or '').strip().upper()
+    if not code:
+        return None
+    return airports.get('by_code', code)
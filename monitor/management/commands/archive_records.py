@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from monitor import archive
+
+
+class Command(BaseCommand):
+    help = '把已结束月份的鸟情记录归档到按 year/month 分区的 Parquet 数据集'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='归档截止月份 YYYY-MM (不含)，默认为热数据窗口开始的月份')
+        parser.add_argument('--partition-species', action='store_true', help='额外按鸟种分区')
+        parser.add_argument('--prune', action='store_true', help='归档成功后从实时库删除已归档的记录')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                cutoff = timezone.make_aware(datetime.strptime(options['before'], '%Y-%m'))
+            except ValueError:
+                raise CommandError('--before 格式应为 YYYY-MM')
+        else:
+            cutoff = archive.default_cutoff()
+
+        if cutoff > timezone.now():
+            raise CommandError('只能归档已结束的月份')
+
+        self.stdout.write(f'归档 {timezone.localtime(cutoff):%Y-%m-%d} 之前的记录到 {archive.archive_dir()}')
+        try:
+            stats = archive.archive_records(
+                cutoff=cutoff,
+                partition_species=options['partition_species'],
+                prune=options['prune'],
+                stdout=self.stdout,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'归档完成: {stats["months"]} 个月, {stats["rows"]} 条记录, 写入 {stats["chunks"]} 批, '
+            f'同步归档后修改或删除的记录 {stats["changed"]} 条'
+            + (f', 已从实时库删除 {stats["pruned"]} 条' if options['prune'] else '')
+        ))
@@ -0,0 +1,318 @@
+import json
+import platform
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+# 基准页面/接口: (用例名称, URL 名称)
+HTTP_CASES = [
+    ('dashboard', 'dashboard'),
+    ('record_list', 'record_list'),
+    ('api_dashboard_data', 'api_dashboard_data'),
+    ('api_bird_records', 'bird_records_api'),
+    ('api_hotspots', 'hotspots_api'),
+    ('api_alerts', 'alerts_api'),
+    ('api_airports', 'airports_api'),
+    ('api_airports_full', 'airports_full_api'),
+    ('admin_birdrecord', 'admin:monitor_birdrecord_changelist'),
+    ('admin_birdspecies', 'admin:monitor_birdspecies_changelist'),
+    ('admin_airport', 'admin:monitor_airport_changelist'),
+    ('admin_importlog', 'admin:monitor_importlog_changelist'),
+]
+
+
+def parse_scale(text):
+    """解析规模: 10k / 100k / 1m / 250000"""
+    text = text.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    number = text[:-1] if multiplier > 1 else text
+    try:
+        return int(float(number) * multiplier)
+    except ValueError:
+        raise CommandError(f'无法解析的数据规模: {text}')
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def peak_rss_mb():
+    """进程峰值常驻内存(MB)，无法获取时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return round(getattr(info, 'peak_wset', info.rss) / 1024 / 1024, 1)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    divisor = 1024 * 1024 if platform.system() == 'Darwin' else 1024
+    return round(peak / divisor, 1)
+
+
+class Command(BaseCommand):
+    help = ('性能基准套件：在临时数据库中按指定规模生成合成数据，测量导入、API、看板、记录列表和后台列表页的'
+            '延迟分位数、SQL 查询数和峰值内存，结果写入 JSON；--compare 与保存的基线对比并标出性能回退')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='10k,100k,1m', help='鸟情记录规模，逗号分隔，如 10k,100k,1m')
+        parser.add_argument('--repeat', type=int, default=10, help='每个页面/接口的测量次数')
+        parser.add_argument('--max-seconds', type=float, default=60.0, help='单个用例的测量时长上限(秒)，至少测量一次')
+        parser.add_argument('--import-rows', type=int, default=2000, help='导入用例的行数')
+        parser.add_argument('--seed', type=int, default=42, help='合成数据随机种子')
+        parser.add_argument('--cases', default='', help='只运行名称包含这些关键字的用例，逗号分隔')
+        parser.add_argument('--output', '-o', help='结果 JSON 路径，默认 bench_<时间>.json')
+        parser.add_argument('--input', help='不运行基准，直接读取已有结果 (配合 --compare)')
+        parser.add_argument('--compare', help='基线结果 JSON，对比并标出回退')
+        parser.add_argument('--threshold', type=float, default=0.2, help='延迟回退阈值 (0.2 表示变慢 20%%)')
+        parser.add_argument('--min-delta-ms', type=float, default=5.0, help='忽略小于该值的延迟变化(毫秒)')
+
+    def handle(self, *args, **options):
+        if options['input']:
+            with open(options['input'], encoding='utf-8') as f:
+                results = json.load(f)
+        else:
+            results = self._run_suite(options)
+            output = options['output'] or f'bench_{timezone.localtime().strftime("%Y%m%d_%H%M%S")}.json'
+            with open(output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'结果已写入 {output}'))
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                baseline = json.load(f)
+            regressions = self._compare(baseline, results, options['threshold'], options['min_delta_ms'])
+            if regressions:
+                raise CommandError(f'发现 {len(regressions)} 项性能回退')
+            self.stdout.write(self.style.SUCCESS('未发现性能回退'))
+
+    def _run_suite(self, options):
+        scales = [parse_scale(part) for part in options['scales'].split(',') if part.strip()]
+        results = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'seed': options['seed'],
+                'repeat': options['repeat'],
+                'import_rows': options['import_rows'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': connection.Database.sqlite_version,
+                'platform': platform.platform(),
+            },
+            'scales': {},
+        }
+        temp_dir = Path(tempfile.mkdtemp(prefix='bird-bench-'))
+        # 基准在独立的临时数据库和归档目录中运行；关闭单写线程，写入在当前线程执行，
+        # 查询计数才能覆盖导入过程中的全部 SQL
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver'], BIRD_SINGLE_WRITER=False,
+                               BIRD_ARCHIVE_DIR=temp_dir / 'archive'):
+            for records in scales:
+                label = self._scale_label(records)
+                self.stdout.write(self.style.MIGRATE_HEADING(f'== 规模 {label}: {records} 条鸟情记录 =='))
+                results['scales'][label] = self._run_scale(records, temp_dir / f'bench_{label}.sqlite', options)
+        return results
+
+    def _scale_label(self, records):
+        if records >= 1000000 and records % 1000000 == 0:
+            return f'{records // 1000000}m'
+        if records >= 1000 and records % 1000 == 0:
+            return f'{records // 1000}k'
+        return str(records)
+
+    def _run_scale(self, records, db_path, options):
+        from monitor.hotspots import HotspotDetector
+        from monitor.synthetic import seed_database
+
+        connection.settings_dict['TEST']['NAME'] = str(db_path)
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            species = 30
+            airports = max(100, min(records // 20, 50000))
+            started = time.perf_counter()
+            seed_database(species=species, airports=airports, records=records, seed=options['seed'])
+            seed_seconds = time.perf_counter() - started
+            self.stdout.write(f'生成数据用时 {seed_seconds:.1f}s (鸟种 {species}, 机场 {airports})')
+
+            scale_result = {
+                'records': records,
+                'airports': airports,
+                'species': species,
+                'seed_seconds': round(seed_seconds, 2),
+                'cases': {},
+            }
+            cases = scale_result['cases']
+
+            if self._selected('hotspot_rebuild', options):
+                cases['hotspot_rebuild'] = self._measure_once(lambda: HotspotDetector().rebuild())
+                self._print_case('hotspot_rebuild', cases['hotspot_rebuild'])
+
+            log_id = None
+            if self._selected('import_bird', options):
+                cases['import_bird'], log_id = self._bench_bird_import(options)
+                self._print_case('import_bird', cases['import_bird'])
+            if self._selected('import_airport', options):
+                cases['import_airport'] = self._bench_airport_import(options)
+                self._print_case('import_airport', cases['import_airport'])
+
+            client = Client()
+            user = get_user_model().objects.create_superuser('bench', 'bench@example.com', 'bench')
+            client.force_login(user)
+            http_cases = list(HTTP_CASES)
+            if log_id:
+                http_cases.append(('api_log_stream', reverse('log_stream_api', args=[log_id])))
+            for name, target in http_cases:
+                if not self._selected(name, options):
+                    continue
+                url = target if target.startswith('/') else reverse(target)
+                cases[name] = self._bench_http(client, url, options)
+                self._print_case(name, cases[name])
+            return scale_result
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _selected(self, name, options):
+        keywords = [part.strip() for part in options['cases'].split(',') if part.strip()]
+        return not keywords or any(keyword in name for keyword in keywords)
+
+    def _bench_bird_import(self, options):
+        from monitor.models import Airport, ImportLog
+        from monitor.synthetic import SyntheticDataGenerator, bird_import_frame
+        from monitor.views import process_bird_import
+
+        generator = SyntheticDataGenerator(options['seed'] + 1)
+        airports = list(Airport.objects.all()[:5000])
+        frame = bird_import_frame(generator.sightings(options['import_rows'], airports, generator.species(30)))
+        log_entry = ImportLog.objects.create(log_type='bird', file_name='bench.csv', file_size=0,
+                                             total_rows=len(frame))
+        result = self._measure_once(lambda: process_bird_import(frame, log_entry), rows=len(frame))
+        return result, log_entry.id
+
+    def _bench_airport_import(self, options):
+        from monitor.models import ImportLog
+        from monitor.synthetic import SyntheticDataGenerator, airport_import_frame
+        from monitor.views import process_airport_import
+
+        generator = SyntheticDataGenerator(options['seed'] + 2)
+        frame = airport_import_frame(generator.airports(options['import_rows'], ident_prefix='SB'))
+        log_entry = ImportLog.objects.create(log_type='airport', file_name='bench_airports.csv', file_size=0,
+                                             total_rows=len(frame))
+        return self._measure_once(lambda: process_airport_import(frame, log_entry), rows=len(frame))
+
+    def _measure_once(self, func, rows=None):
+        rss_before = peak_rss_mb()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            try:
+                func()
+            except Exception as e:
+                return {'error': f'{type(e).__name__}: {e}'}
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        result = self._summary([elapsed_ms], len(queries), rss_before)
+        if rows:
+            result['rows'] = rows
+            result['rows_per_second'] = round(rows / (elapsed_ms / 1000), 1)
+        return result
+
+    def _bench_http(self, client, url, options):
+        rss_before = peak_rss_mb()
+        latencies = []
+        query_count = 0
+        size = 0
+        status = None
+        deadline = time.perf_counter() + options['max_seconds']
+        for index in range(options['repeat'] + 1):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                try:
+                    response = client.get(url)
+                    if response.streaming:
+                        body = b''.join(response.streaming_content)
+                    else:
+                        body = response.content
+                except Exception as e:
+                    return {'error': f'{type(e).__name__}: {e}'}
+                elapsed_ms = (time.perf_counter() - started) * 1000
+            status = response.status_code
+            size = len(body)
+            query_count = len(queries)
+            # 第一次请求用于预热 (模板编译、缓存)，不计入统计
+            if index > 0:
+                latencies.append(elapsed_ms)
+            if latencies and time.perf_counter() > deadline:
+                break
+        result = self._summary(latencies, query_count, rss_before)
+        result['status'] = status
+        result['bytes'] = size
+        return result
+
+    def _summary(self, latencies, query_count, rss_before):
+        ordered = sorted(latencies)
+        rss_after = peak_rss_mb()
+        return {
+            'samples': len(ordered),
+            'p50_ms': round(percentile(ordered, 50), 2),
+            'p95_ms': round(percentile(ordered, 95), 2),
+            'p99_ms': round(percentile(ordered, 99), 2),
+            'max_ms': round(ordered[-1], 2),
+            'mean_ms': round(statistics.mean(ordered), 2),
+            'queries': query_count,
+            'peak_rss_mb': rss_after,
+            'rss_growth_mb': round(rss_after - rss_before, 1) if rss_after is not None else None,
+        }
+
+    def _print_case(self, name, result):
+        if 'error' in result:
+            self.stdout.write(self.style.ERROR(f'  {name:<20} 失败: {result["error"]}'))
+            return
+        line = (f'  {name:<20} p50 {result["p50_ms"]:>9.1f}ms  p95 {result["p95_ms"]:>9.1f}ms  '
+                f'查询 {result["queries"]:>5}  峰值内存 {result["peak_rss_mb"]}MB')
+        if 'rows_per_second' in result:
+            line += f'  {result["rows_per_second"]:.0f} 行/秒'
+        if result.get('status') and result['status'] != 200:
+            line += f'  HTTP {result["status"]}'
+        self.stdout.write(line)
+
+    def _compare(self, baseline, current, threshold, min_delta_ms):
+        """逐个规模/用例对比延迟和查询数，返回回退项列表"""
+        regressions = []
+        for label, scale in current['scales'].items():
+            base_scale = baseline.get('scales', {}).get(label)
+            if not base_scale:
+                self.stdout.write(f'基线中没有规模 {label}，跳过')
+                continue
+            self.stdout.write(self.style.MIGRATE_HEADING(f'== 规模 {label} 对比 =='))
+            for name, result in scale['cases'].items():
+                base = base_scale['cases'].get(name)
+                if not base or 'error' in base or 'error' in result:
+                    continue
+                problems = []
+                for key in ('p50_ms', 'p95_ms'):
+                    old, new = base[key], result[key]
+                    if new > old * (1 + threshold) and new - old >= min_delta_ms:
+                        problems.append(f'{key} {old:.1f} -> {new:.1f} (+{(new / old - 1) * 100:.0f}%)')
+                if result['queries'] > base['queries']:
+                    problems.append(f'查询数 {base["queries"]} -> {result["queries"]}')
+
+                change = (result['p50_ms'] / base['p50_ms'] - 1) * 100 if base['p50_ms'] else 0
+                if problems:
+                    regressions.append((label, name, problems))
+                    self.stdout.write(self.style.ERROR(f'  {name:<20} 回退: {"; ".join(problems)}'))
+                else:
+                    self.stdout.write(f'  {name:<20} p50 {base["p50_ms"]:.1f} -> {result["p50_ms"]:.1f}ms '
+                                      f'({change:+.0f}%), 查询 {base["queries"]} -> {result["queries"]}')
+        return regressions
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import time
+import types
+from pathlib import Path
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test.utils import override_settings
+from django.urls import clear_url_caches, path
+
+from .bench import parse_scale, percentile
+
+# 对比的读取接口: (用例名称, 同步视图, 异步视图, 查询参数)
+ASYNC_CASES = [
+    ('api_bird_records', 'api_bird_records', 'api_bird_records_async', ''),
+    ('api_airports', 'api_airports', 'api_airports_async', ''),
+    ('api_airports_full', 'api_airports_full', 'api_airports_full_async', ''),
+    ('api_dashboard_data', 'api_dashboard_data', 'api_dashboard_data_async', 'days=30'),
+    ('api_log_stream', 'api_log_stream', 'api_log_stream_async', ''),
+]
+
+URLCONF = 'monitor._bench_async_urls'
+
+
+class Command(BaseCommand):
+    help = ('异步接口负载测试：在临时数据库中生成合成数据，通过进程内的 ASGI 应用并发请求读取接口的'
+            '同步和异步版本，对比吞吐量、延迟分位数、首字节时间和事件循环阻塞时间')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', default='10k', help='鸟情记录规模，如 10k')
+        parser.add_argument('--concurrency', type=int, default=20, help='并发客户端数')
+        parser.add_argument('--requests', type=int, default=5, help='每个客户端的请求数')
+        parser.add_argument('--seed', type=int, default=42, help='合成数据随机种子')
+        parser.add_argument('--cases', default='', help='只运行名称包含这些关键字的用例，逗号分隔')
+        parser.add_argument('--output', '-o', help='结果 JSON 路径')
+
+    def handle(self, *args, **options):
+        from monitor.synthetic import seed_database
+        from monitor.models import ImportLog
+
+        records = parse_scale(options['records'])
+        temp_dir = Path(tempfile.mkdtemp(prefix='bird-bench-async-'))
+        connection.settings_dict['TEST']['NAME'] = str(temp_dir / 'bench_async.sqlite')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver'], BIRD_SINGLE_WRITER=False,
+                                   BIRD_ARCHIVE_DIR=temp_dir / 'archive', ROOT_URLCONF=URLCONF):
+                sys.modules[URLCONF] = self._build_urlconf()
+                clear_url_caches()
+                seed_database(species=30, airports=max(100, min(records // 20, 50000)),
+                              records=records, seed=options['seed'])
+                log_entry = ImportLog.objects.create(log_type='bird', file_name='bench.csv', file_size=0,
+                                                     total_rows=0, status='completed')
+                connections.close_all()
+                results = asyncio.run(self._run_cases(options, log_entry.id))
+        finally:
+            sys.modules.pop(URLCONF, None)
+            clear_url_caches()
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump({'records': records, 'concurrency': options['concurrency'],
+                           'requests': options['requests'], 'cases': results}, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'结果已写入 {options["output"]}'))
+
+    def _build_urlconf(self):
+        """同一个 URLconf 里同时挂载同步 (/sync/...) 和异步 (/async/...) 版本"""
+        from monitor import views
+
+        module = types.ModuleType(URLCONF)
+        module.urlpatterns = []
+        for name, sync_name, async_name, _ in ASYNC_CASES:
+            suffix = '<int:log_id>/' if name == 'api_log_stream' else ''
+            for variant, view_name in (('sync', sync_name), ('async', async_name)):
+                module.urlpatterns.append(path(f'{variant}/{name}/{suffix}', getattr(views, view_name),
+                                               name=f'{variant}_{name}'))
+        return module
+
+    async def _run_cases(self, options, log_id):
+        app = get_asgi_application()
+        keywords = [part.strip() for part in options['cases'].split(',') if part.strip()]
+        results = {}
+        for name, _, _, query in ASYNC_CASES:
+            if keywords and not any(keyword in name for keyword in keywords):
+                continue
+            suffix = f'{log_id}/' if name == 'api_log_stream' else ''
+            bodies = {}
+            results[name] = {}
+            for variant in ('sync', 'async'):
+                url = f'/{variant}/{name}/{suffix}'
+                # 预热一次并保存响应体，用于核对两个版本的输出一致
+                _, _, status, bodies[variant] = await _asgi_get(app, url, query)
+                result = await self._load(app, url, query, options)
+                result['status'] = status
+                result['bytes'] = len(bodies[variant])
+                results[name][variant] = result
+            same = json.loads(bodies['sync']) == json.loads(bodies['async'])
+            results[name]['same_output'] = same
+            self._print_case(name, results[name])
+        return results
+
+    async def _load(self, app, url, query, options):
+        latencies = []
+        first_bytes = []
+
+        async def client():
+            for _ in range(options['requests']):
+                total, ttfb, _, _ = await _asgi_get(app, url, query)
+                latencies.append(total)
+                first_bytes.append(ttfb)
+
+        lag = {'max': 0.0, 'samples': []}
+        stop = asyncio.Event()
+
+        async def ticker():
+            # 事件循环被阻塞时，定时任务的实际唤醒时间会晚于预期
+            interval = 0.01
+            while not stop.is_set():
+                expected = time.perf_counter() + interval
+                await asyncio.sleep(interval)
+                delay = max(0.0, time.perf_counter() - expected) * 1000
+                lag['samples'].append(delay)
+                lag['max'] = max(lag['max'], delay)
+
+        ticker_task = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options['concurrency'])))
+        wall = time.perf_counter() - started
+        stop.set()
+        await ticker_task
+
+        ordered = sorted(latencies)
+        ordered_ttfb = sorted(first_bytes)
+        return {
+            'requests': len(ordered),
+            'wall_seconds': round(wall, 3),
+            'requests_per_second': round(len(ordered) / wall, 1),
+            'p50_ms': round(percentile(ordered, 50), 2),
+            'p95_ms': round(percentile(ordered, 95), 2),
+            'p99_ms': round(percentile(ordered, 99), 2),
+            'ttfb_p50_ms': round(percentile(ordered_ttfb, 50), 2),
+            'ttfb_p95_ms': round(percentile(ordered_ttfb, 95), 2),
+            'loop_lag_mean_ms': round(statistics.mean(lag['samples']), 2) if lag['samples'] else 0.0,
+            'loop_lag_max_ms': round(lag['max'], 2),
+        }
+
+    def _print_case(self, name, result):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'== {name} =='))
+        for variant in ('sync', 'async'):
+            item = result[variant]
+            self.stdout.write(
+                f'  {variant:<6} {item["requests_per_second"]:>8.1f} 请求/秒  p50 {item["p50_ms"]:>8.1f}ms  '
+                f'p95 {item["p95_ms"]:>8.1f}ms  p99 {item["p99_ms"]:>8.1f}ms  '
+                f'首字节 p50 {item["ttfb_p50_ms"]:>8.1f}ms  事件循环阻塞 max {item["loop_lag_max_ms"]:.1f}ms')
+        if not result['same_output']:
+            self.stdout.write(self.style.ERROR('  同步和异步版本的输出不一致'))
+
+
+async def _asgi_get(app, url, query=''):
+    """在进程内向 ASGI 应用发送一个 GET 请求，返回 (总耗时ms, 首字节ms, 状态码, 响应体)"""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': url,
+        'raw_path': url.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'testserver')],
+        'client': ('127.0.0.1', 50000),
+        'server': ('testserver', 80),
+    }
+    request_sent = False
+    disconnected = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    status = None
+    chunks = []
+    first_byte = None
+    started = time.perf_counter()
+
+    async def send(message):
+        nonlocal status, first_byte
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            body = message.get('body', b'')
+            if body and first_byte is None:
+                first_byte = time.perf_counter()
+            chunks.append(body)
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        disconnected.set()
+    finished = time.perf_counter()
+    first_byte = first_byte or finished
+    return (finished - started) * 1000, (first_byte - started) * 1000, status, b''.join(chunks)
@@ -0,0 +1,150 @@
+import random
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection, connections
+from django.db.models import Count
+from django.utils import timezone
+
+# 对比用的旧配置：回滚日志模式，默认 DEFERRED 事务，无连接复用
+LEGACY_OPTIONS = {'timeout': 5}
+
+
+class Command(BaseCommand):
+    help = ('SQLite 并发基准：在独立的临时数据库中运行导入，同时用多个读线程模拟地图和看板请求，'
+            '统计导入期间读请求的延迟分位数和 "database is locked" 错误数')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help='导入的记录行数')
+        parser.add_argument('--seed-rows', type=int, default=20000, help='导入前已有的记录数')
+        parser.add_argument('--readers', type=int, default=4, help='并发读线程数')
+        parser.add_argument('--warmup', type=float, default=2.0, help='导入前仅读取的基线时长(秒)')
+        parser.add_argument('--profile', choices=['production', 'legacy'], default='production',
+                            help='production: 当前 WAL 配置 + 单写线程; legacy: 回滚日志 + 请求线程直接写入')
+
+    def handle(self, *args, **options):
+        import pandas as pd
+
+        # 所有线程的连接共享同一份配置，修改后新建的连接都会使用基准数据库
+        db_settings = connection.settings_dict
+        temp_dir = tempfile.mkdtemp(prefix='bird-bench-')
+        db_settings['TEST']['NAME'] = str(Path(temp_dir) / 'bench.sqlite')
+        if options['profile'] == 'legacy':
+            db_settings['OPTIONS'] = dict(LEGACY_OPTIONS)
+            db_settings['CONN_MAX_AGE'] = 0
+            settings.BIRD_SINGLE_WRITER = False
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            journal_mode = connection.cursor().execute('PRAGMA journal_mode').fetchone()[0]
+            self.stdout.write(f'配置: {options["profile"]} (journal_mode={journal_mode}), '
+                              f'读线程 {options["readers"]}, 导入 {options["rows"]} 行')
+            self._seed(options['seed_rows'])
+            frame = self._import_frame(pd, options['rows'])
+            self._run(frame, options)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _seed(self, count):
+        from monitor.models import BirdRecord, BirdSpecies
+
+        species = [BirdSpecies.objects.create(name=f'基准鸟种{i}', danger_level=i % 10 + 1) for i in range(20)]
+        now = timezone.now()
+        rng = random.Random(42)
+        BirdRecord.objects.bulk_create([
+            BirdRecord(
+                species=rng.choice(species),
+                quantity=rng.randint(1, 30),
+                location='基准区域',
+                latitude=39.0 + rng.random(),
+                longitude=116.0 + rng.random(),
+                record_time=now - timezone.timedelta(minutes=rng.randint(0, 60 * 24 * 30)),
+                risk_level=rng.choice(['low', 'medium', 'high']),
+            )
+            for _ in range(count)
+        ], batch_size=2000)
+
+    def _import_frame(self, pd, rows):
+        rng = random.Random(7)
+        return pd.DataFrame({
+            '鸟种': [f'基准鸟种{rng.randint(0, 24)}' for _ in range(rows)],
+            '数量': [rng.randint(1, 30) for _ in range(rows)],
+            '位置': ['导入区域'] * rows,
+            '纬度': [39.0 + rng.random() for _ in range(rows)],
+            '经度': [116.0 + rng.random() for _ in range(rows)],
+        })
+
+    def _read_once(self):
+        """模拟一次地图 + 看板请求的读取"""
+        from monitor.models import BirdRecord
+
+        list(BirdRecord.objects.filter(latitude__isnull=False).select_related('species')
+             .order_by('-id').values('id', 'species__name', 'latitude', 'longitude', 'risk_level')[:500])
+        BirdRecord.objects.count()
+        list(BirdRecord.objects.values('risk_level').annotate(total=Count('id')))
+
+    def _reader(self, stop, samples, errors, phase):
+        close_old_connections()
+        try:
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    self._read_once()
+                except OperationalError as e:
+                    errors[phase[0]].append(str(e))
+                    continue
+                samples[phase[0]].append((time.perf_counter() - started) * 1000)
+        finally:
+            connection.close()
+
+    def _run(self, frame, options):
+        from monitor.models import ImportLog
+        from monitor.views import process_bird_import
+
+        stop = threading.Event()
+        phase = ['baseline']
+        samples = {'baseline': [], 'import': []}
+        errors = {'baseline': [], 'import': []}
+        readers = [
+            threading.Thread(target=self._reader, args=(stop, samples, errors, phase), daemon=True)
+            for _ in range(options['readers'])
+        ]
+        for reader in readers:
+            reader.start()
+
+        time.sleep(options['warmup'])
+        phase[0] = 'import'
+        log_entry = ImportLog.objects.create(log_type='bird', file_name='bench.csv', file_size=0)
+        started = time.perf_counter()
+        result = process_bird_import(frame, log_entry)
+        import_seconds = time.perf_counter() - started
+        stop.set()
+        for reader in readers:
+            reader.join()
+
+        self.stdout.write(f'导入: {result.get("success_count", 0)} 行, 用时 {import_seconds:.2f}s, '
+                          f'{result.get("success_count", 0) / import_seconds:.0f} 行/秒')
+        for name in ('baseline', 'import'):
+            self._report(name, samples[name], errors[name])
+
+    def _report(self, name, latencies, errors):
+        label = {'baseline': '基线(无写入)', 'import': '导入期间'}[name]
+        if not latencies:
+            self.stdout.write(f'{label}: 无成功读取, 错误 {len(errors)} 次')
+            return
+        ordered = sorted(latencies)
+
+        def percentile(p):
+            return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+        self.stdout.write(
+            f'{label}: 读取 {len(ordered)} 次, p50 {percentile(50):.1f}ms, p95 {percentile(95):.1f}ms, '
+            f'p99 {percentile(99):.1f}ms, 最大 {ordered[-1]:.1f}ms, 平均 {statistics.mean(ordered):.1f}ms, '
+            f'错误 {len(errors)} 次'
+        )
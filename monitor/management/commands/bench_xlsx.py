@@ -0,0 +1,144 @@
+import hashlib
+import json
+import multiprocessing
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from .bench import parse_scale, peak_rss_mb
+
+SAMPLE_XLSX = Path(settings.BASE_DIR) / 'monitor' / 'static' / 'monitor' / 'sample_bird_data.xlsx'
+
+# 对比的读取引擎，pandas 为原来的 pd.read_excel (openpyxl 完整对象模型)
+XLSX_ENGINES = ('pandas', 'openpyxl', 'calamine')
+
+
+class Command(BaseCommand):
+    help = ('Excel 导入读取基准：把 sample_bird_data.xlsx 按行数放大，分别用原 pd.read_excel、openpyxl 只读流式'
+            '和 calamine 读取并校验，对比读取耗时、到第一行校验完成的时间和峰值内存，并核对各引擎的校验结果一致')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default='200k', help='放大后的行数，如 200k')
+        parser.add_argument('--repeat', type=int, default=1, help='每个引擎的测量次数 (取最快一次)')
+        parser.add_argument('--extra-columns', type=int, default=0, help='额外添加的无关列数 (导入不需要的列)')
+        parser.add_argument('--engines', default=','.join(XLSX_ENGINES), help='参与对比的引擎，逗号分隔')
+        parser.add_argument('--seed', type=int, default=42, help='随机种子')
+        parser.add_argument('--output', '-o', help='结果 JSON 路径')
+
+    def handle(self, *args, **options):
+        from monitor.excel_reader import calamine_available
+
+        engines = [engine.strip() for engine in options['engines'].split(',') if engine.strip()]
+        unknown = [engine for engine in engines if engine not in XLSX_ENGINES]
+        if unknown:
+            raise CommandError(f'未知的读取引擎: {", ".join(unknown)}，可选: {", ".join(XLSX_ENGINES)}')
+        if 'calamine' in engines and not calamine_available():
+            self.stdout.write(self.style.WARNING('未安装 python-calamine，跳过 calamine (pip install python-calamine)'))
+            engines.remove('calamine')
+
+        rows = parse_scale(options['rows'])
+        temp_dir = Path(tempfile.mkdtemp(prefix='bird-bench-xlsx-'))
+        try:
+            path = temp_dir / 'bird_survey.xlsx'
+            started = time.perf_counter()
+            write_scaled_workbook(path, rows, options['extra_columns'], options['seed'])
+            self.stdout.write(f'生成 {rows} 行测试文件用时 {time.perf_counter() - started:.1f}s, '
+                              f'大小 {path.stat().st_size / 1024 / 1024:.1f}MB')
+
+            results = {}
+            for engine in engines:
+                runs = [_run_isolated(path, engine) for _ in range(max(1, options['repeat']))]
+                results[engine] = min(runs, key=lambda run: run['read_seconds'])
+                self._print_result(engine, results[engine], results.get('pandas'))
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump({'rows': rows, 'extra_columns': options['extra_columns'], 'engines': results},
+                          f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'结果已写入 {options["output"]}'))
+
+    def _print_result(self, engine, result, baseline):
+        speedup = ''
+        if baseline and engine != 'pandas':
+            speedup = f'  提速 {baseline["read_seconds"] / result["read_seconds"]:.1f}x'
+            if result['digest'] != baseline['digest']:
+                speedup += self.style.ERROR('  校验结果与 pandas 不一致')
+        self.stdout.write(
+            f'  {engine:<9} 读取 {result["read_seconds"]:>7.2f}s  首行校验完成 {result["first_row_seconds"]:>7.2f}s  '
+            f'校验 {result["validate_seconds"]:>6.2f}s  {result["rows"]:>7} 行  '
+            f'{result["rows_per_second"]:>9.0f} 行/秒  峰值内存 {result["peak_rss_mb"]}MB{speedup}')
+
+
+def write_scaled_workbook(path, rows, extra_columns=0, seed=42):
+    """按 sample_bird_data.xlsx 的列和内容生成 rows 行的工作簿 (坐标、数量和时间加随机扰动)"""
+    import openpyxl
+
+    source = openpyxl.load_workbook(SAMPLE_XLSX, read_only=True)
+    sample = [list(values) for values in source.worksheets[0].iter_rows(values_only=True)]
+    source.close()
+    header, templates = sample[0], sample[1:]
+    columns = {name: position for position, name in enumerate(header)}
+
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('鸟情记录')
+    sheet.append(header + [f'附加{i + 1}' for i in range(extra_columns)])
+    for index in range(rows):
+        values = list(templates[index % len(templates)])
+        values[columns['数量']] = rng.randint(1, 50)
+        values[columns['纬度']] = round(values[columns['纬度']] + rng.uniform(-0.05, 0.05), 6)
+        values[columns['经度']] = round(values[columns['经度']] + rng.uniform(-0.05, 0.05), 6)
+        values[columns['记录时间']] = (start + timedelta(minutes=index)).strftime('%Y-%m-%d %H:%M:%S')
+        sheet.append(values + [f'备用数据{index}-{i}' for i in range(extra_columns)])
+    workbook.save(path)
+
+
+def _run_isolated(path, engine):
+    """在独立的进程中测量，峰值内存互不影响"""
+    from monitor.import_worker import init_worker
+
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=init_worker) as executor:
+        return executor.submit(_read_and_validate, str(path), engine).result()
+
+
+def _read_and_validate(path, engine):
+    from django.test.utils import override_settings
+
+    from monitor.views import iter_bird_rows, read_import_file
+
+    with override_settings(BIRD_EXCEL_ENGINE=engine):
+        started = time.perf_counter()
+        df = read_import_file(path, 'bird_survey.xlsx', 'bird')
+        read_seconds = time.perf_counter() - started
+
+        rows = iter_bird_rows(df)
+        digest = hashlib.sha1()
+        first_row_seconds = None
+        count = 0
+        for line_no, species_name, record_data, error in rows:
+            if first_row_seconds is None:
+                first_row_seconds = time.perf_counter() - started
+            digest.update(repr((line_no, species_name, record_data, error)).encode())
+            count += 1
+        total_seconds = time.perf_counter() - started
+
+    return {
+        'rows': count,
+        'read_seconds': round(read_seconds, 3),
+        'first_row_seconds': round(first_row_seconds or total_seconds, 3),
+        'validate_seconds': round(total_seconds - read_seconds, 3),
+        'rows_per_second': round(count / read_seconds, 1) if read_seconds else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'digest': digest.hexdigest(),
+    }
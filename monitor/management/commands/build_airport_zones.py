@@ -0,0 +1,57 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from monitor import zones
+from monitor.geo import km_to_lat_deg, km_to_lon_deg
+
+from .bench import parse_scale
+
+
+class Command(BaseCommand):
+    help = ('按 BIRD_AIRPORT_ZONES_KM 重新生成全部机场的保护区；--retag 同时重新标记已有的鸟情记录，'
+            '--benchmark 测量批量分类的速度')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retag', action='store_true', help='重新标记全部鸟情记录所在的保护区')
+        parser.add_argument('--benchmark', metavar='POINTS',
+                            help='在机场周围随机生成若干坐标 (如 1m) 测量批量分类速度')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = zones.rebuild_zones()
+        zones.zone_index.invalidate()
+        index = zones.load_index()
+        self.stdout.write(f'保护区 {count} 个 ({len(index)} 个机场, 网格 {len(index.cells)} 个), '
+                          f'用时 {time.perf_counter() - started:.2f}s')
+
+        if options['retag']:
+            started = time.perf_counter()
+            stats = zones.retag_records(index)
+            self.stdout.write(self.style.SUCCESS(
+                f'重新标记: 检查 {stats["records"]} 条记录, 更新 {stats["changed"]} 条, '
+                f'用时 {time.perf_counter() - started:.2f}s'))
+
+        if options['benchmark']:
+            self._benchmark(index, parse_scale(options['benchmark']))
+
+    def _benchmark(self, index, points):
+        if not len(index):
+            self.stdout.write(self.style.WARNING('没有机场保护区，跳过分类基准'))
+            return
+        rng = random.Random(42)
+        latitudes, longitudes = [], []
+        for _ in range(points):
+            position = rng.randrange(len(index))
+            lat = index.latitudes[position]
+            latitudes.append(lat + km_to_lat_deg(rng.gauss(0, 10)))
+            longitudes.append(index.longitudes[position] + km_to_lon_deg(rng.gauss(0, 10), lat))
+
+        started = time.perf_counter()
+        _, levels = index.classify_many(latitudes, longitudes)
+        seconds = time.perf_counter() - started
+        inside = sum(1 for level in levels if level)
+        self.stdout.write(self.style.SUCCESS(
+            f'批量分类 {points} 个坐标用时 {seconds:.2f}s ({points / seconds:.0f} 个/秒), '
+            f'其中 {inside} 个在保护区内'))
@@ -0,0 +1,27 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from monitor.tracks import TrackLinker
+
+
+class Command(BaseCommand):
+    help = '重建鸟群轨迹：默认重新连接全部记录，--days 只重建最近几天开始的轨迹'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='只删除并重新连接最近几天的轨迹和记录')
+        parser.add_argument('--max-speed', type=float, help='鸟群最大飞行速度(公里/小时)')
+        parser.add_argument('--max-gap-minutes', type=int, help='同一轨迹两次目击的最大时间间隔(分钟)')
+
+    def handle(self, *args, **options):
+        linker = TrackLinker(max_speed_kmh=options['max_speed'], max_gap_minutes=options['max_gap_minutes'])
+        since = timezone.now() - timedelta(days=options['days']) if options['days'] else None
+        started = time.perf_counter()
+        stats = linker.rebuild(since)
+        seconds = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'轨迹重建完成: 处理 {stats["records"]} 条记录, 删除 {stats["removed"]} 条轨迹, '
+            f'新建 {stats["created"]} 条, 延伸 {stats["extended"]} 条, 用时 {seconds:.2f}s'
+        ))
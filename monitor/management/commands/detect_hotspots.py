@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from monitor.hotspots import HotspotDetector
+
+
+class Command(BaseCommand):
+    help = '更新鸟群聚集热点：默认清理过期成员，--rebuild 对整个时间窗口重新聚类'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='对时间窗口内全部记录重新聚类')
+        parser.add_argument('--eps-km', type=float, help='邻域半径(公里)')
+        parser.add_argument('--min-samples', type=int, help='核心点最少邻近记录数')
+        parser.add_argument('--window-minutes', type=int, help='滑动时间窗口(分钟)')
+
+    def handle(self, *args, **options):
+        detector = HotspotDetector(
+            eps_km=options['eps_km'],
+            min_samples=options['min_samples'],
+            window_minutes=options['window_minutes'],
+        )
+        if options['rebuild']:
+            stats = detector.rebuild()
+        else:
+            stats = detector.expire()
+        self.stdout.write(self.style.SUCCESS(
+            f'热点更新完成: 新建 {stats["created"]} 个, 移除 {stats["removed"]} 个'
+        ))
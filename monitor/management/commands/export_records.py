@@ -0,0 +1,62 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from monitor import exporters
+from monitor.filters import filter_airports, filter_bird_records
+
+
+class Command(BaseCommand):
+    help = '流式导出鸟情记录或机场数据 (CSV / XLSX / GeoJSON / Parquet)，内存占用与数据量无关'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', choices=list(exporters.EXPORT_DATASETS), default='records', help='导出数据集')
+        parser.add_argument('--format', choices=list(exporters.EXPORT_FORMATS), default='csv', help='导出格式')
+        parser.add_argument('--output', '-o', help='输出文件路径，默认按数据集和时间自动命名，"-" 表示标准输出')
+        # 与记录列表相同的筛选参数
+        parser.add_argument('--species', default='', help='鸟种ID或名称')
+        parser.add_argument('--risk-level', default='', help='风险等级 low/medium/high')
+        parser.add_argument('--start', default='', help='开始时间 YYYY-MM-DD[ HH:MM]')
+        parser.add_argument('--end', default='', help='结束时间 YYYY-MM-DD[ HH:MM]')
+        parser.add_argument('--bbox', default='', help='最小经度,最小纬度,最大经度,最大纬度')
+        parser.add_argument('--country', default='', help='机场国家代码')
+        parser.add_argument('--type', default='', help='机场类型')
+
+    def handle(self, *args, **options):
+        dataset = options['dataset']
+        fmt = options['format']
+        params = {
+            'species': options['species'],
+            'risk_level': options['risk_level'],
+            'start': options['start'],
+            'end': options['end'],
+            'bbox': options['bbox'],
+            'country': options['country'],
+            'type': options['type'],
+        }
+
+        queryset = exporters.base_queryset(dataset)
+        if dataset == 'records':
+            queryset = filter_bird_records(queryset, params)
+        else:
+            queryset = filter_airports(queryset, params)
+
+        try:
+            stream = exporters.iter_export(dataset, fmt, queryset)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        output = options['output'] or exporters.export_file_name(dataset, fmt)
+        written = 0
+        if output == '-':
+            for chunk in stream:
+                sys.stdout.buffer.write(chunk)
+                written += len(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        with open(output, 'wb') as f:
+            for chunk in stream:
+                f.write(chunk)
+                written += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f'导出完成: {output} ({written} bytes)'))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from monitor import changes
+from monitor.models import Airport, BirdRecord, BirdSpecies
+from monitor.synthetic import seed_database
+
+
+class Command(BaseCommand):
+    help = '生成可复现的合成示例数据：鸟种、全球分布的机场、围绕机场聚集的鸟情记录'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--species', type=int, default=30, help='鸟种数量')
+        parser.add_argument('--airports', type=int, default=1000, help='机场数量')
+        parser.add_argument('--records', type=int, default=10000, help='鸟情记录数量')
+        parser.add_argument('--days', type=int, default=365, help='记录时间分布在最近多少天内')
+        parser.add_argument('--seed', type=int, default=42, help='随机种子，相同种子生成相同数据')
+        parser.add_argument('--clear', action='store_true', help='生成前清空已有的鸟种、机场和鸟情记录')
+
+    def handle(self, *args, **options):
+        if options['species'] < 1 or options['airports'] < 1:
+            raise CommandError('至少需要 1 个鸟种和 1 个机场')
+
+        if options['clear']:
+            with transaction.atomic(), changes.collect():
+                BirdRecord.objects.all().delete()
+            BirdSpecies.objects.all().delete()
+            Airport.objects.all().delete()
+        elif Airport.objects.filter(ident__startswith='SY').exists():
+            raise CommandError('数据库中已有合成机场数据，使用 --clear 重新生成')
+
+        stats = seed_database(
+            species=options['species'],
+            airports=options['airports'],
+            records=options['records'],
+            seed=options['seed'],
+            days=options['days'],
+            stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'生成完成: 鸟种 {stats["species"]} 个, 机场 {stats["airports"]} 个, 鸟情记录 {stats["records"]} 条'
+        ))
@@ -0,0 +1,86 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from monitor import retention
+
+
+def _mb(value):
+    return f'{value / 1024 / 1024:.1f}MB'
+
+
+class Command(BaseCommand):
+    help = ('数据保留与数据库维护：压缩过期导入日志的处理详情、归档旧记录 (可选)、清理记录变更日志、增量 VACUUM、截断 WAL '
+            '和 ANALYZE，输出各步骤耗时和释放的空间')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--steps', default=','.join(retention.MAINTENANCE_STEPS),
+                            help='执行的步骤，逗号分隔: logs,records,changes,vacuum,analyze')
+        parser.add_argument('--log-days', type=int, help='导入日志处理详情的保留天数 (默认 BIRD_RETENTION_LOG_DAYS)')
+        parser.add_argument('--log-mode', choices=retention.LOG_MODES, help='过期日志的处理方式')
+        parser.add_argument('--archive-records', action='store_true',
+                            help='归档热数据窗口以外的记录并从实时库删除 (默认 BIRD_RETENTION_ARCHIVE_RECORDS)')
+        parser.add_argument('--full-vacuum', action='store_true',
+                            help='完整 VACUUM 并转换为增量 VACUUM 模式 (重写整个数据库文件，期间写入会等待)')
+        parser.add_argument('--max-seconds', type=float, help='增量 VACUUM 的最长运行时间')
+        parser.add_argument('--output', '-o', help='报告 JSON 路径')
+
+    def handle(self, *args, **options):
+        steps = [step.strip() for step in options['steps'].split(',') if step.strip()]
+        unknown = [step for step in steps if step not in retention.MAINTENANCE_STEPS]
+        if unknown:
+            raise CommandError(f'未知的维护步骤: {", ".join(unknown)}')
+
+        try:
+            report = retention.run_maintenance(
+                steps=steps,
+                log_days=options['log_days'],
+                log_mode=options['log_mode'],
+                archive_records=options['archive_records'] or None,
+                full=options['full_vacuum'],
+                max_seconds=options['max_seconds'],
+                stdout=self.stdout,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self._print_report(report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'报告已写入 {options["output"]}'))
+
+    def _print_report(self, report):
+        steps = report['steps']
+        if 'logs' in steps:
+            result = steps['logs']['result']
+            self.stdout.write(f'导入日志: 处理 {result["logs"]} 条, 详情 {_mb(result["bytes_before"])} -> '
+                              f'{_mb(result["bytes_after"])} ({steps["logs"]["seconds"]:.2f}s)')
+        if 'records' in steps:
+            result = steps['records']['result']
+            self.stdout.write(f'记录归档: 归档 {result["rows"]} 条, 从实时库删除 {result["pruned"]} 条 '
+                              f'({steps["records"]["seconds"]:.2f}s)')
+        if 'changes' in steps:
+            result = steps['changes']['result']
+            self.stdout.write(f'变更日志: 全文索引同步 {result["search"]["changes"]} 条, '
+                              f'归档同步 {result["archive"] or 0} 条, 删除 {result["removed"]} 条 '
+                              f'({steps["changes"]["seconds"]:.2f}s)')
+        if 'vacuum' in steps:
+            result = steps['vacuum']['result']
+            if 'skipped' in result:
+                self.stdout.write(self.style.WARNING(f'VACUUM: 跳过，{result["skipped"]}'))
+            elif result['mode'] == 'full':
+                self.stdout.write(f'VACUUM: 完整重写，已启用增量模式 ({steps["vacuum"]["seconds"]:.2f}s)')
+            else:
+                self.stdout.write(f'VACUUM: 释放 {result["pages"]} 页 ({steps["vacuum"]["seconds"]:.2f}s)')
+        if 'analyze' in steps:
+            self.stdout.write(f'ANALYZE: {steps["analyze"]["seconds"]:.2f}s')
+        if 'checkpoint' in steps:
+            self.stdout.write(f'WAL 检查点: {steps["checkpoint"]["seconds"]:.2f}s')
+
+        before, after = report['before'], report['after']
+        self.stdout.write(self.style.SUCCESS(
+            f'维护完成: 用时 {report["seconds"]:.2f}s, 数据库 {_mb(before["file_bytes"] + before["wal_bytes"])} -> '
+            f'{_mb(after["file_bytes"] + after["wal_bytes"])}, 释放 {_mb(report["reclaimed_bytes"])}, '
+            f'空闲页 {before["freelist_count"]} -> {after["freelist_count"]} (auto_vacuum={after["auto_vacuum"]})'
+        ))
@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from monitor import dedup
+
+
+class Command(BaseCommand):
+    help = '按当前的 BIRD_DEDUP_MINUTES / BIRD_DEDUP_KM 重新计算全部鸟情记录的重复检测指纹'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        stats = dedup.rebuild_fingerprints()
+        self.stdout.write(self.style.SUCCESS(
+            f'检查 {stats["records"]} 条记录, 更新 {stats["changed"]} 条指纹, '
+            f'用时 {time.perf_counter() - started:.2f}s'))
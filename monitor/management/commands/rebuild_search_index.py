@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from monitor import search
+
+
+class Command(BaseCommand):
+    help = '重建鸟情记录全文索引 (位置、入侵原因、备注和鸟种名称)；--sync 只同步上次以后的变更'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sync', action='store_true', help='只把记录变更日志中尚未同步的变更写入索引')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['sync']:
+            result = search.sync_index()
+            action = '整表重建' if result['rebuilt'] else '增量同步'
+            self.stdout.write(self.style.SUCCESS(
+                f'{action}: {result["changes"]} 条变更, 用时 {time.perf_counter() - started:.2f}s'))
+            return
+        indexed = search.rebuild_index(stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'全文索引重建完成: {indexed} 条记录, 用时 {time.perf_counter() - started:.2f}s'))
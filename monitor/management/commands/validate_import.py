@@ -0,0 +1,37 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from monitor import validation
+
+
+class Command(BaseCommand):
+    help = '预检导入文件 (与导入页面的 "只预检" 相同)：按列校验并汇总有问题的行，不写入数据库'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV / XLS / XLSX 文件')
+        parser.add_argument('--type', choices=('bird', 'airport'), default='bird', help='导入类型')
+        parser.add_argument('--sheet', help='Excel 工作表名称，默认按表头自动选择')
+        parser.add_argument('--json', action='store_true', help='输出 JSON 报告')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'文件不存在: {path}')
+        report = validation.validate_file(path, os.path.basename(path), options['type'], options['sheet'])
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+        if 'error' in report:
+            raise CommandError(report['error'])
+        if report['missing_columns']:
+            raise CommandError(f'缺少必要的列: {", ".join(report["missing_columns"])}')
+
+        self.stdout.write(f'{report["total_rows"]} 行: 可以导入 {report["valid_rows"]} 行, 将失败 {report["error_rows"]} 行, '
+                          f'有提醒 {report["warning_rows"]} 行 (读取 {report["read_seconds"]:.2f}s, '
+                          f'校验 {report["seconds"]:.2f}s)')
+        for issue in report['issues']:
+            style = self.style.ERROR if issue['level'] == 'error' else self.style.WARNING
+            samples = f' 示例: {", ".join(issue["samples"])}' if issue['samples'] else ''
+            self.stdout.write(style(f'[{issue["column"]}] {issue["label"]}: {issue["count"]} 行 - {issue["rows"]}{samples}'))
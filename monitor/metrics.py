@@ -0,0 +1,211 @@
+"""进程内性能指标 - Prometheus 文本格式
+
+计数器和直方图保存在进程内存中，每次观测只做一次加锁累加，开销可以忽略。
+/metrics 接口按 Prometheus 文本格式输出当前进程的累计值；多进程部署时
+每个工作进程各自统计，由 Prometheus 按实例汇总。
+https://prometheus.io/docs/instrumenting/exposition_formats/
+"""
+import threading
+from bisect import bisect_left
+
+# 请求耗时(秒)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 单个请求的 SQL 查询数，用于发现 N+1 查询
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+# 流式响应从开始发送到结束的时长(秒)，包括 SSE 长连接
+STREAMING_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for label_values, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labels, label_values)} {_format_number(value)}')
+        return lines
+
+
+class Gauge:
+    """当前值由回调函数在输出时读取"""
+
+    def __init__(self, name, help_text, callback):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+
+    def collect(self):
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} gauge',
+                f'{self.name} {_format_number(self.callback())}']
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self._values = {}  # 标签值 -> [各桶计数 (非累计), 总和, 次数]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def collect(self):
+        with self._lock:
+            items = sorted((key, [list(state[0]), state[1], state[2]]) for key, state in self._values.items())
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        label_names = self.labels + ('le',)
+        for label_values, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(label_names, label_values + (_format_number(float(bound)),))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f'{self.name}_sum{labels} {_format_number(round(total, 6))}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, callback):
+        return self.register(Gauge(name, help_text, callback))
+
+    def histogram(self, name, help_text, buckets, labels=()):
+        return self.register(Histogram(name, help_text, buckets, labels))
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics):
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+requests_total = registry.counter(
+    'bird_http_requests_total', '按视图、方法和状态码统计的请求数', ('view', 'method', 'status'))
+request_duration = registry.histogram(
+    'bird_http_request_duration_seconds', '视图返回响应对象的耗时 (不含流式响应的发送时间)',
+    LATENCY_BUCKETS, ('view',))
+request_queries = registry.histogram(
+    'bird_http_request_queries', '单个请求执行的 SQL 查询数', QUERY_BUCKETS, ('view',))
+sql_seconds_total = registry.counter(
+    'bird_http_sql_duration_seconds_total', 'SQL 执行总耗时(秒)', ('view',))
+response_bytes_total = registry.counter(
+    'bird_http_response_bytes_total', '响应体总字节数 (流式响应按实际发送的字节计)', ('view',))
+streaming_duration = registry.histogram(
+    'bird_http_streaming_duration_seconds', '流式响应从开始发送到结束的时长', STREAMING_BUCKETS, ('view',))
+slow_requests_total = registry.counter(
+    'bird_http_slow_requests_total', '超过慢请求阈值的请求数', ('view',))
+
+_in_progress = [0]
+_in_progress_lock = threading.Lock()
+
+
+def track_in_progress(delta):
+    with _in_progress_lock:
+        _in_progress[0] += delta
+
+
+registry.gauge('bird_http_requests_in_progress', '正在处理的请求数 (不含正在发送的流式响应)',
+               lambda: _in_progress[0])
+
+
+def _writer_stat(key):
+    from .writer import writer
+    return writer.stats[key]
+
+
+def _writer_pending():
+    from .writer import writer
+    return writer.pending
+
+
+registry.gauge('bird_db_writer_jobs', '单写线程已完成的写任务数', lambda: _writer_stat('jobs'))
+registry.gauge('bird_db_writer_transactions', '单写线程已提交的事务数', lambda: _writer_stat('transactions'))
+registry.gauge('bird_db_writer_failed_jobs', '单写线程失败的写任务数', lambda: _writer_stat('failed_jobs'))
+registry.gauge('bird_db_writer_pending', '单写线程队列中等待的任务数', _writer_pending)
+
+
+def _lookup_stat(table, key):
+    from . import lookups
+    return getattr(lookups, table).stats()[key]
+
+
+for _table, _label in (('species', '鸟种'), ('airports', '机场')):
+    registry.gauge(f'bird_lookup_{_table}_hits', f'{_label}查询缓存命中次数',
+                   lambda table=_table: _lookup_stat(table, 'hits'))
+    registry.gauge(f'bird_lookup_{_table}_misses', f'{_label}查询缓存未命中次数',
+                   lambda table=_table: _lookup_stat(table, 'misses'))
+    registry.gauge(f'bird_lookup_{_table}_reloads', f'{_label}查询缓存重新加载次数',
+                   lambda table=_table: _lookup_stat(table, 'reloads'))
+
+
+def _bootstrap_stat(key):
+    from .bootstrap import stats
+    return stats[key]
+
+
+registry.gauge('bird_map_bootstrap_hits', '地图启动数据包缓存命中次数', lambda: _bootstrap_stat('hits'))
+registry.gauge('bird_map_bootstrap_builds', '地图启动数据包生成次数', lambda: _bootstrap_stat('builds'))
+
+
+def _maintenance_stat(key):
+    from .retention import last_report
+    return last_report.get(key, 0)
+
+
+registry.gauge('bird_maintenance_last_seconds', '本进程最近一次数据库维护的耗时(秒)',
+               lambda: _maintenance_stat('seconds'))
+registry.gauge('bird_maintenance_last_reclaimed_bytes', '本进程最近一次数据库维护释放的空间(字节)',
+               lambda: _maintenance_stat('reclaimed_bytes'))
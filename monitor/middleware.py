@@ -0,0 +1,197 @@
+"""请求性能统计中间件
+
+记录每个视图的耗时、SQL 查询数和 SQL 总耗时、响应字节数，以及流式响应的发送时长，
+汇总到 monitor.metrics。
+
+SQL 统计: 每个数据库连接创建时安装同一个 execute_wrapper (monitor.signals)，按 contextvars 中
+当前请求的统计器计数。异步视图通过 sync_to_async 在其他线程的连接上执行的查询也会复制上下文，
+计入发起它的请求。
+
+设置 BIRD_SLOW_REQUEST_MS 后开启慢请求日志：超过阈值的请求会把耗时最多的
+SQL 语句 (相同语句合并计数) 写入 monitor.slow_requests 日志。
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+
+from . import metrics
+
+slow_logger = logging.getLogger('monitor.slow_requests')
+
+# 当前请求的 QueryCollector，没有统计中的请求时为 None
+_active_collector = contextvars.ContextVar('bird_query_collector', default=None)
+
+_STREAM_END = object()
+
+
+def route_queries(execute, sql, params, many, context):
+    """所有连接共用的 execute_wrapper：把查询交给当前上下文中的统计器"""
+    collector = _active_collector.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    return collector(execute, sql, params, many, context)
+
+
+def install_query_router(connection):
+    """在数据库连接上安装 route_queries (连接重新建立时不重复安装)"""
+    if route_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(route_queries)
+
+
+class QueryCollector:
+    """execute_wrapper：统计查询数和耗时，慢请求日志开启时按语句汇总"""
+
+    def __init__(self, collect_statements=False):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = {} if collect_statements else None  # SQL -> [次数, 总耗时]
+        self._lock = threading.Lock()  # 异步视图可能在多个工作线程中并发查询
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.count += 1
+                self.seconds += elapsed
+                if self.statements is not None:
+                    entry = self.statements.get(sql)
+                    if entry is None:
+                        self.statements[sql] = [1, elapsed]
+                    else:
+                        entry[0] += 1
+                        entry[1] += elapsed
+
+    @contextmanager
+    def capture(self):
+        """块内 (包括由此复制上下文的 sync_to_async 线程) 执行的查询计入本统计器"""
+        token = _active_collector.set(self)
+        try:
+            yield self
+        finally:
+            _active_collector.reset(token)
+
+    def top_statements(self, limit):
+        ordered = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)
+        return ordered[:limit]
+
+
+class RequestMetricsMiddleware:
+    # 同时支持同步和异步：ASGI 下只支持同步的中间件会让每个请求都经过线程切换
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        slow_ms = getattr(settings, 'BIRD_SLOW_REQUEST_MS', None)
+        collector = QueryCollector(collect_statements=slow_ms is not None)
+
+        metrics.track_in_progress(1)
+        started = time.perf_counter()
+        try:
+            with collector.capture():
+                response = self.get_response(request)
+        finally:
+            metrics.track_in_progress(-1)
+        return self._finish(request, response, time.perf_counter() - started, collector, slow_ms)
+
+    async def __acall__(self, request):
+        slow_ms = getattr(settings, 'BIRD_SLOW_REQUEST_MS', None)
+        collector = QueryCollector(collect_statements=slow_ms is not None)
+
+        metrics.track_in_progress(1)
+        started = time.perf_counter()
+        try:
+            with collector.capture():
+                response = await self.get_response(request)
+        finally:
+            metrics.track_in_progress(-1)
+        return self._finish(request, response, time.perf_counter() - started, collector, slow_ms)
+
+    def _finish(self, request, response, elapsed, collector, slow_ms):
+        view = _view_name(request)
+        metrics.requests_total.inc(1, view, request.method, str(response.status_code))
+        metrics.request_duration.observe(elapsed, view)
+
+        if response.streaming:
+            # 流式响应在视图返回后才真正查询和发送，查询统计在发送结束时记录
+            if response.is_async:
+                response.streaming_content = self._wrap_async_stream(response.streaming_content, view, collector)
+            else:
+                response.streaming_content = self._wrap_stream(response.streaming_content, view, collector)
+        else:
+            metrics.response_bytes_total.inc(len(response.content), view)
+            self._record_queries(view, collector)
+
+        if slow_ms is not None and elapsed * 1000 >= slow_ms:
+            self._log_slow_request(request, view, elapsed, collector)
+        return response
+
+    def _wrap_stream(self, content, view, collector):
+        # 每取一块数据单独设置上下文：ASGI 下同步迭代器的每次 next() 可能在不同的上下文副本中执行
+        started = time.perf_counter()
+        sent = 0
+        iterator = iter(content)
+        try:
+            while True:
+                with collector.capture():
+                    chunk = next(iterator, _STREAM_END)
+                if chunk is _STREAM_END:
+                    break
+                sent += len(chunk)
+                yield chunk
+        finally:
+            metrics.response_bytes_total.inc(sent, view)
+            metrics.streaming_duration.observe(time.perf_counter() - started, view)
+            self._record_queries(view, collector)
+
+    async def _wrap_async_stream(self, content, view, collector):
+        started = time.perf_counter()
+        sent = 0
+        iterator = aiter(content)
+        try:
+            while True:
+                with collector.capture():
+                    chunk = await anext(iterator, _STREAM_END)
+                if chunk is _STREAM_END:
+                    break
+                sent += len(chunk)
+                yield chunk
+        finally:
+            metrics.response_bytes_total.inc(sent, view)
+            metrics.streaming_duration.observe(time.perf_counter() - started, view)
+            self._record_queries(view, collector)
+
+    def _record_queries(self, view, collector):
+        metrics.request_queries.observe(collector.count, view)
+        metrics.sql_seconds_total.inc(collector.seconds, view)
+
+    def _log_slow_request(self, request, view, elapsed, collector):
+        metrics.slow_requests_total.inc(1, view)
+        limit = getattr(settings, 'BIRD_SLOW_REQUEST_TOP_SQL', 5)
+        lines = [
+            f'慢请求 {request.method} {request.get_full_path()} ({view}): '
+            f'{elapsed * 1000:.1f}ms, SQL {collector.count} 条 / {collector.seconds * 1000:.1f}ms'
+        ]
+        for sql, (count, seconds) in collector.top_statements(limit):
+            lines.append(f'  {seconds * 1000:8.1f}ms  x{count:<5} {sql[:500]}')
+        slow_logger.warning('\n'.join(lines))
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else '<unresolved>'
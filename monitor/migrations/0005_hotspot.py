@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0004_importlog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hotspot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('centroid_latitude', models.FloatField(verbose_name='中心纬度')),
+                ('centroid_longitude', models.FloatField(verbose_name='中心经度')),
+                ('member_count', models.IntegerField(default=0, verbose_name='记录数')),
+                ('total_quantity', models.IntegerField(default=0, verbose_name='鸟类总数')),
+                ('airport_distance_km', models.FloatField(blank=True, null=True, verbose_name='距机场距离(公里)')),
+                ('member_ids', models.JSONField(default=list, verbose_name='成员记录ID')),
+                ('first_seen', models.DateTimeField(verbose_name='最早记录时间')),
+                ('last_seen', models.DateTimeField(verbose_name='最近记录时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('dominant_species', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='monitor.birdspecies', verbose_name='优势鸟种')),
+                ('nearest_airport', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='monitor.airport', verbose_name='最近机场')),
+            ],
+            options={
+                'verbose_name': '鸟情热点',
+                'verbose_name_plural': '鸟情热点',
+                'ordering': ['-total_quantity'],
+            },
+        ),
+    ]
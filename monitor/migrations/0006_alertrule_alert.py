@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0005_hotspot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertRule',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='规则名称')),
+                ('rule_type', models.CharField(choices=[('quantity', '数量阈值'), ('danger', '鸟种危险等级'), ('density', '机场周边密集出现')], max_length=10, verbose_name='规则类型')),
+                ('level', models.CharField(choices=[('info', '提示'), ('warning', '警告'), ('critical', '严重')], default='warning', max_length=10, verbose_name='预警级别')),
+                ('threshold', models.IntegerField(help_text='数量阈值 / 最低危险等级 / 时间窗口内的记录条数', verbose_name='阈值')),
+                ('radius_km', models.FloatField(default=5.0, verbose_name='机场半径(公里)')),
+                ('window_minutes', models.IntegerField(default=30, verbose_name='时间窗口(分钟)')),
+                ('cooldown_minutes', models.IntegerField(default=10, verbose_name='冷却时间(分钟)')),
+                ('enabled', models.BooleanField(default=True, verbose_name='启用')),
+                ('airport', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='monitor.airport', verbose_name='限定机场')),
+                ('species', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='monitor.birdspecies', verbose_name='限定鸟种')),
+            ],
+            options={
+                'verbose_name': '预警规则',
+                'verbose_name_plural': '预警规则',
+            },
+        ),
+        migrations.CreateModel(
+            name='Alert',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('info', '提示'), ('warning', '警告'), ('critical', '严重')], max_length=10, verbose_name='预警级别')),
+                ('message', models.CharField(max_length=500, verbose_name='预警内容')),
+                ('acknowledged', models.BooleanField(default=False, verbose_name='已确认')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='触发时间')),
+                ('airport', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='monitor.airport', verbose_name='相关机场')),
+                ('record', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='monitor.birdrecord', verbose_name='触发记录')),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='monitor.alertrule', verbose_name='规则')),
+            ],
+            options={
+                'verbose_name': '预警信息',
+                'verbose_name_plural': '预警信息',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
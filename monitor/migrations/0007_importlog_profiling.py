@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0006_alertrule_alert'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importlog',
+            name='duration_seconds',
+            field=models.FloatField(blank=True, null=True, verbose_name='总耗时(秒)'),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='peak_memory_mb',
+            field=models.FloatField(blank=True, null=True, verbose_name='峰值内存(MB)'),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='rows_per_second',
+            field=models.FloatField(blank=True, null=True, verbose_name='处理速度(行/秒)'),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='stage_timings',
+            field=models.JSONField(blank=True, default=dict, verbose_name='各阶段耗时(秒)'),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='write_batch_stats',
+            field=models.JSONField(blank=True, default=dict, verbose_name='写入批次统计'),
+        ),
+    ]
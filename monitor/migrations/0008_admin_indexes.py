@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:38
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0007_importlog_profiling'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='airport',
+            name='iata_code',
+            field=models.CharField(blank=True, db_index=True, max_length=3, verbose_name='IATA代码'),
+        ),
+        migrations.AlterField(
+            model_name='airport',
+            name='icao_code',
+            field=models.CharField(blank=True, db_index=True, max_length=4, verbose_name='ICAO代码'),
+        ),
+        migrations.AlterField(
+            model_name='airport',
+            name='iso_country',
+            field=models.CharField(db_index=True, max_length=2, verbose_name='国家代码'),
+        ),
+        migrations.AlterField(
+            model_name='airport',
+            name='municipality',
+            field=models.CharField(blank=True, db_index=True, max_length=100, verbose_name='城市'),
+        ),
+        migrations.AlterField(
+            model_name='airport',
+            name='name',
+            field=models.CharField(db_index=True, max_length=200, verbose_name='机场名称'),
+        ),
+        migrations.AlterField(
+            model_name='birdrecord',
+            name='location',
+            field=models.CharField(db_index=True, max_length=200, verbose_name='发现位置'),
+        ),
+        migrations.AlterField(
+            model_name='birdrecord',
+            name='record_time',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='记录时间'),
+        ),
+    ]
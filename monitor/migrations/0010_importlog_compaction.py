@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0009_importlog_parent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importlog',
+            name='compacted_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='详情压缩时间'),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='details_archive',
+            field=models.BinaryField(blank=True, null=True, verbose_name='压缩的详细信息'),
+        ),
+    ]
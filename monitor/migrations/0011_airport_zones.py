@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_zones(apps, schema_editor):
+    """为已有机场生成保护区并标记已有的鸟情记录"""
+    from monitor import zones
+
+    AirportZone = apps.get_model('monitor', 'AirportZone')
+    zones.rebuild_zones(airport_model=apps.get_model('monitor', 'Airport'), zone_model=AirportZone)
+    zones.retag_records(index=zones.load_index(AirportZone), record_model=apps.get_model('monitor', 'BirdRecord'))
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0010_importlog_compaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AirportZone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField(verbose_name='等级')),
+                ('radius_km', models.FloatField(verbose_name='半径(公里)')),
+                ('min_latitude', models.FloatField(verbose_name='最小纬度')),
+                ('max_latitude', models.FloatField(verbose_name='最大纬度')),
+                ('min_longitude', models.FloatField(verbose_name='最小经度')),
+                ('max_longitude', models.FloatField(verbose_name='最大经度')),
+            ],
+            options={
+                'verbose_name': '机场保护区',
+                'verbose_name_plural': '机场保护区',
+            },
+        ),
+        migrations.AddField(
+            model_name='birdrecord',
+            name='zone_airport',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='zone_records', to='monitor.airport', verbose_name='保护区机场'),
+        ),
+        migrations.AddField(
+            model_name='birdrecord',
+            name='zone_level',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='保护区等级'),
+        ),
+        migrations.AddIndex(
+            model_name='birdrecord',
+            index=models.Index(condition=models.Q(('zone_airport__isnull', False)), fields=['zone_airport', 'zone_level', 'record_time'], name='birdrecord_zone_idx'),
+        ),
+        migrations.AddField(
+            model_name='airportzone',
+            name='airport',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='zones', to='monitor.airport', verbose_name='机场'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='airportzone',
+            unique_together={('airport', 'level')},
+        ),
+        migrations.RunPython(build_zones, migrations.RunPython.noop),
+    ]
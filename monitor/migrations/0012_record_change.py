@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0011_airport_zones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecordChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('op', models.CharField(choices=[('insert', '新增'), ('update', '修改'), ('delete', '删除')], max_length=6, verbose_name='操作')),
+                ('record_id', models.IntegerField(verbose_name='记录ID')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='变更时间')),
+            ],
+            options={
+                'verbose_name': '记录变更',
+                'verbose_name_plural': '记录变更',
+            },
+        ),
+    ]
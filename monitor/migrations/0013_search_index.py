@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """创建全文索引 (FTS5) 和同步状态表，并索引已有的记录"""
+    from monitor import search
+
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {search.FTS_TABLE} USING fts5("
+        f"{', '.join(search.INDEX_COLUMNS)}, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(f'CREATE TABLE {search.STATE_TABLE} (name varchar(50) PRIMARY KEY, value integer NOT NULL)')
+    search.rebuild_index(record_model=apps.get_model('monitor', 'BirdRecord'),
+                         change_model=apps.get_model('monitor', 'RecordChange'))
+
+
+def drop_search_index(apps, schema_editor):
+    from monitor import search
+
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {search.FTS_TABLE}')
+    schema_editor.execute(f'DROP TABLE IF EXISTS {search.STATE_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0012_record_change'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_fingerprints(apps, schema_editor):
+    """计算已有鸟情记录的重复检测指纹"""
+    from monitor import dedup
+
+    dedup.rebuild_fingerprints(record_model=apps.get_model('monitor', 'BirdRecord'))
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0013_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='birdrecord',
+            name='dedup_fingerprint',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255, null=True, verbose_name='重复检测指纹'),
+        ),
+        migrations.AddField(
+            model_name='birdrecord',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='monitor.birdrecord', verbose_name='重复于'),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='duplicates_flagged',
+            field=models.IntegerField(default=0, verbose_name='标记重复数'),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='duplicates_merged',
+            field=models.IntegerField(default=0, verbose_name='合并重复数'),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='duplicates_skipped',
+            field=models.IntegerField(default=0, verbose_name='跳过重复数'),
+        ),
+        migrations.AddIndex(
+            model_name='birdrecord',
+            index=models.Index(condition=models.Q(('duplicate_of__isnull', False)), fields=['duplicate_of'], name='birdrecord_duplicate_idx'),
+        ),
+        migrations.RunPython(fill_fingerprints, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0014_dedup_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlockTrack',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('record_ids', models.JSONField(default=list, verbose_name='记录ID')),
+                ('path', models.JSONField(default=list, verbose_name='轨迹点')),
+                ('point_count', models.IntegerField(default=0, verbose_name='目击次数')),
+                ('max_quantity', models.IntegerField(default=0, verbose_name='最大数量')),
+                ('first_seen', models.DateTimeField(verbose_name='首次目击时间')),
+                ('last_seen', models.DateTimeField(verbose_name='最近目击时间')),
+                ('last_latitude', models.FloatField(verbose_name='最近纬度')),
+                ('last_longitude', models.FloatField(verbose_name='最近经度')),
+                ('heading_deg', models.FloatField(blank=True, null=True, verbose_name='航向(度)')),
+                ('speed_kmh', models.FloatField(blank=True, null=True, verbose_name='速度(公里/小时)')),
+                ('approach_distance_km', models.FloatField(blank=True, null=True, verbose_name='最近接近距离(公里)')),
+                ('approach_minutes', models.FloatField(blank=True, null=True, verbose_name='到达最近接近点(分钟)')),
+                ('approach_level', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='将进入的保护区等级')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('approach_airport', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='approaching_tracks', to='monitor.airport', verbose_name='最近接近机场')),
+                ('species', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='monitor.birdspecies', verbose_name='鸟种')),
+            ],
+            options={
+                'verbose_name': '鸟群轨迹',
+                'verbose_name_plural': '鸟群轨迹',
+                'ordering': ['-last_seen'],
+                'indexes': [models.Index(fields=['last_seen'], name='flocktrack_last_seen_idx')],
+            },
+        ),
+    ]
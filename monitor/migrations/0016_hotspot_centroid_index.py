@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0015_flock_track'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hotspot',
+            index=models.Index(fields=['centroid_latitude', 'centroid_longitude'], name='hotspot_centroid_idx'),
+        ),
+    ]
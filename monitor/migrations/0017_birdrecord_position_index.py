@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0016_hotspot_centroid_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='birdrecord',
+            index=models.Index(fields=['latitude', 'longitude'], name='birdrecord_position_idx'),
+        ),
+    ]
@@ -22,29 +22,63 @@ class BirdRecord(models.Model):
 
     species = models.ForeignKey(BirdSpecies, on_delete=models.CASCADE, verbose_name="鸟种")
     quantity = models.IntegerField(verbose_name="数量")
-    location = models.CharField(max_length=200, verbose_name="发现位置")
+    location = models.CharField(max_length=200, db_index=True, verbose_name="发现位置")
     latitude = models.FloatField(null=True, blank=True, verbose_name="纬度")
     longitude = models.FloatField(null=True, blank=True, verbose_name="经度")
     intrusion_reason = models.CharField(max_length=200, blank=True, verbose_name="入侵原因")
-    record_time = models.DateTimeField(default=timezone.now, verbose_name="记录时间")
+    record_time = models.DateTimeField(default=timezone.now, db_index=True, verbose_name="记录时间")
     risk_level = models.CharField(max_length=10, choices=RISK_LEVEL_CHOICES, default='low', verbose_name="风险等级")
     notes = models.TextField(blank=True, verbose_name="备注")
+    # 所在的机场保护区 (见 monitor/zones.py)，保存时按坐标计算；不在任何保护区内时为空
+    zone_airport = models.ForeignKey('Airport', null=True, blank=True, on_delete=models.SET_NULL, db_index=False,
+                                     related_name='zone_records', verbose_name="保护区机场")
+    zone_level = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="保护区等级")
+    # 重复检测指纹 (见 monitor/dedup.py)，保存时计算；duplicate_of 为标记的重复记录对应的原记录
+    dedup_fingerprint = models.CharField(max_length=255, null=True, blank=True, db_index=True, editable=False,
+                                         verbose_name="重复检测指纹")
+    duplicate_of = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, db_index=False,
+                                     related_name='duplicates', verbose_name="重复于")
 
-    def save(self, *args, **kwargs):
+    @staticmethod
+    def compute_risk_level(danger_level, quantity):
         # Simple risk calculation logic (Example)
         # Risk = Species Danger * Quantity
-        score = self.species.danger_level * self.quantity
+        score = danger_level * quantity
         if score > 50:
-            self.risk_level = 'high'
+            return 'high'
         elif score > 20:
-            self.risk_level = 'medium'
-        else:
-            self.risk_level = 'low'
+            return 'medium'
+        return 'low'
+
+    def save(self, *args, **kwargs):
+        # 只传了 species_id 时从查询缓存取危险等级，避免再查一次鸟种
+        danger_level = None
+        if not BirdRecord.species.is_cached(self):
+            from .lookups import species_danger_level
+            danger_level = species_danger_level(self.species_id)
+        if danger_level is None:
+            danger_level = self.species.danger_level
+        self.risk_level = self.compute_risk_level(danger_level, self.quantity)
+        from .zones import classify_point
+        self.zone_airport_id, self.zone_level = classify_point(self.latitude, self.longitude)
+        from .dedup import fingerprint
+        self.dedup_fingerprint = fingerprint(self.species_id, self.record_time, self.latitude, self.longitude,
+                                             self.location)
         super().save(*args, **kwargs)
 
     class Meta:
         verbose_name = "鸟情记录"
         verbose_name_plural = "鸟情记录"
+        indexes = [
+            # 只索引保护区内的记录，按机场/等级/时间统计时不扫描全表
+            models.Index(fields=['zone_airport', 'zone_level', 'record_time'], name='birdrecord_zone_idx',
+                         condition=models.Q(zone_airport__isnull=False)),
+            # 按坐标范围查询 (机场保护区变化后重新标记、热点和预警窗口的范围查询)
+            models.Index(fields=['latitude', 'longitude'], name='birdrecord_position_idx'),
+            # 只索引标记为重复的记录，删除原记录时按该索引清空引用
+            models.Index(fields=['duplicate_of'], name='birdrecord_duplicate_idx',
+                         condition=models.Q(duplicate_of__isnull=False)),
+        ]
 
 class Airport(models.Model):
     """机场信息模型"""
@@ -59,7 +93,7 @@ class Airport(models.Model):
     ]
 
     ident = models.CharField(max_length=10, unique=True, verbose_name="机场标识符")
-    name = models.CharField(max_length=200, verbose_name="机场名称")
+    name = models.CharField(max_length=200, db_index=True, verbose_name="机场名称")
     airport_type = models.CharField(max_length=20, choices=AIRPORT_TYPES, default='small_airport', verbose_name="机场类型")
 
     latitude = models.FloatField(verbose_name="纬度")
@@ -67,13 +101,13 @@ class Airport(models.Model):
     elevation_ft = models.IntegerField(null=True, blank=True, verbose_name="海拔高度(英尺)")
 
     continent = models.CharField(max_length=2, blank=True, verbose_name="大洲")
-    iso_country = models.CharField(max_length=2, verbose_name="国家代码")
+    iso_country = models.CharField(max_length=2, db_index=True, verbose_name="国家代码")
     iso_region = models.CharField(max_length=7, verbose_name="地区代码")
-    municipality = models.CharField(max_length=100, blank=True, verbose_name="城市")
+    municipality = models.CharField(max_length=100, blank=True, db_index=True, verbose_name="城市")
 
     scheduled_service = models.CharField(max_length=3, default='no', verbose_name="定期航班")
-    icao_code = models.CharField(max_length=4, blank=True, verbose_name="ICAO代码")
-    iata_code = models.CharField(max_length=3, blank=True, verbose_name="IATA代码")
+    icao_code = models.CharField(max_length=4, blank=True, db_index=True, verbose_name="ICAO代码")
+    iata_code = models.CharField(max_length=3, blank=True, db_index=True, verbose_name="IATA代码")
     gps_code = models.CharField(max_length=10, blank=True, verbose_name="GPS代码")
     local_code = models.CharField(max_length=10, blank=True, verbose_name="本地代码")
 
@@ -88,6 +122,27 @@ class Airport(models.Model):
         verbose_name = "机场信息"
         verbose_name_plural = "机场信息"
 
+class AirportZone(models.Model):
+    """机场鸟击防范保护区：以机场为中心的同心圆，半径按机场类型由 BIRD_AIRPORT_ZONES_KM 设置
+
+    由 monitor/zones.py 根据机场坐标预先计算 (外接矩形用于网格索引)，机场变化时重新生成。
+    """
+    airport = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name='zones', verbose_name="机场")
+    level = models.PositiveSmallIntegerField(verbose_name="等级")  # 1 为最内圈
+    radius_km = models.FloatField(verbose_name="半径(公里)")
+    min_latitude = models.FloatField(verbose_name="最小纬度")
+    max_latitude = models.FloatField(verbose_name="最大纬度")
+    min_longitude = models.FloatField(verbose_name="最小经度")
+    max_longitude = models.FloatField(verbose_name="最大经度")
+
+    def __str__(self):
+        return f"{self.airport_id} {self.level}级保护区 ({self.radius_km}km)"
+
+    class Meta:
+        verbose_name = "机场保护区"
+        verbose_name_plural = "机场保护区"
+        unique_together = ('airport', 'level')
+
 class ImportLog(models.Model):
     """导入日志模型"""
     LOG_TYPES = [
@@ -106,11 +161,178 @@ class ImportLog(models.Model):
     error_messages = models.TextField(blank=True, verbose_name="错误信息")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
     completed_at = models.DateTimeField(null=True, blank=True, verbose_name="完成时间")
+    # 批量导入 (多个文件或 ZIP) 时每个文件一条子日志，汇总在父日志中
+    parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE,
+                               related_name='children', verbose_name="批量导入")
+
+    # 重复鸟情 (见 monitor/dedup.py)：按 BIRD_DEDUP_POLICY 标记、合并或跳过的行数
+    duplicates_flagged = models.IntegerField(default=0, verbose_name="标记重复数")
+    duplicates_merged = models.IntegerField(default=0, verbose_name="合并重复数")
+    duplicates_skipped = models.IntegerField(default=0, verbose_name="跳过重复数")
+
+    # 性能统计 (见 monitor/profiling.py)，导入过程中随每批写入更新
+    stage_timings = models.JSONField(default=dict, blank=True, verbose_name="各阶段耗时(秒)")
+    write_batch_stats = models.JSONField(default=dict, blank=True, verbose_name="写入批次统计")
+    duration_seconds = models.FloatField(null=True, blank=True, verbose_name="总耗时(秒)")
+    rows_per_second = models.FloatField(null=True, blank=True, verbose_name="处理速度(行/秒)")
+    peak_memory_mb = models.FloatField(null=True, blank=True, verbose_name="峰值内存(MB)")
+
+    # 数据保留 (见 monitor/retention.py)：过期日志的处理详情只保留摘要，完整内容可以压缩保存在这里
+    details_archive = models.BinaryField(null=True, blank=True, editable=False, verbose_name="压缩的详细信息")
+    compacted_at = models.DateTimeField(null=True, blank=True, verbose_name="详情压缩时间")
 
     def __str__(self):
         return f"{self.get_log_type_display()} - {self.file_name} ({self.created_at.strftime('%H:%M:%S')})"
 
+    def full_details(self):
+        """完整的处理详情 (已压缩的日志从 details_archive 解压)"""
+        if self.details_archive:
+            import zlib
+            return zlib.decompress(bytes(self.details_archive)).decode('utf-8')
+        return self.details
+
+    def stage_breakdown(self):
+        """[(阶段名称, 耗时秒, 占比%)]，按导入流程顺序"""
+        from .profiling import STAGE_LABELS
+
+        total = sum(self.stage_timings.values()) or 1
+        return [
+            (STAGE_LABELS.get(name, name), seconds, round(seconds / total * 100, 1))
+            for name, seconds in self.stage_timings.items()
+        ]
+
     class Meta:
         verbose_name = "导入日志"
         verbose_name_plural = "导入日志"
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+
+class Hotspot(models.Model):
+    """鸟群聚集热点 - 时间窗口内近期记录的空间聚类结果"""
+    centroid_latitude = models.FloatField(verbose_name="中心纬度")
+    centroid_longitude = models.FloatField(verbose_name="中心经度")
+    member_count = models.IntegerField(default=0, verbose_name="记录数")
+    total_quantity = models.IntegerField(default=0, verbose_name="鸟类总数")
+    dominant_species = models.ForeignKey(BirdSpecies, null=True, blank=True, on_delete=models.SET_NULL, verbose_name="优势鸟种")
+    nearest_airport = models.ForeignKey(Airport, null=True, blank=True, on_delete=models.SET_NULL, verbose_name="最近机场")
+    airport_distance_km = models.FloatField(null=True, blank=True, verbose_name="距机场距离(公里)")
+    member_ids = models.JSONField(default=list, verbose_name="成员记录ID")
+    first_seen = models.DateTimeField(verbose_name="最早记录时间")
+    last_seen = models.DateTimeField(verbose_name="最近记录时间")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    def __str__(self):
+        return f"热点 ({self.centroid_latitude:.4f}, {self.centroid_longitude:.4f}) - {self.member_count}条记录"
+
+    class Meta:
+        verbose_name = "鸟情热点"
+        verbose_name_plural = "鸟情热点"
+        ordering = ['-total_quantity']
+        indexes = [
+            # 新记录到达时按中心点范围查找相邻热点
+            models.Index(fields=['centroid_latitude', 'centroid_longitude'], name='hotspot_centroid_idx'),
+        ]
+
+
+class FlockTrack(models.Model):
+    """鸟群轨迹 - 同一鸟种按时空邻近连接起来的连续目击 (见 monitor/tracks.py)"""
+    species = models.ForeignKey(BirdSpecies, on_delete=models.CASCADE, verbose_name="鸟种")
+    record_ids = models.JSONField(default=list, verbose_name="记录ID")  # 按记录时间排列
+    path = models.JSONField(default=list, verbose_name="轨迹点")  # [[纬度, 经度, 时间戳(秒)]]，与 record_ids 对应
+    point_count = models.IntegerField(default=0, verbose_name="目击次数")
+    max_quantity = models.IntegerField(default=0, verbose_name="最大数量")
+    first_seen = models.DateTimeField(verbose_name="首次目击时间")
+    last_seen = models.DateTimeField(verbose_name="最近目击时间")
+    last_latitude = models.FloatField(verbose_name="最近纬度")
+    last_longitude = models.FloatField(verbose_name="最近经度")
+    heading_deg = models.FloatField(null=True, blank=True, verbose_name="航向(度)")
+    speed_kmh = models.FloatField(null=True, blank=True, verbose_name="速度(公里/小时)")
+    # 按当前航向和速度外推后与机场的最近接近，附近没有设保护区的机场时为空
+    approach_airport = models.ForeignKey(Airport, null=True, blank=True, on_delete=models.SET_NULL,
+                                         related_name='approaching_tracks', verbose_name="最近接近机场")
+    approach_distance_km = models.FloatField(null=True, blank=True, verbose_name="最近接近距离(公里)")
+    approach_minutes = models.FloatField(null=True, blank=True, verbose_name="到达最近接近点(分钟)")
+    approach_level = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="将进入的保护区等级")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    def __str__(self):
+        return f"轨迹 #{self.id} - {self.point_count}次目击"
+
+    class Meta:
+        verbose_name = "鸟群轨迹"
+        verbose_name_plural = "鸟群轨迹"
+        ordering = ['-last_seen']
+        indexes = [
+            # 按最近目击时间取开放轨迹和地图显示的近期轨迹
+            models.Index(fields=['last_seen'], name='flocktrack_last_seen_idx'),
+        ]
+
+
+class AlertRule(models.Model):
+    """预警规则 - 在记录写入和导入时实时评估"""
+    RULE_TYPES = [
+        ('quantity', '数量阈值'),
+        ('danger', '鸟种危险等级'),
+        ('density', '机场周边密集出现'),
+    ]
+    ALERT_LEVELS = [
+        ('info', '提示'),
+        ('warning', '警告'),
+        ('critical', '严重'),
+    ]
+
+    name = models.CharField(max_length=100, verbose_name="规则名称")
+    rule_type = models.CharField(max_length=10, choices=RULE_TYPES, verbose_name="规则类型")
+    level = models.CharField(max_length=10, choices=ALERT_LEVELS, default='warning', verbose_name="预警级别")
+    threshold = models.IntegerField(verbose_name="阈值", help_text="数量阈值 / 最低危险等级 / 时间窗口内的记录条数")
+    species = models.ForeignKey(BirdSpecies, null=True, blank=True, on_delete=models.CASCADE, verbose_name="限定鸟种")
+    airport = models.ForeignKey(Airport, null=True, blank=True, on_delete=models.CASCADE, verbose_name="限定机场")
+    radius_km = models.FloatField(default=5.0, verbose_name="机场半径(公里)")
+    window_minutes = models.IntegerField(default=30, verbose_name="时间窗口(分钟)")
+    cooldown_minutes = models.IntegerField(default=10, verbose_name="冷却时间(分钟)")
+    enabled = models.BooleanField(default=True, verbose_name="启用")
+
+    def __str__(self):
+        return f"{self.name} ({self.get_rule_type_display()})"
+
+    class Meta:
+        verbose_name = "预警规则"
+        verbose_name_plural = "预警规则"
+
+
+class Alert(models.Model):
+    """触发的预警"""
+    rule = models.ForeignKey(AlertRule, on_delete=models.CASCADE, verbose_name="规则")
+    level = models.CharField(max_length=10, choices=AlertRule.ALERT_LEVELS, verbose_name="预警级别")
+    message = models.CharField(max_length=500, verbose_name="预警内容")
+    record = models.ForeignKey(BirdRecord, null=True, blank=True, on_delete=models.SET_NULL, verbose_name="触发记录")
+    airport = models.ForeignKey(Airport, null=True, blank=True, on_delete=models.SET_NULL, verbose_name="相关机场")
+    acknowledged = models.BooleanField(default=False, verbose_name="已确认")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="触发时间")
+
+    def __str__(self):
+        return f"[{self.get_level_display()}] {self.message}"
+
+    class Meta:
+        verbose_name = "预警信息"
+        verbose_name_plural = "预警信息"
+        ordering = ['-created_at']
+
+
+class RecordChange(models.Model):
+    """鸟情记录变更日志，主键即同步序号 (见 monitor/changes.py)"""
+    OPS = [
+        ('insert', '新增'),
+        ('update', '修改'),
+        ('delete', '删除'),
+    ]
+
+    op = models.CharField(max_length=6, choices=OPS, verbose_name="操作")
+    record_id = models.IntegerField(verbose_name="记录ID")  # 不使用外键，记录删除后仍保留
+    created_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name="变更时间")
+
+    def __str__(self):
+        return f"#{self.id} {self.get_op_display()} {self.record_id}"
+
+    class Meta:
+        verbose_name = "记录变更"
+        verbose_name_plural = "记录变更"
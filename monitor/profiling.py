@@ -0,0 +1,121 @@
+"""导入过程分阶段计时
+
+记录文件读取、逐行校验、鸟种解析/查重、数据库写入、等待写线程、预警评估、
+热点更新、轨迹连接和日志保存各阶段的累计耗时，以及写入批次统计和按批次采样的进程内存峰值。
+结果写入 ImportLog 的结构化字段，实时日志页面和日志中心的吞吐趋势直接读取。
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# 阶段 -> 显示名称 (按导入流程顺序)
+STAGE_LABELS = {
+    'parse': '等待并行解析',
+    'read': '读取文件',
+    'validate': '逐行校验',
+    'species': '鸟种解析',
+    'dedup': '重复检测',
+    'lookup': '机场查重',
+    'write': '数据库写入',
+    'writer_wait': '等待写线程/提交',
+    'alerts': '预警评估',
+    'hotspots': '热点更新',
+    'tracks': '轨迹连接',
+    'zones': '保护区标记',
+    'search': '全文索引',
+    'log': '保存日志',
+}
+
+
+def current_rss_mb():
+    """当前进程常驻内存(MB)，无法获取时返回 None"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024, 1)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return round(psutil.Process().memory_info().rss / 1024 / 1024, 1)
+
+
+class ImportProfiler:
+    """单次导入的计时器；写线程中的阶段也记录到这里 (调用方此时在等待结果)"""
+
+    def __init__(self, chunk_size=None):
+        self.started = time.perf_counter()
+        self.chunk_size = chunk_size
+        self.stages = {}
+        self.batches = []  # (行数, 写入耗时)
+        self.peak_memory_mb = None
+        self._lock = threading.Lock()
+        self.sample_memory()
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def record_offloaded(self, stages, peak_memory_mb=None):
+        """计入在其他进程中完成的阶段 (批量导入的并行解析)，总耗时从这些阶段开始算起"""
+        for name, seconds in stages.items():
+            self.add(name, seconds)
+        self.started -= sum(stages.values())
+        if peak_memory_mb is not None and (self.peak_memory_mb is None or peak_memory_mb > self.peak_memory_mb):
+            self.peak_memory_mb = peak_memory_mb
+
+    def total(self):
+        with self._lock:
+            return sum(self.stages.values())
+
+    def record_batch(self, rows, seconds):
+        self.batches.append((rows, seconds))
+        self.sample_memory()
+
+    def sample_memory(self):
+        rss = current_rss_mb()
+        if rss is not None and (self.peak_memory_mb is None or rss > self.peak_memory_mb):
+            self.peak_memory_mb = rss
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def batch_stats(self):
+        if not self.batches:
+            return {}
+        rows = [count for count, _ in self.batches]
+        seconds = [elapsed for _, elapsed in self.batches]
+        total_seconds = sum(seconds)
+        return {
+            'batches': len(self.batches),
+            'chunk_size': self.chunk_size,
+            'rows': sum(rows),
+            'avg_rows': round(sum(rows) / len(rows), 1),
+            'avg_seconds': round(total_seconds / len(seconds), 4),
+            'max_seconds': round(max(seconds), 4),
+            'rows_per_second': round(sum(rows) / total_seconds, 1) if total_seconds else None,
+        }
+
+    def apply(self, log_entry, processed_rows):
+        """把当前统计写入日志对象的结构化字段 (由调用方保存)"""
+        self.sample_memory()
+        elapsed = self.elapsed()
+        with self._lock:
+            log_entry.stage_timings = {
+                name: round(self.stages[name], 4) for name in STAGE_LABELS if name in self.stages
+            }
+        log_entry.write_batch_stats = self.batch_stats()
+        log_entry.duration_seconds = round(elapsed, 3)
+        log_entry.rows_per_second = round(processed_rows / elapsed, 1) if elapsed > 0 else None
+        log_entry.peak_memory_mb = self.peak_memory_mb
@@ -0,0 +1,303 @@
+"""数据保留与数据库维护
+
+按 settings 中的策略执行，每次运行返回各步骤的耗时和数据库文件释放的空间：
+- logs: 超过 BIRD_RETENTION_LOG_DAYS 天的导入日志，处理详情只保留开头和结尾的摘要，
+  compress 模式下完整内容用 zlib 压缩保存在 details_archive (实时日志页面仍显示完整内容)；
+- records: BIRD_RETENTION_ARCHIVE_RECORDS 开启时，把热数据窗口以外的已结束月份归档到
+  Parquet (monitor/archive.py) 并从实时库删除；
+- changes: 删除超过 BIRD_CHANGE_LOG_DAYS 天的记录变更日志 (monitor/changes.py)，删除前先同步到全文索引和历史归档；
+- vacuum: 增量 VACUUM，把删除产生的空闲页还给文件系统，每次最多释放 BIRD_MAINTENANCE_VACUUM_PAGES 页，
+  每次是一个独立的短写事务，与单写线程的写入交替进行，不会长时间阻塞导入；最后截断 WAL 文件；
+- analyze: 更新查询优化器的统计信息。
+
+增量 VACUUM 需要数据库处于 auto_vacuum=INCREMENTAL 模式。新建的数据库由 SQLITE_INIT_PRAGMAS
+设置；已有的数据库需要执行一次 `manage.py maintain_db --full-vacuum` 转换 (完整重写数据库文件)。
+
+设置 BIRD_MAINTENANCE_WINDOW 后，Web 进程内的维护线程每天在该时间窗口内运行一次。
+多进程部署时通过共享缓存加锁，保证同一天只有一个进程运行 (需要配置共享的 CACHES 后端)。
+"""
+import logging
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from . import changes, search
+from .models import ImportLog
+from .writer import writer as db_writer
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_STEPS = ('logs', 'records', 'changes', 'vacuum', 'analyze')
+LOG_MODES = ('compress', 'trim')
+COMPACT_BATCH_SIZE = 200
+SUMMARY_HEAD_LINES = 20  # 摘要保留的开头行数
+SUMMARY_TAIL_LINES = 20  # 摘要保留的结尾行数
+
+# 最近一次维护的结果，/metrics 读取
+last_report = {}
+
+
+def summarize_details(details):
+    """处理详情的摘要：开头和结尾若干行，中间省略"""
+    lines = details.splitlines()
+    if len(lines) <= SUMMARY_HEAD_LINES + SUMMARY_TAIL_LINES:
+        return details
+    omitted = len(lines) - SUMMARY_HEAD_LINES - SUMMARY_TAIL_LINES
+    return '\n'.join(
+        lines[:SUMMARY_HEAD_LINES] + [f'... 省略 {omitted} 行 ...'] + lines[-SUMMARY_TAIL_LINES:]
+    )
+
+
+def compact_import_logs(days=None, mode=None, now=None):
+    """压缩或截断过期导入日志的处理详情，返回 {'logs': 条数, 'bytes_before': ..., 'bytes_after': ...}"""
+    days = settings.BIRD_RETENTION_LOG_DAYS if days is None else days
+    mode = mode or settings.BIRD_RETENTION_LOG_MODE
+    if mode not in LOG_MODES:
+        raise ValueError(f'不支持的日志保留方式: {mode}，可选: {", ".join(LOG_MODES)}')
+    stats = {'logs': 0, 'bytes_before': 0, 'bytes_after': 0}
+    if days is None:
+        return stats
+
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    ids = list(ImportLog.objects.filter(created_at__lt=cutoff, compacted_at__isnull=True)
+               .exclude(status='processing').order_by('id').values_list('id', flat=True))
+    for start in range(0, len(ids), COMPACT_BATCH_SIZE):
+        before, after = db_writer.run(_compact_logs, ids[start:start + COMPACT_BATCH_SIZE], mode)
+        stats['logs'] += len(ids[start:start + COMPACT_BATCH_SIZE])
+        stats['bytes_before'] += before
+        stats['bytes_after'] += after
+    return stats
+
+
+def _compact_logs(ids, mode):
+    logs = list(ImportLog.objects.filter(id__in=ids).only('id', 'details', 'details_archive'))
+    compacted_at = timezone.now()
+    before = after = 0
+    for log in logs:
+        full = log.details.encode('utf-8')
+        summary = summarize_details(log.details)
+        if mode == 'compress' and summary != log.details:
+            log.details_archive = zlib.compress(full, 6)
+        log.details = summary
+        log.compacted_at = compacted_at
+        before += len(full)
+        after += len(log.details.encode('utf-8')) + len(log.details_archive or b'')
+    ImportLog.objects.bulk_update(logs, ['details', 'details_archive', 'compacted_at'])
+    return before, after
+
+
+def archive_old_records(stdout=None):
+    """把热数据窗口以外的已结束月份归档并从实时库删除"""
+    from . import archive
+
+    return archive.archive_records(cutoff=archive.default_cutoff(), prune=True, stdout=stdout)
+
+
+def sync_archive_changes():
+    """把已归档记录的修改和删除写入归档 (清理变更日志之前)，没有归档或未安装 pyarrow 时返回 None"""
+    from . import archive
+
+    try:
+        return archive.apply_changes()
+    except ValueError:
+        return None
+
+
+def _pragma(name):
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA {name}')
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def database_stats():
+    """数据库文件大小、WAL 大小、页大小、总页数、空闲页数和 auto_vacuum 模式"""
+    path = str(connection.settings_dict['NAME'])
+    sizes = {}
+    for key, file_path in (('file_bytes', path), ('wal_bytes', f'{path}-wal')):
+        sizes[key] = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+    return {
+        **sizes,
+        'page_size': _pragma('page_size'),
+        'page_count': _pragma('page_count'),
+        'freelist_count': _pragma('freelist_count'),
+        'auto_vacuum': {0: 'none', 1: 'full', 2: 'incremental'}.get(_pragma('auto_vacuum'), 'unknown'),
+    }
+
+
+def incremental_vacuum(max_pages=None, deadline=None):
+    """分批释放空闲页，返回释放的页数；deadline (time.monotonic) 到达后停止"""
+    max_pages = max_pages or settings.BIRD_MAINTENANCE_VACUUM_PAGES
+    released = 0
+    connection.ensure_connection()
+    while deadline is None or time.monotonic() < deadline:
+        before = _pragma('freelist_count')
+        # sqlite3 的 execute 只执行一步 (释放一页)，executescript 会执行到底；
+        # 在自动提交模式下调用，每次是一个独立的写事务
+        connection.connection.executescript(f'PRAGMA incremental_vacuum({int(max_pages)})')
+        freed = before - _pragma('freelist_count')
+        released += freed
+        if freed < max_pages:
+            break
+    return released
+
+
+def vacuum_database(full=False, deadline=None):
+    """在自动提交模式下执行 (不能在事务或单写线程中调用)"""
+    if full:
+        full_vacuum()
+        return {'mode': 'full'}
+    if _pragma('auto_vacuum') != 2:
+        return {'skipped': '数据库未启用增量 VACUUM，请执行一次 maintain_db --full-vacuum'}
+    return {'mode': 'incremental', 'pages': incremental_vacuum(deadline=deadline)}
+
+
+def full_vacuum():
+    """转换为增量 VACUUM 模式并完整重写数据库文件 (期间其他写入会等待)"""
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        cursor.execute('VACUUM')
+
+
+def checkpoint_wal():
+    """把 WAL 中的内容写回数据库文件并截断 WAL，返回 (是否被占用, WAL 页数, 已写回页数)"""
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return cursor.fetchone()
+
+
+def _analyze():
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def run_maintenance(steps=None, log_days=None, log_mode=None, archive_records=None, full=False,
+                    max_seconds=None, stdout=None):
+    """按顺序执行维护步骤，返回报告 (各步骤耗时、结果和释放的空间)
+
+    max_seconds 限制增量 VACUUM 的运行时间 (维护窗口结束前停止)，stdout 用于输出归档进度。
+    """
+    steps = steps or MAINTENANCE_STEPS
+    if archive_records is None:
+        archive_records = settings.BIRD_RETENTION_ARCHIVE_RECORDS
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+    started = time.perf_counter()
+    before = database_stats()
+    report = {'started_at': timezone.now().isoformat(), 'before': before, 'steps': {}}
+
+    def step(name, func):
+        step_started = time.perf_counter()
+        result = func()
+        report['steps'][name] = {'seconds': round(time.perf_counter() - step_started, 3), 'result': result}
+
+    if 'logs' in steps:
+        step('logs', lambda: compact_import_logs(log_days, log_mode))
+    if 'records' in steps and archive_records:
+        step('records', lambda: archive_old_records(stdout))
+    if 'changes' in steps:
+        # 在归档之后执行，归档删除记录产生的变更保留到下一次维护；
+        # 清理前先把变更同步到全文索引，避免索引因同步点之前的变更被删除而整表重建；
+        # 已归档记录的修改同理先写入归档
+        step('changes', lambda: {'search': db_writer.run(search.sync_index),
+                                 'archive': sync_archive_changes(),
+                                 'removed': db_writer.run(changes.compact_changes)})
+    if 'vacuum' in steps:
+        step('vacuum', lambda: vacuum_database(full, deadline))
+    if 'analyze' in steps:
+        step('analyze', lambda: db_writer.run(_analyze))
+    if 'vacuum' in steps:
+        # 最后截断 WAL，前面各步骤的写入都已写回数据库文件
+        step('checkpoint', lambda: dict(zip(('busy', 'wal_pages', 'checkpointed'), checkpoint_wal())))
+
+    after = database_stats()
+    report['after'] = after
+    report['reclaimed_bytes'] = (before['file_bytes'] + before['wal_bytes']) - (after['file_bytes'] + after['wal_bytes'])
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    last_report.clear()
+    last_report.update(report)
+    logger.info('数据库维护完成: 用时 %.2fs, 释放 %.1fMB, 空闲页 %s -> %s', report['seconds'],
+                report['reclaimed_bytes'] / 1024 / 1024, before['freelist_count'], after['freelist_count'])
+    return report
+
+
+def _parse_window(window):
+    start, end = (datetime.strptime(value, '%H:%M').time() for value in window)
+    return start, end
+
+
+def in_window(now, window):
+    start, end = _parse_window(window)
+    current = now.time()
+    if start <= end:
+        return start <= current < end
+    # 跨午夜的时间窗口，如 ('23:00', '02:00')
+    return current >= start or current < end
+
+
+def _window_seconds_left(now, window):
+    _, end = _parse_window(window)
+    end_at = now.replace(hour=end.hour, minute=end.minute, second=0, microsecond=0)
+    if end_at <= now:
+        end_at += timedelta(days=1)
+    return (end_at - now).total_seconds()
+
+
+class MaintenanceScheduler:
+    """每天在维护时间窗口内运行一次 run_maintenance 的后台线程"""
+
+    check_interval = 60
+
+    def __init__(self, window):
+        _parse_window(window)
+        self.window = window
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='bird-maintenance', daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            try:
+                self.tick()
+            except Exception:
+                logger.exception('定时数据库维护失败')
+            finally:
+                close_old_connections()
+            time.sleep(self.check_interval)
+
+    def tick(self, now=None):
+        """在时间窗口内且当天尚未运行时执行维护，返回报告 (未运行时返回 None)"""
+        now = timezone.localtime(now or timezone.now())
+        if not in_window(now, self.window):
+            return None
+        # 跨午夜的窗口在午夜之后仍属于前一天的维护
+        day = now.date() if now.time() >= _parse_window(self.window)[0] else now.date() - timedelta(days=1)
+        if not cache.add(f'bird-maintenance:{day.isoformat()}', True, 2 * 24 * 3600):
+            return None
+        return run_maintenance(max_seconds=_window_seconds_left(now, self.window))
+
+
+_scheduler = None
+
+
+def start_scheduler():
+    """设置了 BIRD_MAINTENANCE_WINDOW 时启动维护线程 (由 WSGI/ASGI 入口调用，重复调用无影响)"""
+    global _scheduler
+    window = getattr(settings, 'BIRD_MAINTENANCE_WINDOW', None)
+    if not window:
+        return None
+    if _scheduler is None:
+        _scheduler = MaintenanceScheduler(window)
+    _scheduler.start()
+    return _scheduler
@@ -0,0 +1,194 @@
+"""鸟情记录全文检索 (SQLite FTS5)
+
+索引发现位置、入侵原因、备注和鸟种名称。FTS5 自带的分词器不能切分中文，写入和查询前先在 Python 中
+把连续的中日韩文字切成相互重叠的二字词 (如 "垃圾场" -> "垃圾 圾场")，其他文字原样保留，
+再由 unicode61 分词器按空格和标点切分。查询词按同样方式切分后作为短语匹配，
+效果等同于子串匹配 (中文关键字至少两个字，单字只能匹配单独出现的字)。
+
+索引跟随记录变更日志 (monitor/changes.py) 增量更新：sync_index() 把上次同步以后的变更写入索引，
+同步到的序号保存在 monitor_search_state 表中。导入完成、数据库维护、新增记录和后台保存后在单写线程中调用，
+搜索只读取索引的当前内容；
+变更日志在同步点之后已被清理时整表重建 (也可以手动执行 `manage.py rebuild_search_index`)。
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models import BooleanField, Max, Min
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'monitor_birdrecord_fts'
+STATE_TABLE = 'monitor_search_state'
+INDEX_COLUMNS = ('location', 'intrusion_reason', 'notes', 'species')
+REBUILD_BATCH_SIZE = 20000
+SYNC_BATCH_SIZE = 5000
+REBUILD_THRESHOLD = 100000  # 待同步的变更超过该数量时直接整表重建
+BROAD_MATCH_ROWS = 20000  # 匹配的记录超过该数量时按记录顺序逐条检查，而不是先取出全部匹配的 ID
+
+# 中日韩统一表意文字 (含扩展 A)、假名和韩文音节
+_CJK_RUN = re.compile(r'[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]+')
+_OR_SEPARATOR = re.compile(r'\s+OR\s+|\|', re.IGNORECASE)
+
+
+def tokenize(text):
+    """把文本转换为按空格分隔的索引词：中文切成二字词，其他文字原样保留"""
+    if not text:
+        return ''
+    parts = []
+    position = 0
+    for match in _CJK_RUN.finditer(text):
+        parts.append(text[position:match.start()])
+        run = match.group()
+        if len(run) == 1:
+            parts.append(run)
+        else:
+            parts.append(' '.join(run[i:i + 2] for i in range(len(run) - 1)))
+        position = match.end()
+    parts.append(text[position:])
+    return ' '.join(part for part in parts if part.strip())
+
+
+def _phrase(term):
+    # 只保留词字符 (unicode61 也把标点当作分隔符)，引号等不会进入 FTS5 表达式
+    tokens = ' '.join(re.findall(r'\w+', tokenize(term)))
+    return f'"{tokens}"' if tokens else None
+
+
+def build_match(query):
+    """把搜索词转换为 FTS5 查询表达式，没有有效关键字时返回 None
+
+    空格分隔的关键字需要同时出现，OR (或 |) 分隔的几组满足任意一组即可，
+    如 "垃圾场 OR 鱼塘 跑道" 匹配包含 "垃圾场"，或同时包含 "鱼塘" 和 "跑道" 的记录。
+    """
+    groups = []
+    for alternative in _OR_SEPARATOR.split(query or ''):
+        phrases = [phrase for phrase in map(_phrase, alternative.split()) if phrase]
+        if phrases:
+            groups.append('(' + ' AND '.join(phrases) + ')')
+    return ' OR '.join(groups) or None
+
+
+def matching_ids(query):
+    """匹配记录 ID 的子查询 (用于 id__in)，没有有效关键字时返回 None"""
+    match = build_match(query)
+    if match is None:
+        return None
+    return RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,))
+
+
+def _is_broad(match):
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT count(*) FROM (SELECT 1 FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT %s)',
+                       (match, BROAD_MATCH_ROWS))
+        return cursor.fetchone()[0] >= BROAD_MATCH_ROWS
+
+
+def filter_matching(queryset, query):
+    """按全文检索筛选鸟情记录 (可以与其他筛选条件组合)
+
+    关键字较少见时先从索引取出匹配的 ID；匹配大量记录 (如 "筑巢") 时取出全部 ID 再排序要读取几十万行，
+    改为沿排序使用的索引逐条按 rowid 检查是否匹配，取够分页条数即停止。
+    """
+    match = build_match(query)
+    if match is None:
+        return queryset.none()
+    if _is_broad(match):
+        table = connection.ops.quote_name(queryset.model._meta.db_table)
+        return queryset.filter(RawSQL(
+            f'EXISTS (SELECT 1 FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = {table}.id)',
+            (match,), output_field=BooleanField(),
+        ))
+    return queryset.filter(id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,)))
+
+
+def _index_rows(cursor, rows):
+    cursor.executemany(
+        f'INSERT INTO {FTS_TABLE} (rowid, {", ".join(INDEX_COLUMNS)}) VALUES (%s, %s, %s, %s, %s)',
+        [(pk, *(tokenize(value) for value in values)) for pk, *values in rows],
+    )
+
+
+def _record_rows(record_model, queryset=None):
+    queryset = record_model.objects.all() if queryset is None else queryset
+    return queryset.values_list('id', 'location', 'intrusion_reason', 'notes', 'species__name')
+
+
+def _synced_seq(cursor):
+    cursor.execute(f"SELECT value FROM {STATE_TABLE} WHERE name = 'record_changes'")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def _set_synced_seq(cursor, seq):
+    cursor.execute(f"INSERT OR REPLACE INTO {STATE_TABLE} (name, value) VALUES ('record_changes', %s)", (seq,))
+
+
+def rebuild_index(record_model=None, change_model=None, stdout=None):
+    """清空并重建整个索引，返回索引的记录数 (迁移中调用时传入历史模型)"""
+    from .models import BirdRecord, RecordChange
+
+    record_model = record_model or BirdRecord
+    change_model = change_model or RecordChange
+    indexed = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        # 先取序号再读取记录，读取期间的变更在下次同步时再应用一次
+        seq = change_model.objects.aggregate(seq=Max('id'))['seq'] or 0
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        last_id = 0
+        while True:
+            rows = list(_record_rows(record_model).filter(id__gt=last_id).order_by('id')[:REBUILD_BATCH_SIZE])
+            if not rows:
+                break
+            _index_rows(cursor, rows)
+            last_id = rows[-1][0]
+            indexed += len(rows)
+            if stdout:
+                stdout.write(f'已索引 {indexed} 条记录')
+        # 合并索引段，减少查询时需要读取的 b-tree
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        _set_synced_seq(cursor, seq)
+    return indexed
+
+
+def needs_sync():
+    """是否有尚未写入索引的记录变更"""
+    from .changes import latest_seq
+
+    with connection.cursor() as cursor:
+        return latest_seq() > _synced_seq(cursor)
+
+
+def sync_after_commit():
+    """当前事务提交后把同步任务交给单写线程 (不等待同步完成)"""
+    from .writer import writer
+
+    transaction.on_commit(lambda: writer.submit(sync_index))
+
+
+def sync_index():
+    """把上次同步以后的记录变更写入索引，返回 {'changes': 处理的变更条数, 'rebuilt': 是否整表重建}"""
+    from .models import BirdRecord, RecordChange
+
+    bounds = RecordChange.objects.aggregate(oldest=Min('id'), latest=Max('id'))
+    latest = bounds['latest'] or 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        synced = _synced_seq(cursor)
+        if latest <= synced:
+            return {'changes': 0, 'rebuilt': False}
+        if latest - synced > REBUILD_THRESHOLD or (bounds['oldest'] is not None and synced < bounds['oldest'] - 1):
+            rebuild_index()
+            return {'changes': latest - synced, 'rebuilt': True}
+
+        processed = 0
+        while synced < latest:
+            entries = list(RecordChange.objects.filter(id__gt=synced).order_by('id')
+                           .values_list('id', 'record_id')[:SYNC_BATCH_SIZE])
+            if not entries:
+                break
+            # 同一批中的记录先删除旧索引，再按当前内容写入仍然存在的记录
+            record_ids = sorted({record_id for _, record_id in entries})
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in record_ids])
+            _index_rows(cursor, _record_rows(BirdRecord, BirdRecord.objects.filter(id__in=record_ids)))
+            synced = entries[-1][0]
+            processed += len(entries)
+        _set_synced_seq(cursor, synced)
+    return {'changes': processed, 'rebuilt': False}
@@ -0,0 +1,61 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import changes, lookups, zones
+from .middleware import install_query_router
+from .alerts import engine as alert_engine
+from .models import Airport, AlertRule, BirdRecord, BirdSpecies
+
+
+@receiver(connection_created)
+def route_connection_queries(sender, connection, **kwargs):
+    """每个新建的数据库连接 (包括异步视图工作线程中的) 都把查询计入当前请求的统计"""
+    install_query_router(connection)
+
+
+@receiver([post_save, post_delete], sender=AlertRule)
+def reload_alert_rules(sender, **kwargs):
+    """预警规则变化后让引擎重新加载规则和滑动窗口"""
+    alert_engine.invalidate()
+
+
+@receiver([post_save, post_delete], sender=BirdSpecies)
+def invalidate_species_lookups(sender, using, **kwargs):
+    """鸟种变化后在事务提交时让查询缓存失效 (提交前其他连接还看不到新数据)"""
+    transaction.on_commit(lookups.species.invalidate, using=using)
+
+
+@receiver(post_save, sender=BirdSpecies)
+def journal_species_records(sender, instance, created, raw, **kwargs):
+    """已有鸟种修改后 (如改名) 把它的记录记为修改，地图和全文索引随之更新"""
+    if not created and not raw:
+        changes.record('update', BirdRecord.objects.filter(species_id=instance.pk).values_list('id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Airport)
+def invalidate_airport_lookups(sender, using, **kwargs):
+    transaction.on_commit(lookups.airports.invalidate, using=using)
+
+
+@receiver(post_save, sender=Airport)
+def rebuild_airport_zones(sender, instance, raw, **kwargs):
+    """机场保存后重新生成它的保护区 (批量导入时每批一次；已有记录的标记需要执行 build_airport_zones --retag 更新)"""
+    if not raw:
+        zones.airports_changed([instance.pk])
+
+
+@receiver(post_delete, sender=Airport)
+def invalidate_zone_index(sender, using, **kwargs):
+    transaction.on_commit(zones.zone_index.invalidate, using=using)
+
+
+@receiver(post_save, sender=BirdRecord)
+def journal_record_save(sender, instance, created, **kwargs):
+    changes.record('insert' if created else 'update', [instance.pk])
+
+
+@receiver(post_delete, sender=BirdRecord)
+def journal_record_delete(sender, instance, **kwargs):
+    changes.record('delete', [instance.pk])
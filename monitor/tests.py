@@ -1,3 +1,1590 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import zipfile
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from . import archive, changes, exporters, lookups, metrics, retention, views, zones
+from .geo import haversine_km
+from .alerts import AlertBroadcaster, AlertEngine, engine as alert_engine
+from .hotspots import HotspotDetector
+from .management.commands import bench
+from .models import Airport, AlertRule, BirdRecord, BirdSpecies, FlockTrack, Hotspot, ImportLog, RecordChange
+from .profiling import ImportProfiler
+from .synthetic import SyntheticDataGenerator, seed_database
+
+
+@override_settings(BIRD_SINGLE_WRITER=False, BIRD_IMPORT_ASYNC=False)
+class MonitorTestCase(TestCase):
+    """测试基类: 写入不经过单写线程；每个测试前清空进程内缓存
+
+    TestCase 在事务中运行，提交时才执行的缓存失效 (transaction.on_commit) 不会触发，
+    回滚后自增 ID 还会被复用，所以每个测试都从空缓存开始。
+    """
+
+    def setUp(self):
+        cache.clear()
+        for table in (lookups.species, lookups.airports, zones.zone_index):
+            table.invalidate()
+        alert_engine.invalidate()
+
+    @staticmethod
+    def make_species(name='白鹭', danger_level=5):
+        species = BirdSpecies.objects.create(name=name, danger_level=danger_level)
+        lookups.species.invalidate()
+        return species
+
+    @staticmethod
+    def make_airport(ident='ZBAA', latitude=40.08, longitude=116.58, airport_type='large_airport', **fields):
+        fields.setdefault('name', f'{ident} 机场')
+        fields.setdefault('iso_country', 'CN')
+        fields.setdefault('iso_region', 'CN-11')
+        airport = Airport.objects.create(ident=ident, latitude=latitude, longitude=longitude,
+                                         airport_type=airport_type, **fields)
+        lookups.airports.invalidate()
+        zones.zone_index.invalidate()
+        return airport
+
+    @staticmethod
+    def make_record(species, latitude=None, longitude=None, quantity=1, minutes_ago=0, **fields):
+        fields.setdefault('location', '跑道东侧')
+        fields.setdefault('record_time', timezone.now() - timedelta(minutes=minutes_ago))
+        return BirdRecord.objects.create(species=species, quantity=quantity, latitude=latitude,
+                                         longitude=longitude, **fields)
+
+
+class HotspotDetectorTests(MonitorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.species = self.make_species()
+        self.detector = HotspotDetector(eps_km=1.0, min_samples=3, window_minutes=360, airport_radius_km=30)
+
+    def cluster(self, latitude, longitude, count=3):
+        return [
+            self.make_record(self.species, latitude + i * 0.001, longitude, quantity=5, minutes_ago=10).id
+            for i in range(count)
+        ]
+
+    def test_new_records_form_hotspot(self):
+        ids = self.cluster(40.0, 116.0)
+        result = self.detector.update(ids)
+        self.assertEqual(result, {'created': 1, 'removed': 0})
+        hotspot = Hotspot.objects.get()
+        self.assertEqual(sorted(hotspot.member_ids), sorted(ids))
+        self.assertEqual(hotspot.total_quantity, 15)
+
+    def test_nearby_hotspot_is_merged_and_distant_one_kept(self):
+        near = self.cluster(40.0, 116.0)
+        far = self.cluster(30.0, 110.0)
+        self.detector.update(near + far)
+        self.assertEqual(Hotspot.objects.count(), 2)
+
+        new = self.make_record(self.species, 40.003, 116.0, quantity=5, minutes_ago=5)
+        result = self.detector.update([new.id])
+        self.assertEqual(result, {'created': 1, 'removed': 1})
+        merged = Hotspot.objects.get(centroid_latitude__gt=35)
+        self.assertEqual(sorted(merged.member_ids), sorted(near + [new.id]))
+        self.assertEqual(sorted(Hotspot.objects.get(centroid_latitude__lt=35).member_ids), sorted(far))
+
+    def test_overlap_check_only_loads_hotspots_near_new_clusters(self):
+        ids = self.cluster(40.0, 116.0)
+        self.detector.update(ids)
+        current = Hotspot.objects.get()
+        now = timezone.now()
+
+        def hotspot(latitude, longitude, member_ids):
+            return Hotspot.objects.create(centroid_latitude=latitude, centroid_longitude=longitude,
+                                          member_ids=member_ids, first_seen=now, last_seen=now)
+
+        overlapping = hotspot(40.0005, 116.0, [ids[1]])
+        # 中心点远离新簇的热点不会被查询 (实际不会与新簇共享成员)
+        distant = hotspot(30.0, 110.0, [ids[0]])
+        result = self.detector._recluster(set(ids), [current], now - self.detector.window)
+        self.assertEqual(result, {'created': 1, 'removed': 2})
+        self.assertFalse(Hotspot.objects.filter(id__in=[current.id, overlapping.id]).exists())
+        self.assertTrue(Hotspot.objects.filter(id=distant.id).exists())
+
+    def test_neighbour_lookup_uses_centroid_index(self):
+        plan = self.detector._hotspots_in((39.9, 40.1, 115.9, 116.1)).explain()
+        self.assertIn('hotspot_centroid_idx', plan)
+
+    def test_records_outside_window_are_ignored(self):
+        ids = [self.make_record(self.species, 40.0 + i * 0.001, 116.0, minutes_ago=600).id for i in range(3)]
+        self.assertEqual(self.detector.update(ids), {'created': 0, 'removed': 0})
+
+
+class AlertEngineTests(MonitorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.species = self.make_species()
+        self.airport = self.make_airport()
+        self.engine = AlertEngine(AlertBroadcaster())
+        self.now = timezone.now()
+
+    def record_at(self, minutes_ago, quantity=1):
+        return self.make_record(self.species, 40.09, 116.59, quantity=quantity,
+                                record_time=self.now - timedelta(minutes=minutes_ago))
+
+    def density_rule(self, **fields):
+        for name, value in (('name', '周边密集'), ('threshold', 3), ('window_minutes', 30), ('cooldown_minutes', 0)):
+            fields.setdefault(name, value)
+        return AlertRule.objects.create(rule_type='density', airport=self.airport, radius_km=5, **fields)
+
+    def test_density_window_counts_only_records_inside_window(self):
+        self.density_rule()
+        self.assertEqual(self.engine.evaluate([self.record_at(40)], now=self.now), [])
+        self.assertEqual(self.engine.evaluate([self.record_at(20)], now=self.now), [])
+        self.assertEqual(self.engine.evaluate([self.record_at(10)], now=self.now), [])
+        alerts = self.engine.evaluate([self.record_at(5)], now=self.now)
+        self.assertEqual(len(alerts), 1)
+        self.assertIn('出现 3 次', alerts[0].message)
+
+    def test_alerts_are_published_after_commit(self):
+        self.density_rule(threshold=1)
+        with mock.patch.object(self.engine.broadcaster, 'publish') as publish:
+            with self.captureOnCommitCallbacks() as callbacks:
+                alerts = self.engine.evaluate([self.record_at(5)], now=self.now)
+            self.assertEqual(len(alerts), 1)
+            publish.assert_not_called()
+            for callback in callbacks:
+                callback()
+        publish.assert_called_once()
+        self.assertEqual(publish.call_args.args[0]['id'], alerts[0].id)
+
+    def test_window_expires_from_the_left_and_stays_sorted(self):
+        rule = self.density_rule(threshold=10)
+        self.engine.evaluate([self.record_at(5)], now=self.now)
+        self.engine.evaluate([self.record_at(25), self.record_at(15)], now=self.now)
+        events = self.engine._windows[self.engine._window_key(rule)]['events']
+        self.assertEqual([t for t, _ in events], sorted(t for t, _ in events))
+        self.assertEqual(len(events), 3)
+
+        later = self.now + timedelta(minutes=10)
+        self.assertEqual(self.engine._push_window(rule, self.record_at(-10), later), 3)
+        self.assertEqual([round((later - t).total_seconds() / 60) for t, _ in events], [25, 15, 0])
+
+    def test_rules_with_different_windows_count_separately(self):
+        self.density_rule(name='短窗口', window_minutes=10)
+        self.density_rule(name='长窗口', window_minutes=60)
+        records = [self.record_at(minutes) for minutes in (50, 30, 5)]
+        alerts = self.engine.evaluate(records, now=self.now)
+        self.assertEqual({alert.rule.name for alert in alerts}, {'长窗口'})
+
+    def test_prime_window_loads_existing_records(self):
+        for minutes in (20, 10):
+            self.record_at(minutes)
+        self.density_rule()
+        alerts = self.engine.evaluate([self.record_at(1)], now=self.now)
+        self.assertEqual(len(alerts), 1)
+
+    def test_cooldown_applies_to_quantity_rules(self):
+        AlertRule.objects.create(name='大群', rule_type='quantity', threshold=50, cooldown_minutes=10)
+        first = self.engine.evaluate([self.record_at(3, quantity=80), self.record_at(2, quantity=90)], now=self.now)
+        self.assertEqual(len(first), 1)
+        self.assertEqual(self.engine.evaluate([self.record_at(1, quantity=60)], now=self.now + timedelta(minutes=5)), [])
+        later = self.engine.evaluate([self.record_at(0, quantity=60)], now=self.now + timedelta(minutes=11))
+        self.assertEqual(len(later), 1)
+
+    def test_cooldown_applies_to_danger_and_density_rules(self):
+        AlertRule.objects.create(name='高危', rule_type='danger', threshold=5, cooldown_minutes=10)
+        self.density_rule(threshold=2, cooldown_minutes=10)
+        alerts = self.engine.evaluate([self.record_at(minutes) for minutes in (4, 3, 2, 1)], now=self.now)
+        self.assertEqual(sorted(alert.rule.name for alert in alerts), ['周边密集', '高危'])
+
+
+class ExportTests(MonitorTestCase):
+    def setUp(self):
+        super().setUp()
+        egret = self.make_species('白鹭', 5)
+        sparrow = self.make_species('麻雀', 1)
+        self.make_record(egret, 40.1, 116.5, quantity=20, location='跑道东侧')
+        self.make_record(sparrow, 40.2, 116.6, quantity=3, location='机坪')
+        self.make_record(sparrow, quantity=2, location='塔台')  # 没有坐标
+
+    def stream(self, **params):
+        response = self.client.get(reverse('export'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_uses_import_headers_and_record_filters(self):
+        content = self.stream(format='csv', species='麻雀').decode('utf-8-sig')
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0], [header for _, header in exporters.RECORD_EXPORT_FIELDS])
+        self.assertEqual(sorted(row[3] for row in rows[1:]), ['塔台', '机坪'])
+
+    def test_geojson_skips_records_without_coordinates(self):
+        data = json.loads(self.stream(format='geojson'))
+        self.assertEqual(len(data['features']), 2)
+        feature = data['features'][0]
+        self.assertEqual(feature['geometry']['coordinates'], [116.5, 40.1])
+        self.assertEqual(feature['properties']['鸟种'], '白鹭')
+
+    def test_parquet_writes_one_row_group_per_chunk(self):
+        import pyarrow.parquet as pq
+
+        with mock.patch.object(exporters, 'CHUNK_SIZE', 2):
+            content = self.stream(format='parquet')
+        parquet = pq.ParquetFile(io.BytesIO(content))
+        self.assertEqual(parquet.metadata.num_rows, 3)
+        self.assertEqual(parquet.metadata.num_row_groups, 2)
+        self.assertEqual(sorted(parquet.read().column('数量').to_pylist()), [2, 3, 20])
+
+    def test_xlsx_export(self):
+        from openpyxl import load_workbook
+
+        sheet = load_workbook(io.BytesIO(self.stream(format='xlsx', risk_level='high'))).active
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][1], '白鹭')
+
+    def test_airport_export_and_unknown_format(self):
+        self.make_airport('ZSPD', iso_country='CN')
+        self.make_airport('KJFK', iso_country='US')
+        content = self.stream(dataset='airports', country='us').decode('utf-8-sig')
+        self.assertEqual([row[0] for row in csv.reader(io.StringIO(content))], ['ident', 'KJFK'])
+        response = self.client.get(reverse('export'), {'format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_records_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'records.csv')
+            call_command('export_records', '--format', 'csv', '--start', '2000-01-01', '-o', path, stdout=io.StringIO())
+            with open(path, encoding='utf-8-sig') as f:
+                self.assertEqual(len(list(csv.reader(f))), 4)
+
+
+class ArchiveTests(MonitorTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(BIRD_ARCHIVE_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.directory = directory.name
+
+        self.egret = self.make_species('白鹭', 5)
+        self.sparrow = self.make_species('麻雀', 1)
+        self.old = [
+            self.make_record(self.egret, quantity=10, record_time=self.local(2025, 1, 10)),
+            self.make_record(self.egret, quantity=20, record_time=self.local(2025, 1, 20)),
+            self.make_record(self.sparrow, quantity=3, record_time=self.local(2025, 2, 5)),
+        ]
+        self.recent = self.make_record(self.sparrow, quantity=4, minutes_ago=60)
+        self.cutoff = self.local(2025, 3, 1)
+
+    @staticmethod
+    def local(year, month, day):
+        return timezone.make_aware(datetime(year, month, day, 12) if day > 1 else datetime(year, month, day))
+
+    def dashboard(self):
+        data = self.client.get(reverse('api_dashboard_data'), {'days': 3660}).json()
+        # 同步版本 (WSGI 部署) 的结果应一致
+        sync_data = json.loads(views.api_dashboard_data(RequestFactory().get('/', {'days': 3660})).content)
+        self.assertEqual(sync_data, data)
+        return dict(zip(data['species_labels'], data['species_values'])), sum(data['daily_values'])
+
+    def test_partitions_and_manifest(self):
+        stats = archive.archive_records(cutoff=self.cutoff)
+        self.assertEqual((stats['rows'], stats['months']), (3, 2))
+        self.assertTrue(os.path.isdir(os.path.join(self.directory, 'year=2025', 'month=1')))
+
+        manifest = archive.load_manifest()
+        self.assertEqual(manifest['months']['2025-01']['rows'], 2)
+        self.assertEqual(manifest['months']['2025-01']['max_id'], self.old[1].id)
+        self.assertEqual(manifest['months']['2025-02']['max_id'], self.old[2].id)
+        self.assertEqual(archive.archive_cutoff(), self.cutoff)
+
+        frame = archive.query_archive(start=self.local(2025, 2, 1), end=self.cutoff)
+        self.assertEqual(frame['id'].tolist(), [self.old[2].id])
+        # 重复运行不会重复写入
+        self.assertEqual(archive.archive_records(cutoff=self.cutoff)['rows'], 0)
+
+    def test_prune_keeps_dashboard_totals(self):
+        before = self.dashboard()
+        stats = archive.archive_records(cutoff=self.cutoff, prune=True)
+        self.assertEqual(stats['pruned'], 3)
+        self.assertEqual(BirdRecord.objects.count(), 1)
+        self.assertEqual(self.dashboard(), before)
+        self.assertEqual(before, ({'白鹭': 30, '麻雀': 7}, 4))
+
+    def test_backfilled_record_in_archived_month_is_counted(self):
+        archive.archive_records(cutoff=self.cutoff, prune=True)
+        self.make_record(self.egret, quantity=5, record_time=self.local(2025, 1, 15))
+        self.assertEqual(self.dashboard(), ({'白鹭': 35, '麻雀': 7}, 5))
+
+        # 下一次归档把补录的记录写入归档，不会重复统计
+        stats = archive.archive_records(cutoff=self.cutoff, prune=True)
+        self.assertEqual((stats['rows'], stats['pruned']), (1, 1))
+        self.assertEqual(archive.load_manifest()['months']['2025-01']['rows'], 3)
+        self.assertEqual(self.dashboard(), ({'白鹭': 35, '麻雀': 7}, 5))
+
+    def test_edited_and_deleted_archived_records_use_live_values(self):
+        archive.archive_records(cutoff=self.cutoff)
+        changed_ids = sorted([self.old[0].id, self.old[2].id])
+        self.old[0].quantity = 50
+        self.old[0].save()
+        self.old[2].delete()
+        expected = ({'白鹭': 70, '麻雀': 4}, 3)
+        self.assertEqual(archive.analytics_split()[2], changed_ids)
+        self.assertEqual(self.dashboard(), expected)
+
+        # 同步后归档中是修改后的版本，统计结果不变
+        self.assertEqual(archive.apply_changes(), 2)
+        self.assertEqual(archive.analytics_split()[2], [])
+        manifest = archive.load_manifest()
+        self.assertEqual((manifest['months']['2025-01']['rows'], manifest['months']['2025-02']['rows']), (2, 0))
+        self.assertEqual(sorted(archive.query_archive(columns=['quantity'])['quantity'].tolist()), [20, 50])
+        self.assertEqual(self.dashboard(), expected)
+
+    def test_record_moved_out_of_archived_month(self):
+        archive.archive_records(cutoff=self.cutoff)
+        self.old[1].record_time = timezone.now() - timedelta(days=1)
+        self.old[1].save()
+        self.assertEqual(self.dashboard(), ({'白鹭': 30, '麻雀': 7}, 4))
+        archive.archive_records(cutoff=self.cutoff, prune=True)
+        self.assertEqual(archive.load_manifest()['months']['2025-01']['rows'], 1)
+        self.assertTrue(BirdRecord.objects.filter(id=self.old[1].id).exists())
+        self.assertEqual(self.dashboard(), ({'白鹭': 30, '麻雀': 7}, 4))
+
+    def test_maintenance_syncs_archive_before_compacting_changes(self):
+        archive.archive_records(cutoff=self.cutoff, prune=True)
+        self.make_record(self.egret, quantity=5, record_time=self.local(2025, 1, 15))
+        backfilled = self.make_record(self.egret, quantity=1, record_time=self.local(2025, 1, 16))
+        archive.archive_records(cutoff=self.cutoff)
+        backfilled.quantity = 8
+        backfilled.save()
+
+        report = retention.run_maintenance(steps=['changes'])
+        self.assertEqual(report['steps']['changes']['result']['archive'], 1)
+        self.assertEqual(archive.analytics_split()[2], [])
+        self.assertEqual(self.dashboard(), ({'白鹭': 43, '麻雀': 7}, 6))
+
+
+def sample_file(name):
+    with open(os.path.join(settings.BASE_DIR, 'monitor', 'static', 'monitor', name), 'rb') as f:
+        return SimpleUploadedFile(name, f.read())
+
+
+class ImportViewTests(MonitorTestCase):
+    def test_sync_bird_import_renders_result_page(self):
+        response = self.client.post(reverse('import_xls'), {
+            'import_type': 'bird',
+            'xls_file': sample_file('sample_bird_data.csv'),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('success', response.context)
+        self.assertContains(response, f'href="{reverse("logs")}"')
+        self.assertEqual(BirdRecord.objects.count(), 4)
+        log = ImportLog.objects.get()
+        self.assertEqual(log.status, 'completed')
+        self.assertEqual(log.success_count, 4)
+
+    def test_sync_airport_import(self):
+        response = self.client.post(reverse('import_xls'), {
+            'import_type': 'airport',
+            'xls_file': sample_file('sample_airport_data.csv'),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('success', response.context)
+        self.assertEqual(Airport.objects.count(), 3)
+
+
+class SyntheticDataTests(MonitorTestCase):
+    def test_same_seed_generates_same_data(self):
+        now = timezone.now()
+
+        def generate(seed):
+            generator = SyntheticDataGenerator(seed)
+            species = generator.species(5)
+            airports = generator.airports(20)
+            return species, airports, list(generator.sightings(50, airports, species, now=now))
+
+        self.assertEqual(generate(7), generate(7))
+        self.assertNotEqual(generate(7)[1], generate(8)[1])
+
+    def test_sightings_cluster_around_airports(self):
+        generator = SyntheticDataGenerator(1)
+        airports = generator.airports(10)
+        sightings = list(generator.sightings(200, airports, generator.species(3)))
+        near = 0
+        for sighting in sightings:
+            distance = min(haversine_km(a['latitude'], a['longitude'], sighting['latitude'], sighting['longitude'])
+                           for a in airports)
+            near += distance < 30
+        self.assertGreater(near / len(sightings), 0.8)
+
+    def test_seed_database_writes_tagged_records(self):
+        stats = seed_database(species=4, airports=30, records=300, seed=3)
+        self.assertEqual(stats, {'species': 4, 'airports': 30, 'records': 300})
+        self.assertEqual(BirdRecord.objects.count(), 300)
+        self.assertTrue(BirdRecord.objects.filter(zone_airport__isnull=False).exists())
+
+    def test_generate_data_command_refuses_to_duplicate(self):
+        call_command('generate_data', species=2, airports=5, records=10, stdout=io.StringIO())
+        with self.assertRaises(CommandError):
+            call_command('generate_data', species=2, airports=5, records=10, stdout=io.StringIO())
+        call_command('generate_data', species=2, airports=5, records=20, clear=True, stdout=io.StringIO())
+        self.assertEqual(BirdRecord.objects.count(), 20)
+
+
+class BenchHelperTests(TestCase):
+    def test_parse_scale(self):
+        self.assertEqual([bench.parse_scale(text) for text in ('10k', '1m', '2.5k', '300')], [10000, 1000000, 2500, 300])
+
+    def test_percentile(self):
+        ordered = list(range(1, 101))
+        self.assertEqual((bench.percentile(ordered, 50), bench.percentile(ordered, 95)), (51, 95))
+
+    def test_compare_flags_latency_and_query_regressions(self):
+        def case(p50, p95, queries):
+            return {'p50_ms': p50, 'p95_ms': p95, 'queries': queries}
+
+        baseline = {'scales': {'10k': {'cases': {'api': case(10, 20, 3), 'list': case(10, 20, 3)}}}}
+        current = {'scales': {'10k': {'cases': {'api': case(30, 40, 3), 'list': case(10.5, 20, 4)}}}}
+        command = bench.Command(stdout=io.StringIO())
+        regressions = command._compare(baseline, current, threshold=0.2, min_delta_ms=5)
+        self.assertEqual(sorted(name for _, name, _ in regressions), ['api', 'list'])
+        self.assertEqual(len(dict((name, problems) for _, name, problems in regressions)['api']), 2)
+
+
+class RequestMetricsTests(MonitorTestCase):
+    def setUp(self):
+        super().setUp()
+        species = self.make_species()
+        for minutes in (10, 20):
+            self.make_record(species, 40.0, 116.0, minutes_ago=minutes)
+
+    def observed_queries(self, view, request):
+        with mock.patch.object(metrics.request_queries, 'observe') as observe:
+            response = request()
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return [value for value, name in (call.args for call in observe.call_args_list) if name == view]
+
+    def test_sync_view_query_count(self):
+        counts = self.observed_queries('record_list', lambda: self.client.get(reverse('record_list')))
+        self.assertEqual(len(counts), 1)
+        self.assertGreater(counts[0], 0)
+
+    async def test_async_view_queries_in_worker_threads_are_counted(self):
+        url = reverse('bird_records_api')
+        self.assertIs(resolve(url).func, views.api_bird_records_async)
+        with mock.patch.object(metrics.request_queries, 'observe') as observe:
+            response = await self.async_client.get(url)
+            chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(json.loads(b''.join(chunks))), 2)
+        counts = [value for value, name in (call.args for call in observe.call_args_list) if name == 'bird_records_api']
+        self.assertEqual(len(counts), 1)
+        self.assertGreater(counts[0], 0)
+
+    def test_streaming_response_queries_are_counted_when_sent(self):
+        counts = self.observed_queries('export', lambda: self.client.get(reverse('export')))
+        self.assertEqual(len(counts), 1)
+        self.assertGreater(counts[0], 0)
+
+    @override_settings(BIRD_SLOW_REQUEST_MS=0)
+    def test_slow_request_log_lists_statements(self):
+        with self.assertLogs('monitor.slow_requests', 'WARNING') as logs:
+            self.client.get(reverse('record_list'))
+        self.assertIn('SELECT', logs.output[0])
+
+
+class ImportProfilingTests(MonitorTestCase):
+    def test_profiler_stages_and_batch_stats(self):
+        profiler = ImportProfiler(chunk_size=100)
+        with profiler.stage('read'):
+            pass
+        profiler.add('write', 0.5)
+        profiler.add('write', 0.25)
+        profiler.record_batch(100, 0.5)
+        profiler.record_batch(50, 0.25)
+        log = ImportLog(log_type='bird', file_name='a.csv', file_size=1)
+        profiler.apply(log, 150)
+
+        self.assertEqual(list(log.stage_timings), ['read', 'write'])
+        self.assertEqual(log.stage_timings['write'], 0.75)
+        self.assertEqual(log.write_batch_stats['batches'], 2)
+        self.assertEqual(log.write_batch_stats['rows_per_second'], 200.0)
+        self.assertEqual(log.write_batch_stats['chunk_size'], 100)
+        self.assertGreater(log.rows_per_second, 0)
+
+    @override_settings(BIRD_IMPORT_CHUNK_SIZE=3)
+    def test_import_records_stage_timings_and_trend(self):
+        self.client.post(reverse('import_xls'), {
+            'import_type': 'bird',
+            'xls_file': sample_file('sample_bird_data.csv'),
+        })
+        log = ImportLog.objects.get()
+        self.assertTrue({'read', 'validate', 'write'} <= set(log.stage_timings))
+        self.assertEqual(log.write_batch_stats['batches'], 2)
+        self.assertEqual(log.write_batch_stats['rows'], 4)
+        self.assertIsNotNone(log.duration_seconds)
+
+        payload = self.client.get(reverse('log_stream_api', args=[log.id])).json()
+        self.assertEqual(payload['status'], 'completed')
+        self.assertIn('数据库写入', [stage['name'] for stage in payload['stages']])
+
+        response = self.client.get(reverse('logs'))
+        self.assertEqual([item['id'] for item in response.context['throughput_trend']], [log.id])
+        self.assertEqual(self.client.get(reverse('realtime_log', args=[log.id])).status_code, 200)
+
+
+class AsyncApiTests(MonitorTestCase):
+    """异步版本 (ASGI 请求) 与同步版本 (WSGI 请求回退) 的输出一致"""
+
+    def setUp(self):
+        super().setUp()
+        species = self.make_species()
+        for index in range(5):
+            self.make_record(species, 40.0 + index * 0.01, 116.0, quantity=index + 1, minutes_ago=index)
+        self.make_record(species, quantity=9)  # 没有坐标，不在地图接口中
+        self.make_airport('ZBAA')
+        self.make_airport('KJFK', iso_country='US')
+        self.log = ImportLog.objects.create(log_type='bird', file_name='a.csv', file_size=1, status='completed',
+                                            success_count=5)
+
+    async def both(self, name, args=(), params=None):
+        url = reverse(name, args=args)
+        async_response = await self.async_client.get(url, params or {})
+        if async_response.streaming:
+            body = b''.join([chunk async for chunk in async_response.streaming_content])
+        else:
+            body = async_response.content
+        sync_response = await sync_to_async(self.client.get)(url, params or {})
+        return json.loads(body), sync_response.json()
+
+    async def test_bird_records_stream_matches_sync_version(self):
+        with mock.patch.object(views, 'STREAM_CHUNK_ROWS', 2):
+            async_data, sync_data = await self.both('bird_records_api')
+        self.assertEqual(async_data, sync_data)
+        self.assertEqual(len(async_data), 5)
+
+    async def test_airport_apis_match_sync_versions(self):
+        async_data, sync_data = await self.both('airports_api', params={'country': 'us'})
+        self.assertEqual(async_data, sync_data)
+        self.assertEqual([airport['ident'] for airport in async_data], ['KJFK'])
+        async_data, sync_data = await self.both('airports_full_api')
+        self.assertEqual(async_data, sync_data)
+        self.assertEqual(len(async_data), 2)
+
+    async def test_log_stream_matches_sync_version(self):
+        async_data, sync_data = await self.both('log_stream_api', args=[self.log.id])
+        self.assertEqual(async_data, sync_data)
+        self.assertEqual(async_data['success_count'], 5)
+        response = await self.async_client.get(reverse('log_stream_api', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_log_stream_sse_ends_when_import_finished(self):
+        response = await self.async_client.get(reverse('log_stream_api', args=[self.log.id]), {'stream': 1})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = ''.join([chunk.decode() async for chunk in response.streaming_content])
+        self.assertEqual(events.count('event: progress'), 1)
+        self.assertIn('"status": "completed"', events)
+
+
+class AdminChangelistTests(MonitorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'secret'))
+        self.species = self.make_species()
+        self.records = [self.make_record(self.species, location=f'跑道{index}') for index in range(3)]
+
+    def changelist(self, model, params=None):
+        response = self.client.get(reverse(f'admin:monitor_{model}_changelist'), params or {})
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def test_unfiltered_count_is_estimated_from_max_id(self):
+        self.records[0].delete()
+        changelist = self.changelist('birdrecord')
+        self.assertEqual(changelist.paginator.count, self.records[-1].pk)
+        self.assertEqual(changelist.result_count, self.records[-1].pk)
+
+    @override_settings(BIRD_ADMIN_COUNT_LIMIT=2)
+    def test_filtered_count_stops_at_limit(self):
+        changelist = self.changelist('birdrecord', {'risk_level__exact': self.records[0].risk_level})
+        self.assertEqual(changelist.paginator.count, 2)
+        self.assertEqual(len(changelist.result_list), 3)
+
+    def test_search_uses_exact_and_prefix_conditions(self):
+        self.make_record(self.make_species('麻雀', 1), location='机坪')
+        self.assertEqual(self.changelist('birdrecord', {'q': '麻雀'}).result_list.count(), 1)
+        self.assertEqual(self.changelist('birdrecord', {'q': '跑道'}).result_list.count(), 3)
+        self.assertEqual(self.changelist('birdrecord', {'q': '道'}).result_list.count(), 0)
+        self.make_airport('ZSPD', icao_code='ZSPD', iata_code='PVG', name='浦东国际机场')
+        self.make_airport('ZBAA', name='首都国际机场')
+        self.assertEqual([airport.ident for airport in self.changelist('airport', {'q': 'pvg'}).result_list],
+                         ['ZSPD'])
+        self.assertEqual([airport.ident for airport in self.changelist('airport', {'q': '首都'}).result_list],
+                         ['ZBAA'])
+
+    def test_filter_choices_are_cached(self):
+        self.make_airport('ZBAA', iso_country='CN')
+
+        def country_choices():
+            changelist = self.changelist('airport')
+            spec = next(spec for spec in changelist.filter_specs if spec.field_path == 'iso_country')
+            return list(spec.lookup_choices)
+
+        self.assertEqual(country_choices(), ['CN'])
+        self.make_airport('KJFK', iso_country='US')
+        self.assertEqual(country_choices(), ['CN'])
+        cache.clear()
+        self.assertEqual(country_choices(), ['CN', 'US'])
+
+
+class LookupCacheTests(MonitorTestCase):
+    def test_species_lookup_counts_hits_and_misses(self):
+        species = self.make_species('白鹭', 4)
+        table = lookups.LookupTable('species', lookups._load_species)
+        self.assertEqual(table.get('by_name', '白鹭'), species.id)
+        self.assertIsNone(table.get('by_name', '麻雀'))
+        self.assertEqual(table.stats(), {'hits': 1, 'misses': 1, 'reloads': 1})
+        self.assertEqual(lookups.species_danger_level(species.id), 4)
+        reference = lookups.species_reference('白鹭')
+        self.assertEqual((reference.pk, reference.name, reference.danger_level), (species.id, '白鹭', 4))
+        self.assertIsNone(lookups.species_reference('麻雀'))
+
+    def test_airport_codes_prefer_ident_over_icao_and_iata(self):
+        first = self.make_airport('ZBAA', icao_code='ZBAA', iata_code='PEK')
+        second = self.make_airport('PEK', icao_code='ZBAD', iata_code='ZBAA')
+        self.assertEqual(lookups.airport_id(' zbaa '), first.id)
+        self.assertEqual(lookups.airport_id('PEK'), second.id)
+        self.assertEqual(lookups.airport_id('zbad'), second.id)
+        self.assertIsNone(lookups.airport_id(''))
+
+    def test_save_invalidates_on_commit_and_bumps_version(self):
+        species = self.make_species('白鹭')
+        self.assertEqual(lookups.species_id('白鹭'), species.id)
+        version = lookups.species.version()
+        with self.captureOnCommitCallbacks(execute=True):
+            species.name = '大白鹭'
+            species.save()
+        self.assertEqual(lookups.species.version(), version + 1)
+        self.assertIsNone(lookups.species_id('白鹭'))
+        self.assertEqual(lookups.species_id('大白鹭'), species.id)
+
+    @override_settings(BIRD_LOOKUP_CHECK_SECONDS=0)
+    def test_other_process_reloads_when_version_changes(self):
+        species = self.make_species('白鹭')
+        other = lookups.LookupTable('species', lookups._load_species)
+        self.assertEqual(other.get('by_name', '白鹭'), species.id)
+        other.get('by_name', '白鹭')
+        self.assertEqual(other.stats()['reloads'], 1)
+        BirdSpecies.objects.filter(pk=species.pk).update(name='大白鹭')
+        lookups.species.invalidate()
+        self.assertIsNone(other.get('by_name', '白鹭'))
+        self.assertEqual(other.get('by_name', '大白鹭'), species.id)
+        self.assertEqual(other.stats()['reloads'], 2)
+
+
+@override_settings(BIRD_IMPORT_WORKERS=2)
+class BatchImportTests(MonitorTestCase):
+    def zip_upload(self, members):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            for name, content in members.items():
+                archive.writestr(name, content)
+        return SimpleUploadedFile('batch.zip', buffer.getvalue(), content_type='application/zip')
+
+    def test_zip_files_are_parsed_in_worker_processes_with_child_logs(self):
+        with open(os.path.join(settings.BASE_DIR, 'monitor', 'static', 'monitor', 'sample_bird_data.csv'), 'rb') as f:
+            birds = f.read()
+        upload = self.zip_upload({
+            'east/birds.csv': birds,
+            'west/birds.csv': birds.replace('跑道'.encode(), '滑行道'.encode()),
+            'broken.csv': '名称,备注\n白鹭,无\n'.encode(),
+            'readme.txt': b'notes',
+            '__MACOSX/._birds.csv': b'',
+        })
+        response = self.client.post(reverse('import_xls'), {'import_type': 'bird', 'xls_file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('success', response.context)
+        self.assertEqual(BirdRecord.objects.count(), 8)
+
+        parent = ImportLog.objects.get(parent__isnull=True)
+        self.assertEqual(parent.status, 'completed_with_errors')
+        self.assertEqual(parent.success_count, 8)
+        self.assertIn('使用 2 个解析进程', parent.details)
+        self.assertIn('跳过不支持的文件: batch.zip/readme.txt', parent.details)
+        children = {child.file_name: child for child in parent.children.all()}
+        self.assertEqual(set(children), {'batch.zip/east/birds.csv', 'batch.zip/west/birds.csv',
+                                         'batch.zip/broken.csv'})
+        self.assertEqual(children['batch.zip/broken.csv'].status, 'failed')
+        self.assertIn('缺少必要的列', children['batch.zip/broken.csv'].error_messages)
+        self.assertEqual(children['batch.zip/east/birds.csv'].success_count, 4)
+
+    def test_multiple_airport_files(self):
+        response = self.client.post(reverse('import_xls'), {
+            'import_type': 'airport',
+            'xls_file': [sample_file('sample_airport_data.csv'), sample_file('sample_bird_data.csv')],
+        })
+        self.assertIn('success', response.context)
+        self.assertEqual(Airport.objects.count(), 3)
+        parent = ImportLog.objects.get(parent__isnull=True)
+        self.assertEqual(parent.children.count(), 2)
+        self.assertEqual(parent.status, 'completed_with_errors')
+
+    def test_airport_batch_builds_zones_and_retags_once(self):
+        from .models import AirportZone
+
+        extra = SimpleUploadedFile('extra.csv', (
+            'ident,name,latitude_deg,longitude_deg,type\n'
+            'ZBTJ,天津滨海国际机场,39.1244,117.346,large_airport\n').encode(), content_type='text/csv')
+        with mock.patch.object(zones, 'rebuild_zones', wraps=zones.rebuild_zones) as rebuild, \
+                mock.patch.object(zones, 'retag_records', return_value={'records': 0, 'changed': 0}) as retag:
+            response = self.client.post(reverse('import_xls'), {
+                'import_type': 'airport', 'xls_file': [sample_file('sample_airport_data.csv'), extra],
+            })
+        self.assertIn('success', response.context)
+        # 子文件只写入机场，保护区和重新标记在所有文件写完后各执行一次
+        airport_ids = sorted(Airport.objects.values_list('id', flat=True))
+        self.assertEqual(len(airport_ids), 4)
+        self.assertEqual(rebuild.call_count, 1)
+        self.assertEqual(sorted(rebuild.call_args.args[0]), airport_ids)
+        self.assertEqual(AirportZone.objects.count(), 12)
+        self.assertEqual(retag.call_count, 1)
+        self.assertEqual(sorted(retag.call_args.kwargs['airport_ids']), airport_ids)
+        self.assertIn('保护区标记', ImportLog.objects.get(parent__isnull=True).details)
+
+    def test_zip_without_data_files_fails(self):
+        response = self.client.post(reverse('import_xls'), {
+            'import_type': 'bird', 'xls_file': self.zip_upload({'readme.txt': b'notes'}),
+        })
+        self.assertIn('没有可导入的数据文件', response.context['error'])
+        self.assertEqual(ImportLog.objects.get().status, 'failed')
+
+    def test_unsupported_upload_is_rejected(self):
+        response = self.client.post(reverse('import_xls'), {
+            'import_type': 'bird',
+            'xls_file': [sample_file('sample_bird_data.csv'), SimpleUploadedFile('notes.txt', b'x')],
+        })
+        self.assertIn('不支持的文件格式: notes.txt', response.context['error'])
+        self.assertFalse(ImportLog.objects.exists())
+
+    def test_gbk_member_names_are_decoded(self):
+        from .batch_import import _member_name
+
+        info = zipfile.ZipInfo('鸟情.csv'.encode('gbk').decode('cp437'))
+        self.assertEqual(_member_name(info), '鸟情.csv')
+        info = zipfile.ZipInfo('鸟情.csv')
+        info.flag_bits |= 0x800
+        self.assertEqual(_member_name(info), '鸟情.csv')
+
+
+class ExcelReaderTests(TestCase):
+    COLUMNS = {'鸟种': 'text', '数量': 'number', '纬度': 'number', '记录时间': 'raw', '备注': 'text'}
+
+    def setUp(self):
+        import openpyxl
+
+        workbook = openpyxl.Workbook()
+        notes = workbook.active
+        notes.title = '说明'
+        notes.append(['本文件由巡查系统导出'])
+        sheet = workbook.create_sheet('数据')
+        sheet.append(['2024 年 1 月鸟情'])
+        sheet.append([])
+        sheet.append(['鸟种', '数量', '纬度', '记录时间', '备注', '多余列'])
+        sheet.append(['白鹭', 3, 39.9, datetime(2024, 1, 15, 8, 30), 7, 'x'])
+        sheet.append([None, None, None, None, None, 'x'])
+        sheet.append(['麻雀', '很多', 40.1, datetime(2024, 1, 16).date(), '跑道', None])
+        handle, self.path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(handle)
+        workbook.save(self.path)
+        self.addCleanup(os.remove, self.path)
+
+    def read(self, engine, **kwargs):
+        from .excel_reader import read_excel
+
+        kwargs.setdefault('required', ('鸟种', '数量'))
+        return read_excel(self.path, self.COLUMNS, engine=engine, **kwargs)
+
+    def test_streaming_engines_find_header_and_select_columns(self):
+        for engine in ('calamine', 'openpyxl'):
+            with self.subTest(engine=engine):
+                df = self.read(engine)
+                self.assertEqual(list(df.columns), ['鸟种', '数量', '纬度', '记录时间', '备注'])
+                # 行索引 = Excel 行号 - 2，空行被跳过
+                self.assertEqual(list(df.index), [2, 4])
+                self.assertEqual(df['鸟种'].tolist(), ['白鹭', '麻雀'])
+                self.assertEqual(df['数量'].tolist(), [3, '很多'])
+                self.assertEqual(df['备注'].tolist(), ['7', '跑道'])
+                self.assertEqual(df['记录时间'].tolist(), [datetime(2024, 1, 15, 8, 30), datetime(2024, 1, 16)])
+
+    def test_number_columns_are_float(self):
+        for engine in ('calamine', 'openpyxl'):
+            with self.subTest(engine=engine):
+                df = self.read(engine)
+                self.assertEqual(str(df['纬度'].dtype), 'float64')
+                self.assertEqual(str(df['数量'].dtype), 'object')
+
+    def test_missing_columns_fall_back_to_first_non_empty_row(self):
+        df = self.read('openpyxl', required=('鸟种', '经度'))
+        self.assertEqual(len(df.columns), 0)
+        df = self.read('calamine', sheet_name='数据', required=('经度',))
+        self.assertEqual(list(df.columns), [])
+
+    def test_named_sheet_must_exist(self):
+        with self.assertRaisesMessage(ValueError, '工作表 "记录" 不存在'):
+            self.read('openpyxl', sheet_name='记录')
+
+    def test_pandas_engine_reads_whole_sheet(self):
+        df = self.read('pandas', sheet_name='说明')
+        self.assertEqual(list(df.columns), ['本文件由巡查系统导出'])
+
+    def test_resolve_engine(self):
+        from .excel_reader import resolve_engine
+
+        with override_settings(BIRD_EXCEL_ENGINE='auto'):
+            self.assertEqual(resolve_engine('a.xlsx'), 'calamine')
+            with mock.patch('monitor.excel_reader.calamine_available', return_value=False):
+                self.assertEqual(resolve_engine('a.xlsx'), 'openpyxl')
+                self.assertEqual(resolve_engine('a.xls'), 'pandas')
+                with self.assertRaisesMessage(ValueError, 'python-calamine'):
+                    resolve_engine('a.xlsx', 'calamine')
+        with self.assertRaisesMessage(ValueError, 'openpyxl 不支持 .xls'):
+            resolve_engine('a.xls', 'openpyxl')
+        with self.assertRaisesMessage(ValueError, '不支持的 Excel 读取引擎'):
+            resolve_engine('a.xlsx', 'xlrd')
+
+
+class RetentionTests(MonitorTestCase):
+    def make_log(self, days_ago, lines=100, status='completed'):
+        log = ImportLog.objects.create(log_type='bird', file_name='a.csv', file_size=1, status=status,
+                                       details='\n'.join(f'第 {line} 行' for line in range(lines)))
+        ImportLog.objects.filter(pk=log.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return log
+
+    def test_compress_keeps_full_details_in_archive(self):
+        old, recent, running = self.make_log(40), self.make_log(5), self.make_log(40, status='processing')
+        full = old.details
+        stats = retention.compact_import_logs(days=30, mode='compress')
+        self.assertEqual(stats['logs'], 1)
+        self.assertLess(stats['bytes_after'], stats['bytes_before'])
+        old.refresh_from_db()
+        self.assertIsNotNone(old.compacted_at)
+        self.assertIn('... 省略 60 行 ...', old.details)
+        self.assertEqual(len(old.details.splitlines()), 41)
+        self.assertEqual(old.full_details(), full)
+        for log in (recent, running):
+            log.refresh_from_db()
+            self.assertIsNone(log.compacted_at)
+        # 已压缩的日志不会重复处理
+        self.assertEqual(retention.compact_import_logs(days=30, mode='compress')['logs'], 0)
+
+    def test_trim_drops_middle_lines(self):
+        old, short = self.make_log(40), self.make_log(40, lines=10)
+        short_details = short.details
+        retention.compact_import_logs(days=30, mode='trim')
+        old.refresh_from_db()
+        short.refresh_from_db()
+        self.assertIsNone(old.details_archive)
+        self.assertIn('省略', old.full_details())
+        self.assertEqual(short.details, short_details)
+        self.assertIsNotNone(short.compacted_at)
+
+    def test_invalid_mode_and_disabled_retention(self):
+        with self.assertRaisesMessage(ValueError, '不支持的日志保留方式'):
+            retention.compact_import_logs(days=30, mode='delete')
+        self.make_log(400)
+        with override_settings(BIRD_RETENTION_LOG_DAYS=None):
+            self.assertEqual(retention.compact_import_logs()['logs'], 0)
+
+    def test_compact_changes_keeps_latest_entry(self):
+        species = self.make_species()
+        for _ in range(3):
+            self.make_record(species)
+        RecordChange.objects.update(created_at=timezone.now() - timedelta(days=60))
+        latest = changes.latest_seq()
+        self.assertEqual(changes.compact_changes(days=30), 2)
+        self.assertEqual(list(RecordChange.objects.values_list('id', flat=True)), [latest])
+        self.make_record(species)
+        self.assertEqual(changes.compact_changes(days=30), 1)
+        self.assertEqual(changes.compact_changes(days=None), 0)
+
+    def test_run_maintenance_reports_steps(self):
+        self.make_log(40)
+        report = retention.run_maintenance(steps=('logs', 'changes'), log_days=30, log_mode='compress')
+        self.assertEqual(set(report['steps']), {'logs', 'changes'})
+        self.assertEqual(report['steps']['logs']['result']['logs'], 1)
+        self.assertIn('removed', report['steps']['changes']['result'])
+        self.assertEqual(retention.last_report['seconds'], report['seconds'])
+
+    def test_maintain_db_rejects_unknown_steps(self):
+        with self.assertRaisesMessage(CommandError, '未知的维护步骤: shrink'):
+            call_command('maintain_db', steps='logs,shrink', stdout=io.StringIO())
+
+    def test_scheduler_runs_once_per_window(self):
+        self.assertTrue(retention.in_window(datetime(2024, 1, 1, 23, 30), ('23:00', '02:00')))
+        self.assertTrue(retention.in_window(datetime(2024, 1, 2, 1, 0), ('23:00', '02:00')))
+        self.assertFalse(retention.in_window(datetime(2024, 1, 2, 3, 0), ('23:00', '02:00')))
+
+        scheduler = retention.MaintenanceScheduler(('02:00', '04:00'))
+        day = timezone.make_aware(datetime(2024, 1, 2, 2, 30))
+        with mock.patch.object(retention, 'run_maintenance', return_value={'seconds': 1}) as run:
+            self.assertIsNone(scheduler.tick(day - timedelta(hours=2)))
+            self.assertEqual(scheduler.tick(day), {'seconds': 1})
+            self.assertIsNone(scheduler.tick(day + timedelta(minutes=30)))
+            self.assertEqual(scheduler.tick(day + timedelta(days=1)), {'seconds': 1})
+        self.assertEqual(run.call_count, 2)
+        self.assertEqual(run.call_args.kwargs['max_seconds'], 90 * 60)
+
+
+class AirportZoneTests(MonitorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.species = self.make_species()
+
+    def test_classify_point_takes_innermost_zone(self):
+        large = self.make_airport('ZBAA', 40.08, 116.58)
+        small = self.make_airport('ZBXX', 40.14, 116.58, airport_type='small_airport')
+        self.assertEqual(zones.classify_point(40.09, 116.58), (large.id, 1))
+        self.assertEqual(zones.classify_point(40.02, 116.58), (large.id, 2))
+        self.assertEqual(zones.classify_point(40.19, 116.58), (small.id, 2))
+        # 距大型机场 5.6 公里 (2 级)，距小型机场 1.1 公里 (1 级)
+        self.assertEqual(zones.classify_point(40.13, 116.58), (small.id, 1))
+        self.assertEqual(zones.classify_point(39.98, 116.58), (large.id, 3))
+        self.assertEqual(zones.classify_point(39.90, 116.58), (None, None))
+        self.assertEqual(zones.classify_point(None, 116.58), (None, None))
+
+    def test_classify_many_matches_classify(self):
+        self.make_airport('ZBAA', 40.08, 116.58)
+        self.make_airport('ZBXX', 40.14, 116.58, airport_type='small_airport')
+        self.make_airport('ZBHH', 40.10, 116.70, airport_type='heliport')
+        index = zones.current_index()
+        points = [(40.08 + row * 0.013, 116.50 + col * 0.017) for row in range(-12, 12) for col in range(-6, 14)]
+        points.append((float('nan'), 116.58))
+        airport_ids, levels = index.classify_many(*zip(*points))
+        expected = [index.classify(*point) if point[0] == point[0] else (None, None) for point in points]
+        self.assertEqual(list(zip(airport_ids, levels)), expected)
+        self.assertIn(1, levels)
+
+    def test_records_are_tagged_on_save_and_retagged(self):
+        record = self.make_record(self.species, 40.09, 116.58)
+        self.assertIsNone(record.zone_airport_id)
+        airport = self.make_airport('ZBAA', 40.08, 116.58)
+        self.assertEqual(zones.retag_records(), {'records': 1, 'changed': 1})
+        record.refresh_from_db()
+        self.assertEqual((record.zone_airport_id, record.zone_level), (airport.id, 1))
+        self.assertEqual(zones.retag_records(), {'records': 1, 'changed': 0})
+        self.assertEqual(self.make_record(self.species, 40.02, 116.58).zone_level, 2)
+
+    def test_retag_for_airports_only_checks_their_zones(self):
+        near = self.make_record(self.species, 40.09, 116.58)
+        far = self.make_record(self.species, 31.15, 121.80)
+        airport = self.make_airport('ZBAA', 40.08, 116.58)
+        moved = self.make_airport('ZBXX', 39.50, 116.00)
+        tagged = self.make_record(self.species, 39.51, 116.00)
+        self.assertEqual(tagged.zone_airport_id, moved.id)
+        # 机场移走后，原来标记为该机场的记录也要检查
+        Airport.objects.filter(pk=moved.pk).update(latitude=45.0)
+        zones.rebuild_zones([moved.pk])
+        zones.zone_index.invalidate()
+
+        writer = mock.Mock()
+        writer.run.side_effect = lambda func, *args: func(*args)
+        stats = zones.retag_records(airport_ids=[airport.id, moved.id], writer=writer, chunk_size=1)
+        self.assertEqual(stats, {'records': 2, 'changed': 2})
+        # 每批一个写任务
+        self.assertEqual(writer.run.call_count, 2)
+        for record in (near, far, tagged):
+            record.refresh_from_db()
+        self.assertEqual((near.zone_airport_id, near.zone_level), (airport.id, 1))
+        self.assertIsNone(tagged.zone_airport_id)
+        self.assertIsNone(far.zone_airport_id)
+
+    def test_merge_boxes(self):
+        boxes = [(0, 2, 0, 2), (1, 3, 1, 3), (5, 6, 5, 6), (0.5, 1, 0.5, 1), (2.5, 5.5, 2.5, 2.8)]
+        self.assertEqual(zones.merge_boxes(boxes), [(0, 5.5, 0, 3), (5, 6, 5, 6)])
+
+    def test_saving_an_airport_rebuilds_its_zones(self):
+        airport = self.make_airport('ZBAA', airport_type='small_airport')
+        self.assertEqual(list(airport.zones.values_list('level', 'radius_km')), [(1, 3), (2, 8)])
+        airport.airport_type = 'heliport'
+        airport.save()
+        self.assertEqual(list(airport.zones.values_list('level', 'radius_km')), [(1, 3)])
+
+    @override_settings(BIRD_IMPORT_CHUNK_SIZE=2)
+    def test_airport_import_rebuilds_zones_once_per_batch(self):
+        from .models import AirportZone
+
+        with mock.patch.object(zones, 'rebuild_zones', wraps=zones.rebuild_zones) as rebuild, \
+                mock.patch.object(zones, 'retag_records', return_value={'records': 0, 'changed': 0}) as retag:
+            self.client.post(reverse('import_xls'), {
+                'import_type': 'airport', 'xls_file': sample_file('sample_airport_data.csv'),
+            })
+        self.assertEqual(Airport.objects.count(), 3)
+        # 只重新标记新机场保护区内的记录
+        self.assertEqual(sorted(retag.call_args.kwargs['airport_ids']),
+                         sorted(Airport.objects.values_list('id', flat=True)))
+        self.assertEqual(rebuild.call_count, 2)
+        self.assertEqual([len(call.args[0]) for call in rebuild.call_args_list], [2, 1])
+        self.assertEqual(AirportZone.objects.count(), 9)
+        self.assertEqual(AirportZone.objects.filter(airport__ident='ZBAD').count(), 3)
+
+    def test_deferred_rebuild_nests_and_skips_on_error(self):
+        with mock.patch.object(zones, 'rebuild_zones') as rebuild:
+            with zones.deferred_rebuild():
+                zones.airports_changed([3])
+                with zones.deferred_rebuild():
+                    zones.airports_changed([1, 3])
+                self.assertFalse(rebuild.called)
+            rebuild.assert_called_once_with([1, 3])
+            rebuild.reset_mock()
+            with self.assertRaises(RuntimeError), zones.deferred_rebuild():
+                zones.airports_changed([2])
+                raise RuntimeError
+            self.assertFalse(rebuild.called)
+            zones.airports_changed([2])
+            rebuild.assert_called_once_with([2])
+
+    def test_airport_zones_api(self):
+        airport = self.make_airport('ZBAA', 40.08, 116.58, iata_code='PEK')
+        self.make_airport('ZSPD', 31.14, 121.80)
+        for latitude in (40.09, 40.085, 40.02):
+            self.make_record(self.species, latitude, 116.58)
+        self.make_record(self.species, 40.09, 116.58, minutes_ago=60 * 24 * 40)
+        self.make_record(self.species, 31.15, 121.80)
+
+        data = self.client.get(reverse('airport_zones_api'), {'airport': 'pek'}).json()
+        self.assertEqual(data['days'], 30)
+        self.assertEqual(data['airports'], [{
+            'airport': 'ZBAA', 'name': airport.name, 'type': 'large_airport', 'total': 3,
+            'zones': [{'level': 1, 'radius_km': 3, 'count': 2}, {'level': 2, 'radius_km': 8, 'count': 1},
+                      {'level': 3, 'radius_km': 13, 'count': 0}],
+        }])
+        data = self.client.get(reverse('airport_zones_api'), {'days': 60}).json()
+        self.assertEqual([(row['airport'], row['total']) for row in data['airports']], [('ZBAA', 4), ('ZSPD', 1)])
+        data = self.client.get(reverse('airport_zones_api'), {'airport': 'XXXX'}).json()
+        self.assertEqual(data['airports'], [])
+
+
+class ChangeJournalTests(MonitorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.species = self.make_species()
+
+    def test_changes_since_keeps_last_operation_per_record(self):
+        start = changes.latest_seq()
+        first = self.make_record(self.species, 40.0, 116.0)
+        second = self.make_record(self.species, 40.1, 116.1)
+        first.quantity = 5
+        first.save()
+        second_id = second.id
+        second.delete()
+        delta = changes.changes_since(start)
+        self.assertEqual(delta['seq'], changes.latest_seq())
+        self.assertEqual((delta['upserts'], delta['deletes'], delta['reset']), ([first.id], [second_id], False))
+
+        delta = changes.changes_since(start, limit=2)
+        self.assertEqual(delta['upserts'], [first.id, second_id])
+        self.assertTrue(delta['has_more'])
+        delta = changes.changes_since(delta['seq'], limit=2)
+        self.assertEqual((delta['upserts'], delta['deletes'], delta['has_more']), ([first.id], [second_id], False))
+
+        latest = changes.latest_seq()
+        self.assertEqual(changes.changes_since(None)['seq'], latest)
+        self.assertEqual(changes.changes_since(latest)['upserts'], [])
+
+    def test_reset_when_sequence_was_pruned_or_unknown(self):
+        for _ in range(3):
+            self.make_record(self.species)
+        start = RecordChange.objects.order_by('id').first().id - 1
+        self.assertFalse(changes.changes_since(start)['reset'])
+        self.assertTrue(changes.changes_since(changes.latest_seq() + 1)['reset'])
+        RecordChange.objects.update(created_at=timezone.now() - timedelta(days=60))
+        changes.compact_changes(days=30)
+        self.assertTrue(changes.changes_since(start)['reset'])
+        self.assertFalse(changes.changes_since(changes.latest_seq() - 1)['reset'])
+
+    def test_collect_writes_once_at_outermost_block(self):
+        before = RecordChange.objects.count()
+        with changes.collect():
+            changes.record('insert', [1, 2])
+            with changes.collect():
+                changes.record('update', [1])
+            self.assertEqual(RecordChange.objects.count(), before)
+        self.assertEqual(list(RecordChange.objects.order_by('id').values_list('op', 'record_id')[before:]),
+                         [('insert', 1), ('insert', 2), ('update', 1)])
+        with self.assertRaises(RuntimeError), changes.collect():
+            changes.record('delete', [3])
+            raise RuntimeError
+        self.assertEqual(RecordChange.objects.count(), before + 3)
+
+    def test_species_rename_journals_its_records(self):
+        record = self.make_record(self.species, 40.0, 116.0)
+        start = changes.latest_seq()
+        self.species.name = '大白鹭'
+        self.species.save()
+        self.assertEqual(changes.changes_since(start)['upserts'], [record.id])
+
+    def test_import_journals_created_records(self):
+        start = changes.latest_seq()
+        self.client.post(reverse('import_xls'), {'import_type': 'bird', 'xls_file': sample_file('sample_bird_data.csv')})
+        delta = changes.changes_since(start)
+        self.assertEqual(sorted(delta['upserts']), sorted(BirdRecord.objects.values_list('id', flat=True)))
+
+    def test_changes_api(self):
+        url = reverse('bird_record_changes_api')
+        seq = self.client.get(url).json()['seq']
+        located = self.make_record(self.species, 40.0, 116.0)
+        unlocated = self.make_record(self.species)
+        removed = self.make_record(self.species, 40.1, 116.1)
+        removed_id = removed.id
+        removed.delete()
+
+        data = self.client.get(url, {'since': seq}).json()
+        self.assertFalse(data['reset'])
+        self.assertEqual([record['id'] for record in data['upserts']], [located.id])
+        self.assertEqual(data['upserts'][0]['species'], '白鹭')
+        # 没有坐标的记录不在地图上，按删除处理
+        self.assertEqual(sorted(data['deletes']), sorted([unlocated.id, removed_id]))
+        self.assertEqual(self.client.get(url, {'since': data['seq'] + 10}).json()['reset'], True)
+
+
+class MapBootstrapTests(MonitorTestCase):
+    def setUp(self):
+        super().setUp()
+        from . import bootstrap
+
+        self.bootstrap = bootstrap
+        self.species = self.make_species()
+        self.make_airport('ZBAA')
+        self.make_airport('KJFK', 40.64, -73.78, iso_country='US')
+        self.make_airport('ZBXX', 40.2, 116.6, airport_type='heliport')
+        self.recent = self.make_record(self.species, 40.0, 116.0, quantity=3)
+        self.make_record(self.species)
+        self.make_record(self.species, 40.1, 116.1, minutes_ago=60 * 24 * 40)
+
+    def fetch(self, **headers):
+        return self.client.get(reverse('map_bootstrap_api'), headers=headers)
+
+    def test_bundle_holds_columns_and_summary(self):
+        data = self.fetch().json()
+        self.assertEqual(data['records']['id'], [self.recent.id])
+        self.assertEqual(data['records']['species'], [0])
+        self.assertEqual(data['species']['name'], ['白鹭'])
+        self.assertEqual(data['risk_levels'][data['records']['risk'][0]]['code'], self.recent.risk_level)
+        self.assertEqual(data['tier'], 'china')
+        self.assertEqual(data['airports']['ident'], ['ZBAA', 'ZBXX'])
+        self.assertEqual(data['summary']['records'], 3)
+        self.assertEqual(data['summary']['recent_records'], 1)
+        self.assertEqual(data['seq'], changes.latest_seq())
+        major = self.client.get(reverse('map_bootstrap_api'), {'tier': 'major', 'days': 60}).json()
+        self.assertEqual(major['airports']['ident'], ['ZBAA', 'KJFK'])
+        self.assertEqual(len(major['records']['id']), 2)
+
+    def test_bundle_is_built_once_and_served_gzipped(self):
+        builds = self.bootstrap.stats['builds']
+        response = self.fetch(accept_encoding='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        etag = response['ETag']
+        self.assertEqual(json.loads(gzip.decompress(response.content))['version'], etag.strip('"'))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.fetch()['ETag'], etag)
+        self.assertEqual(self.fetch(if_none_match=etag).status_code, 304)
+        self.assertEqual(self.bootstrap.stats['builds'], builds + 1)
+
+    def test_version_changes_with_lookups_and_change_lag(self):
+        etag = self.fetch()['ETag']
+        self.make_record(self.species, 40.0, 116.0)
+        # 落后的变更不超过 BIRD_MAP_BOOTSTRAP_MAX_LAG 时继续使用缓存，由客户端增量同步
+        self.assertEqual(self.fetch()['ETag'], etag)
+        with override_settings(BIRD_MAP_BOOTSTRAP_MAX_LAG=0):
+            lagged = self.fetch()['ETag']
+        self.assertNotEqual(lagged, etag)
+        self.make_species('麻雀')
+        renamed = self.fetch()
+        self.assertNotEqual(renamed['ETag'], lagged)
+        self.assertEqual(renamed.json()['species']['name'], ['白鹭', '麻雀'])
+
+    def test_invalid_parameters(self):
+        response = self.client.get(reverse('map_bootstrap_api'), {'tier': 'all'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('不支持的机场分层', response.json()['error'])
+        self.assertEqual(self.client.get(reverse('map_bootstrap_api'), {'days': 0}).status_code, 400)
+
+
+class FullTextSearchTests(MonitorTestCase):
+    def setUp(self):
+        super().setUp()
+        from . import search
+
+        self.search = search
+        self.egret = self.make_species('白鹭')
+        self.sparrow = self.make_species('麻雀', 1)
+        self.dump = self.make_record(self.egret, 40.0, 116.0, location='垃圾场北侧', intrusion_reason='觅食',
+                                     minutes_ago=30)
+        self.pond = self.make_record(self.sparrow, 40.1, 116.1, location='鱼塘', notes='跑道附近成群活动',
+                                     minutes_ago=20)
+        self.runway = self.make_record(self.egret, 40.2, 116.2, location='跑道东侧 Gate-7', minutes_ago=10)
+        search.sync_index()
+
+    def search_api(self, query, **params):
+        response = self.client.get(reverse('bird_records_search_api'), {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def ids(self, query, **params):
+        return [record['id'] for record in self.search_api(query, **params)['results']]
+
+    def test_tokenize_and_build_match(self):
+        self.assertEqual(self.search.tokenize('垃圾场Gate-7'), '垃圾 圾场 Gate-7')
+        self.assertEqual(self.search.tokenize('鹭'), '鹭')
+        self.assertEqual(self.search.build_match('垃圾场 OR 鱼塘 跑道'),
+                         '("垃圾 圾场") OR ("鱼塘" AND "跑道")')
+        self.assertEqual(self.search.build_match('"'), None)
+
+    def test_search_api_matches_bigrams_and_combines_terms(self):
+        self.assertEqual(self.ids('垃圾场'), [self.dump.id])
+        self.assertEqual(self.ids('跑道'), [self.runway.id, self.pond.id])
+        self.assertEqual(self.ids('跑道 成群'), [self.pond.id])
+        self.assertEqual(self.ids('垃圾场 OR 鱼塘'), [self.pond.id, self.dump.id])
+        self.assertEqual(self.ids('gate'), [self.runway.id])
+        # 鸟种名称也在索引中
+        self.assertEqual(self.ids('白鹭'), [self.runway.id, self.dump.id])
+        self.assertEqual(self.ids('垃圾'), [self.dump.id])
+        self.assertEqual(self.ids('圾'), [])
+
+    def test_search_api_filters_and_limit(self):
+        self.assertEqual(self.ids('跑道', species='白鹭'), [self.runway.id])
+        response = self.client.get(reverse('bird_records_search_api'), {'q': '跑道', 'limit': 1}).json()
+        self.assertTrue(response['has_more'])
+        self.assertEqual(len(response['results']), 1)
+        self.assertEqual(self.client.get(reverse('bird_records_search_api')).status_code, 400)
+
+    def test_index_follows_change_journal(self):
+        self.assertEqual(self.ids('鱼塘'), [self.pond.id])
+        self.pond.location = '水库'
+        self.pond.save()
+        self.dump.delete()
+        # 搜索不同步索引，只报告索引落后于变更日志
+        response = self.search_api('鱼塘')
+        self.assertTrue(response['stale'])
+        self.assertEqual([record['id'] for record in response['results']], [self.pond.id])
+        self.assertTrue(self.search.needs_sync())
+
+        self.search.sync_index()
+        self.assertFalse(self.search_api('鱼塘')['stale'])
+        self.assertEqual(self.ids('鱼塘'), [])
+        self.assertEqual(self.ids('水库'), [self.pond.id])
+        self.assertEqual(self.ids('垃圾场'), [])
+
+    def test_add_record_and_admin_delete_sync_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('add_record'), {
+                'species': self.sparrow.id, 'quantity': 2, 'location': '机坪草地', 'reason': '',
+            })
+        self.assertFalse(self.search.needs_sync())
+        added = BirdRecord.objects.latest('id')
+        self.assertEqual(self.ids('机坪'), [added.id])
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'secret'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:monitor_birdrecord_delete', args=[added.id]), {'post': 'yes'})
+        self.assertFalse(self.search.needs_sync())
+        self.assertEqual(self.ids('机坪'), [])
+
+    def test_broad_matches_use_row_by_row_check(self):
+        with mock.patch.object(self.search, 'BROAD_MATCH_ROWS', 2):
+            self.assertEqual(self.ids('白鹭'), [self.runway.id, self.dump.id])
+            self.assertEqual(self.ids('鱼塘'), [self.pond.id])
+
+    def test_sync_rebuilds_when_journal_was_pruned(self):
+        self.search.sync_index()
+        self.make_record(self.sparrow, location='机坪草地')
+        RecordChange.objects.update(created_at=timezone.now() - timedelta(days=60))
+        self.make_record(self.sparrow, location='停机坪')
+        changes.compact_changes(days=30)
+        self.assertTrue(self.search.sync_index()['rebuilt'])
+        self.assertEqual(len(self.ids('机坪')), 2)
+
+    def test_rebuild_search_index_command(self):
+        out = io.StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('全文索引重建完成: 3 条记录', out.getvalue())
+        self.make_record(self.sparrow, location='鱼塘南侧')
+        out = io.StringIO()
+        call_command('rebuild_search_index', sync=True, stdout=out)
+        self.assertIn('增量同步: 1 条变更', out.getvalue())
+        self.assertEqual(len(self.ids('鱼塘')), 2)
+
+
+class DuplicateDetectionTests(MonitorTestCase):
+    CSV = '\n'.join([
+        '鸟种,数量,位置,纬度,经度,记录时间,入侵原因,备注',
+        '白鹭,5,跑道北侧,40.001,116.001,2024-01-15 08:30:00,觅食,雷达',
+        '白鹭,2,鱼塘,40.5,116.5,2024-01-15 09:00:00,,',
+        '白鹭,7,鱼塘,40.502,116.5,2024-01-15 09:05:00,,巡查补报',
+        '麻雀,4,跑道北侧,40.001,116.001,2024-01-15 08:30:00,,',
+        '白鹭,1,跑道北侧,40.001,116.001,2024-01-15 10:30:00,,',
+    ])
+
+    def setUp(self):
+        super().setUp()
+        self.egret = self.make_species('白鹭')
+        self.make_species('麻雀', 1)
+        self.existing = self.make_record(self.egret, 40.0, 116.0, quantity=2,
+                                         record_time=timezone.make_aware(datetime(2024, 1, 15, 8, 20)))
+
+    def import_csv(self, policy):
+        with override_settings(BIRD_DEDUP_POLICY=policy):
+            self.client.post(reverse('import_xls'), {
+                'import_type': 'bird',
+                'xls_file': SimpleUploadedFile('birds.csv', self.CSV.encode('utf-8'), content_type='text/csv'),
+            })
+        return ImportLog.objects.get()
+
+    def test_flag_policy_marks_duplicates(self):
+        log = self.import_csv('flag')
+        self.assertEqual(log.success_count, 5)
+        self.assertEqual(log.duplicates_flagged, 2)
+        flagged = BirdRecord.objects.filter(duplicate_of__isnull=False).order_by('record_time')
+        pond = BirdRecord.objects.get(quantity=2, location='鱼塘')
+        self.assertEqual([(record.quantity, record.duplicate_of_id) for record in flagged],
+                         [(5, self.existing.id), (7, pond.id)])
+
+    def test_merge_policy_updates_original_records(self):
+        log = self.import_csv('merge')
+        self.assertEqual((log.success_count, log.duplicates_merged), (3, 2))
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.quantity, self.existing.intrusion_reason, self.existing.notes),
+                         (5, '觅食', '雷达'))
+        pond = BirdRecord.objects.get(location='鱼塘')
+        self.assertEqual((pond.quantity, pond.notes), (7, '巡查补报'))
+        self.assertFalse(BirdRecord.objects.filter(duplicate_of__isnull=False).exists())
+
+    def test_skip_policy_drops_duplicates(self):
+        log = self.import_csv('skip')
+        self.assertEqual((log.success_count, log.duplicates_skipped), (3, 2))
+        self.assertEqual(BirdRecord.objects.count(), 4)
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.quantity, 2)
+
+    def test_disabled_policy_imports_everything(self):
+        log = self.import_csv(None)
+        self.assertEqual(log.success_count, 5)
+        self.assertFalse(BirdRecord.objects.filter(duplicate_of__isnull=False).exists())
+
+    def test_add_record_applies_policy(self):
+        def add(policy, quantity):
+            with override_settings(BIRD_DEDUP_POLICY=policy):
+                self.client.post(reverse('add_record'), {
+                    'species': self.egret.id, 'quantity': quantity, 'location': '机坪 东侧', 'reason': '',
+                })
+
+        add('flag', 3)
+        first = BirdRecord.objects.latest('id')
+        # 没有坐标时按规范化的发现位置比较
+        add('flag', 4)
+        self.assertEqual(BirdRecord.objects.latest('id').duplicate_of_id, first.id)
+        add('skip', 5)
+        add('merge', 9)
+        self.assertEqual(BirdRecord.objects.filter(location__startswith='机坪').count(), 2)
+        first.refresh_from_db()
+        self.assertEqual(first.quantity, 9)
+
+    def test_rebuild_fingerprints_after_tolerance_change(self):
+        from . import dedup
+
+        old = self.existing.dedup_fingerprint
+        self.assertEqual(dedup.rebuild_fingerprints(), {'records': 1, 'changed': 0})
+        with override_settings(BIRD_DEDUP_MINUTES=60):
+            self.assertEqual(dedup.rebuild_fingerprints(), {'records': 1, 'changed': 1})
+        self.existing.refresh_from_db()
+        self.assertNotEqual(self.existing.dedup_fingerprint, old)
+
+    def test_invalid_policy(self):
+        from . import dedup
+
+        with self.assertRaisesMessage(ValueError, '不支持的重复记录处理方式'):
+            dedup.resolve([(self.egret.id, {'quantity': 1})], policy='drop')
+
+
+class ImportValidationTests(MonitorTestCase):
+    BIRD_CSV = '\n'.join([
+        '鸟种,数量,位置,纬度,经度,记录时间',
+        '白鹭,3,跑道,40.0,116.0,2024-01-15 08:30:00',
+        '白鹭,2.5,跑道,40.0,116.0,2024-01-15',
+        '白鹭, 4 ,跑道,40.0,116.0,昨天',
+        ',1,跑道,40.0,116.0,',
+        '白鹭,1,跑道,,116.0,',
+        '白鹭,很多,跑道,40.0,116.0,',
+        '白鹭,1,跑道,北纬40,116.0,',
+        '白鹭,1,跑道,95.5,116.0,',
+        '白鹭,1,跑道,40.0,-181,',
+        '麻雀,-2,跑道,40.0,116.0,',
+        '白鹭,1,跑道,nan,116.0,',
+    ])
+    AIRPORT_CSV = '\n'.join([
+        'ident,name,latitude_deg,longitude_deg,elevation_ft,type',
+        'ZBAA,首都,40.08,116.58,116,large_airport',
+        'ZBAD,南苑,39.78,116.38,98.5,unknown',
+        'ZBXX,测试,39.78,116.38,一百,small_airport',
+        'ZBYY,,39.78,116.38,10,small_airport',
+        'ZBZZ,越界,91,116.38,10,small_airport',
+        'ZBWW,越界,39,200,,small_airport',
+    ])
+
+    def setUp(self):
+        super().setUp()
+        self.make_species('白鹭')
+
+    def frame(self, text, import_type):
+        return views.read_import_file(io.StringIO(text), 'rows.csv', import_type)
+
+    def failing_lines(self, checker, rows):
+        validated = checker.lines[checker.failed].tolist()
+        imported = [row[0] for row in rows if row[-1] is not None]
+        return validated, imported
+
+    def test_bird_validation_matches_import(self):
+        from .validation import validate_bird_frame
+
+        df = self.frame(self.BIRD_CSV, 'bird')
+        validated, imported = self.failing_lines(validate_bird_frame(df), views.iter_bird_rows(df))
+        self.assertEqual(validated, imported)
+        self.assertEqual(imported, [3, 5, 6, 7, 8, 9, 10, 12])
+
+    def test_numeric_quantity_column_matches_import(self):
+        from .validation import validate_bird_frame
+
+        df = self.frame(self.BIRD_CSV, 'bird')
+        df = df[df['数量'].isin(['3', '2.5', '-2'])].copy()
+        df['数量'] = df['数量'].astype(float)
+        df.loc[df.index[0], '数量'] = float('inf')
+        checker = validate_bird_frame(df)
+        validated, imported = self.failing_lines(checker, views.iter_bird_rows(df))
+        self.assertEqual(validated, imported)
+        self.assertEqual(imported, [2])
+        # 数字列中的小数导入时舍去小数，只是提醒
+        self.assertIn('quantity_fractional', [issue['code'] for issue in checker.issues])
+
+    def test_airport_validation_matches_import(self):
+        from .validation import validate_airport_frame
+
+        df = self.frame(self.AIRPORT_CSV, 'airport')
+        validated, imported = self.failing_lines(validate_airport_frame(df), views.iter_airport_rows(df))
+        self.assertEqual(validated, imported)
+        self.assertEqual(imported, [3, 4, 5, 6, 7])
+
+    def test_report_lists_issue_ranges(self):
+        from .validation import line_ranges, validate_frame
+
+        report = validate_frame(self.frame(self.BIRD_CSV, 'bird'), 'bird')
+        self.assertEqual((report['total_rows'], report['error_rows'], report['valid_rows']), (11, 8, 3))
+        issues = {issue['code']: issue for issue in report['issues']}
+        self.assertEqual(issues['quantity_invalid']['rows'], '3, 7')
+        self.assertEqual(issues['quantity_invalid']['samples'], ['2.5', '很多'])
+        self.assertEqual(issues['latitude_out_of_range']['rows'], '9')
+        self.assertEqual(issues['time_invalid']['rows'], '4')
+        self.assertEqual(issues['species_unknown']['rows'], '11')
+        self.assertEqual(line_ranges([2, 3, 4, 9, 48000, 48001]), '2-4, 9, 48000-48001')
+        missing = validate_frame(self.frame('鸟种,数量\n白鹭,1\n', 'bird'), 'bird')
+        self.assertEqual(missing['missing_columns'], ['位置', '纬度', '经度'])
+
+    def test_out_of_range_rows_fail_on_import(self):
+        self.client.post(reverse('import_xls'), {
+            'import_type': 'bird',
+            'xls_file': SimpleUploadedFile('birds.csv', self.BIRD_CSV.encode('utf-8'), content_type='text/csv'),
+        })
+        log = ImportLog.objects.get()
+        self.assertEqual((log.success_count, log.error_count), (3, 8))
+        self.assertIn('第9行: 纬度 95.5 超出 -90 ~ 90', log.error_messages)
+        self.assertFalse(BirdRecord.objects.filter(latitude__gt=90).exists())
+
+
+class TrackLinkingTests(MonitorTestCase):
+    def setUp(self):
+        super().setUp()
+        from . import tracks
+
+        self.tracks = tracks
+        self.egret = self.make_species('白鹭')
+        self.sparrow = self.make_species('麻雀', 1)
+        self.airport = self.make_airport('ZBAA', 40.08, 116.58)
+        # 白鹭群每 10 分钟向北飞 0.05 度 (约 33 km/h)，朝机场飞去
+        self.flock = [self.make_record(self.egret, latitude, 116.58, quantity=quantity, minutes_ago=minutes_ago)
+                      for latitude, quantity, minutes_ago in ((39.90, 5, 40), (39.95, 8, 30), (40.00, 6, 20))]
+        # 同一时间远处的另一只白鹭、附近的麻雀都不接到这条轨迹上
+        self.far = self.make_record(self.egret, 39.95, 117.5, minutes_ago=30)
+        self.other = [self.make_record(self.sparrow, 39.95, 116.58, minutes_ago=minutes_ago)
+                      for minutes_ago in (30, 25)]
+
+    def ids(self, records):
+        return [record.id for record in records]
+
+    def test_update_links_flock_and_predicts_approach(self):
+        stats = self.tracks.TrackLinker().update(self.ids(self.flock + [self.far] + self.other))
+        self.assertEqual(stats, {'records': 6, 'created': 2, 'extended': 0})
+        track = FlockTrack.objects.get(species=self.egret)
+        self.assertEqual(track.record_ids, self.ids(self.flock))
+        self.assertEqual((track.point_count, track.max_quantity), (3, 8))
+        self.assertAlmostEqual(track.heading_deg, 0, delta=0.5)
+        self.assertAlmostEqual(track.speed_kmh, 33.4, delta=0.5)
+        self.assertEqual((track.approach_airport_id, track.approach_level), (self.airport.id, 1))
+        self.assertAlmostEqual(track.approach_minutes, 16, delta=1)
+        self.assertEqual(FlockTrack.objects.get(species=self.sparrow).record_ids, self.ids(self.other))
+
+    def test_update_extends_existing_track(self):
+        linker = self.tracks.TrackLinker()
+        linker.update(self.ids(self.flock))
+        latest = self.make_record(self.egret, 40.05, 116.58, minutes_ago=10)
+        # 已连成轨迹的记录不再处理，远处那条未成轨迹的白鹭记录会再处理一次
+        self.assertEqual(linker.update([latest.id]), {'records': 2, 'created': 0, 'extended': 1})
+        track = FlockTrack.objects.get(species=self.egret)
+        self.assertEqual(track.record_ids, self.ids(self.flock) + [latest.id])
+        # 超出时间间隔或飞行速度的目击开始新的轨迹 (单次目击不保存)
+        late = self.make_record(self.egret, 40.06, 116.58, minutes_ago=-70)
+        fast = self.make_record(self.egret, 40.5, 116.58, minutes_ago=5)
+        self.assertEqual(linker.update([late.id, fast.id])['extended'], 0)
+        self.assertEqual(FlockTrack.objects.get(species=self.egret).point_count, 4)
+
+    def test_rebuild_relinks_and_skips_duplicates(self):
+        self.tracks.TrackLinker().update(self.ids(self.flock + self.other))
+        BirdRecord.objects.filter(pk=self.flock[1].pk).update(duplicate_of=self.flock[0])
+        stats = self.tracks.TrackLinker().rebuild()
+        self.assertEqual(stats['removed'], 2)
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(FlockTrack.objects.get(species=self.egret).record_ids,
+                         [self.flock[0].id, self.flock[2].id])
+        out = io.StringIO()
+        call_command('build_tracks', days=1, stdout=out)
+        self.assertIn('新建 2 条', out.getvalue())
+
+    def test_tracks_api_filters(self):
+        self.tracks.TrackLinker().rebuild()
+        url = reverse('tracks_api')
+        data = self.client.get(url).json()
+        self.assertEqual([track['species'] for track in data], ['白鹭'])
+        self.assertEqual(data[0]['approach_airport'], 'ZBAA')
+        self.assertEqual([point[0] for point in data[0]['path']], [39.90, 39.95, 40.00])
+        self.assertEqual(len(self.client.get(url, {'min_points': 2}).json()), 2)
+        self.assertEqual(len(self.client.get(url, {'min_points': 2, 'species': '麻雀'}).json()), 1)
+        self.assertEqual(len(self.client.get(url, {'min_points': 2, 'approaching': 1}).json()), 1)
+        self.assertEqual(len(self.client.get(url, {'airport': 'ZSPD'}).json()), 0)
+        self.assertEqual(len(self.client.get(url, {'bbox': '116,39,116.5,40.5'}).json()), 0)
+
+    def test_update_tracks_logs_failures(self):
+        self.assertIsNone(self.tracks.update_tracks([]))
+        with mock.patch.object(self.tracks.TrackLinker, 'update', side_effect=RuntimeError), \
+                self.assertLogs('monitor.tracks', 'ERROR'):
+            self.assertIsNone(self.tracks.update_tracks([self.flock[0].id]))
@@ -0,0 +1,327 @@
+"""鸟群轨迹
+
+单条鸟情记录只是一个点，把同一群鸟的连续目击连起来才能看出它是否正飞向机场。
+按记录时间顺序处理：同一鸟种、与轨迹最后一次目击相隔不超过 BIRD_TRACK_MAX_GAP_MINUTES，
+且距离不超过 BIRD_TRACK_MAX_SPEED_KMH x 时间间隔 + BIRD_TRACK_POSITION_KM 的目击接到该轨迹上；
+有多条候选轨迹时，接到按其当前航向和速度外推到该时刻的位置离目击最近的一条。
+
+内存中只保留开放的轨迹 (最后一次目击在时间间隔以内)，轨迹末端按鸟种放在网格索引 (geo.GridIndex) 中，
+每条记录只检查附近网格中的轨迹，不做两两比较。新记录写入后 update_tracks() 只重新处理
+新记录前后各一个时间间隔内的记录：已连成轨迹的记录不再处理，这些轨迹作为开放轨迹载入，可以继续延伸。
+晚到的记录只能接在轨迹末端之后，不会插入已有轨迹的中间；修改参数或补录历史数据后执行 `manage.py build_tracks`。
+
+两次以上目击的轨迹保存在 FlockTrack 表中：按时间排列的记录ID和坐标、最近几次目击的航向和速度，
+以及按航向和速度外推 BIRD_TRACK_HORIZON_MINUTES 分钟内与机场的最近接近 (只考虑设有保护区的机场，见 monitor/zones.py)。
+"""
+import itertools
+import logging
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import FloatField, Func, Max, Min
+from django.utils import timezone
+
+from .geo import KM_PER_LAT_DEGREE, GridIndex, bearing_deg, destination_point, haversine_km, km_to_lat_deg
+
+logger = logging.getLogger(__name__)
+
+# values_list 字段顺序: 记录ID、鸟种ID、纬度、经度、记录时间、数量
+RECORD_FIELDS = ('id', 'species_id', 'latitude', 'longitude', 'record_time', 'quantity')
+# 参与连接的记录：有坐标，且不是标记为重复的记录 (monitor/dedup.py)
+LINKABLE = {'latitude__isnull': False, 'longitude__isnull': False, 'duplicate_of__isnull': True}
+SUMMARY_FIELDS = (
+    'record_ids', 'path', 'point_count', 'max_quantity', 'first_seen', 'last_seen', 'last_latitude',
+    'last_longitude', 'heading_deg', 'speed_kmh', 'approach_airport', 'approach_distance_km',
+    'approach_minutes', 'approach_level', 'updated_at',
+)
+
+TREND_POINTS = 3  # 航向和速度按最近几次目击计算
+STREAM_CHUNK_SIZE = 5000
+ID_CHUNK_SIZE = 5000
+SWEEP_INTERVAL = 1000  # 每处理多少条记录关闭一次超出时间间隔的轨迹
+SAVE_BATCH_SIZE = 500
+
+
+def trend(path):
+    """最近 TREND_POINTS 次目击的 (航向, 速度km/h)，只有一次目击或时间相同时为 (None, None)"""
+    if len(path) < 2:
+        return None, None
+    lat1, lon1, ts1 = path[-TREND_POINTS:][0]
+    lat2, lon2, ts2 = path[-1]
+    if ts2 <= ts1:
+        return None, None
+    speed = haversine_km(lat1, lon1, lat2, lon2) / ((ts2 - ts1) / 3600)
+    return (bearing_deg(lat1, lon1, lat2, lon2) if speed else None), speed
+
+
+def closest_approach(latitude, longitude, heading, travel_km, index=None):
+    """沿航向直线前进 travel_km 公里途中与机场的最近接近，返回 (机场ID, 距离km, 到最近点的前进距离km, 保护区等级)
+
+    只考虑保护区网格覆盖这段路径的机场，没有时返回 None；最近点不在保护区内时等级为 None。
+    """
+    from .zones import current_index
+
+    index = index or current_index()
+    if heading is None:
+        travel_km = 0
+    end_lat, end_lon = destination_point(latitude, longitude, heading, travel_km) if travel_km else (latitude, longitude)
+    candidates = index.airports_in_bbox(min(latitude, end_lat), max(latitude, end_lat),
+                                        min(longitude, end_lon), max(longitude, end_lon))
+    if not candidates:
+        return None
+
+    # 以当前位置为原点的局部平面坐标 (公里)，外推距离不长，误差可以忽略
+    km_per_lon_deg = KM_PER_LAT_DEGREE * math.cos(math.radians(latitude))
+    ux, uy = (math.sin(math.radians(heading)), math.cos(math.radians(heading))) if travel_km else (0.0, 0.0)
+    best = None
+    for position in candidates:
+        x = ((index.longitudes[position] - longitude + 540) % 360 - 180) * km_per_lon_deg
+        y = (index.latitudes[position] - latitude) * KM_PER_LAT_DEGREE
+        along = min(max(x * ux + y * uy, 0.0), travel_km)
+        distance = math.hypot(x - along * ux, y - along * uy)
+        if best is None or distance < best[1]:
+            best = (position, distance, along)
+
+    position, distance, along = best
+    level = next((level for level, radius_km in enumerate(index.radii[position], start=1) if distance <= radius_km),
+                 None)
+    return index.airport_ids[position], distance, along, level
+
+
+class _OpenTrack:
+    """处理过程中的开放轨迹，model 为已保存的 FlockTrack (新轨迹为 None)"""
+
+    __slots__ = ('model', 'species_id', 'record_ids', 'path', 'max_quantity', 'heading', 'speed', 'changed')
+
+    def __init__(self, species_id, model=None):
+        self.model = model
+        self.species_id = species_id
+        self.record_ids = list(model.record_ids) if model else []
+        self.path = [list(point) for point in model.path] if model else []
+        self.max_quantity = model.max_quantity if model else 0
+        self.heading, self.speed = trend(self.path)
+        self.changed = False
+
+    def add(self, record_id, latitude, longitude, timestamp, quantity):
+        self.record_ids.append(record_id)
+        self.path.append([latitude, longitude, timestamp])
+        self.max_quantity = max(self.max_quantity, quantity or 0)
+        self.heading, self.speed = trend(self.path)
+        self.changed = True
+
+    def predict(self, timestamp, max_speed_kmh):
+        """按当前航向和速度外推到 timestamp 时的位置"""
+        latitude, longitude, last_ts = self.path[-1]
+        if self.heading is None:
+            return latitude, longitude
+        distance = min(self.speed, max_speed_kmh) * (timestamp - last_ts) / 3600
+        return destination_point(latitude, longitude, self.heading, distance)
+
+
+class TrackLinker:
+    """增量轨迹连接"""
+
+    def __init__(self, max_speed_kmh=None, max_gap_minutes=None, position_km=None, horizon_minutes=None):
+        self.max_speed_kmh = max_speed_kmh or settings.BIRD_TRACK_MAX_SPEED_KMH
+        self.max_gap = timedelta(minutes=max_gap_minutes or settings.BIRD_TRACK_MAX_GAP_MINUTES)
+        self.position_km = settings.BIRD_TRACK_POSITION_KM if position_km is None else position_km
+        self.horizon_minutes = horizon_minutes or settings.BIRD_TRACK_HORIZON_MINUTES
+        # 时间间隔内可能连接的最远距离，也是网格索引的网格大小
+        self.link_km = self.max_speed_kmh * self.max_gap.total_seconds() / 3600 + self.position_km
+
+    def update(self, record_ids):
+        """新记录写入后调用：重新处理新记录前后各一个时间间隔内的记录"""
+        from .models import FlockTrack
+
+        stats = {'records': 0, 'created': 0, 'extended': 0}
+        intervals = self._intervals(record_ids)
+        longest = None
+        if len(intervals) > 1:
+            # 与时间段重叠的轨迹最迟在 结束时间 + 最长轨迹时长 之前结束，限定每段读取的 last_seen 索引范围
+            days = FlockTrack.objects.aggregate(days=Max(
+                Func('last_seen', function='julianday') - Func('first_seen', function='julianday'),
+                output_field=FloatField()))['days']
+            longest = timedelta(days=days or 0, seconds=1)
+        for start, end, species_ids in intervals:
+            self._link(start, end, species_ids, stats, longest)
+        return stats
+
+    def rebuild(self, since=None):
+        """删除 since 之后开始的轨迹 (为空时删除全部)，重新连接 since 之后的记录"""
+        from .models import BirdRecord, FlockTrack
+
+        tracks = FlockTrack.objects.all() if since is None else FlockTrack.objects.filter(first_seen__gte=since)
+        removed, _ = tracks.delete()
+        stats = {'records': 0, 'created': 0, 'extended': 0, 'removed': removed}
+        start = since or BirdRecord.objects.filter(**LINKABLE).aggregate(start=Min('record_time'))['start']
+        if start is not None:
+            self._link(start, None, None, stats)
+        return stats
+
+    def _intervals(self, record_ids):
+        """新记录前后各一个时间间隔合并后的时间段 [[开始, 结束, 鸟种ID集合]]，按时间排列"""
+        from .models import BirdRecord
+
+        record_ids = list(record_ids)
+        moments = []
+        for offset in range(0, len(record_ids), ID_CHUNK_SIZE):
+            moments.extend(BirdRecord.objects.filter(id__in=record_ids[offset:offset + ID_CHUNK_SIZE], **LINKABLE)
+                           .values_list('record_time', 'species_id'))
+        moments.sort()
+        intervals = []
+        for record_time, species_id in moments:
+            start, end = record_time - self.max_gap, record_time + self.max_gap
+            if intervals and start <= intervals[-1][1]:
+                intervals[-1][1] = end
+                intervals[-1][2].add(species_id)
+            else:
+                intervals.append([start, end, {species_id}])
+        return intervals
+
+    def _link(self, start, end, species_ids, stats, longest=None):
+        """按时间顺序连接 start ~ end 之间尚未连成轨迹的记录"""
+        from .models import BirdRecord, FlockTrack
+
+        tracks = FlockTrack.objects.filter(last_seen__gte=start - self.max_gap)
+        records = BirdRecord.objects.filter(record_time__gte=start, **LINKABLE)
+        if end is not None:
+            tracks = tracks.filter(first_seen__lte=end)
+            records = records.filter(record_time__lte=end)
+        if longest is not None:
+            tracks = tracks.filter(last_seen__lte=end + longest)
+        # 鸟种不作为查询条件 (SQLite 会改用鸟种索引读取该鸟种的全部记录)，读取后再跳过其他鸟种
+
+        gap_seconds = self.max_gap.total_seconds()
+        cell_deg = km_to_lat_deg(self.link_km)
+        keys = itertools.count()
+        open_tracks = {}  # 键 -> _OpenTrack
+        indexes = {}  # 鸟种ID -> 轨迹末端的网格索引
+        linked_ids = set()
+        closed = []
+
+        def place(key, track):
+            latitude, longitude, _ = track.path[-1]
+            indexes.setdefault(track.species_id, GridIndex(cell_deg)).insert(key, latitude, longitude, track)
+
+        for model in tracks:
+            if species_ids is not None and model.species_id not in species_ids:
+                continue
+            key = next(keys)
+            open_tracks[key] = _OpenTrack(model.species_id, model)
+            place(key, open_tracks[key])
+            linked_ids.update(model.record_ids)
+
+        processed = 0
+        for record_id, species_id, latitude, longitude, record_time, quantity in self._stream(records):
+            if record_id in linked_ids or (species_ids is not None and species_id not in species_ids):
+                continue
+            timestamp = int(record_time.timestamp())
+            best = None
+            index = indexes.get(species_id)
+            for key, last_lat, last_lon, track in (index.candidates(latitude, longitude, self.link_km) if index else ()):
+                elapsed = timestamp - track.path[-1][2]
+                if not 0 <= elapsed <= gap_seconds:
+                    continue
+                if haversine_km(last_lat, last_lon, latitude, longitude) > \
+                        self.max_speed_kmh * elapsed / 3600 + self.position_km:
+                    continue
+                score = haversine_km(*track.predict(timestamp, self.max_speed_kmh), latitude, longitude)
+                if best is None or score < best[0]:
+                    best = (score, key, track)
+            if best is None:
+                key, track = next(keys), _OpenTrack(species_id)
+                open_tracks[key] = track
+            else:
+                _, key, track = best
+            track.add(record_id, latitude, longitude, timestamp, quantity)
+            place(key, track)
+
+            processed += 1
+            if processed % SWEEP_INTERVAL == 0:
+                # 关闭超出时间间隔的轨迹，攒够一批后保存
+                for key in [key for key, track in open_tracks.items() if track.path[-1][2] < timestamp - gap_seconds]:
+                    track = open_tracks.pop(key)
+                    indexes[track.species_id].remove(key)
+                    closed.append(track)
+                if len(closed) >= SAVE_BATCH_SIZE:
+                    self._save(closed, stats)
+                    closed = []
+
+        closed.extend(open_tracks.values())
+        self._save(closed, stats)
+        stats['records'] += processed
+
+    def _stream(self, records):
+        """按 (记录时间, ID) 分批读取，每批一次查询 (处理过程中会写入轨迹，不保持读游标)"""
+        records = records.order_by('record_time', 'id')
+        last = None
+        while True:
+            batch = records
+            if last is not None:
+                # 不用 OR 条件，SQLite 才能从索引中的上次位置开始读取
+                batch = records.filter(record_time__gte=last[0]).exclude(record_time=last[0], id__lte=last[1])
+            rows = list(batch.values_list(*RECORD_FIELDS)[:STREAM_CHUNK_SIZE])
+            yield from rows
+            if len(rows) < STREAM_CHUNK_SIZE:
+                return
+            last = (rows[-1][4], rows[-1][0])
+
+    def _save(self, tracks, stats):
+        """保存有变化且不少于两次目击的轨迹"""
+        from .models import FlockTrack
+        from .zones import current_index
+
+        tracks = [track for track in tracks if track.changed and len(track.path) >= 2]
+        if not tracks:
+            return
+        index = current_index()
+        created, updated = [], []
+        for track in tracks:
+            fields = self._summary(track, index)
+            if track.model is None:
+                created.append(FlockTrack(species_id=track.species_id, **fields))
+            else:
+                for name, value in fields.items():
+                    setattr(track.model, name, value)
+                updated.append(track.model)
+        with transaction.atomic():
+            FlockTrack.objects.bulk_create(created, batch_size=SAVE_BATCH_SIZE)
+            FlockTrack.objects.bulk_update(updated, SUMMARY_FIELDS, batch_size=SAVE_BATCH_SIZE)
+        stats['created'] += len(created)
+        stats['extended'] += len(updated)
+
+    def _summary(self, track, index):
+        latitude, longitude, _ = track.path[-1]
+        travel_km = min(track.speed or 0, self.max_speed_kmh) * self.horizon_minutes / 60
+        approach = closest_approach(latitude, longitude, track.heading, travel_km, index)
+        airport_id, distance, along, level = approach or (None, None, None, None)
+        return {
+            'record_ids': track.record_ids,
+            'path': track.path,
+            'point_count': len(track.path),
+            'max_quantity': track.max_quantity,
+            'first_seen': datetime.fromtimestamp(track.path[0][2], tz=dt_timezone.utc),
+            'last_seen': datetime.fromtimestamp(track.path[-1][2], tz=dt_timezone.utc),
+            'last_latitude': latitude,
+            'last_longitude': longitude,
+            'heading_deg': track.heading,
+            'speed_kmh': track.speed,
+            'approach_airport_id': airport_id,
+            'approach_distance_km': distance,
+            'approach_minutes': along / track.speed * 60 if along else (0.0 if approach else None),
+            'approach_level': level,
+            'updated_at': timezone.now(),
+        }
+
+
+def update_tracks(record_ids):
+    """写入新记录后连接轨迹；失败只记录日志，不影响记录写入"""
+    if not record_ids:
+        return None
+    try:
+        return TrackLinker().update(record_ids)
+    except Exception:
+        logger.exception('轨迹连接失败')
+        return None
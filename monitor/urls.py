@@ -1,19 +1,36 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+
+def read_api(name):
+    """BIRD_ASYNC_API 开启时使用读取接口的异步版本"""
+    return getattr(views, f'{name}_async' if settings.BIRD_ASYNC_API else name)
+
+
 urlpatterns = [
     path('', views.map_final, name='map_final'),
     path('dashboard/', views.dashboard, name='dashboard'),
     path('list/', views.record_list, name='record_list'),
     path('add/', views.add_record, name='add_record'),
+    path('export/', views.export_view, name='export'),
     path('import-xls/', views.import_xls_view, name='import_xls'),
     path('logs/', views.logs_view, name='logs'),
     path('import-log/<int:log_id>/', views.import_log_detail_view, name='import_log_detail'),
     path('realtime-log/<int:log_id>/', views.realtime_log_view, name='realtime_log'),
-    path('api/log-stream/<int:log_id>/', views.api_log_stream, name='log_stream_api'),
+    path('api/log-stream/<int:log_id>/', read_api('api_log_stream'), name='log_stream_api'),
     path('api/project-log-stream/', views.project_log_stream, name='project_log_stream'),
-    path('api/data/', views.api_dashboard_data, name='api_dashboard_data'),
-    path('api/bird-records/', views.api_bird_records, name='bird_records_api'),
-    path('api/airports/', views.api_airports, name='airports_api'),
-    path('api/airports-full/', views.api_airports_full, name='airports_full_api'),
-]
\ No newline at end of file
+    path('api/data/', read_api('api_dashboard_data'), name='api_dashboard_data'),
+    path('api/bird-records/', read_api('api_bird_records'), name='bird_records_api'),
+    path('api/bird-records/changes/', views.api_bird_record_changes, name='bird_record_changes_api'),
+    path('api/bird-records/search/', views.api_search_bird_records, name='bird_records_search_api'),
+    path('api/map-bootstrap/', views.api_map_bootstrap, name='map_bootstrap_api'),
+    path('api/hotspots/', views.api_hotspots, name='hotspots_api'),
+    path('api/tracks/', views.api_tracks, name='tracks_api'),
+    path('api/airport-zones/', views.api_airport_zones, name='airport_zones_api'),
+    path('api/alerts/', views.api_alerts, name='alerts_api'),
+    path('api/alerts/stream/', views.api_alert_stream, name='alert_stream'),
+    path('api/airports/', read_api('api_airports'), name='airports_api'),
+    path('api/airports-full/', read_api('api_airports_full'), name='airports_full_api'),
+    path('metrics', views.metrics_view, name='metrics'),
+]
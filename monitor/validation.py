@@ -0,0 +1,239 @@
+"""导入预检 (dry run)
+
+在写入之前按列向量化执行与导入相同的校验 (pandas)，不写数据库，只读取已有的鸟种名称和机场标识符。
+结果按问题类型汇总为行号区间 (与导入日志相同，数据第一行为第 2 行)：
+error 的行导入时会失败，warning 的行可以导入但结果可能与预期不同 (如新建鸟种、时间按导入时间记录)。
+会失败的行与导入时逐行校验 (views.iter_bird_rows / iter_airport_rows) 的结果一致。
+"""
+import time
+from datetime import datetime
+
+MAX_RANGES = 20  # 每类问题最多列出的行号区间
+MAX_SAMPLES = 5  # 每类问题最多列出的示例值
+
+# 问题代码 -> (级别, 说明)
+ISSUES = {
+    'species_missing': ('error', '鸟种名称为空'),
+    'quantity_invalid': ('error', '数量为空、不是数字或是带小数的文本'),
+    'coordinates_missing': ('error', '纬度或经度为空'),
+    'latitude_invalid': ('error', '纬度不是数字'),
+    'longitude_invalid': ('error', '经度不是数字'),
+    'latitude_out_of_range': ('error', '纬度超出 -90 ~ 90'),
+    'longitude_out_of_range': ('error', '经度超出 -180 ~ 180'),
+    'quantity_not_positive': ('warning', '数量不大于 0'),
+    'quantity_fractional': ('warning', '数量不是整数 (导入时舍去小数)'),
+    'time_invalid': ('warning', '记录时间无法解析 (导入时记为导入时间)'),
+    'species_unknown': ('warning', '鸟种不存在 (导入时新建，危险等级 3)'),
+    'ident_or_name_missing': ('error', '机场标识符或名称为空'),
+    'elevation_invalid': ('error', '海拔高度不是数字或是带小数的文本'),
+    'ident_duplicate': ('error', '机场标识符在文件中重复 (只导入第一行)'),
+    'ident_exists': ('error', '机场标识符已存在 (跳过)'),
+    'airport_type_unknown': ('warning', '机场类型未知 (导入时记为小型机场)'),
+}
+
+
+def line_ranges(lines):
+    """把升序行号压缩为区间文本，如 "2-5, 9, 48000-48002"，区间过多时只列出前 MAX_RANGES 个"""
+    import numpy as np
+
+    lines = np.asarray(lines)
+    if not len(lines):
+        return ''
+    breaks = np.flatnonzero(np.diff(lines) != 1)
+    starts = lines[np.r_[0, breaks + 1]]
+    ends = lines[np.r_[breaks, len(lines) - 1]]
+    parts = [str(start) if start == end else f'{start}-{end}'
+             for start, end in zip(starts[:MAX_RANGES].tolist(), ends[:MAX_RANGES].tolist())]
+    if len(starts) > MAX_RANGES:
+        parts.append(f'… 共 {len(starts)} 段')
+    return ', '.join(parts)
+
+
+class _Checker:
+    """收集各类问题的行掩码"""
+
+    def __init__(self, df):
+        import numpy as np
+
+        self.lines = np.asarray(df.index) + 2
+        self.failed = np.zeros(len(df), dtype=bool)  # 已有 error 的行，导入时不会执行后面的检查
+        self.warned = np.zeros(len(df), dtype=bool)
+        self.issues = []
+
+    def add(self, code, column, mask, values=None):
+        """登记问题，mask 为命中的行；error 类问题只统计之前没有出错的行 (与导入时逐行检查的顺序一致)"""
+        import numpy as np
+
+        level, label = ISSUES[code]
+        mask = np.asarray(mask, dtype=bool) & ~self.failed
+        if level == 'error':
+            self.failed |= mask
+        else:
+            self.warned |= mask
+        count = int(mask.sum())
+        if not count:
+            return
+        samples = []
+        if values is not None:
+            values = values[mask & values.notna().to_numpy()]
+            samples = [str(value) for value in values.drop_duplicates().head(MAX_SAMPLES).tolist()]
+        self.issues.append({
+            'code': code,
+            'level': level,
+            'label': label,
+            'column': column,
+            'count': count,
+            'rows': line_ranges(self.lines[mask]),
+            'samples': samples,
+        })
+
+
+def _text(series):
+    """与导入时的 _clean_text 相同：空单元格为空字符串，其余转为去掉首尾空白的字符串"""
+    return series.where(series.notna(), '').astype(str).str.strip()
+
+
+def _numbers(df, column, checker, code):
+    """数字列：不为空但不是数字的行登记 code，返回转换后的列 (空值和非数字为 NaN)"""
+    import pandas as pd
+
+    values = df[column]
+    numbers = pd.to_numeric(values, errors='coerce')
+    checker.add(code, column, values.notna() & numbers.isna(), values)
+    return numbers
+
+
+def _integers(df, column):
+    """与导入时的 int() 转换相同：文本只接受整数写法 (如 "2.5" 导入时失败)，数字舍去小数；
+    返回转换后的列，无法转换的值 (含无穷大) 为 NaN"""
+    import numpy as np
+    import pandas as pd
+
+    values = df[column]
+    numbers = pd.to_numeric(values, errors='coerce')
+    is_text = (values.map(type) == str).to_numpy()
+    if is_text.any():
+        bad_text = np.zeros(len(values), dtype=bool)
+        bad_text[is_text] = ~values[is_text].str.strip().str.fullmatch(r'[+-]?\d+').to_numpy(dtype=bool)
+        numbers = numbers.mask(bad_text)
+    return numbers.where(np.isfinite(numbers))
+
+
+def _check_coordinates(df, checker, lat_column, lon_column):
+    latitude = _numbers(df, lat_column, checker, 'latitude_invalid')
+    longitude = _numbers(df, lon_column, checker, 'longitude_invalid')
+    checker.add('latitude_out_of_range', lat_column, latitude.abs() > 90, df[lat_column])
+    checker.add('longitude_out_of_range', lon_column, longitude.abs() > 180, df[lon_column])
+
+
+def _valid_times(values):
+    """记录时间能否按导入时的规则解析：日期时间单元格，或 RECORD_TIME_FORMATS 之一的字符串 (返回布尔数组)"""
+    import numpy as np
+    import pandas as pd
+    from .views import RECORD_TIME_FORMATS
+
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return np.ones(len(values), dtype=bool)
+    valid = np.zeros(len(values), dtype=bool)
+    is_text = (values.map(type) == str).to_numpy()
+    # 每种格式只解析前面的格式没有解析成功的字符串
+    positions = np.flatnonzero(is_text)
+    text = values.iloc[positions].str.strip()
+    for fmt in RECORD_TIME_FORMATS:
+        if not len(positions):
+            break
+        parsed = pd.to_datetime(text, format=fmt, errors='coerce').notna().to_numpy()
+        valid[positions[parsed]] = True
+        positions, text = positions[~parsed], text[~parsed]
+    others = np.flatnonzero(~is_text & values.notna().to_numpy())
+    valid[others] = [isinstance(value, datetime) for value in values.iloc[others]]
+    return valid
+
+
+def validate_bird_frame(df):
+    from .models import BirdSpecies
+
+    # 检查顺序与导入时逐行校验 (iter_bird_rows) 相同，每行只计入第一个错误
+    checker = _Checker(df)
+    species = _text(df['鸟种'])
+    checker.add('species_missing', '鸟种', species == '')
+    checker.add('coordinates_missing', '纬度/经度', df['纬度'].isna() | df['经度'].isna())
+    quantity = _integers(df, '数量')
+    checker.add('quantity_invalid', '数量', quantity.isna(), df['数量'])
+    _check_coordinates(df, checker, '纬度', '经度')
+    checker.add('quantity_not_positive', '数量', quantity <= 0, df['数量'])
+    checker.add('quantity_fractional', '数量', quantity % 1 != 0, df['数量'])
+    if '记录时间' in df.columns:
+        values = df['记录时间']
+        checker.add('time_invalid', '记录时间', values.notna() & ~_valid_times(values), values)
+    known = set(BirdSpecies.objects.values_list('name', flat=True))
+    checker.add('species_unknown', '鸟种', ~species.isin(known), species)
+    return checker
+
+
+def validate_airport_frame(df):
+    from .models import Airport
+
+    checker = _Checker(df)
+    ident = _text(df['ident'])
+    checker.add('ident_or_name_missing', 'ident/name', (ident == '') | (_text(df['name']) == ''))
+    checker.add('coordinates_missing', 'latitude_deg/longitude_deg',
+                df['latitude_deg'].isna() | df['longitude_deg'].isna())
+    if 'elevation_ft' in df.columns:
+        elevation = df['elevation_ft']
+        checker.add('elevation_invalid', 'elevation_ft', elevation.notna() & _integers(df, 'elevation_ft').isna(),
+                    elevation)
+    _check_coordinates(df, checker, 'latitude_deg', 'longitude_deg')
+    # 通过校验的行按顺序写入：文件中重复的标识符只有第一行成功，已存在的标识符跳过
+    valid = ~checker.failed
+    checker.add('ident_duplicate', 'ident', ident.where(valid).duplicated(keep='first'), ident)
+    checker.add('ident_exists', 'ident', ident.isin(set(Airport.objects.values_list('ident', flat=True))), ident)
+    if 'type' in df.columns:
+        airport_type = _text(df['type'])
+        known_types = {code for code, _ in Airport.AIRPORT_TYPES}
+        checker.add('airport_type_unknown', 'type', (airport_type != '') & ~airport_type.isin(known_types),
+                    airport_type)
+    return checker
+
+
+def validate_frame(df, import_type):
+    """校验导入的 DataFrame，返回汇总报告
+
+    {'total_rows', 'valid_rows', 'error_rows', 'warning_rows', 'missing_columns', 'issues': [...], 'seconds'}，
+    issues 按 error 在前、行数从多到少排列，每项包含 code / level / label / column / count / rows / samples。
+    """
+    from .views import missing_import_columns
+
+    started = time.perf_counter()
+    report = {
+        'import_type': import_type,
+        'total_rows': len(df),
+        'missing_columns': missing_import_columns(df, import_type),
+        'issues': [],
+    }
+    if report['missing_columns']:
+        report.update(valid_rows=0, error_rows=len(df), warning_rows=0,
+                      seconds=round(time.perf_counter() - started, 3))
+        return report
+
+    checker = validate_airport_frame(df) if import_type == 'airport' else validate_bird_frame(df)
+    error_rows = int(checker.failed.sum())
+    report['issues'] = sorted(checker.issues, key=lambda issue: (issue['level'] != 'error', -issue['count']))
+    report['valid_rows'] = len(df) - error_rows
+    report['error_rows'] = error_rows
+    report['warning_rows'] = int((checker.warned & ~checker.failed).sum())
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def validate_file(path, file_name, import_type, sheet_name=None):
+    """读取文件并预检，返回报告 (另含 file_name 和 read_seconds)；文件无法读取时报告中有 error"""
+    from .views import read_import_file
+
+    started = time.perf_counter()
+    try:
+        df = read_import_file(path, file_name.lower(), import_type, sheet_name)
+    except Exception as e:
+        return {'file_name': file_name, 'error': f'文件读取失败: {e}'}
+    read_seconds = round(time.perf_counter() - started, 3)
+    return dict(validate_frame(df, import_type), file_name=file_name, read_seconds=read_seconds)
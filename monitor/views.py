@@ -1,9 +1,37 @@
+import asyncio
+import functools
+import gzip
+import json
+import threading
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render, redirect
-from django.http import JsonResponse, StreamingHttpResponse
-from .models import BirdRecord, BirdSpecies, Airport, ImportLog
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from .models import BirdRecord, BirdSpecies, Airport, ImportLog, Hotspot, FlockTrack, Alert
+from .hotspots import update_hotspots
+from .tracks import update_tracks
+from .alerts import broadcaster as alert_broadcaster, evaluate_records, serialize_alert
+from .filters import filter_bird_records, filter_airports, parse_bbox
+from . import exporters
+from . import lookups
+from . import archive
+from . import bootstrap
+from . import changes
+from . import dedup
+from . import metrics
+from . import search
+from . import validation
+from . import zones
+from .excel_reader import read_excel
+from .profiling import ImportProfiler
+from .writer import writer as db_writer
 from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
 from django.utils import timezone
-from datetime import datetime
+from datetime import datetime, timedelta
 
 def dashboard(request):
     # Basic stats
@@ -19,23 +47,70 @@ def dashboard(request):
     return render(request, 'monitor/index.html', context)
 
 def record_list(request):
-    records = BirdRecord.objects.all().order_by('-record_time')
-    return render(request, 'monitor/record_list.html', {'records': records})
+    records = filter_bird_records(BirdRecord.objects.select_related('species'), request.GET).order_by('-record_time')
+
+    # 分页显示，避免一次渲染全部记录
+    from django.core.paginator import Paginator
+    paginator = Paginator(records, 50)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    context = {
+        'page_obj': page_obj,
+        'records': page_obj.object_list,
+        'species_list': BirdSpecies.objects.order_by('name'),
+        'filters': request.GET,
+    }
+    return render(request, 'monitor/record_list.html', context)
+
+def export_view(request):
+    """数据导出 - 流式输出，筛选参数与记录列表一致"""
+    dataset = request.GET.get('dataset', 'records')  # records 或 airports
+    fmt = request.GET.get('format', 'csv')
+
+    if dataset not in exporters.EXPORT_DATASETS or fmt not in exporters.EXPORT_FORMATS:
+        return JsonResponse({'error': f'不支持的导出类型: {dataset}/{fmt}'}, status=400)
+
+    queryset = exporters.base_queryset(dataset)
+    if dataset == 'records':
+        queryset = filter_bird_records(queryset, request.GET)
+    else:
+        queryset = filter_airports(queryset, request.GET)
+
+    try:
+        stream = exporters.iter_export(dataset, fmt, queryset)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    content_type = exporters.EXPORT_FORMATS[fmt][0]
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{exporters.export_file_name(dataset, fmt)}"'
+    response['X-Accel-Buffering'] = 'no'  # 禁用nginx缓冲，边查询边下载
+    return response
 
 def add_record(request):
     if request.method == 'POST':
-        species_id = request.POST.get('species')
+        from django.db import transaction
+
+        species_id = int(request.POST.get('species'))
         quantity = int(request.POST.get('quantity'))
         location = request.POST.get('location')
         reason = request.POST.get('reason')
-        
-        species = BirdSpecies.objects.get(id=species_id)
-        BirdRecord.objects.create(
-            species=species,
-            quantity=quantity,
-            location=location,
-            intrusion_reason=reason
-        )
+        record_data = {'quantity': quantity, 'location': location, 'intrusion_reason': reason}
+
+        # 与已有记录重复时按 BIRD_DEDUP_POLICY 标记、合并或跳过
+        with transaction.atomic():
+            action = dedup.resolve([(species_id, record_data)])[0]
+            if action is not None and action[0] != 'flag':
+                return redirect('record_list')
+            record = BirdRecord.objects.create(
+                species_id=species_id,
+                duplicate_of_id=action[1][1] if action else None,
+                **record_data
+            )
+        evaluate_records([record])
+        update_hotspots([record.id])
+        update_tracks([record.id])
+        search.sync_after_commit()
         return redirect('record_list')
     
     species_list = BirdSpecies.objects.all()
@@ -43,24 +118,52 @@ def add_record(request):
 
 def api_dashboard_data(request):
     # Data for charts
+    # 早于归档截止时间的部分从列式归档读取，之后的部分 (以及归档后补录、修改的记录) 查询实时库
+    cutoff, live_filter, stale_ids = archive.analytics_split()
+    start = _dashboard_start(request)
+    species_query, daily_query = _dashboard_queries(live_filter, start)
+
     # 1. Species distribution
-    species_data = BirdRecord.objects.values('species__name').annotate(total=Sum('quantity')).order_by('-total')
-    
-    # 2. Daily trend (last 7 days)
-    last_7_days = timezone.now() - datetime.timedelta(days=7)
-    daily_data = BirdRecord.objects.filter(record_time__gte=last_7_days)\
-        .extra(select={'day': 'date(record_time)'})\
+    species_totals = archive.archived_species_totals(end=cutoff, exclude_ids=stale_ids) if cutoff else {}
+    _merge_counts(species_totals, ((item['species__name'], item['total']) for item in species_query))
+
+    # 2. Daily trend (default last 7 days)
+    daily_counts = {}
+    if cutoff and start < cutoff:
+        daily_counts = archive.archived_daily_counts(start=start, end=cutoff, exclude_ids=stale_ids)
+    _merge_counts(daily_counts, ((item['day'], item['count']) for item in daily_query))
+
+    return JsonResponse(_dashboard_payload(species_totals, daily_counts))
+
+def _dashboard_start(request):
+    days = min(int(request.GET.get('days', 7)), 3660)
+    return timezone.now() - timedelta(days=days)
+
+def _dashboard_queries(live_filter, start):
+    """看板的两个实时库聚合查询 (鸟种数量合计、每日记录数)，有归档时只覆盖归档中没有的记录"""
+    live_records = BirdRecord.objects.all()
+    if live_filter is not None:
+        live_records = live_records.filter(live_filter)
+    species_query = live_records.values('species__name').annotate(total=Sum('quantity'))
+    daily_query = live_records.filter(record_time__gte=start)\
+        .annotate(day=TruncDate('record_time'))\
         .values('day')\
-        .annotate(count=Count('id'))\
-        .order_by('day')
-        
-    data = {
-        'species_labels': [item['species__name'] for item in species_data],
-        'species_values': [item['total'] for item in species_data],
-        'daily_labels': [item['day'] for item in daily_data],
-        'daily_values': [item['count'] for item in daily_data],
+        .annotate(count=Count('id'))
+    return species_query, daily_query
+
+def _merge_counts(totals, items):
+    for key, value in items:
+        totals[key] = totals.get(key, 0) + value
+
+def _dashboard_payload(species_totals, daily_counts):
+    species_data = sorted(species_totals.items(), key=lambda item: item[1], reverse=True)
+    daily_items = sorted(daily_counts.items())
+    return {
+        'species_labels': [name for name, _ in species_data],
+        'species_values': [total for _, total in species_data],
+        'daily_labels': [day.strftime('%Y-%m-%d') for day, _ in daily_items],
+        'daily_values': [count for _, count in daily_items],
     }
-    return JsonResponse(data)
 
 def map_simple(request):
     """极简化地图视图"""
@@ -93,82 +196,360 @@ def map_test(request):
 
 def api_bird_records(request):
     """API: 获取所有有坐标的鸟情记录"""
-    records = BirdRecord.objects.filter(
-        latitude__isnull=False,
-        longitude__isnull=False
-    ).select_related('species')
+    rows = _bird_records_query().values(*BIRD_RECORD_API_FIELDS)
+    data = [_serialize_bird_record(row) for row in rows]
+    return JsonResponse(data, safe=False)
+
+# 地图接口输出的记录字段 (按 values 读取，不实例化模型)
+BIRD_RECORD_API_FIELDS = (
+    'id', 'species__name', 'quantity', 'location', 'latitude', 'longitude',
+    'risk_level', 'record_time', 'intrusion_reason', 'notes',
+)
+
+def _bird_records_query():
+    return BirdRecord.objects.filter(latitude__isnull=False, longitude__isnull=False).order_by('id')
+
+def _serialize_bird_record(row):
+    return {
+        'id': row['id'],
+        'species': row['species__name'],
+        'quantity': row['quantity'],
+        'location': row['location'],
+        'latitude': row['latitude'],
+        'longitude': row['longitude'],
+        'risk_level': row['risk_level'],
+        'record_time': row['record_time'].strftime('%Y-%m-%d %H:%M'),
+        'intrusion_reason': row['intrusion_reason'],
+        'notes': row['notes']
+    }
+
+def api_bird_record_changes(request):
+    """API: 鸟情记录增量同步 (变更日志见 monitor/changes.py)
+
+    不带 since 时只返回当前序号，客户端先取序号再加载全部记录；带 since 时返回之后新增或修改的记录
+    (字段与 /api/bird-records/ 相同) 和删除的记录 ID。reset 为 true 时客户端需要重新加载全部记录，
+    has_more 为 true 时以返回的 seq 继续请求。
+    """
+    since = request.GET.get('since')
+    delta = changes.changes_since(int(since) if since else None)
+    upserts = []
+    if delta['upserts']:
+        rows = _bird_records_query().filter(id__in=delta['upserts']).values(*BIRD_RECORD_API_FIELDS)
+        upserts = [_serialize_bird_record(row) for row in rows]
+    # 已被删除或没有坐标的记录按删除处理，与全部记录接口的范围一致
+    present = {record['id'] for record in upserts}
+    deletes = delta['deletes'] + [record_id for record_id in delta['upserts'] if record_id not in present]
+    return JsonResponse({
+        'seq': delta['seq'],
+        'reset': delta['reset'],
+        'has_more': delta['has_more'],
+        'upserts': upserts,
+        'deletes': deletes,
+    })
+
+def api_search_bird_records(request):
+    """API: 全文检索鸟情记录的位置、入侵原因、备注和鸟种名称 (monitor/search.py)
+
+    q 为搜索词 (空格分隔的关键字同时匹配，OR 分隔的任一组匹配)，可以组合 species、risk_level、
+    start / end 和 bbox 筛选；按记录时间倒序返回最多 limit 条 (默认 100，最多 1000)。
+    搜索不写数据库，索引还有未同步的变更时 stale 为 true (同步在写入完成后由单写线程执行)
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'error': '缺少搜索词 q'}, status=400)
+
+    limit = max(1, min(int(request.GET.get('limit', 100)), 1000))
+    # 先加其他筛选条件，逐条检查全文匹配时先排除不符合条件的记录
+    records = search.filter_matching(filter_bird_records(BirdRecord.objects.all(), request.GET), query)
+    rows = list(records.order_by('-record_time').values(*BIRD_RECORD_API_FIELDS)[:limit + 1])
+    return JsonResponse({
+        'query': query,
+        'stale': search.needs_sync(),
+        'has_more': len(rows) > limit,
+        'results': [_serialize_bird_record(row) for row in rows[:limit]],
+    })
+
+def api_map_bootstrap(request):
+    """API: 地图启动数据包 (monitor/bootstrap.py)，gzip 压缩后缓存，ETag 为数据包版本
+
+    支持 tier (机场分层) 和 days (最近天数)，客户端加载后从返回的 seq 开始增量同步记录变更
+    """
+    try:
+        days = int(request.GET['days']) if request.GET.get('days') else None
+        version, payload = bootstrap.get_bundle(request.GET.get('tier'), days)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    etag = f'"{version}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = HttpResponse(payload, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(gzip.decompress(payload), content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+def api_hotspots(request):
+    """API: 获取当前鸟群聚集热点"""
+    hotspots = Hotspot.objects.select_related('dominant_species', 'nearest_airport')
+
+    airport = request.GET.get('airport', '')  # 按机场标识符、ICAO 或 IATA 代码筛选
+    if airport:
+        airport_id = lookups.airport_id(airport)
+        hotspots = hotspots.filter(nearest_airport_id=airport_id) if airport_id else hotspots.none()
 
     data = []
-    for record in records:
+    for hotspot in hotspots:
         data.append({
-            'id': record.id,
-            'species': record.species.name,
-            'quantity': record.quantity,
-            'location': record.location,
-            'latitude': record.latitude,
-            'longitude': record.longitude,
-            'risk_level': record.risk_level,
-            'record_time': record.record_time.strftime('%Y-%m-%d %H:%M'),
-            'intrusion_reason': record.intrusion_reason,
-            'notes': record.notes
+            'id': hotspot.id,
+            'latitude': hotspot.centroid_latitude,
+            'longitude': hotspot.centroid_longitude,
+            'member_count': hotspot.member_count,
+            'total_quantity': hotspot.total_quantity,
+            'dominant_species': hotspot.dominant_species.name if hotspot.dominant_species else None,
+            'nearest_airport': hotspot.nearest_airport.ident if hotspot.nearest_airport else None,
+            'nearest_airport_name': hotspot.nearest_airport.name if hotspot.nearest_airport else None,
+            'airport_distance_km': round(hotspot.airport_distance_km, 2) if hotspot.airport_distance_km is not None else None,
+            'first_seen': hotspot.first_seen.strftime('%Y-%m-%d %H:%M'),
+            'last_seen': hotspot.last_seen.strftime('%Y-%m-%d %H:%M'),
         })
 
     return JsonResponse(data, safe=False)
 
-def api_airports(request):
-    """API: 获取机场数据"""
-    country = request.GET.get('country', '')  # 国家筛选
-    airport_type = request.GET.get('type', '')  # 类型筛选
-
-    airports = Airport.objects.all()
+def api_tracks(request):
+    """API: 鸟群轨迹 (monitor/tracks.py)，按最近目击时间倒序
+
+    支持 hours (最近目击在多少小时内，默认 24)、species (ID或名称)、airport (最近接近的机场)、
+    approaching=1 (只返回外推后将进入机场保护区的轨迹)、bbox (按最近位置)、
+    min_points (最少目击次数，默认 BIRD_TRACK_MIN_POINTS)、limit (默认 500，最多 5000)
+    """
+    hours = max(1, min(int(request.GET.get('hours', 24)), 24 * 366))
+    min_points = max(2, int(request.GET.get('min_points', settings.BIRD_TRACK_MIN_POINTS)))
+    limit = max(1, min(int(request.GET.get('limit', 500)), 5000))
+    tracks = FlockTrack.objects.filter(last_seen__gte=timezone.now() - timedelta(hours=hours),
+                                       point_count__gte=min_points)
+
+    species = request.GET.get('species', '').strip()
+    if species:
+        tracks = tracks.filter(species_id=int(species) if species.isdigit() else lookups.species_id(species))
+    airport = request.GET.get('airport', '')
+    if airport:
+        airport_id = lookups.airport_id(airport)
+        tracks = tracks.filter(approach_airport_id=airport_id) if airport_id else tracks.none()
+    if request.GET.get('approaching'):
+        tracks = tracks.filter(approach_level__isnull=False)
+    bbox = parse_bbox(request.GET.get('bbox', ''))
+    if bbox:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        tracks = tracks.filter(last_longitude__gte=min_lon, last_longitude__lte=max_lon,
+                               last_latitude__gte=min_lat, last_latitude__lte=max_lat)
+
+    current_tz = timezone.get_current_timezone()
+    data = []
+    for track in tracks.select_related('species', 'approach_airport')[:limit]:
+        airport = track.approach_airport
+        data.append({
+            'id': track.id,
+            'species': track.species.name,
+            'record_ids': track.record_ids,
+            # [[纬度, 经度, 记录时间]]
+            'path': [[lat, lon, datetime.fromtimestamp(ts, tz=current_tz).strftime('%Y-%m-%d %H:%M')]
+                     for lat, lon, ts in track.path],
+            'point_count': track.point_count,
+            'max_quantity': track.max_quantity,
+            'first_seen': timezone.localtime(track.first_seen).strftime('%Y-%m-%d %H:%M'),
+            'last_seen': timezone.localtime(track.last_seen).strftime('%Y-%m-%d %H:%M'),
+            'heading_deg': round(track.heading_deg, 1) if track.heading_deg is not None else None,
+            'speed_kmh': round(track.speed_kmh, 1) if track.speed_kmh is not None else None,
+            'approach_airport': airport.ident if airport else None,
+            'approach_airport_name': airport.name if airport else None,
+            'approach_distance_km': round(track.approach_distance_km, 2) if airport else None,
+            'approach_minutes': round(track.approach_minutes, 1) if airport else None,
+            'approach_level': track.approach_level,
+        })
 
-    if country:
-        airports = airports.filter(iso_country=country.upper())
+    return JsonResponse(data, safe=False)
 
-    if airport_type:
-        airports = airports.filter(airport_type=airport_type)
+def api_airport_zones(request):
+    """API: 机场保护区内的鸟情记录数，按机场和保护区等级统计 (只读取 birdrecord_zone_idx 部分索引)
+
+    支持 airport (机场标识符、ICAO 或 IATA 代码)、days (最近天数，默认 30)、
+    limit (不指定机场时返回记录数最多的机场个数，默认 20)
+    """
+    days = min(int(request.GET.get('days', 30)), 3660)
+    records = BirdRecord.objects.filter(zone_airport__isnull=False,
+                                        record_time__gte=timezone.now() - timedelta(days=days))
+    airport = request.GET.get('airport', '')
+    if airport:
+        airport_id = lookups.airport_id(airport)
+        records = records.filter(zone_airport_id=airport_id) if airport_id else records.none()
+
+    counts = {}
+    for row in records.values('zone_airport_id', 'zone_level').annotate(count=Count('id')).order_by():
+        counts.setdefault(row['zone_airport_id'], {})[row['zone_level']] = row['count']
+    limit = min(int(request.GET.get('limit', 20)), 500)
+    top = sorted(counts.items(), key=lambda item: sum(item[1].values()), reverse=True)[:limit]
+    airports = Airport.objects.only('ident', 'name', 'airport_type').in_bulk([pk for pk, _ in top])
 
     data = []
-    for airport in airports:
+    for pk, levels in top:
+        airport = airports[pk]
         data.append({
-            'id': airport.id,
-            'ident': airport.ident,
+            'airport': airport.ident,
             'name': airport.name,
             'type': airport.airport_type,
-            'latitude': airport.latitude,
-            'longitude': airport.longitude,
-            'elevation_ft': airport.elevation_ft,
-            'country': airport.iso_country,
-            'municipality': airport.municipality,
-            'icao_code': airport.icao_code,
-            'iata_code': airport.iata_code
+            'total': sum(levels.values()),
+            'zones': [
+                {'level': level, 'radius_km': radius_km, 'count': levels.get(level, 0)}
+                for level, radius_km in enumerate(zones.zone_radii(airport.airport_type), start=1)
+            ],
         })
+    return JsonResponse({'days': days, 'airports': data})
 
+def api_airports(request):
+    """API: 获取机场数据"""
+    # 支持 country (国家) 和 type (类型) 筛选
+    airports = filter_airports(Airport.objects.all(), request.GET).values(*AIRPORT_API_FIELDS)
+    data = [_serialize_airport(row) for row in airports]
     return JsonResponse(data, safe=False)
 
+AIRPORT_API_FIELDS = (
+    'id', 'ident', 'name', 'airport_type', 'latitude', 'longitude', 'elevation_ft',
+    'iso_country', 'municipality', 'icao_code', 'iata_code',
+)
+
+def _serialize_airport(row):
+    return {
+        'id': row['id'],
+        'ident': row['ident'],
+        'name': row['name'],
+        'type': row['airport_type'],
+        'latitude': row['latitude'],
+        'longitude': row['longitude'],
+        'elevation_ft': row['elevation_ft'],
+        'country': row['iso_country'],
+        'municipality': row['municipality'],
+        'icao_code': row['icao_code'],
+        'iata_code': row['iata_code']
+    }
+
 
 def api_airports_full(request):
     """返回完整机场数据API (用于前端搜索)"""
     airports = Airport.objects.all()
-    data = list(airports.values(
-        'id', 'ident', 'name', 'latitude', 'longitude', 'icao_code', 'iata_code',
-        'municipality', 'iso_country', 'elevation_ft', 'airport_type'
-    ))
+    data = list(airports.values(*AIRPORT_FULL_API_FIELDS))
     return JsonResponse(data, safe=False)
 
+AIRPORT_FULL_API_FIELDS = (
+    'id', 'ident', 'name', 'latitude', 'longitude', 'icao_code', 'iata_code',
+    'municipality', 'iso_country', 'elevation_ft', 'airport_type'
+)
+
+
+# ---- 异步读取接口 (ASGI) ----
+# 使用异步 ORM 分块读取、边查询边输出，等待数据库和网络时不占用线程。
+# SQLite 查询本身仍在 Django 的线程敏感执行器中执行，但每次只占用一个数据块的时间，
+# 并发请求可以交替进行，而不是整个请求排队。
+# WSGI 下异步流式响应会被整体缓冲，因此非 ASGI 请求直接调用对应的同步实现。
+
+STREAM_CHUNK_ROWS = 1000
+
+def _with_sync_fallback(sync_view):
+    def decorator(async_view):
+        @functools.wraps(async_view)
+        async def wrapper(request, *args, **kwargs):
+            if not isinstance(request, ASGIRequest):
+                return await sync_to_async(sync_view)(request, *args, **kwargs)
+            return await async_view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+async def _stream_json_array(rows, serialize=None):
+    """把异步迭代的行输出为 JSON 数组，每 STREAM_CHUNK_ROWS 行一块"""
+    yield '['
+    first = True
+    batch = []
+    async for row in rows:
+        batch.append(serialize(row) if serialize else row)
+        if len(batch) >= STREAM_CHUNK_ROWS:
+            yield ('' if first else ',') + json.dumps(batch, cls=DjangoJSONEncoder)[1:-1]
+            first = False
+            batch = []
+    if batch:
+        yield ('' if first else ',') + json.dumps(batch, cls=DjangoJSONEncoder)[1:-1]
+    yield ']'
+
+def _json_stream_response(stream):
+    response = StreamingHttpResponse(stream, content_type='application/json')
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@_with_sync_fallback(api_bird_records)
+async def api_bird_records_async(request):
+    """API: 获取所有有坐标的鸟情记录 (异步流式输出)"""
+    rows = _bird_records_query().values(*BIRD_RECORD_API_FIELDS).aiterator(chunk_size=STREAM_CHUNK_ROWS)
+    return _json_stream_response(_stream_json_array(rows, _serialize_bird_record))
+
+@_with_sync_fallback(api_airports)
+async def api_airports_async(request):
+    """API: 获取机场数据 (异步流式输出)"""
+    airports = filter_airports(Airport.objects.all(), request.GET).values(*AIRPORT_API_FIELDS)
+    return _json_stream_response(_stream_json_array(airports.aiterator(chunk_size=STREAM_CHUNK_ROWS), _serialize_airport))
+
+@_with_sync_fallback(api_airports_full)
+async def api_airports_full_async(request):
+    """返回完整机场数据API (异步流式输出)"""
+    airports = Airport.objects.values(*AIRPORT_FULL_API_FIELDS).aiterator(chunk_size=STREAM_CHUNK_ROWS)
+    return _json_stream_response(_stream_json_array(airports))
+
+@_with_sync_fallback(api_dashboard_data)
+async def api_dashboard_data_async(request):
+    """看板图表数据 (异步)：归档统计 (pyarrow) 在工作线程中计算，实时库聚合用异步 ORM"""
+    cutoff, live_filter, stale_ids = await sync_to_async(archive.analytics_split)()
+    start = _dashboard_start(request)
+    species_query, daily_query = _dashboard_queries(live_filter, start)
+
+    species_totals = {}
+    if cutoff:
+        species_totals = await sync_to_async(archive.archived_species_totals, thread_sensitive=False)(
+            end=cutoff, exclude_ids=stale_ids)
+    _merge_counts(species_totals, [(item['species__name'], item['total']) async for item in species_query])
+
+    daily_counts = {}
+    if cutoff and start < cutoff:
+        daily_counts = await sync_to_async(archive.archived_daily_counts, thread_sensitive=False)(
+            start=start, end=cutoff, exclude_ids=stale_ids)
+    _merge_counts(daily_counts, [(item['day'], item['count']) async for item in daily_query])
+
+    return JsonResponse(_dashboard_payload(species_totals, daily_counts))
+
 
 def import_xls_view(request):
     """XLS/CSV文件导入视图"""
     # 处理文件上传和导入逻辑
     if request.method == 'POST':
-        uploaded_file = request.FILES.get('xls_file')
+        uploaded_files = request.FILES.getlist('xls_file')
         import_type = request.POST.get('import_type', 'bird')  # bird 或 airport
+        sheet_name = request.POST.get('sheet_name', '').strip() or None  # Excel 工作表，为空时按表头自动选择
 
-        if not uploaded_file:
+        if not uploaded_files:
             return render(request, 'monitor/import_xls.html', {
                 'error': '请选择要上传的文件'
             })
 
+        # 只预检不导入
+        if request.POST.get('dry_run'):
+            return _dry_run_import(request, uploaded_files, import_type, sheet_name)
+
+        # 多个文件或 ZIP 压缩包走批量导入
+        uploaded_file = uploaded_files[0]
+        if len(uploaded_files) > 1 or uploaded_file.name.lower().endswith('.zip'):
+            return _start_batch_import(request, uploaded_files, import_type, sheet_name)
+
         # 检查文件类型
         file_name = uploaded_file.name.lower()
         supported_formats = ['.xls', '.xlsx', '.csv']
@@ -192,227 +573,575 @@ def import_xls_view(request):
             details=f'开始处理文件: {uploaded_file.name}'
         )
 
-        # 返回处理中的状态，让用户知道可以查看实时日志
-        return render(request, 'monitor/import_xls.html', {
-            'processing': True,
-            'log_id': log_entry.id,
-            'message': f'正在处理文件 "{uploaded_file.name}"，请在新窗口中查看实时日志监控。'
-        })
+        # 上传的临时文件在请求结束后会被删除，先复制一份交给导入过程
+        source_path = _spool_upload(uploaded_file)
 
-        try:
-            # 使用pandas读取文件
-            import pandas as pd
-            from datetime import datetime
-
-            log_entry.details += f'\n正在读取文件...'
-            log_entry.save()
-
-            if file_name.endswith('.csv') and import_type != 'geodata':
-                # 普通CSV文件
-                df = pd.read_csv(uploaded_file, encoding='utf-8')
-            elif file_name.endswith(('.shp', '.geojson', '.json', '.kml')) or (file_name.endswith('.csv') and import_type == 'geodata'):
-                # 处理地理数据文件
-                df = process_geospatial_file(uploaded_file, file_name)
-            else:
-                df = pd.read_excel(uploaded_file)
-
-            log_entry.total_rows = len(df)
-            log_entry.details += f'\n成功读取 {len(df)} 行数据'
-            log_entry.details += f'\n列名: {", ".join(df.columns)}'
-            log_entry.save()
-
-            print(f"读取到 {len(df)} 行数据，列名: {list(df.columns)}")
-
-            # 根据导入类型选择处理函数
-            if import_type == 'airport':
-                return process_airport_import(df, request, log_entry)
-            else:
-                return process_bird_import(df, request, log_entry)
+        if settings.BIRD_IMPORT_ASYNC:
+            threading.Thread(
+                target=run_import,
+                args=(log_entry.id, source_path, file_name, import_type),
+                kwargs={'background': True, 'sheet_name': sheet_name},
+                name=f'bird-import-{log_entry.id}',
+                daemon=True,
+            ).start()
 
-        except Exception as e:
-            log_entry.status = 'failed'
-            log_entry.error_messages = str(e)
-            log_entry.completed_at = datetime.now()
-            log_entry.save()
+            # 返回处理中的状态，让用户知道可以查看实时日志
+            return render(request, 'monitor/import_xls.html', {
+                'processing': True,
+                'log_id': log_entry.id,
+                'message': f'正在处理文件 "{uploaded_file.name}"，请在新窗口中查看实时日志监控。'
+            })
 
+        result = run_import(log_entry.id, source_path, file_name, import_type, sheet_name=sheet_name)
+        if 'error' in result:
             return render(request, 'monitor/import_xls.html', {
-                'error': f'文件处理失败: {str(e)}',
+                'error': result['error'],
                 'log_id': log_entry.id
             })
+        return render(request, 'monitor/import_xls.html', {
+            'success': result['message'],
+            'error_count': result['error_count'],
+            'errors': result['errors'][:10],  # 只显示前10个错误
+            'log_id': log_entry.id
+        })
 
     return render(request, 'monitor/import_xls.html')
 
-def process_bird_import(df, request, log_entry):
-    """处理鸟情数据导入"""
-    # 检查必要的列
-    required_columns = ['鸟种', '数量', '位置', '纬度', '经度']
-    missing_columns = [col for col in required_columns if col not in df.columns]
+def _start_batch_import(request, uploaded_files, import_type, sheet_name=None):
+    """批量导入：创建父日志，文件在进程池中并行解析后依次写入"""
+    from .batch_import import BATCH_FILE_FORMATS, run_batch_import
 
-    if missing_columns:
+    if import_type not in ('bird', 'airport'):
         return render(request, 'monitor/import_xls.html', {
-            'error': f'缺少必要的列: {", ".join(missing_columns)}'
+            'error': '批量导入只支持鸟情数据和机场数据'
+        })
+    unsupported = [f.name for f in uploaded_files if not f.name.lower().endswith(BATCH_FILE_FORMATS + ('.zip',))]
+    if unsupported:
+        return render(request, 'monitor/import_xls.html', {
+            'error': f'不支持的文件格式: {", ".join(unsupported)}。批量导入只支持 XLS、XLSX、CSV 和 ZIP'
         })
 
-    # 处理数据导入
-    success_count = 0
-    error_count = 0
-    errors = []
-    log_entry.details += f'\n开始处理鸟情数据导入...'
+    names = [f.name for f in uploaded_files]
+    log_entry = ImportLog.objects.create(
+        log_type=import_type,
+        file_name=names[0] if len(names) == 1 else f'批量导入 {len(names)} 个文件',
+        file_size=sum(f.size for f in uploaded_files),
+        status='processing',
+        details=f'开始批量导入: {", ".join(names)}'
+    )
+    sources = [(f.name, _spool_upload(f)) for f in uploaded_files]
+
+    if settings.BIRD_IMPORT_ASYNC:
+        threading.Thread(
+            target=run_batch_import,
+            args=(log_entry.id, sources, import_type),
+            kwargs={'background': True, 'sheet_name': sheet_name},
+            name=f'bird-import-{log_entry.id}',
+            daemon=True,
+        ).start()
+        return render(request, 'monitor/import_xls.html', {
+            'processing': True,
+            'log_id': log_entry.id,
+            'message': f'正在批量导入 {len(names)} 个上传文件，请在新窗口中查看实时日志监控。'
+        })
 
-    for index, row in df.iterrows():
+    result = run_batch_import(log_entry.id, sources, import_type, sheet_name=sheet_name)
+    if 'error' in result:
+        return render(request, 'monitor/import_xls.html', {
+            'error': result['error'],
+            'log_id': log_entry.id
+        })
+    return render(request, 'monitor/import_xls.html', {
+        'success': result['message'],
+        'error_count': result['error_count'],
+        'errors': result['errors'][:10],  # 只显示前10个错误
+        'log_id': log_entry.id
+    })
+
+def _dry_run_import(request, uploaded_files, import_type, sheet_name=None):
+    """预检上传的文件 (monitor/validation.py)：只校验不写入，也不创建导入日志
+
+    ZIP 压缩包展开后逐个文件预检；format=json 时返回 JSON 报告。
+    """
+    import os
+    import shutil
+    import tempfile
+    from .batch_import import expand_sources
+
+    if import_type not in ('bird', 'airport'):
+        return render(request, 'monitor/import_xls.html', {
+            'error': '预检只支持鸟情数据和机场数据'
+        })
+
+    sources = [(f.name, _spool_upload(f)) for f in uploaded_files]
+    work_dir = tempfile.mkdtemp(prefix='bird-dry-run-')
+    try:
+        files, skipped = expand_sources(sources, work_dir)
+        reports = [validation.validate_file(path, name, import_type, sheet_name) for name, path in files]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        for _, path in sources:
+            os.remove(path)
+
+    if request.POST.get('format') == 'json':
+        return JsonResponse({'import_type': import_type, 'files': reports, 'skipped': skipped},
+                            json_dumps_params={'ensure_ascii': False})
+    return render(request, 'monitor/import_xls.html', {
+        'dry_run_reports': reports,
+        'skipped_files': skipped,
+        'error': None if files else '没有可预检的数据文件 (支持 CSV、XLS、XLSX)',
+    })
+
+def _spool_upload(uploaded_file):
+    """把上传文件复制到临时文件，返回路径"""
+    import os
+    import shutil
+    import tempfile
+
+    suffix = os.path.splitext(uploaded_file.name)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as temp_file:
+        for chunk in uploaded_file.chunks():
+            temp_file.write(chunk)
+    return temp_file.name
+
+def read_import_file(source, file_name, import_type, sheet_name=None):
+    """按文件类型读取导入数据为 DataFrame；Excel 文件可以指定工作表名称"""
+    import pandas as pd
+
+    if file_name.endswith(('.xls', '.xlsx')) and import_type in IMPORT_COLUMNS:
+        # Excel 流式读取，只读取导入需要的列
+        return read_excel(source, IMPORT_COLUMNS[import_type], required_import_columns(import_type),
+                          sheet_name=sheet_name, file_name=file_name)
+    elif file_name.endswith('.csv') and import_type != 'geodata':
+        # 普通CSV文件
+        return pd.read_csv(source, encoding='utf-8')
+    elif file_name.endswith(('.shp', '.geojson', '.json', '.kml')) or (file_name.endswith('.csv') and import_type == 'geodata'):
+        # 处理地理数据文件
+        with open(source, 'rb') as f:
+            return process_geospatial_file(f, file_name)
+    else:
+        return pd.read_excel(source, sheet_name=sheet_name or 0)
+
+def run_import(log_id, source_path, file_name, import_type, background=False, sheet_name=None):
+    """读取文件并执行导入，返回导入结果；background=True 时在后台线程中运行"""
+    import os
+    from django.db import connection
+
+    log_entry = ImportLog.objects.get(id=log_id)
+    profiler = ImportProfiler(chunk_size=settings.BIRD_IMPORT_CHUNK_SIZE)
+    try:
+        log_entry.details += f'\n正在读取文件...'
+        _save_log(log_entry, profiler)
+
+        # 使用pandas读取文件
+        with profiler.stage('read'):
+            df = read_import_file(source_path, file_name, import_type, sheet_name)
+
+        log_entry.total_rows = len(df)
+        log_entry.details += f'\n成功读取 {len(df)} 行数据'
+        log_entry.details += f'\n列名: {", ".join(str(col) for col in df.columns)}'
+        profiler.apply(log_entry, 0)
+        _save_log(log_entry, profiler)
+
+        print(f"读取到 {len(df)} 行数据，列名: {list(df.columns)}")
+
+        # 根据导入类型选择处理函数
+        if import_type == 'airport':
+            return process_airport_import(df, log_entry, profiler)
+        else:
+            return process_bird_import(df, log_entry, profiler)
+
+    except Exception as e:
+        log_entry.status = 'failed'
+        log_entry.error_messages = str(e)
+        log_entry.completed_at = timezone.now()
+        _save_log(log_entry)
+        return {'error': f'文件处理失败: {str(e)}'}
+
+    finally:
+        os.remove(source_path)
+        if background:
+            # 后台线程结束时释放自己的数据库连接
+            connection.close()
+
+def _save_log(log_entry, profiler=None):
+    """导入日志的写入也交给单写线程，避免与批量写入争抢写锁"""
+    if profiler is None:
+        db_writer.run(log_entry.save)
+        return
+    with profiler.stage('log'):
+        db_writer.run(log_entry.save)
+
+def _run_write_batch(profiler, func, rows):
+    """交给单写线程执行一批写入，分别记录写入耗时和排队/提交等待时间"""
+    timing = {}
+
+    def job():
+        started = time.perf_counter()
         try:
-            log_entry.details += f'\n处理第{index+2}行: '
+            return func(rows, profiler)
+        finally:
+            timing['seconds'] = time.perf_counter() - started
+
+    submitted = time.perf_counter()
+    inner_before = profiler.total()
+    result = db_writer.run(job)
+    waited = time.perf_counter() - submitted
+    # 写入函数内部单独计时的阶段 (鸟种解析、机场查重) 不重复计入写入
+    inner = profiler.total() - inner_before
+    profiler.add('write', timing['seconds'] - inner)
+    profiler.add('writer_wait', waited - timing['seconds'])
+    profiler.record_batch(len(rows), timing['seconds'])
+    return result
+
+def _fail_import(log_entry, error_msg):
+    log_entry.status = 'failed'
+    log_entry.error_messages = error_msg
+    log_entry.completed_at = timezone.now()
+    _save_log(log_entry)
+    return {'error': error_msg}
+
+BIRD_REQUIRED_COLUMNS = ['鸟种', '数量', '位置', '纬度', '经度']
+# 基于airports.csv格式
+AIRPORT_REQUIRED_COLUMNS = ['ident', 'name', 'latitude_deg', 'longitude_deg']
+
+# 导入读取的列及类型 (Excel 只读取这些列): text 字符串, number 数字, raw 单元格原值
+IMPORT_COLUMNS = {
+    'bird': {
+        '鸟种': 'text', '数量': 'number', '位置': 'text', '纬度': 'number', '经度': 'number',
+        '记录时间': 'raw', '入侵原因': 'text', '备注': 'text',
+    },
+    'airport': {
+        'ident': 'text', 'type': 'text', 'name': 'text', 'latitude_deg': 'number',
+        'longitude_deg': 'number', 'elevation_ft': 'number', 'continent': 'text', 'iso_country': 'text',
+        'iso_region': 'text', 'municipality': 'text', 'scheduled_service': 'text', 'icao_code': 'text',
+        'iata_code': 'text', 'gps_code': 'text', 'local_code': 'text', 'home_link': 'text',
+        'wikipedia_link': 'text', 'keywords': 'text',
+    },
+}
+
+def required_import_columns(import_type):
+    return AIRPORT_REQUIRED_COLUMNS if import_type == 'airport' else BIRD_REQUIRED_COLUMNS
+
+def missing_import_columns(df, import_type):
+    return [col for col in required_import_columns(import_type) if col not in df.columns]
+
+def process_bird_import(df, log_entry, profiler=None):
+    """处理鸟情数据导入
+
+    逐行校验后按批 (BIRD_IMPORT_CHUNK_SIZE) 交给单写线程写入，每批一个事务，
+    写入期间不阻塞读请求，其他写请求也可以在批次之间执行。
+    各阶段耗时和批次统计记录在 profiler 中，随每批写入保存到日志。
+    """
+    # 检查必要的列
+    missing_columns = missing_import_columns(df, 'bird')
+    if missing_columns:
+        return _fail_import(log_entry, f'缺少必要的列: {", ".join(missing_columns)}')
 
-            # 获取或创建鸟种
-            species_name = str(row['鸟种']).strip()
-            if not species_name:
-                error_msg = f'第{index+2}行: 鸟种名称不能为空'
-                errors.append(error_msg)
-                log_entry.error_messages += f'\n{error_msg}'
-                error_count += 1
-                continue
+    return import_bird_rows(iter_bird_rows(df), log_entry, profiler)
 
-            species, created = BirdSpecies.objects.get_or_create(
-                name=species_name,
-                defaults={'danger_level': 3}  # 默认中等危险等级
-            )
+def iter_bird_rows(df):
+    """逐行校验鸟情数据，生成 (行号, 鸟种名称, 记录字段, 错误信息)；校验失败时前两项为 None"""
+    import pandas as pd
 
-            if created:
-                log_entry.details += f'创建新鸟种 "{species_name}" '
-            else:
-                log_entry.details += f'使用现有鸟种 "{species_name}" '
+    for index, row in df.iterrows():
+        line_no = index + 2
+        try:
+            species_name = str(row['鸟种']).strip()
+            if not species_name or pd.isna(row['鸟种']):
+                yield line_no, None, None, '鸟种名称不能为空'
+                continue
 
             # 验证坐标
             latitude = row.get('纬度')
             longitude = row.get('经度')
 
             if pd.isna(latitude) or pd.isna(longitude):
-                error_msg = f'第{index+2}行: 纬度和经度不能为空'
-                errors.append(error_msg)
-                log_entry.error_messages += f'\n{error_msg}'
-                error_count += 1
+                yield line_no, None, None, '纬度和经度不能为空'
                 continue
 
             # 创建鸟情记录
             record_data = {
-                'species': species,
                 'quantity': int(row.get('数量', 1)),
                 'location': str(row.get('位置', '')).strip(),
                 'latitude': float(latitude),
                 'longitude': float(longitude),
-                'intrusion_reason': str(row.get('入侵原因', '')).strip(),
-                'notes': str(row.get('备注', '')).strip()
+                'intrusion_reason': _clean_text(row.get('入侵原因', '')),
+                'notes': _clean_text(row.get('备注', ''))
             }
 
+            coordinate_error = _coordinate_error(record_data['latitude'], record_data['longitude'])
+            if coordinate_error:
+                yield line_no, None, None, coordinate_error
+                continue
+
             # 处理记录时间
             record_time_str = row.get('记录时间')
-            if not pd.isna(record_time_str):
-                if isinstance(record_time_str, str):
-                    # 尝试解析字符串时间
-                    try:
-                        record_data['record_time'] = datetime.strptime(record_time_str, '%Y-%m-%d %H:%M:%S')
-                    except ValueError:
-                        try:
-                            record_data['record_time'] = datetime.strptime(record_time_str, '%Y-%m-%d')
-                        except ValueError:
-                            record_data['record_time'] = datetime.now()
-                else:
-                    # 如果是pandas的时间戳
-                    record_data['record_time'] = record_time_str.to_pydatetime() if hasattr(record_time_str, 'to_pydatetime') else datetime.now()
-
-            BirdRecord.objects.create(**record_data)
-            success_count += 1
-            log_entry.details += f'✓ 成功创建记录'
+            if record_time_str is not None and not pd.isna(record_time_str):
+                record_data['record_time'] = _parse_record_time(record_time_str)
 
         except Exception as e:
-            error_msg = f'第{index+2}行: {str(e)}'
-            errors.append(error_msg)
-            log_entry.error_messages += f'\n{error_msg}'
-            error_count += 1
-            log_entry.details += f'✗ 失败: {str(e)}'
+            yield line_no, None, None, str(e)
+            continue
+
+        yield line_no, species_name, record_data, None
+
+def import_bird_rows(rows, log_entry, profiler=None, update_hotspot_index=True):
+    """把校验后的行 (iter_bird_rows 的输出) 分批写入并更新日志
+
+    update_hotspot_index=False 时不在结束时更新热点和轨迹 (批量导入在所有文件写完后统一更新)，
+    新建记录的 ID 在返回结果的 created_ids 中。
+    """
+    profiler = profiler or ImportProfiler(chunk_size=settings.BIRD_IMPORT_CHUNK_SIZE)
+
+    # 处理数据导入
+    chunk_size = settings.BIRD_IMPORT_CHUNK_SIZE
+    success_count = 0
+    error_count = 0
+    errors = []
+    created_ids = []
+    alert_count = 0
+    flush_seconds = 0.0
+    pending_rows = []  # (行号, 鸟种名称, 记录字段)
+    duplicate_counts = dict.fromkeys(dedup.POLICIES, 0)
+    log_entry.details += f'\n开始处理鸟情数据导入...'
+
+    def add_error(error_msg):
+        nonlocal error_count
+        errors.append(error_msg)
+        log_entry.error_messages += f'\n{error_msg}'
+        error_count += 1
+
+    def flush():
+        nonlocal success_count, alert_count, flush_seconds
+        flush_started = time.perf_counter()
+        created, failures, new_species, duplicates = _run_write_batch(profiler, _write_bird_rows, pending_rows)
+        for species_name in new_species:
+            log_entry.details += f'\n创建新鸟种 "{species_name}"'
+        for line_no, policy, original in duplicates:
+            duplicate_counts[policy] += 1
+            log_entry.details += f'\n处理第{line_no}行: 与{original}重复，{DEDUP_ACTION_LABELS[policy]}'
+        for line_no, record in created:
+            created_ids.append(record.id)
+            log_entry.details += f'\n处理第{line_no}行: ✓ 成功创建记录'
+        for line_no, message in failures:
+            add_error(f'第{line_no}行: {message}')
+            log_entry.details += f'\n处理第{line_no}行: ✗ 失败: {message}'
+        success_count += len(created)
+        _apply_duplicate_counts(log_entry, duplicate_counts)
+        # 每批写入后评估预警规则
+        with profiler.stage('alerts'):
+            alert_count += len(db_writer.run(evaluate_records, [record for _, record in created]))
+        # 更新进度，实时日志页面可以看到
+        log_entry.success_count = success_count
+        log_entry.error_count = error_count
+        profiler.apply(log_entry, success_count + error_count)
+        _save_log(log_entry, profiler)
+        pending_rows.clear()
+        flush_seconds += time.perf_counter() - flush_started
+
+    # 校验耗时 = 逐行循环总耗时 - 其中各批写入的耗时
+    loop_started = time.perf_counter()
+    for line_no, species_name, record_data, error in rows:
+        if error is not None:
+            add_error(f'第{line_no}行: {error}')
+            continue
+        pending_rows.append((line_no, species_name, record_data))
+        if len(pending_rows) >= chunk_size:
+            flush()
+    profiler.add('validate', time.perf_counter() - loop_started - flush_seconds)
+
+    if pending_rows:
+        flush()
+
+    if alert_count:
+        log_entry.details += f'\n触发预警 {alert_count} 条'
+    if any(duplicate_counts.values()):
+        log_entry.details += (f'\n重复记录: 标记 {duplicate_counts["flag"]} 条, 合并 {duplicate_counts["merge"]} 条, '
+                              f'跳过 {duplicate_counts["skip"]} 条')
+
+    # 对新导入的记录增量更新热点
+    if update_hotspot_index:
+        with profiler.stage('hotspots'):
+            hotspot_stats = db_writer.run(update_hotspots, created_ids)
+        if hotspot_stats:
+            log_entry.details += f'\n热点更新: 新建 {hotspot_stats["created"]} 个, 移除 {hotspot_stats["removed"]} 个'
+        with profiler.stage('tracks'):
+            track_stats = db_writer.run(update_tracks, created_ids)
+        if track_stats:
+            log_entry.details += f'\n轨迹连接: 新建 {track_stats["created"]} 条, 延伸 {track_stats["extended"]} 条'
+
+    # 新记录写入全文索引
+    with profiler.stage('search'):
+        db_writer.run(search.sync_index)
 
     # 更新日志记录
     log_entry.success_count = success_count
     log_entry.error_count = error_count
     log_entry.status = 'completed' if error_count == 0 else 'completed_with_errors'
-    log_entry.completed_at = datetime.now()
+    log_entry.completed_at = timezone.now()
     log_entry.details += f'\n\n导入完成: 成功 {success_count} 条, 失败 {error_count} 条'
-    log_entry.save()
+    profiler.apply(log_entry, success_count + error_count)
+    log_entry.details += f'\n总耗时 {log_entry.duration_seconds:.2f} 秒, {log_entry.rows_per_second or 0:.0f} 行/秒'
+    _save_log(log_entry, profiler)
 
-    return render(request, 'monitor/import_xls.html', {
-        'success': f'成功导入 {success_count} 条鸟情记录',
+    return {
+        'message': f'成功导入 {success_count} 条鸟情记录',
+        'success_count': success_count,
         'error_count': error_count,
-        'errors': errors[:10],  # 只显示前10个错误
-        'log_id': log_entry.id
-    })
+        'errors': errors,
+        'created_ids': created_ids,
+        'duplicates': duplicate_counts,
+    }
+
+def _coordinate_error(latitude, longitude):
+    """坐标超出范围时的错误信息 (与预检的 latitude_out_of_range / longitude_out_of_range 相同)"""
+    if not -90 <= latitude <= 90:
+        return f'纬度 {latitude} 超出 -90 ~ 90'
+    if not -180 <= longitude <= 180:
+        return f'经度 {longitude} 超出 -180 ~ 180'
+    return None
+
+# 重复记录的处理方式 -> 导入日志中的说明
+DEDUP_ACTION_LABELS = {'flag': '已标记', 'merge': '已合并到原记录', 'skip': '已跳过'}
+
+def _apply_duplicate_counts(log_entry, counts):
+    log_entry.duplicates_flagged = counts['flag']
+    log_entry.duplicates_merged = counts['merge']
+    log_entry.duplicates_skipped = counts['skip']
+
+def _clean_text(value):
+    """单元格文本：空单元格 (NaN) 转为空字符串"""
+    if value is None or (isinstance(value, float) and value != value):
+        return ''
+    return str(value).strip()
+
+# 导入文件中记录时间字符串的格式
+RECORD_TIME_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d')
+
+def _parse_record_time(value):
+    """解析导入文件中的记录时间"""
+    if isinstance(value, str):
+        # 尝试解析字符串时间
+        for fmt in RECORD_TIME_FORMATS:
+            try:
+                return timezone.make_aware(datetime.strptime(value.strip(), fmt))
+            except ValueError:
+                continue
+        return timezone.now()
+    # 如果是pandas的时间戳
+    if hasattr(value, 'to_pydatetime'):
+        value = value.to_pydatetime()
+    # Excel 日期单元格 (流式读取时为 datetime)
+    if isinstance(value, datetime):
+        return timezone.make_aware(value) if timezone.is_naive(value) else value
+    return timezone.now()
+
+def _write_bird_rows(rows, profiler=None):
+    """在写线程中执行：解析鸟种，整批检查重复 (monitor/dedup.py) 后逐行创建记录，每行一个保存点
+
+    返回 (成功 [(行号, 记录)], 失败 [(行号, 错误)], 新建鸟种名称列表, 重复 [(行号, 处理方式, 重复的对象)])
+    """
+    from django.db import transaction
+
+    species_by_name = {}
+    created, failures, new_species, duplicates = [], [], [], []
+    resolved = []  # (行号, 鸟种, 记录字段)
+    # 变更日志在整批结束时一次写入
+    with changes.collect():
+        for line_no, species_name, record_data in rows:
+            try:
+                species = species_by_name.get(species_name)
+                if species is None:
+                    # 已有鸟种从查询缓存取，未知名称再获取或创建
+                    started = time.perf_counter()
+                    species = lookups.species_reference(species_name)
+                    if species is None:
+                        with transaction.atomic():
+                            species, was_created = BirdSpecies.objects.get_or_create(
+                                name=species_name,
+                                defaults={'danger_level': 3}  # 默认中等危险等级
+                            )
+                        if was_created:
+                            new_species.append(species_name)
+                    if profiler:
+                        profiler.add('species', time.perf_counter() - started)
+                    species_by_name[species_name] = species
+                resolved.append((line_no, species, record_data))
+            except Exception as e:
+                failures.append((line_no, str(e)))
+
+        # 整批一次查询已有记录的指纹
+        started = time.perf_counter()
+        actions = dedup.resolve([(species.pk, record_data) for _, species, record_data in resolved])
+        if profiler:
+            profiler.add('dedup', time.perf_counter() - started)
+
+        records_by_position = {}
+        for position, ((line_no, species, record_data), action) in enumerate(zip(resolved, actions)):
+            if action is not None:
+                policy, (kind, target) = action
+                original = f'记录 #{target}' if kind == 'record' else f'第{resolved[target][0]}行'
+                duplicates.append((line_no, policy, original))
+                if policy != 'flag':
+                    continue
+                original = target if kind == 'record' else getattr(records_by_position.get(target), 'id', None)
+                record_data = dict(record_data, duplicate_of_id=original)
+            try:
+                with transaction.atomic():
+                    record = BirdRecord.objects.create(species=species, **record_data)
+                records_by_position[position] = record
+                created.append((line_no, record))
+            except Exception as e:
+                failures.append((line_no, str(e)))
+    return created, failures, new_species, duplicates
 
-def process_airport_import(df, request, log_entry):
+def process_airport_import(df, log_entry, profiler=None):
     """处理机场数据导入"""
     # 检查必要的列 (基于airports.csv格式)
-    required_columns = ['ident', 'name', 'latitude_deg', 'longitude_deg']
-    missing_columns = [col for col in required_columns if col not in df.columns]
-
+    missing_columns = missing_import_columns(df, 'airport')
     if missing_columns:
-        return render(request, 'monitor/import_xls.html', {
-            'error': f'缺少必要的列: {", ".join(missing_columns)}。请参考airports.csv格式。'
-        })
-
-    # 处理数据导入
-    success_count = 0
-    error_count = 0
-    errors = []
-    log_entry.details += f'\n开始处理机场数据导入...'
+        return _fail_import(log_entry, f'缺少必要的列: {", ".join(missing_columns)}。请参考airports.csv格式。')
+
+    return import_airport_rows(iter_airport_rows(df), log_entry, profiler)
+
+def iter_airport_rows(df):
+    """逐行校验机场数据，生成 (行号, 机场字段, 错误信息)"""
+    import pandas as pd
+
+    # 处理机场类型映射
+    type_mapping = {
+        'large_airport': 'large_airport',
+        'medium_airport': 'medium_airport',
+        'small_airport': 'small_airport',
+        'heliport': 'heliport',
+        'seaplane_base': 'seaplane_base',
+        'balloonport': 'balloonport',
+        'closed': 'closed'
+    }
 
     for index, row in df.iterrows():
+        line_no = index + 2
         try:
-            log_entry.details += f'\n处理第{index+2}行: '
-
             # 获取必要字段
-            ident = str(row.get('ident', '')).strip()
-            name = str(row.get('name', '')).strip()
+            ident = _clean_text(row.get('ident', ''))
+            name = _clean_text(row.get('name', ''))
 
             if not ident or not name:
-                error_msg = f'第{index+2}行: 机场标识符和名称不能为空'
-                errors.append(error_msg)
-                log_entry.error_messages += f'\n{error_msg}'
-                error_count += 1
+                yield line_no, None, '机场标识符和名称不能为空'
                 continue
 
-            log_entry.details += f'机场 {ident} ({name}) '
-
             # 验证坐标
             latitude = row.get('latitude_deg')
             longitude = row.get('longitude_deg')
 
             if pd.isna(latitude) or pd.isna(longitude):
-                error_msg = f'第{index+2}行: 纬度和经度不能为空'
-                errors.append(error_msg)
-                log_entry.error_messages += f'\n{error_msg}'
-                error_count += 1
+                yield line_no, None, '纬度和经度不能为空'
                 continue
 
-            # 处理机场类型映射
-            type_mapping = {
-                'large_airport': 'large_airport',
-                'medium_airport': 'medium_airport',
-                'small_airport': 'small_airport',
-                'heliport': 'heliport',
-                'seaplane_base': 'seaplane_base',
-                'balloonport': 'balloonport',
-                'closed': 'closed'
-            }
-
-            airport_type = str(row.get('type', 'small_airport')).strip()
+            airport_type = _clean_text(row.get('type', 'small_airport'))
             airport_type = type_mapping.get(airport_type, 'small_airport')
 
-            # 检查是否已存在
-            if Airport.objects.filter(ident=ident).exists():
-                error_msg = f'第{index+2}行: 机场标识符 {ident} 已存在，跳过'
-                errors.append(error_msg)
-                log_entry.error_messages += f'\n{error_msg}'
-                error_count += 1
-                continue
-
             # 创建机场记录
             airport_data = {
                 'ident': ident,
@@ -421,45 +1150,137 @@ def process_airport_import(df, request, log_entry):
                 'latitude': float(latitude),
                 'longitude': float(longitude),
                 'elevation_ft': int(row.get('elevation_ft', 0)) if not pd.isna(row.get('elevation_ft')) else None,
-                'continent': str(row.get('continent', '')).strip(),
-                'iso_country': str(row.get('iso_country', '')).strip(),
-                'iso_region': str(row.get('iso_region', '')).strip(),
-                'municipality': str(row.get('municipality', '')).strip(),
-                'scheduled_service': str(row.get('scheduled_service', 'no')).strip(),
-                'icao_code': str(row.get('icao_code', '')).strip(),
-                'iata_code': str(row.get('iata_code', '')).strip(),
-                'gps_code': str(row.get('gps_code', '')).strip(),
-                'local_code': str(row.get('local_code', '')).strip(),
-                'home_link': str(row.get('home_link', '')).strip(),
-                'wikipedia_link': str(row.get('wikipedia_link', '')).strip(),
-                'keywords': str(row.get('keywords', '')).strip()
+                'continent': _clean_text(row.get('continent', '')),
+                'iso_country': _clean_text(row.get('iso_country', '')),
+                'iso_region': _clean_text(row.get('iso_region', '')),
+                'municipality': _clean_text(row.get('municipality', '')),
+                'scheduled_service': _clean_text(row.get('scheduled_service', 'no')),
+                'icao_code': _clean_text(row.get('icao_code', '')),
+                'iata_code': _clean_text(row.get('iata_code', '')),
+                'gps_code': _clean_text(row.get('gps_code', '')),
+                'local_code': _clean_text(row.get('local_code', '')),
+                'home_link': _clean_text(row.get('home_link', '')),
+                'wikipedia_link': _clean_text(row.get('wikipedia_link', '')),
+                'keywords': _clean_text(row.get('keywords', ''))
             }
 
-            Airport.objects.create(**airport_data)
-            success_count += 1
-            log_entry.details += f'✓ 成功创建机场'
+            coordinate_error = _coordinate_error(airport_data['latitude'], airport_data['longitude'])
+            if coordinate_error:
+                yield line_no, None, coordinate_error
+                continue
 
         except Exception as e:
-            error_msg = f'第{index+2}行: {str(e)}'
-            errors.append(error_msg)
-            log_entry.error_messages += f'\n{error_msg}'
-            error_count += 1
-            log_entry.details += f'✗ 失败: {str(e)}'
+            yield line_no, None, str(e)
+            continue
+
+        yield line_no, airport_data, None
+
+def import_airport_rows(rows, log_entry, profiler=None, update_zones=True):
+    """把校验后的行 (iter_airport_rows 的输出) 分批写入并更新日志
+
+    update_zones=False 时不生成保护区、不重新标记记录 (批量导入在所有文件写完后统一处理)，
+    新建机场的 ID 在返回结果的 created_ids 中。
+    """
+    profiler = profiler or ImportProfiler(chunk_size=settings.BIRD_IMPORT_CHUNK_SIZE)
+
+    # 处理数据导入
+    chunk_size = settings.BIRD_IMPORT_CHUNK_SIZE
+    success_count = 0
+    error_count = 0
+    errors = []
+    created_ids = []
+    flush_seconds = 0.0
+    pending_rows = []  # (行号, 机场字段)
+    log_entry.details += f'\n开始处理机场数据导入...'
+
+    def add_error(error_msg):
+        nonlocal error_count
+        errors.append(error_msg)
+        log_entry.error_messages += f'\n{error_msg}'
+        error_count += 1
+
+    def flush():
+        nonlocal success_count, flush_seconds
+        flush_started = time.perf_counter()
+        created, failures = _run_write_batch(
+            profiler, functools.partial(_write_airport_rows, rebuild_zones=update_zones), pending_rows)
+        for line_no, airport in created:
+            log_entry.details += f'\n处理第{line_no}行: 机场 {airport.ident} ({airport.name}) ✓ 成功创建机场'
+        for line_no, message in failures:
+            add_error(f'第{line_no}行: {message}')
+        success_count += len(created)
+        created_ids.extend(airport.id for _, airport in created)
+        log_entry.success_count = success_count
+        log_entry.error_count = error_count
+        profiler.apply(log_entry, success_count + error_count)
+        _save_log(log_entry, profiler)
+        pending_rows.clear()
+        flush_seconds += time.perf_counter() - flush_started
+
+    loop_started = time.perf_counter()
+    for line_no, airport_data, error in rows:
+        if error is not None:
+            add_error(f'第{line_no}行: {error}')
+            continue
+        pending_rows.append((line_no, airport_data))
+        if len(pending_rows) >= chunk_size:
+            flush()
+    profiler.add('validate', time.perf_counter() - loop_started - flush_seconds)
+
+    if pending_rows:
+        flush()
+
+    if created_ids and update_zones:
+        # 新机场的保护区已在每批写入后生成 (_write_airport_rows)，只重新标记这些保护区范围内的记录，每批一个写任务
+        with profiler.stage('zones'):
+            retag = zones.retag_records(airport_ids=created_ids, writer=db_writer)
+        log_entry.details += f'\n保护区标记: 检查 {retag["records"]} 条记录, 更新 {retag["changed"]} 条'
 
     # 更新日志记录
     log_entry.success_count = success_count
     log_entry.error_count = error_count
     log_entry.status = 'completed' if error_count == 0 else 'completed_with_errors'
-    log_entry.completed_at = datetime.now()
+    log_entry.completed_at = timezone.now()
     log_entry.details += f'\n\n导入完成: 成功 {success_count} 个, 失败 {error_count} 个'
-    log_entry.save()
+    profiler.apply(log_entry, success_count + error_count)
+    log_entry.details += f'\n总耗时 {log_entry.duration_seconds:.2f} 秒, {log_entry.rows_per_second or 0:.0f} 行/秒'
+    _save_log(log_entry, profiler)
 
-    return render(request, 'monitor/import_xls.html', {
-        'success': f'成功导入 {success_count} 个机场',
+    return {
+        'message': f'成功导入 {success_count} 个机场',
+        'success_count': success_count,
         'error_count': error_count,
-        'errors': errors[:10],  # 只显示前10个错误
-        'log_id': log_entry.id
-    })
+        'errors': errors,
+        'created_ids': created_ids,
+    }
+
+def _write_airport_rows(rows, profiler=None, rebuild_zones=True):
+    """在写线程中执行：一次查询已存在的标识符，再逐行创建机场
+
+    rebuild_zones=False 时不生成新机场的保护区，由调用方统一生成。
+    """
+    from django.db import transaction
+
+    started = time.perf_counter()
+    existing = set(Airport.objects.filter(ident__in=[data['ident'] for _, data in rows]).values_list('ident', flat=True))
+    if profiler:
+        profiler.add('lookup', time.perf_counter() - started)
+    created, failures = [], []
+    # 保护区在整批写入后一次生成，不在每个机场保存时各重建一次
+    with zones.deferred_rebuild(rebuild=rebuild_zones):
+        for line_no, airport_data in rows:
+            # 检查是否已存在
+            if airport_data['ident'] in existing:
+                failures.append((line_no, f'机场标识符 {airport_data["ident"]} 已存在，跳过'))
+                continue
+            try:
+                with transaction.atomic():
+                    airport = Airport.objects.create(**airport_data)
+                existing.add(airport.ident)
+                created.append((line_no, airport))
+            except Exception as e:
+                failures.append((line_no, str(e)))
+    return created, failures
 
 def logs_view(request):
     """日志中心视图 - 包含项目日志和导入日志"""
@@ -467,8 +1288,8 @@ def logs_view(request):
     log_type = request.GET.get('type', '')
     status = request.GET.get('status', '')
 
-    # 构建导入日志查询
-    import_logs = ImportLog.objects.all()
+    # 构建导入日志查询 (批量导入的子日志在父日志的实时日志页面中查看)
+    import_logs = ImportLog.objects.filter(parent__isnull=True)
 
     if log_type:
         import_logs = import_logs.filter(log_type=log_type)
@@ -487,10 +1308,34 @@ def logs_view(request):
         'log_type': log_type,
         'status': status,
         'import_logs_count': import_logs.count(),
+        'throughput_trend': _throughput_trend(),
+        'import_chunk_size': settings.BIRD_IMPORT_CHUNK_SIZE,
     }
 
     return render(request, 'monitor/logs.html', context)
 
+def _throughput_trend(limit=30):
+    """最近完成的导入的处理速度，按时间正序，用于日志中心的吞吐趋势图"""
+    logs = ImportLog.objects.filter(
+        rows_per_second__isnull=False,
+        completed_at__isnull=False,
+    ).exclude(status='failed').order_by('-created_at')[:limit]
+
+    trend = []
+    for log in reversed(logs):
+        trend.append({
+            'id': log.id,
+            'label': timezone.localtime(log.created_at).strftime('%m-%d %H:%M'),
+            'log_type': log.log_type,
+            'rows': log.success_count + log.error_count,
+            'rows_per_second': log.rows_per_second,
+            'duration_seconds': log.duration_seconds,
+            'peak_memory_mb': log.peak_memory_mb,
+            'chunk_size': log.write_batch_stats.get('chunk_size'),
+            'write_seconds': log.stage_timings.get('write', 0),
+        })
+    return trend
+
 def import_log_detail_view(request, log_id):
     """导入日志详情视图"""
     try:
@@ -570,19 +1415,76 @@ def api_log_stream(request, log_id):
     """实时日志流API"""
     try:
         log_entry = ImportLog.objects.get(id=log_id)
-        data = {
-            'status': log_entry.status,
-            'details': log_entry.details,
-            'error_messages': log_entry.error_messages,
-            'success_count': log_entry.success_count,
-            'error_count': log_entry.error_count,
-            'total_rows': log_entry.total_rows,
-            'completed_at': log_entry.completed_at.isoformat() if log_entry.completed_at else None
-        }
-        return JsonResponse(data)
+        return JsonResponse(_log_stream_payload(log_entry, list(log_entry.children.all())))
+    except ImportLog.DoesNotExist:
+        return JsonResponse({'error': '日志不存在'}, status=404)
+
+@_with_sync_fallback(api_log_stream)
+async def api_log_stream_async(request, log_id):
+    """实时日志流API (异步)：?stream=1 时以 SSE 推送进度，直到导入结束"""
+    try:
+        log_entry = await ImportLog.objects.aget(id=log_id)
     except ImportLog.DoesNotExist:
         return JsonResponse({'error': '日志不存在'}, status=404)
 
+    if not request.GET.get('stream'):
+        children = [child async for child in log_entry.children.all()]
+        return JsonResponse(_log_stream_payload(log_entry, children))
+
+    response = StreamingHttpResponse(_log_event_stream(log_entry), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # 禁用nginx缓冲
+    return response
+
+async def _log_event_stream(log_entry):
+    yield "retry: 3000\n\n"
+    while True:
+        children = [child async for child in log_entry.children.all()]
+        payload = json.dumps(_log_stream_payload(log_entry, children), ensure_ascii=False)
+        yield f"event: progress\ndata: {payload}\n\n"
+        if log_entry.status != 'processing':
+            break
+        await asyncio.sleep(1)
+        log_entry = await ImportLog.objects.aget(id=log_entry.id)
+
+def _log_stream_payload(log_entry, children=()):
+    return {
+        'status': log_entry.status,
+        'details': log_entry.full_details(),
+        'error_messages': log_entry.error_messages,
+        'success_count': log_entry.success_count,
+        'error_count': log_entry.error_count,
+        'total_rows': log_entry.total_rows,
+        'duplicates': {
+            'flagged': log_entry.duplicates_flagged,
+            'merged': log_entry.duplicates_merged,
+            'skipped': log_entry.duplicates_skipped,
+        },
+        'completed_at': log_entry.completed_at.isoformat() if log_entry.completed_at else None,
+        # 性能统计
+        'stages': [
+            {'name': name, 'seconds': seconds, 'percent': percent}
+            for name, seconds, percent in log_entry.stage_breakdown()
+        ],
+        'write_batch_stats': log_entry.write_batch_stats,
+        'duration_seconds': log_entry.duration_seconds,
+        'rows_per_second': log_entry.rows_per_second,
+        'peak_memory_mb': log_entry.peak_memory_mb,
+        # 批量导入的各文件
+        'children': [
+            {
+                'id': child.id,
+                'file_name': child.file_name,
+                'status': child.status,
+                'total_rows': child.total_rows,
+                'success_count': child.success_count,
+                'error_count': child.error_count,
+                'rows_per_second': child.rows_per_second,
+            }
+            for child in children
+        ],
+    }
+
 
 def project_log_stream(request):
     """项目日志实时流"""
@@ -624,4 +1526,78 @@ def project_log_stream(request):
     response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
     response['Cache-Control'] = 'no-cache'
     response['X-Accel-Buffering'] = 'no'  # 禁用nginx缓冲
-    return response
\ No newline at end of file
+    return response
+
+
+def api_alerts(request):
+    """API: 获取最近的预警信息"""
+    alerts = Alert.objects.select_related('rule', 'airport')
+
+    if request.GET.get('unacknowledged'):
+        alerts = alerts.filter(acknowledged=False)
+
+    limit = min(int(request.GET.get('limit', 50)), 500)
+    data = [serialize_alert(alert) for alert in alerts[:limit]]
+    return JsonResponse(data, safe=False)
+
+
+async def api_alert_stream(request):
+    """预警实时推送 (SSE)
+
+    ASGI 下订阅进程内的预警广播，新预警立即推送；WSGI 下退化为定期轮询预警表。
+    """
+    if isinstance(request, ASGIRequest):
+        stream = _alert_push_stream()
+    else:
+        stream = _alert_poll_stream(request.headers.get('Last-Event-ID'))
+
+    response = StreamingHttpResponse(stream, content_type="text/event-stream")
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # 禁用nginx缓冲
+    return response
+
+
+def _alert_event(alert_data):
+    payload = json.dumps(alert_data, ensure_ascii=False)
+    return f"id: {alert_data['id']}\nevent: alert\ndata: {payload}\n\n"
+
+
+async def _alert_push_stream():
+    queue = alert_broadcaster.subscribe()
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                alert_data = await asyncio.wait_for(queue.get(), timeout=15)
+                yield _alert_event(alert_data)
+            except asyncio.TimeoutError:
+                # 心跳，防止代理断开空闲连接
+                yield ": keepalive\n\n"
+    finally:
+        alert_broadcaster.unsubscribe(queue)
+
+
+def _alert_poll_stream(last_event_id):
+    import time
+
+    last_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    if last_id is None:
+        last_id = Alert.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+    yield "retry: 3000\n\n"
+    while True:
+        alerts = list(Alert.objects.filter(id__gt=last_id).select_related('rule', 'airport').order_by('id')[:100])
+        for alert in alerts:
+            last_id = alert.id
+            yield _alert_event(serialize_alert(alert))
+        if not alerts:
+            yield ": keepalive\n\n"
+        time.sleep(3)
+
+
+def metrics_view(request):
+    """Prometheus 指标 (当前进程的累计值)"""
+    allowed = getattr(settings, 'BIRD_METRICS_ALLOWED_IPS', None)
+    if allowed is not None and request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponse(status=403)
+    return HttpResponse(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
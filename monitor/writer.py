@@ -0,0 +1,120 @@
+"""进程内单写线程
+
+SQLite 同一时间只允许一个写事务。导入和批量写入如果各自在请求线程中开事务，
+会互相等待写锁，长事务还会拖慢 WAL 检查点。这里把写任务交给一个专门的线程
+串行执行：队列中积压的多个小任务合并到同一个事务里提交，每个任务使用独立的
+保存点，单个任务失败不影响同批的其他任务。读请求不经过这里，WAL 模式下不受影响。
+"""
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class _WriteJob:
+    __slots__ = ('func', 'args', 'kwargs', 'future')
+
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+
+
+class DatabaseWriter:
+    """单写线程，按批提交事务"""
+
+    def __init__(self, max_batch=None):
+        self.max_batch = max_batch or getattr(settings, 'BIRD_WRITER_MAX_BATCH', 50)
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {'jobs': 0, 'transactions': 0, 'failed_jobs': 0, 'max_batch': 0}
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'BIRD_SINGLE_WRITER', True)
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def submit(self, func, *args, **kwargs):
+        """提交写任务，返回 Future；任务所在事务提交后 Future 才完成"""
+        job = _WriteJob(func, args, kwargs)
+        # 未启用或已经在写线程内 (任务中嵌套提交) 时直接执行，避免死锁
+        if not self.enabled or threading.current_thread() is self._thread:
+            self._run_inline(job)
+            return job.future
+        self._ensure_thread()
+        self._queue.put(job)
+        return job.future
+
+    def run(self, func, *args, **kwargs):
+        """提交写任务并等待结果"""
+        return self.submit(func, *args, **kwargs).result()
+
+    def _run_inline(self, job):
+        try:
+            with transaction.atomic():
+                result = job.func(*job.args, **job.kwargs)
+        except Exception as e:
+            job.future.set_exception(e)
+        else:
+            job.future.set_result(result)
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='bird-db-writer', daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            # 合并已经在排队的任务，减少事务提交次数
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            close_old_connections()
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        outcomes = []
+        try:
+            with transaction.atomic():
+                for job in batch:
+                    try:
+                        with transaction.atomic():
+                            outcomes.append((job, True, job.func(*job.args, **job.kwargs)))
+                    except Exception as e:
+                        outcomes.append((job, False, e))
+        except Exception as e:
+            # 提交失败 (例如磁盘错误)，整批任务都视为失败
+            logger.exception('写入事务提交失败')
+            connection.close()
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            self.stats['failed_jobs'] += len(batch)
+            return
+
+        self.stats['jobs'] += len(batch)
+        self.stats['transactions'] += 1
+        self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+        for job, ok, value in outcomes:
+            if ok:
+                job.future.set_result(value)
+            else:
+                self.stats['failed_jobs'] += 1
+                job.future.set_exception(value)
+
+
+writer = DatabaseWriter()
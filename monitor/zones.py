@@ -0,0 +1,366 @@
+"""机场鸟击防范保护区
+
+每个机场按类型划分若干级同心圆保护区 (BIRD_AIRPORT_ZONES_KM，如大型机场 3/8/13 公里)，
+圆心、半径和外接矩形预先计算后保存在 AirportZone 表中，机场变化时重新生成 (monitor.signals)；
+批量导入机场时在 deferred_rebuild() 中写入，每批只重建一次。
+
+进程内按 BIRD_ZONE_GRID_DEG 建立网格索引：每个机场登记到其最外圈外接矩形覆盖的所有网格，
+查询时只需取点所在网格中的少量机场计算距离。索引随查询缓存的版本号失效 (monitor/lookups.py)。
+
+点落在多个机场的保护区内时，取等级最高 (最内圈) 的保护区，等级相同时取距离最近的机场。
+鸟情记录保存时标记所在的机场和等级 (BirdRecord.zone_airport / zone_level)；
+批量标记使用 numpy 按网格分组向量化计算。
+"""
+import math
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .geo import EARTH_RADIUS_KM, bbox_around, haversine_km
+from .lookups import LookupTable
+
+RETAG_CHUNK_SIZE = 50000
+ID_CHUNK_SIZE = 5000
+# 网格编号合成一个整数: 行号、列号加偏移后按位拼接
+_CELL_OFFSET = 1 << 20
+
+_local = threading.local()
+
+
+def zone_radii(airport_type):
+    """机场类型对应的各级保护区半径 (由内到外)"""
+    return tuple(sorted(settings.BIRD_AIRPORT_ZONES_KM.get(airport_type, ())))
+
+
+def zone_fields(latitude, longitude, airport_type):
+    """一个机场的保护区字段列表 (等级、半径、外接矩形)"""
+    fields = []
+    for level, radius_km in enumerate(zone_radii(airport_type), start=1):
+        min_lat, max_lat, min_lon, max_lon = bbox_around(latitude, longitude, radius_km)
+        fields.append({
+            'level': level,
+            'radius_km': radius_km,
+            'min_latitude': min_lat,
+            'max_latitude': max_lat,
+            'min_longitude': min_lon,
+            'max_longitude': max_lon,
+        })
+    return fields
+
+
+def rebuild_zones(airport_ids=None, airport_model=None, zone_model=None):
+    """重新生成保护区，airport_ids 为空时重建全部，返回保护区数量
+
+    迁移中调用时传入历史模型。
+    """
+    from .models import Airport, AirportZone
+
+    airport_model = airport_model or Airport
+    zone_model = zone_model or AirportZone
+    airports = airport_model.objects.all()
+    existing = zone_model.objects.all()
+    if airport_ids is not None:
+        airports = airports.filter(id__in=airport_ids)
+        existing = existing.filter(airport_id__in=airport_ids)
+
+    zones = [
+        zone_model(airport_id=airport_id, **fields)
+        for airport_id, latitude, longitude, airport_type in airports.values_list(
+            'id', 'latitude', 'longitude', 'airport_type').iterator(chunk_size=5000)
+        for fields in zone_fields(latitude, longitude, airport_type)
+    ]
+    with transaction.atomic():
+        existing.delete()
+        zone_model.objects.bulk_create(zones, batch_size=2000)
+        transaction.on_commit(zone_index.invalidate)
+    return len(zones)
+
+
+@contextmanager
+def deferred_rebuild(rebuild=True):
+    """块内保存的机场先不生成保护区，正常结束时一次重建 (可以嵌套，由最外层重建)
+
+    rebuild=False 时块结束也不重建，由调用方稍后自行调用 rebuild_zones (批量导入在所有文件写完后统一重建)。
+    """
+    if getattr(_local, 'pending', None) is not None:
+        yield
+        return
+    _local.pending = set()
+    try:
+        yield
+        airport_ids = _local.pending
+    finally:
+        _local.pending = None
+    if airport_ids and rebuild:
+        rebuild_zones(sorted(airport_ids))
+
+
+def airports_changed(airport_ids):
+    """重新生成这些机场的保护区；在 deferred_rebuild() 中时推迟到块结束"""
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        pending.update(airport_ids)
+    else:
+        rebuild_zones(airport_ids)
+
+
+def _cell_key(row, col):
+    return (row + _CELL_OFFSET) * (_CELL_OFFSET * 2) + col + _CELL_OFFSET
+
+
+class ZoneIndex:
+    """保护区网格索引"""
+
+    def __init__(self, zones, cell_deg):
+        """zones 为 (机场ID, 等级, 半径km, 机场纬度, 机场经度) 序列"""
+        self.cell_deg = cell_deg
+        airports = {}
+        for airport_id, level, radius_km, latitude, longitude in zones:
+            entry = airports.setdefault(airport_id, (latitude, longitude, {}))
+            entry[2][level] = radius_km
+
+        self.airport_ids = []
+        self.latitudes = []
+        self.longitudes = []
+        self.radii = []  # 每个机场的半径元组，下标 + 1 为等级
+        cells = defaultdict(list)
+        for airport_id, (latitude, longitude, levels) in airports.items():
+            position = len(self.airport_ids)
+            self.airport_ids.append(airport_id)
+            self.latitudes.append(latitude)
+            self.longitudes.append(longitude)
+            self.radii.append(tuple(levels[level] for level in sorted(levels)))
+            min_lat, max_lat, min_lon, max_lon = bbox_around(latitude, longitude, max(levels.values()))
+            min_row, min_col = self._cell_of(min_lat, min_lon)
+            max_row, max_col = self._cell_of(max_lat, max_lon)
+            for row in range(min_row, max_row + 1):
+                for col in range(min_col, max_col + 1):
+                    cells[_cell_key(row, col)].append(position)
+        self.cells = dict(cells)
+        self._arrays = None
+
+    def __len__(self):
+        return len(self.airport_ids)
+
+    def _cell_of(self, latitude, longitude):
+        return int(math.floor(latitude / self.cell_deg)), int(math.floor(longitude / self.cell_deg))
+
+    def classify(self, latitude, longitude):
+        """返回 (机场ID, 等级)，不在任何保护区内时返回 (None, None)"""
+        if latitude is None or longitude is None:
+            return None, None
+        candidates = self.cells.get(_cell_key(*self._cell_of(latitude, longitude)))
+        if not candidates:
+            return None, None
+        best = None
+        for position in candidates:
+            distance = haversine_km(latitude, longitude, self.latitudes[position], self.longitudes[position])
+            for level, radius_km in enumerate(self.radii[position], start=1):
+                if distance <= radius_km:
+                    if best is None or (level, distance) < best[:2]:
+                        best = (level, distance, position)
+                    break
+        if best is None:
+            return None, None
+        return self.airport_ids[best[2]], best[0]
+
+    def airports_in_bbox(self, min_lat, max_lat, min_lon, max_lon):
+        """保护区外接矩形与该范围所在网格重叠的机场 (下标集合)"""
+        min_row, min_col = self._cell_of(min_lat, min_lon)
+        max_row, max_col = self._cell_of(max_lat, max_lon)
+        positions = set()
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                positions.update(self.cells.get(_cell_key(row, col), ()))
+        return positions
+
+    def classify_many(self, latitudes, longitudes):
+        """批量分类，返回 (机场ID 列表, 等级列表)，不在保护区内的为 None
+
+        点按网格分组，每组与该网格的候选机场一次性计算距离矩阵。
+        """
+        import numpy as np
+
+        lat = np.asarray(latitudes, dtype='float64')
+        lon = np.asarray(longitudes, dtype='float64')
+        result_airport = np.zeros(len(lat), dtype='int64')
+        result_level = np.zeros(len(lat), dtype='int64')
+        valid = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+        if len(valid) and self.airport_ids:
+            ids, centre_lat, centre_lon, radii, level_counts = self._numpy_arrays()
+            rows = np.floor(lat[valid] / self.cell_deg).astype('int64')
+            cols = np.floor(lon[valid] / self.cell_deg).astype('int64')
+            keys = (rows + _CELL_OFFSET) * (_CELL_OFFSET * 2) + cols + _CELL_OFFSET
+            order = np.argsort(keys, kind='stable')
+            unique_keys, starts = np.unique(keys[order], return_index=True)
+            ends = np.append(starts[1:], len(order))
+            for key, start, end in zip(unique_keys.tolist(), starts.tolist(), ends.tolist()):
+                candidates = self.cells.get(key)
+                if not candidates:
+                    continue
+                points = valid[order[start:end]]
+                candidates = np.asarray(candidates)
+                distance = _haversine_matrix(lat[points], lon[points], centre_lat[candidates], centre_lon[candidates])
+                # 等级 = 小于距离的半径个数 + 1，超过该机场的等级数即不在保护区内
+                levels = (distance[:, :, None] > radii[candidates][None, :, :]).sum(axis=2) + 1
+                inside = levels <= level_counts[candidates][None, :]
+                score = np.where(inside, levels * 1e6 + distance, np.inf)
+                best = score.argmin(axis=1)
+                picked = np.arange(len(points))
+                hit = np.isfinite(score[picked, best])
+                result_airport[points[hit]] = ids[candidates[best[hit]]]
+                result_level[points[hit]] = levels[picked, best][hit]
+
+        airports = [value or None for value in result_airport.tolist()]
+        levels = [value or None for value in result_level.tolist()]
+        return airports, levels
+
+    def _numpy_arrays(self):
+        if self._arrays is None:
+            import numpy as np
+
+            depth = max((len(radii) for radii in self.radii), default=0)
+            # 缺少的外圈填充为无穷大，不影响 "小于距离的半径个数"
+            radii = np.full((len(self.radii), max(depth, 1)), np.inf)
+            for position, values in enumerate(self.radii):
+                radii[position, :len(values)] = values
+            self._arrays = (
+                np.asarray(self.airport_ids, dtype='int64'),
+                np.asarray(self.latitudes, dtype='float64'),
+                np.asarray(self.longitudes, dtype='float64'),
+                radii,
+                np.asarray([len(values) for values in self.radii], dtype='int64'),
+            )
+        return self._arrays
+
+
+def _haversine_matrix(lat1, lon1, lat2, lon2):
+    """点 (n) 与机场 (m) 之间的球面距离矩阵 (n, m)，公里"""
+    import numpy as np
+
+    phi1 = np.radians(lat1)[:, None]
+    phi2 = np.radians(lat2)[None, :]
+    d_lambda = np.radians(lon2[None, :] - lon1[:, None])
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def load_index(zone_model=None):
+    from .models import AirportZone
+
+    zone_model = zone_model or AirportZone
+    zones = zone_model.objects.values_list(
+        'airport_id', 'level', 'radius_km', 'airport__latitude', 'airport__longitude').iterator(chunk_size=5000)
+    return ZoneIndex(zones, settings.BIRD_ZONE_GRID_DEG)
+
+
+zone_index = LookupTable('airport_zones', lambda: {'index': load_index()})
+
+
+def current_index():
+    return zone_index.current('index')
+
+
+def classify_point(latitude, longitude):
+    """按坐标返回 (保护区机场ID, 等级)，不在任何保护区内时返回 (None, None)"""
+    if latitude is None or longitude is None:
+        return None, None
+    return current_index().classify(latitude, longitude)
+
+
+def retag_records(index=None, record_model=None, chunk_size=RETAG_CHUNK_SIZE, airport_ids=None, writer=None):
+    """按当前保护区重新标记鸟情记录，返回 {'records': 检查条数, 'changed': 变化条数}
+
+    airport_ids 为空时检查全部记录；指定时只检查这些机场最外圈保护区外接矩形内的记录
+    和当前标记为这些机场的记录 (机场移动或保护区缩小后清除原标记)，耗时与变化的范围成正比。
+    每批读取坐标后向量化分类，写入临时表，再用一条 UPDATE ... FROM 只更新标记变化的记录；
+    传入 writer (单写线程) 时每批是一个单独的写任务，不在一个长事务中处理全部记录。
+    """
+    from .models import BirdRecord
+
+    index = index or current_index()
+    record_model = record_model or BirdRecord
+    write = writer.run if writer is not None else (lambda func, *args: func(*args))
+    batches = _all_records(record_model, chunk_size) if airport_ids is None else \
+        _records_near(record_model, chunk_size, airport_ids)
+    stats = {'records': 0, 'changed': 0}
+    for rows in batches:
+        record_ids, latitudes, longitudes = zip(*rows)
+        latitudes = [math.nan if value is None else value for value in latitudes]
+        longitudes = [math.nan if value is None else value for value in longitudes]
+        airport_tags, levels = index.classify_many(latitudes, longitudes)
+        stats['changed'] += write(_write_tags, record_model, list(zip(record_ids, airport_tags, levels)))
+        stats['records'] += len(rows)
+    return stats
+
+
+def _all_records(record_model, chunk_size):
+    """按 ID 顺序分批读取全部记录的 (ID, 纬度, 经度)"""
+    last_id = 0
+    while True:
+        rows = list(record_model.objects.filter(id__gt=last_id).order_by('id')
+                    .values_list('id', 'latitude', 'longitude')[:chunk_size])
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield rows
+
+
+def _records_near(record_model, chunk_size, airport_ids):
+    """这些机场保护区范围内 (按坐标索引) 和当前标记为这些机场 (按保护区索引) 的记录，分批返回"""
+    from .models import AirportZone
+
+    airport_ids = list(airport_ids)
+    rows = {}
+    for offset in range(0, len(airport_ids), ID_CHUNK_SIZE):
+        chunk = airport_ids[offset:offset + ID_CHUNK_SIZE]
+        for pk, latitude, longitude in record_model.objects.filter(zone_airport_id__in=chunk).values_list(
+                'id', 'latitude', 'longitude'):
+            rows[pk] = (pk, latitude, longitude)
+        boxes = AirportZone.objects.filter(airport_id__in=chunk).values_list(
+            'min_latitude', 'max_latitude', 'min_longitude', 'max_longitude')
+        for min_lat, max_lat, min_lon, max_lon in merge_boxes(boxes):
+            for pk, latitude, longitude in record_model.objects.filter(
+                    latitude__gte=min_lat, latitude__lte=max_lat,
+                    longitude__gte=min_lon, longitude__lte=max_lon).values_list('id', 'latitude', 'longitude'):
+                rows[pk] = (pk, latitude, longitude)
+    ordered = [rows[pk] for pk in sorted(rows)]
+    for offset in range(0, len(ordered), chunk_size):
+        yield ordered[offset:offset + chunk_size]
+
+
+def merge_boxes(boxes):
+    """合并相互重叠的外接矩形 (min_lat, max_lat, min_lon, max_lon)，同一机场的各级保护区只查询一次"""
+    merged = []
+    for box in sorted(boxes):
+        box = list(box)
+        overlapping = True
+        while overlapping:
+            overlapping = False
+            for other in merged:
+                if box[0] <= other[1] and other[0] <= box[1] and box[2] <= other[3] and other[2] <= box[3]:
+                    merged.remove(other)
+                    box = [min(box[0], other[0]), max(box[1], other[1]), min(box[2], other[2]), max(box[3], other[3])]
+                    overlapping = True
+                    break
+        merged.append(box)
+    return [tuple(box) for box in merged]
+
+
+def _write_tags(record_model, tags):
+    """把一批 (记录ID, 机场ID, 等级) 写入临时表，只更新标记变化的记录，返回更新条数"""
+    table = connection.ops.quote_name(record_model._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS bird_zone_tags '
+                       '(id INTEGER PRIMARY KEY, airport_id INTEGER, level INTEGER)')
+        cursor.execute('DELETE FROM bird_zone_tags')
+        cursor.executemany('INSERT INTO bird_zone_tags (id, airport_id, level) VALUES (%s, %s, %s)', tags)
+        cursor.execute(
+            f'UPDATE {table} SET zone_airport_id = t.airport_id, zone_level = t.level '
+            f'FROM bird_zone_tags AS t WHERE {table}.id = t.id '
+            f'AND ({table}.zone_airport_id IS NOT t.airport_id OR {table}.zone_level IS NOT t.level)'
+        )
+        return cursor.rowcount